@@ -0,0 +1,207 @@
+import math
+import multiprocessing
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from constants import * # Import all constants
+from entity_store import PICKUP_MASK # Import the pickup components
+
+# Compact world snapshot sent to the workers (plain tuples, no sprites)
+# Tokens are the stable entity ids assigned by the World (see World)
+# cars: (token, x, y, vx, vy, angle, hp, is_disabled, is_player)
+# pickups: (token, x, y, hp_value)
+WorldSnapshot = namedtuple("WorldSnapshot", ["frame", "cars", "pickups"])
+
+# High-level plan of one AI car
+# target_token: the token (entity id) of the car or pickup to go for, or None
+# target_is_pickup: True if the target is a health pickup
+# lead_time: the bullet flight time to aim ahead of the target (seconds)
+AIPlan = namedtuple("AIPlan", ["frame", "target_token", "target_is_pickup", "lead_time"])
+
+# Indices in the car tuples of a WorldSnapshot
+CAR_TOKEN, CAR_X, CAR_Y, CAR_VX, CAR_VY, CAR_ANGLE, CAR_HP, CAR_DISABLED, CAR_IS_PLAYER = range(9)
+
+def make_world_snapshot(frame, cars, pickups):
+    """
+    Packs the state needed by the planner into plain tuples.
+
+    Args:
+        frame (int): The current frame number.
+        cars (list): All the cars of the session.
+        pickups (EntityStore): The health pickups on the track (World.pickups).
+
+    Returns:
+        WorldSnapshot: The compact snapshot.
+    """
+    return WorldSnapshot(
+        frame,
+        tuple((car.entity_id, car.position.x, car.position.y, car.velocity.x, car.velocity.y,
+               car.angle, car.hp, car.is_disabled, car.is_player) for car in cars),
+        tuple((pickups.ids[row], pickups.x[row], pickups.y[row], pickups.hp[row]) for row in pickups.query(PICKUP_MASK))
+    )
+
+def lead_time(shooter_x, shooter_y, target_x, target_y, target_vx, target_vy, bullet_speed=BULLET_SPEED):
+    """
+    Returns the bullet flight time to intercept a target moving at constant velocity.
+
+    Solves |target + target_velocity * t - shooter| = bullet_speed * t for the smallest t > 0.
+
+    Args:
+        shooter_x (float): The x-coordinate of the shooter.
+        shooter_y (float): The y-coordinate of the shooter.
+        target_x (float): The x-coordinate of the target.
+        target_y (float): The y-coordinate of the target.
+        target_vx (float): The x-component of the target velocity.
+        target_vy (float): The y-component of the target velocity.
+        bullet_speed (float, optional): The speed of the bullets. Defaults to BULLET_SPEED.
+
+    Returns:
+        float: The intercept time in seconds, 0 if the target cannot be intercepted.
+    """
+    rx, ry = target_x - shooter_x, target_y - shooter_y
+    a = target_vx * target_vx + target_vy * target_vy - bullet_speed * bullet_speed
+    b = 2 * (rx * target_vx + ry * target_vy)
+    c = rx * rx + ry * ry
+    if abs(a) < 1e-9:
+        return -c / b if b < 0 else 0.0
+    discriminant = b * b - 4 * a * c
+    if discriminant < 0:
+        return 0.0
+    root = math.sqrt(discriminant)
+    times = [t for t in ((-b - root) / (2 * a), (-b + root) / (2 * a)) if t > 0]
+    return min(times) if times else 0.0
+
+def plan_ai_cars(snapshot, ai_tokens):
+    """
+    Computes the high-level plans of AI cars from a world snapshot (runs in a worker process).
+
+    Tactical choice: a healthy AI attacks the human player with the lowest attack cost
+    (close and damaged players first); a damaged AI, or one without a human to chase, heads for the
+    closest health pickup. Attack plans include the lead time to aim ahead of the target.
+
+    Args:
+        snapshot (WorldSnapshot): The world snapshot.
+        ai_tokens (tuple): The tokens of the AI cars to plan for.
+
+    Returns:
+        dict: The AIPlan of each AI car token.
+    """
+    cars_by_token = {car[CAR_TOKEN]: car for car in snapshot.cars}
+    humans = [car for car in snapshot.cars if car[CAR_IS_PLAYER] and car[CAR_HP] > 0 and not car[CAR_DISABLED]]
+    plans = {}
+    for token in ai_tokens:
+        car = cars_by_token.get(token)
+        if car is None or car[CAR_DISABLED]:
+            continue
+        x, y = car[CAR_X], car[CAR_Y]
+
+        wants_pickup = car[CAR_HP] < MAX_HP * AI_RETREAT_HP_RATIO or not humans
+        if wants_pickup and snapshot.pickups:
+            pickup = min(snapshot.pickups, key=lambda p: (p[1] - x) ** 2 + (p[2] - y) ** 2)
+            plans[token] = AIPlan(snapshot.frame, pickup[0], True, 0.0)
+            continue
+        if not humans:
+            continue
+
+        def attack_cost(target):
+            distance = math.hypot(target[CAR_X] - x, target[CAR_Y] - y)
+            return distance * (0.5 + target[CAR_HP] / MAX_HP) # Prefer close and damaged targets
+
+        target = min(humans, key=attack_cost)
+        flight_time = lead_time(x, y, target[CAR_X], target[CAR_Y], target[CAR_VX], target[CAR_VY])
+        plans[token] = AIPlan(snapshot.frame, target[CAR_TOKEN], False, flight_time)
+    return plans
+
+class PlannerService:
+    """
+    Runs the AI plans asynchronously in a process pool.
+
+    The game loop submits world snapshots and collects finished plans without ever
+    waiting on the pool; the reactive steering of Car.update_ai covers the frames
+    until a plan arrives.
+    """
+    def __init__(self, max_workers=None):
+        """
+        Initializes the planner service (worker processes are started by start() or on the first request).
+
+        Args:
+            max_workers (int, optional): The number of worker processes. Defaults to the spare cores.
+        """
+        if max_workers is None:
+            max_workers = max(1, (os.cpu_count() or 2) - 1)
+        self.max_workers = max_workers
+        self.executor = None
+        self.pending = [] # Futures in flight
+        self.enabled = True
+
+    def start(self):
+        """
+        Starts the worker processes, so that spawning them does not cost a game frame later.
+        Called during the session setup.
+        """
+        if not self.enabled or self.executor is not None:
+            return
+        try:
+            self.executor = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+            self.pending.append(self.executor.submit(plan_ai_cars, WorldSnapshot(0, (), ()), ())) # Warm-up job
+        except (BrokenProcessPool, OSError, RuntimeError) as e:
+            print(f"AI planner disabled: {e}")
+            self.enabled = False
+
+    def request_plans(self, snapshot, ai_tokens):
+        """
+        Submits a planning job if a worker is free. Never blocks.
+
+        Args:
+            snapshot (WorldSnapshot): The world snapshot.
+            ai_tokens (tuple): The tokens of the AI cars to plan for.
+
+        Returns:
+            bool: True if the job was submitted, False if the pool is busy or disabled.
+        """
+        if not self.enabled or len(self.pending) >= self.max_workers:
+            return False
+        if self.executor is None:
+            self.start()
+        try:
+            self.pending.append(self.executor.submit(plan_ai_cars, snapshot, ai_tokens))
+        except (BrokenProcessPool, OSError, RuntimeError) as e:
+            print(f"AI planner disabled: {e}")
+            self.enabled = False
+            return False
+        return True
+
+    def collect(self):
+        """
+        Returns the plans of the jobs that finished since the last call. Never blocks.
+
+        Returns:
+            dict: The latest AIPlan of each AI car token.
+        """
+        plans = {}
+        still_pending = []
+        for future in self.pending:
+            if not future.done():
+                still_pending.append(future)
+                continue
+            try:
+                for token, plan in future.result().items():
+                    if token not in plans or plans[token].frame < plan.frame:
+                        plans[token] = plan
+            except BrokenProcessPool as e:
+                print(f"AI planner disabled: {e}")
+                self.enabled = False
+            except Exception as e:
+                print(f"AI planning job failed: {e}")
+        self.pending = still_pending
+        return plans
+
+    def shutdown(self):
+        """
+        Stops the worker processes without waiting for the jobs in flight.
+        """
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        self.pending = []
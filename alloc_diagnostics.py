@@ -0,0 +1,274 @@
+import gc
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+from constants import * # Import all constants
+
+# Result of measure_step_allocations, per simulated step:
+# blocks: memory blocks still allocated at the end of the step (net), bytes: traced bytes (net),
+# peak_bytes: largest amount of traced memory a step reached above its start (its temporaries included),
+# mean_peak_bytes: the same peak, averaged over the steps,
+# top_lines: the (file:line, blocks, bytes) that retained the most memory over the measure
+StepAllocations = namedtuple("StepAllocations", ["blocks", "bytes", "peak_bytes", "mean_peak_bytes", "top_lines"])
+
+# tracemalloc and this module are not the game
+TRACE_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<unknown>")
+)
+
+def _take_snapshot():
+    return tracemalloc.take_snapshot().filter_traces(TRACE_FILTERS)
+
+def _top_lines(snapshot, previous, count):
+    """
+    Returns the source lines that allocated the most blocks between two snapshots: [(file:line, blocks, bytes)].
+    """
+    differences = snapshot.compare_to(previous, "lineno")
+    differences.sort(key=lambda stat: (-stat.count_diff, -stat.size_diff))
+    return [(f"{stat.traceback[0].filename.rsplit('/', 1)[-1]}:{stat.traceback[0].lineno}", stat.count_diff, stat.size_diff)
+            for stat in differences[:count] if stat.count_diff > 0]
+
+class AllocationDiagnostics:
+    """
+    tracemalloc-based allocation diagnostics of the game loop.
+
+    The game loop announces its phases (World.phase_hook, then "render"); for each phase the
+    diagnostics accumulate the memory blocks and bytes it left allocated and the peak of its
+    temporaries. Every ALLOC_REPORT_FRAMES frames, they print the per-frame figures of each phase,
+    the source lines that retained the most blocks (tracemalloc snapshot difference) and the
+    garbage collections of the period with their pause times.
+
+    Temporaries freed within their phase (Vector2 arithmetic...) are released by reference counting
+    and only show in the peaks; the net blocks are what accumulates in the GC generations.
+    """
+    def __init__(self, report_frames=ALLOC_REPORT_FRAMES, top_lines=ALLOC_TOP_LINES):
+        """
+        Initializes the diagnostics (tracing starts with start()).
+
+        Args:
+            report_frames (int, optional): The number of frames between two reports. Defaults to ALLOC_REPORT_FRAMES.
+            top_lines (int, optional): The number of source lines listed in the reports. Defaults to ALLOC_TOP_LINES.
+        """
+        self.report_frames = report_frames
+        self.top_lines = top_lines
+        self.frames = 0
+        self.phases = {} # Phase -> [net blocks, net bytes, peak bytes, times run] over the report period
+        self.gc_collections = [0, 0, 0]
+        self.gc_pauses = [] # Seconds
+        self._gc_start = None
+        self._phase = None
+        self._blocks = 0
+        self._bytes = 0
+        self._snapshot = None
+        self._started_tracing = False
+
+    def start(self):
+        """
+        Starts tracing the allocations and timing the garbage collections.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(ALLOC_TRACEBACK_DEPTH)
+            self._started_tracing = True
+        gc.callbacks.append(self._on_gc)
+        self._snapshot = _take_snapshot()
+        print(f"Diagnostic des allocations actif (rapport toutes les {self.report_frames} images)")
+
+    def stop(self):
+        """
+        Stops tracing (the allocations of the last, partial period are not reported).
+        """
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def _on_gc(self, phase, info):
+        if phase == "start":
+            self._gc_start = time.perf_counter()
+        elif self._gc_start is not None:
+            self.gc_pauses.append(time.perf_counter() - self._gc_start)
+            self.gc_collections[info["generation"]] += 1
+            self._gc_start = None
+
+    # --- Game loop ---
+
+    def phase(self, name):
+        """
+        Ends the current phase of the frame and starts another one.
+
+        Args:
+            name (str): The phase starting, None to only end the current one.
+        """
+        blocks = sys.getallocatedblocks()
+        current, peak = tracemalloc.get_traced_memory()
+        if self._phase is not None:
+            stats = self.phases.get(self._phase)
+            if stats is None:
+                stats = self.phases[self._phase] = [0, 0, 0, 0]
+            stats[0] += blocks - self._blocks
+            stats[1] += current - self._bytes
+            stats[2] = max(stats[2], peak - self._bytes)
+            stats[3] += 1
+            stats = None
+        self._phase = name
+        # The temporaries of the measure are released before the new baseline, so that they are not counted
+        del blocks, current, peak
+        tracemalloc.reset_peak()
+        self._bytes = tracemalloc.get_traced_memory()[0]
+        self._blocks = sys.getallocatedblocks()
+
+    def end_frame(self):
+        """
+        Ends the frame (and its last phase), and prints the report at the end of each period.
+        """
+        self.phase(None)
+        self.frames += 1
+        if self.frames % self.report_frames == 0:
+            self.report()
+
+    def report(self):
+        """
+        Prints the allocations of the period and resets the counters.
+        """
+        frames = self.report_frames
+        snapshot = _take_snapshot()
+        lines = _top_lines(snapshot, self._snapshot, self.top_lines)
+        self._snapshot = snapshot
+
+        phases = ", ".join(f"{name} {blocks / frames:+.1f} blocs / {size / frames / 1024:+.2f} KB (pic {peak / 1024:.1f} KB)"
+                           for name, (blocks, size, peak, _) in self.phases.items())
+        # Long frames are simulated in several steps: their phases run several times per frame
+        steps = max((count for _, _, _, count in self.phases.values()), default=0) / frames
+        print(f"Allocations par image sur {frames} images ({steps:.1f} passages par image): {phases}")
+        for location, count, size in lines:
+            print(f"    {location}: {count:+d} blocs ({size / 1024:+.1f} KB)")
+        pauses = self.gc_pauses
+        if pauses:
+            print(f"GC: {self.gc_collections[0]}/{self.gc_collections[1]}/{self.gc_collections[2]} collectes (générations 0/1/2), "
+                  f"pause moyenne {sum(pauses) / len(pauses) * 1000:.2f} ms, max {max(pauses) * 1000:.2f} ms, "
+                  f"total {sum(pauses) * 1000:.1f} ms")
+        else:
+            print("GC: aucune collecte")
+        self.phases = {}
+        self.gc_collections = [0, 0, 0]
+        self.gc_pauses = []
+
+# --- Step budget ---
+
+def measure_step_allocations(world, player_controls, steps=ALLOC_BUDGET_STEPS, warmup=ALLOC_BUDGET_WARMUP, dt_ms=16, top_lines=ALLOC_TOP_LINES):
+    """
+    Measures the allocations of simulated steps (the garbage collector is paused during the measure).
+
+    The net blocks only show what the steps retain: the temporaries a step frees before it ends
+    are measured by the peak of traced memory of each step, reset before it starts.
+
+    Args:
+        world (World): The simulation (PLANNER_INLINE or PLANNER_OFF, so that no other thread allocates).
+        player_controls (sequence): The CONTROL_* flags of each human player, for every step.
+        steps (int, optional): The number of steps measured. Defaults to ALLOC_BUDGET_STEPS.
+        warmup (int, optional): The number of steps simulated first (caches filling up). Defaults to ALLOC_BUDGET_WARMUP.
+        dt_ms (int, optional): The duration of the steps. Defaults to 16.
+        top_lines (int, optional): The number of source lines returned. Defaults to ALLOC_TOP_LINES.
+
+    Returns:
+        StepAllocations: The allocations per step.
+    """
+    for _ in range(warmup):
+        world.step(dt_ms, player_controls)
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(ALLOC_TRACEBACK_DEPTH)
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        before = _take_snapshot()
+        blocks = sys.getallocatedblocks()
+        traced = tracemalloc.get_traced_memory()[0]
+        peak_bytes = total_peak_bytes = 0
+        for _ in range(steps):
+            step_start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            world.step(dt_ms, player_controls)
+            step_peak = tracemalloc.get_traced_memory()[1] - step_start
+            total_peak_bytes += step_peak
+            if step_peak > peak_bytes:
+                peak_bytes = step_peak
+        blocks = sys.getallocatedblocks() - blocks
+        current = tracemalloc.get_traced_memory()[0]
+        lines = _top_lines(_take_snapshot(), before, top_lines)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+        if started_tracing:
+            tracemalloc.stop()
+    return StepAllocations(blocks / steps, (current - traced) / steps, peak_bytes, total_peak_bytes / steps, lines)
+
+def assert_step_allocations(world, player_controls, max_peak_bytes, max_blocks=None, **kwargs):
+    """
+    Checks that simulated steps stay within an allocation budget (for tests).
+
+    Args:
+        world (World): The simulation.
+        player_controls (sequence): The CONTROL_* flags of each human player.
+        max_peak_bytes (int): The most memory a step may allocate above its start, temporaries included.
+        max_blocks (float, optional): The largest number of blocks a step may leave allocated, on average. Defaults to None (not checked).
+        **kwargs: The other arguments of measure_step_allocations.
+
+    Returns:
+        StepAllocations: The measure.
+
+    Raises:
+        AssertionError: If a step allocates more than the budget.
+    """
+    result = measure_step_allocations(world, player_controls, **kwargs)
+    if result.peak_bytes > max_peak_bytes:
+        raise AssertionError(f"A step allocated {result.peak_bytes} bytes at its peak, budget {max_peak_bytes} "
+                             f"({result.mean_peak_bytes:.0f} bytes per step on average)")
+    if max_blocks is not None and result.blocks > max_blocks:
+        lines = "; ".join(f"{location} {count:+d}" for location, count, _ in result.top_lines)
+        raise AssertionError(f"{result.blocks:.1f} blocks allocated per step, budget {max_blocks} ({lines})")
+    return result
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    import random
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    import pygame
+    from track import load_track # Import the track loader
+    from world import World, PLANNER_INLINE # Import the simulation
+    from car import Car # Import Car class (sounds)
+
+    parser = argparse.ArgumentParser(description="Report the allocations of the simulation, per phase and per source line.")
+    parser.add_argument("--track", default=DEFAULT_TRACK_PATH)
+    parser.add_argument("--mode", choices=[GAME_MODE_FREE_PLAY, GAME_MODE_RACE], default=GAME_MODE_FREE_PLAY)
+    parser.add_argument("--ai", type=int, default=8, help="Number of AI cars")
+    parser.add_argument("--frames", type=int, default=1200, help="Number of frames simulated with the diagnostics")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    Car.sounds_enabled = False
+    world = World(load_track(args.track), 2, args.ai, args.mode, DIFFICULTY_PRO, seed=args.seed, planner_mode=PLANNER_INLINE)
+    controls_rng = random.Random(args.seed)
+
+    diagnostics = AllocationDiagnostics(report_frames=min(ALLOC_REPORT_FRAMES, args.frames))
+    diagnostics.start()
+    world.phase_hook = diagnostics.phase
+    for _ in range(args.frames):
+        world.step(16, [controls_rng.randrange(1 << CONTROL_BITS) for _ in world.player_cars])
+        diagnostics.end_frame()
+    world.phase_hook = None
+    diagnostics.stop()
+
+    result = measure_step_allocations(world, [CONTROL_ACCELERATE | CONTROL_FIRE] * len(world.player_cars))
+    print(f"Budget: {result.blocks:.1f} blocs et {result.bytes / 1024:.2f} KB conservés par pas, "
+          f"pic par pas {result.mean_peak_bytes / 1024:.1f} KB en moyenne, {result.peak_bytes / 1024:.1f} KB au plus")
+    world.shutdown()
@@ -0,0 +1,185 @@
+import threading
+import time
+import pygame
+from constants import * # Import all constants
+from track import load_track # Import the track loader
+
+# Sounds of the game and their playback volume
+SOUND_VOLUMES = {
+    SOUND_MENU_SELECT_PATH: 0.7,
+    SOUND_COLLISION_PATH: 0.5,
+    SOUND_PICKUP_PATH: 0.6
+}
+CAR_COLORS = (BLUE, GREEN, YELLOW) # Players 1 and 2, AI cars
+
+def create_pizza_slice_surface(width, length, color):
+    """
+    Creates a Pygame surface with the shape of a pizza slice.
+
+    Args:
+        width (int): The width of the pizza slice's base.
+        length (int): The length of the pizza slice.
+        color (tuple): The color of the pizza slice.
+
+    Returns:
+        pygame.Surface: A Pygame surface with the pizza slice shape.
+    """
+    max_dim = max(width, length) * 2
+    surface = pygame.Surface((max_dim, max_dim), pygame.SRCALPHA)
+
+    center_x, center_y = max_dim / 2, max_dim / 2
+
+    points = [
+        (center_x, center_y - length / 2),
+        (center_x - width / 2, center_y + length / 2),
+        (center_x + width / 2, center_y + length / 2)
+    ]
+    pygame.draw.polygon(surface, color, points)
+    return surface
+
+class AssetCache:
+    """
+    Shared game assets: decoded sounds, car sprites, loaded tracks and fonts, each built once per process.
+
+    preload() builds the sounds, sprites and tracks on a background thread (while the menu is shown),
+    so that starting a session only looks them up. An asset requested before the preloading is
+    over waits for it; an asset that was not preloaded is built on the spot.
+    Fonts are only built on the main thread (SDL_ttf is not thread-safe).
+    """
+    def __init__(self):
+        self.sounds = {} # Path -> pygame.mixer.Sound (None if it could not be loaded)
+        self.car_images = {} # Color -> unrotated car sprite (shared by the cars, never drawn on)
+        self.scaled_car_images = {} # (color, scale) -> car sprite at an internal render resolution (main thread only)
+        self.rotated_car_images = {} # (color, angle, scale) -> car sprite rotated by a whole angle step (main thread only)
+        self.tracks = {} # Path -> Track
+        self.fonts = {} # Size -> pygame.font.Font
+        self._thread = None
+        self.preload_time = None # Duration of the last preloading, in seconds (None until it is over)
+
+    # --- Preloading ---
+
+    def preload(self, track_paths=(DEFAULT_TRACK_PATH,)):
+        """
+        Starts building the sounds, car sprites and tracks on a background thread (call after pygame.mixer.init()).
+
+        Args:
+            track_paths (iterable, optional): The tracks to load. Defaults to (DEFAULT_TRACK_PATH,).
+        """
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._preload, args=(tuple(track_paths),), name="asset-loader", daemon=True)
+        self._thread.start()
+
+    def _preload(self, track_paths):
+        start = time.perf_counter()
+        for path in SOUND_VOLUMES:
+            self._load_sound(path)
+        for color in CAR_COLORS:
+            self._load_car_image(color)
+        for path in track_paths:
+            try:
+                self.tracks[path] = load_track(path)
+            except (OSError, ValueError) as e:
+                print(f"Erreur de préchargement de la piste {path}: {e}")
+        self.preload_time = time.perf_counter() - start
+
+    def ready(self):
+        """
+        Returns whether the preloading is over (or was never started).
+        """
+        return self._thread is None or not self._thread.is_alive()
+
+    def wait(self):
+        """
+        Waits for the end of the preloading.
+        """
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    # --- Lookups ---
+
+    def sound(self, path, wait=True):
+        """
+        Returns a sound of the game, at its volume.
+
+        Args:
+            path (str): The sound file.
+            wait (bool, optional): Whether to wait for the preloading if it is still running. Defaults to True
+                (False returns None instead, e.g. for a menu that must stay responsive).
+
+        Returns:
+            pygame.mixer.Sound: The sound, None if it could not be loaded (or is not ready yet).
+        """
+        if path not in self.sounds:
+            if not wait and not self.ready():
+                return None
+            self.wait()
+            if path not in self.sounds:
+                self._load_sound(path)
+        return self.sounds[path]
+
+    def car_image(self, color):
+        """
+        Returns the unrotated sprite of a car of a color (shared: rotate or copy it, never draw on it).
+        """
+        if color not in self.car_images:
+            self.wait()
+            if color not in self.car_images:
+                self._load_car_image(color)
+        return self.car_images[color]
+
+    def rotated_car_image(self, color, angle, scale=1.0):
+        """
+        Returns the sprite of a car of a color rotated by an angle and scaled (cached: use a limited set of angles, see Car.rotation_step).
+        """
+        key = (color, angle, scale)
+        image = self.rotated_car_images.get(key)
+        if image is None:
+            image = self.rotated_car_images[key] = pygame.transform.rotate(self.scaled_car_image(color, scale), -angle)
+        return image
+
+    def scaled_car_image(self, color, scale):
+        """
+        Returns the unrotated sprite of a car of a color, scaled (shared: rotate or copy it, never draw on it).
+        """
+        if scale == 1:
+            return self.car_image(color)
+        key = (color, scale)
+        image = self.scaled_car_images.get(key)
+        if image is None:
+            image = self.scaled_car_images[key] = pygame.transform.smoothscale_by(self.car_image(color), scale)
+        return image
+
+    def track(self, path):
+        """
+        Returns a loaded track (the Track is shared by every session on it).
+        """
+        if path not in self.tracks:
+            self.wait()
+            if path not in self.tracks:
+                self.tracks[path] = load_track(path)
+        return self.tracks[path]
+
+    def font(self, size):
+        """
+        Returns the default font at a size (main thread only).
+        """
+        font = self.fonts.get(size)
+        if font is None:
+            font = self.fonts[size] = pygame.font.Font(None, size)
+        return font
+
+    def _load_sound(self, path):
+        try:
+            sound = pygame.mixer.Sound(path)
+            sound.set_volume(SOUND_VOLUMES.get(path, 1.0))
+        except pygame.error as e:
+            print(f"Erreur de chargement du son {path}: {e}")
+            sound = None
+        self.sounds[path] = sound
+
+    def _load_car_image(self, color):
+        self.car_images[color] = create_pizza_slice_surface(CAR_WIDTH, CAR_LENGTH, color)
+
+# The assets of the process
+assets = AssetCache()
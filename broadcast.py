@@ -0,0 +1,294 @@
+import argparse
+import asyncio
+import json
+import os
+import struct
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+import pygame
+from constants import * # Import all constants
+from track import load_track # Import the track loader
+from world import World, PLANNER_OFF # Import the simulation (spectator display)
+from asset_loader import assets # Import the shared fonts
+from net_protocol import quantize_world, encode_state, decode_state, describe_session # Import the state encoding
+from net_client import display_state # Import the display of received states
+
+# --- Spectator stream ---
+# A TCP stream of messages: payload length, type, tick, payload.
+#   SESSION:  the JSON session description (first message)
+#   KEYFRAME: a full encoded state (net_protocol.encode_state)
+#   DELTA:    a state encoded against the previous message's state
+# A spectator joining mid-match receives the session, the latest keyframe and the deltas since,
+# all of them the very bytes already sent to the other spectators.
+MESSAGE_SESSION = 1
+MESSAGE_KEYFRAME = 2
+MESSAGE_DELTA = 3
+MESSAGE_FORMAT = struct.Struct("<IBI")
+
+def make_message(message_type, tick, payload):
+    return MESSAGE_FORMAT.pack(len(payload), message_type, tick) + payload
+
+class SpectatorProtocol(asyncio.Protocol):
+    """
+    One spectator connection (read-only: anything it sends is ignored).
+    """
+    def __init__(self, service):
+        self.service = service
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.service._add_spectator(self)
+
+    def connection_lost(self, exc):
+        self.service._remove_spectator(self)
+
+    def data_received(self, data):
+        pass
+
+class BroadcastService:
+    """
+    Streams a running session to read-only spectators.
+
+    The game loop calls publish() every frame: every NET_SNAPSHOT_INTERVAL frames the state is
+    quantized and encoded once (a keyframe every BROADCAST_KEYFRAME_INTERVAL seconds, deltas in
+    between), then handed to the network thread, which writes the same bytes to every spectator
+    without waiting for them. A spectator whose unsent data exceeds BROADCAST_MAX_BUFFER is dropped.
+    """
+    def __init__(self, world, track_path, host=NET_DEFAULT_HOST, port=BROADCAST_DEFAULT_PORT):
+        """
+        Initializes the broadcast of a session.
+
+        Args:
+            world (World): The session to stream.
+            track_path (str): The track file of the session.
+            host (str, optional): The address to listen on. Defaults to NET_DEFAULT_HOST.
+            port (int, optional): The TCP port. Defaults to BROADCAST_DEFAULT_PORT.
+        """
+        self.world = world
+        self.host = host
+        self.port = port
+        self.session_message = make_message(MESSAGE_SESSION, 0, json.dumps(describe_session(world, track_path)).encode("utf-8"))
+        self.keyframe_ticks = max(1, round(BROADCAST_KEYFRAME_INTERVAL * NET_TICK_RATE))
+        self.frames = 0
+        self.tick = 0
+        self.last_keyframe_tick = None
+        self.previous_state = None
+
+        # Network thread state (only touched from its event loop)
+        self.loop = None
+        self.server = None
+        self.spectators = set()
+        self.catch_up = [] # Latest keyframe and the deltas since, for joining spectators
+        self._ready = threading.Event()
+        self._thread = None
+
+        self.messages = 0
+        self.bytes_encoded = 0
+        self.bytes_sent = 0
+        self.encode_time = 0.0
+        self.fan_out_time = 0.0
+        self.dropped = 0
+        self.last_report = time.perf_counter()
+
+    # --- Network thread ---
+
+    def start(self):
+        """
+        Starts listening on the network thread.
+        """
+        self._thread = threading.Thread(target=self._run, name="broadcast", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        print(f"Diffusion des spectateurs sur {self.host}:{self.port}")
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(
+            self.loop.create_server(lambda: SpectatorProtocol(self), self.host, self.port))
+        self._ready.set()
+        self.loop.run_forever()
+        self.server.close()
+        for spectator in list(self.spectators):
+            spectator.transport.close()
+        self.loop.run_until_complete(self.server.wait_closed())
+        self.loop.close()
+
+    def stop(self):
+        """
+        Closes the spectator connections and stops the network thread.
+        """
+        if self.loop and self._thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout=5)
+
+    def _add_spectator(self, spectator):
+        spectator.transport.write(self.session_message)
+        for message in self.catch_up:
+            spectator.transport.write(message)
+        self.spectators.add(spectator)
+
+    def _remove_spectator(self, spectator):
+        self.spectators.discard(spectator)
+
+    def _fan_out(self, message, keyframe):
+        """
+        Writes a message to every spectator (network thread). Never waits: slow spectators are dropped.
+        """
+        start = time.perf_counter()
+        if keyframe:
+            self.catch_up = [message]
+        elif self.catch_up:
+            self.catch_up.append(message)
+        for spectator in list(self.spectators):
+            transport = spectator.transport
+            transport.write(message)
+            if transport.get_write_buffer_size() > BROADCAST_MAX_BUFFER:
+                self.spectators.discard(spectator)
+                transport.abort()
+                self.dropped += 1
+        self.bytes_sent += len(message) * len(self.spectators)
+        self.fan_out_time += time.perf_counter() - start
+
+    # --- Game thread ---
+
+    def publish(self):
+        """
+        Called by the game loop after each simulation frame: encodes and streams the state every NET_SNAPSHOT_INTERVAL frames.
+        """
+        self.frames += 1
+        if self.frames % NET_SNAPSHOT_INTERVAL:
+            return
+        start = time.perf_counter()
+        self.tick = self.frames
+        state = quantize_world(self.world)
+        keyframe = self.last_keyframe_tick is None or self.tick - self.last_keyframe_tick >= self.keyframe_ticks
+        if keyframe:
+            self.last_keyframe_tick = self.tick
+            message = make_message(MESSAGE_KEYFRAME, self.tick, encode_state(state))
+        else:
+            message = make_message(MESSAGE_DELTA, self.tick, encode_state(state, self.previous_state))
+        self.previous_state = state
+        self.messages += 1
+        self.bytes_encoded += len(message)
+        self.encode_time += time.perf_counter() - start
+        self.loop.call_soon_threadsafe(self._fan_out, message, keyframe)
+
+        now = time.perf_counter()
+        if now - self.last_report >= NET_STATS_INTERVAL:
+            self.report(now - self.last_report)
+            self.last_report = now
+
+    def report(self, elapsed):
+        """
+        Prints the broadcast statistics since the last report and resets them.
+        """
+        messages = max(1, self.messages)
+        print(f"Diffusion: {len(self.spectators)} spectateurs, {self.messages / elapsed:.0f} messages/s, "
+              f"{self.bytes_encoded / messages:.0f} octets par message, encodage {self.encode_time / messages * 1e6:.0f} us, "
+              f"envoi {self.fan_out_time / messages * 1e6:.0f} us, {self.bytes_sent / elapsed / 1024:.0f} KB/s au total, "
+              f"{self.dropped} spectateurs trop lents déconnectés")
+        self.messages = self.bytes_encoded = self.bytes_sent = self.dropped = 0
+        self.encode_time = self.fan_out_time = 0.0
+
+# --- Spectator client ---
+
+async def watch(screen, host=NET_DEFAULT_HOST, port=BROADCAST_DEFAULT_PORT, duration=None):
+    """
+    Watches a broadcast session.
+
+    Args:
+        screen (pygame.Surface or None): The screen to draw on, None to only receive and decode the stream.
+        host (str, optional): The address of the broadcast. Defaults to NET_DEFAULT_HOST.
+        port (int, optional): The TCP port of the broadcast. Defaults to BROADCAST_DEFAULT_PORT.
+        duration (float, optional): The number of seconds to watch. Defaults to None (until ESC or the end of the match).
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    world = None
+    snapshots = deque()
+    state = None
+    latest_tick, latest_time = None, 0.0
+    received = {"bytes": 0, "messages": 0}
+    start = time.perf_counter()
+
+    async def read_stream():
+        nonlocal world, state, latest_tick, latest_time
+        while True:
+            header = await reader.readexactly(MESSAGE_FORMAT.size)
+            length, message_type, tick = MESSAGE_FORMAT.unpack(header)
+            payload = await reader.readexactly(length)
+            received["bytes"] += MESSAGE_FORMAT.size + length
+            received["messages"] += 1
+            if message_type == MESSAGE_SESSION:
+                session = json.loads(payload.decode("utf-8"))
+                if screen is not None:
+                    world = World(load_track(session["track"]), session["player_count"], session["ai_count"], session["game_mode"],
+                                  session["difficulty"], seed=session["seed"], start_ticks=session["start_ticks"], planner_mode=PLANNER_OFF)
+            elif message_type == MESSAGE_KEYFRAME or (message_type == MESSAGE_DELTA and state is not None):
+                state = decode_state(payload, 0, state if message_type == MESSAGE_DELTA else None)
+                snapshots.append((tick, state))
+                while len(snapshots) > 2 and snapshots[1][0] < tick - NET_TICK_RATE:
+                    snapshots.popleft()
+                latest_tick, latest_time = tick, time.perf_counter()
+
+    reading = asyncio.ensure_future(read_stream())
+    font_score = assets.font(SCORE_FONT_SIZE)
+    font_coords = assets.font(COORD_FONT_SIZE)
+    running = True
+    try:
+        while running and not reading.done() and (duration is None or time.perf_counter() - start < duration):
+            if screen is not None:
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                        running = False
+                if world is not None and snapshots:
+                    render_tick = (latest_tick + (time.perf_counter() - latest_time) * NET_TICK_RATE
+                                   - NET_INTERPOLATION_DELAY * NET_TICK_RATE)
+                    display_state(world, snapshots, render_tick)
+                    world.draw(screen, font_score, font_coords)
+                    pygame.display.flip()
+            await asyncio.sleep(1.0 / FPS)
+    finally:
+        reading.cancel()
+        writer.close()
+        if world:
+            world.shutdown()
+    elapsed = time.perf_counter() - start
+    print(f"Spectateur: {received['messages']} messages, {received['bytes'] / 1024:.1f} KB ({received['bytes'] / elapsed / 1024:.2f} KB/s)")
+
+def parse_address(text, default_port):
+    host, _, port = text.rpartition(":") if ":" in text else (text, None, None)
+    return host or NET_DEFAULT_HOST, int(port) if port else default_port
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=f"Watch a broadcast {GAME_TITLE} session.")
+    parser.add_argument("address", nargs="?", default=f"{NET_DEFAULT_HOST}:{BROADCAST_DEFAULT_PORT}", help="HOST[:PORT] of the broadcast")
+    parser.add_argument("--headless", action="store_true", help="Only receive and decode the stream (load tests)")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds")
+    parser.add_argument("--processes", type=int, default=1, help="Start this many headless spectator processes (load tests)")
+    args = parser.parse_args()
+
+    if args.processes > 1:
+        command = [sys.executable, os.path.abspath(__file__), args.address, "--headless"]
+        if args.duration is not None:
+            command += ["--duration", str(args.duration)]
+        spectators = [subprocess.Popen(command) for _ in range(args.processes)]
+        for spectator in spectators:
+            spectator.wait()
+        sys.exit()
+
+    if args.headless:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        os.environ["SDL_AUDIODRIVER"] = "dummy"
+    pygame.init()
+    screen = pygame.display.set_mode((1, 1) if args.headless else (SCREEN_WIDTH, SCREEN_HEIGHT))
+    host, port = parse_address(args.address, BROADCAST_DEFAULT_PORT)
+    try:
+        asyncio.run(watch(None if args.headless else screen, host, port, args.duration))
+    except (ConnectionError, asyncio.IncompleteReadError) as e:
+        print(f"Diffusion interrompue: {e}")
+    pygame.quit()
@@ -1,63 +1,55 @@
 import pygame
 import math
 import random
+import struct
 from constants import * # Import all constants
 from wall import Wall # Import Wall class from wall.py
 from collision_utils import resolve_collision # Import collision resolution function
+from raycast import HIT_NONE, HIT_WALL, HIT_CAR # Sensor hit kinds
+from asset_loader import assets # Import the shared sounds, sprites and fonts
+from heading import Heading, ai_heading_to, angle_difference # Import the cached heading vectors and AI angle helpers
+from render_queue import RenderQueue, LAYER_CARS, LAYER_HP_BARS, LAYER_LABELS, stamps # Import the batched sprite submission
+from entity_store import EntityStore, CAR_COMPONENT_COLUMNS, CAR_MASK, pack_color # Import the car component columns
 
-# --- Classe Bullet ---
-class Bullet(pygame.sprite.Sprite):
-    """
-    Represents a bullet fired by a car.
-    """
-    def __init__(self, x, y, angle, owner_car_color):
-        """
-        Initializes a new Bullet object.
-
-        Args:
-            x (int): The x-coordinate of the bullet's starting position.
-            y (int): The y-coordinate of the bullet's starting position.
-            angle (float): The angle in degrees at which the bullet is fired.
-            owner_car_color (tuple): The color of the car that fired the bullet.
-        """
-        super().__init__()
-        self.position = pygame.math.Vector2(x, y)
-        self.velocity = pygame.math.Vector2(0, -BULLET_SPEED).rotate(angle)
-        self.radius = BULLET_RADIUS
-        self.color = BULLET_COLOR
-        self.damage = BULLET_DAMAGE
-        self.owner_car_color = owner_car_color
-        # Rect plus précis pour la collision
-        self.rect = pygame.Rect(x - self.radius, y - self.radius, 
-                               self.radius * 2, self.radius * 2)
-
-
-    def update(self, dt):
-        """
-        Updates the bullet's position.
+_FLOAT32 = struct.Struct("f")
 
-        Args:
-            dt (float): The time delta since the last frame.
-        """
-        self.position += self.velocity * dt
-        self.rect.center = (int(self.position.x), int(self.position.y))
+def _rotated_size(width, height, angle):
+    """
+    Returns the size of pygame.transform.rotate(surface, angle) for a surface of the given size, without rotating
+    it (same computation as pygame: the angle in single precision, the bounding box of the rotated corners truncated).
 
-    def draw(self, screen):
-        """
-        Draws the bullet on the screen.
+    Args:
+        width (int): The width of the surface.
+        height (int): The height of the surface.
+        angle (float): The rotation angle in degrees (counterclockwise, as pygame.transform.rotate).
 
-        Args:
-            screen (pygame.Surface): The screen to draw the bullet on.
-        """
-        pygame.draw.circle(screen, self.color, (int(self.position.x), int(self.position.y)), self.radius)
-        pygame.draw.circle(screen, BLACK, (int(self.position.x), int(self.position.y)), self.radius, 1) # Contour
+    Returns:
+        tuple: The width and height of the rotated surface.
+    """
+    angle = _FLOAT32.unpack(_FLOAT32.pack(angle))[0]
+    if math.fmod(angle, 90.0) == 0: # Quarter turns are exact: the sides are swapped or not
+        return (height, width) if int(angle / 90) % 2 else (width, height)
+    radians = angle * .01745329251994329
+    sine, cosine = math.sin(radians), math.cos(radians)
+    cx, cy, sx, sy = cosine * width, cosine * height, sine * width, sine * height
+    return (int(max(abs(cx + sy), abs(cx - sy), abs(-cx + sy), abs(-cx - sy))),
+            int(max(abs(sx + cy), abs(sx - cy), abs(-sx + cy), abs(-sx - cy))))
 
 # --- Classe Car ---
 class Car(pygame.sprite.Sprite):
     """
     Represents a car in the game.
     """
-    def __init__(self, x, y, angle=0, color=BLUE, is_player=True, game_mode=GAME_MODE_FREE_PLAY, difficulty=None):
+    # Zones de dégâts avec résistances (shared by every car)
+    damage_zones = {
+        "front": {"resistance": 1.5},
+        "sides": {"resistance": 0.8},
+        "rear": {"resistance": 1.0}
+    }
+    sounds_enabled = True # Turned off while frames are re-simulated (rollback), so that their sounds are not played twice
+    rotation_step = 0 # Angle step in degrees of the drawn sprites, shared by all the cars (0: exact rotation, see perf_profiles)
+
+    def __init__(self, x, y, angle=0, color=BLUE, is_player=True, game_mode=GAME_MODE_FREE_PLAY, difficulty=None, rng=None, store=None):
         """
         Initializes a new Car object.
 
@@ -69,20 +61,26 @@ class Car(pygame.sprite.Sprite):
             is_player (bool, optional): Whether the car is controlled by a player. Defaults to True.
             game_mode (str, optional): The game mode. Defaults to GAME_MODE_FREE_PLAY.
             difficulty (str, optional): The AI difficulty. Defaults to None.
+            rng (random.Random, optional): The random generator of the session (replays need a seeded one). Defaults to the random module.
+            store (EntityStore, optional): The car store holding the transform, kinematics, health, weapon and team of the car
+                (see World.step). Defaults to None (a store of its own).
         """
         super().__init__()
+        # Component columns of the car (position, angle, velocity, angular_velocity, hp, bullets_remaining and
+        # fire_cooldown_timer are views of its row)
+        if store is None:
+            store = EntityStore(CAR_COMPONENT_COLUMNS)
+        self.store_row = store.row(store.create(CAR_MASK, x=x, y=y, angle=angle, team=pack_color(color)))
+        self._x_column, self._y_column, self._angle_column = store.x, store.y, store.angle
+        self._vx_column, self._vy_column, self._spin_column = store.vx, store.vy, store.spin
+        self._hp_column, self._ammo_column, self._cooldown_column = store.hp, store.ammo, store.cooldown
         print(f"Creating Car: Color={color}, Player={is_player}, Initial Pos=({x}, {y}), Mode={game_mode}, Difficulty={difficulty}")
-        self.original_image = self.create_pizza_slice_surface(CAR_WIDTH, CAR_LENGTH, color)
-        self.image = self.original_image
-        self.rect = self.image.get_rect(center=(x, y))
+        self.original_image = assets.car_image(color) # Shared by the cars of this color
 
         self.initial_position = pygame.math.Vector2(x, y) # For respawn
         self.initial_angle = angle # For respawn
 
-        self.position = pygame.math.Vector2(x, y)
-        self.velocity = pygame.math.Vector2(0, 0)
-        self.angle = angle  # Angle in degrees (0 = up, 90 = right)
-        self.angular_velocity = 0 # Angular velocity in degrees per second
+        self._heading = Heading() # Forward/right vectors of the angle, recomputed when it changes (see heading)
 
         self.mass = CAR_MASS
         self.inertia = CAR_INERTIA
@@ -93,6 +91,7 @@ class Car(pygame.sprite.Sprite):
         self.color = color
         self.game_mode = game_mode
         self.difficulty = difficulty
+        self.rng = rng if rng is not None else random
         self.speed_multiplier = 1.0
         if not self.is_player and self.difficulty:
             self.speed_multiplier = AI_SPEED_MULTIPLIERS.get(self.difficulty, 1.0) # Default to 1.0 if difficulty not found
@@ -120,67 +119,116 @@ class Car(pygame.sprite.Sprite):
             pygame.math.Vector2(-CAR_WIDTH / 2, CAR_LENGTH / 2), # Bas-gauche (index 1)
             pygame.math.Vector2(CAR_WIDTH / 2, CAR_LENGTH / 2)   # Bas-droite (index 2)
         ]
-        self.rotated_points = [pygame.math.Vector2(0,0), pygame.math.Vector2(0,0), pygame.math.Vector2(0,0)] # Points après rotation
-
-        # Zones de dégâts avec résistances
-        self.damage_zones = {
-            "front": {"resistance": 1.5},
-            "sides": {"resistance": 0.8},
-            "rear": {"resistance": 1.0}
-        }
-
-        # Sons
-        # self.engine_sound = None # REMOVED: Engine sound
-        self.collision_sound = None
-        self.pickup_sound = None
-        try:
-            # self.engine_sound = pygame.mixer.Sound(SOUND_ENGINE_PATH) # REMOVED
-            # self.engine_sound.set_volume(0.3) # REMOVED
-            if self.is_player: # Only player cars had engine sound
-                pass # self.engine_sound.play(-1) # REMOVED
-        except pygame.error as e:
-            print(f"Erreur de chargement du son du moteur: {e}")
-        
-        try:
-            self.collision_sound = pygame.mixer.Sound(SOUND_COLLISION_PATH)
-            self.collision_sound.set_volume(0.5)
-        except pygame.error as e:
-            print(f"Erreur de chargement du son de collision: {e}")
-
-        try:
-            self.pickup_sound = pygame.mixer.Sound(SOUND_PICKUP_PATH)
-            self.pickup_sound.set_volume(0.6)
-        except pygame.error as e:
-            print(f"Erreur de chargement du son de ramassage: {e}")
+
+        # Derived state of the pose recorded by update_transform, each part recomputed when next used (see the
+        # rotated_points, rect and image properties): the physics steps and collision corrections only record
+        # the pose, the collisions compute the polygon and the rect, and drawing rotates the image once per frame
+        self._pose_x, self._pose_y, self._pose_angle = x, y, angle
+        self._rotated_points = [pygame.math.Vector2(0,0), pygame.math.Vector2(0,0), pygame.math.Vector2(0,0)] # Points après rotation (mis à jour sur place)
+        self._rect = self.original_image.get_rect(center=(x, y))
+        self._rect_angle = 0 # Angle of the size of _rect (None: unknown)
+        self._image = self.original_image
+        self._image_angle = 0 # Angle of _image
+        self._polygon_dirty = self._rect_dirty = self._image_dirty = False # Until the first physics step: unrotated sprite, polygon at the origin
+
+        # Scratch vectors of the physics step (updated in place instead of allocating temporaries)
+        self._force = pygame.math.Vector2()
+        self._force_term = pygame.math.Vector2()
+
+        # Sons (decoded once and shared by every car)
+        self.collision_sound = assets.sound(SOUND_COLLISION_PATH)
+        self.pickup_sound = assets.sound(SOUND_PICKUP_PATH)
+
+        self.entity_id = None # Stable id assigned by the World (AI plans, replays)
+
+        # AI high-level plan, computed asynchronously by the AI planner (None until the first plan arrives)
+        self.ai_plan = None
 
         # Race mode specific
         self.current_waypoint_index = 0
+        self.race_progress = None # Index of the closest racing line sample (None until first lookup)
 
 
-    def create_pizza_slice_surface(self, width, length, color):
+    @property
+    def position(self):
         """
-        Creates a Pygame surface with the shape of a pizza slice.
+        The position of the car (transform columns of the car store). A new vector: assign it to move the car.
+        """
+        row = self.store_row
+        return pygame.math.Vector2(self._x_column[row], self._y_column[row])
 
-        Args:
-            width (int): The width of the pizza slice's base.
-            length (int): The length of the pizza slice.
-            color (tuple): The color of the pizza slice.
+    @position.setter
+    def position(self, value):
+        row = self.store_row
+        self._x_column[row], self._y_column[row] = value
 
-        Returns:
-            pygame.Surface: A Pygame surface with the pizza slice shape.
+    @property
+    def angle(self):
         """
-        max_dim = max(width, length) * 2
-        surface = pygame.Surface((max_dim, max_dim), pygame.SRCALPHA)
-        
-        center_x, center_y = max_dim / 2, max_dim / 2
-        
-        points = [
-            (center_x, center_y - length / 2),
-            (center_x - width / 2, center_y + length / 2),
-            (center_x + width / 2, center_y + length / 2)
-        ]
-        pygame.draw.polygon(surface, color, points)
-        return surface
+        The heading of the car in degrees, 0 = up, 90 = right (transform column of the car store).
+        """
+        return self._angle_column[self.store_row]
+
+    @angle.setter
+    def angle(self, value):
+        self._angle_column[self.store_row] = value
+
+    @property
+    def velocity(self):
+        """
+        The velocity of the car in pixels per second (kinematics columns of the car store). A new vector: assign it to change it.
+        """
+        row = self.store_row
+        return pygame.math.Vector2(self._vx_column[row], self._vy_column[row])
+
+    @velocity.setter
+    def velocity(self, value):
+        row = self.store_row
+        self._vx_column[row], self._vy_column[row] = value
+
+    @property
+    def angular_velocity(self):
+        """
+        The angular velocity of the car in degrees per second (kinematics column of the car store).
+        """
+        return self._spin_column[self.store_row]
+
+    @angular_velocity.setter
+    def angular_velocity(self, value):
+        self._spin_column[self.store_row] = value
+
+    @property
+    def hp(self):
+        """
+        The health points of the car (health column of the car store).
+        """
+        return self._hp_column[self.store_row]
+
+    @hp.setter
+    def hp(self, value):
+        self._hp_column[self.store_row] = value
+
+    @property
+    def bullets_remaining(self):
+        """
+        The bullets left in the cannon (weapon column of the car store).
+        """
+        return self._ammo_column[self.store_row]
+
+    @bullets_remaining.setter
+    def bullets_remaining(self, value):
+        self._ammo_column[self.store_row] = value
+
+    @property
+    def fire_cooldown_timer(self):
+        """
+        The seconds until the cannon can fire again (weapon column of the car store).
+        """
+        return self._cooldown_column[self.store_row]
+
+    @fire_cooldown_timer.setter
+    def fire_cooldown_timer(self, value):
+        self._cooldown_column[self.store_row] = value
 
     def handle_input(self, keys, player_num=1):
         """
@@ -191,51 +239,71 @@ class Car(pygame.sprite.Sprite):
             player_num (int, optional): The player number (1 or 2). Defaults to 1.
 
         Returns:
-            Bullet or None: A new Bullet object if the car fires, otherwise None.
+            tuple or None: The position and velocity (x, y, vx, vy) of the bullet fired, otherwise None.
         """
-        if self.is_disabled: # Ne pas traiter les inputs si la voiture est désactivée
-            self.accelerating = self.braking = self.turning_left = self.turning_right = False
-            return None # No bullet fired
+        return self.apply_controls(Car.read_controls(keys, player_num))
 
-        self.accelerating = False
-        self.braking = False
-        self.turning_left = False
-        self.turning_right = False
-        
-        bullet = None
+    @staticmethod
+    def read_controls(keys, player_num=1):
+        """
+        Converts the keyboard state into the control flags of a player.
+
+        Args:
+            keys (pygame.key.get_pressed): The current state of the keyboard.
+            player_num (int, optional): The player number (1 or 2). Defaults to 1.
 
+        Returns:
+            int: The CONTROL_* flags of the player for this frame.
+        """
         if player_num == 1:
-            if keys[pygame.K_UP]:
-                self.accelerating = True
-            if keys[pygame.K_DOWN]:
-                self.braking = True
-            if keys[pygame.K_LEFT]:
-                self.turning_left = True
-            if keys[pygame.K_RIGHT]:
-                self.turning_right = True
-            if keys[pygame.K_SPACE]: # Player 1 fire key
-                bullet = self.fire_cannon()
+            accelerate_key, brake_key, left_key, right_key, fire_key = pygame.K_UP, pygame.K_DOWN, pygame.K_LEFT, pygame.K_RIGHT, pygame.K_SPACE
         elif player_num == 2:
-            if keys[pygame.K_z]:
-                self.accelerating = True
-            if keys[pygame.K_s]:
-                self.braking = True
-            if keys[pygame.K_q]:
-                self.turning_left = True
-            if keys[pygame.K_d]:
-                self.turning_right = True
-            if keys[pygame.K_LCTRL]: # Player 2 fire key
-                bullet = self.fire_cannon()
-        
-        return bullet # Return bullet if fired, else None
+            accelerate_key, brake_key, left_key, right_key, fire_key = pygame.K_z, pygame.K_s, pygame.K_q, pygame.K_d, pygame.K_LCTRL
+        else:
+            return 0
+
+        controls = 0
+        if keys[accelerate_key]:
+            controls |= CONTROL_ACCELERATE
+        if keys[brake_key]:
+            controls |= CONTROL_BRAKE
+        if keys[left_key]:
+            controls |= CONTROL_TURN_LEFT
+        if keys[right_key]:
+            controls |= CONTROL_TURN_RIGHT
+        if keys[fire_key]:
+            controls |= CONTROL_FIRE
+        return controls
+
+    def apply_controls(self, controls):
+        """
+        Applies the control flags of a frame (keyboard, replay or network input) to the car.
 
+        Args:
+            controls (int): The CONTROL_* flags.
+
+        Returns:
+            tuple or None: The position and velocity (x, y, vx, vy) of the bullet fired, otherwise None.
+        """
+        if self.is_disabled: # Ne pas traiter les inputs si la voiture est désactivée
+            self.accelerating = self.braking = self.turning_left = self.turning_right = False
+            return None # No bullet fired
+
+        self.accelerating = bool(controls & CONTROL_ACCELERATE)
+        self.braking = bool(controls & CONTROL_BRAKE)
+        self.turning_left = bool(controls & CONTROL_TURN_LEFT)
+        self.turning_right = bool(controls & CONTROL_TURN_RIGHT)
+        if controls & CONTROL_FIRE:
+            return self.fire_cannon()
+        return None # Return bullet if fired, else None
 
     def fire_cannon(self):
         """
         Fires a bullet from the car's cannon if available.
 
         Returns:
-            Bullet or None: A new Bullet object if a bullet is fired, otherwise None.
+            tuple or None: The position and velocity (x, y, vx, vy) of the bullet fired, otherwise None
+            (the World adds it to its entity store).
         """
         if self.can_fire and not self.is_disabled and self.bullets_remaining > 0:
             self.can_fire = False
@@ -243,25 +311,38 @@ class Car(pygame.sprite.Sprite):
             self.bullets_remaining -= 1  # Décrémente le compteur de balles
             
             # Calculate bullet spawn position
-            forward_vector = pygame.math.Vector2(0, -1).rotate(self.angle)
-            spawn_offset = forward_vector * (CAR_LENGTH / 2 + BULLET_RADIUS + 5)
-            bullet_pos = self.position + spawn_offset
-            
-            return Bullet(bullet_pos.x, bullet_pos.y, self.angle, self.color)
+            forward_vector = self.heading.forward
+            spawn_offset = CAR_LENGTH / 2 + BULLET_RADIUS + 5
+            row = self.store_row
+            return (self._x_column[row] + forward_vector.x * spawn_offset, self._y_column[row] + forward_vector.y * spawn_offset,
+                    forward_vector.x * BULLET_SPEED, forward_vector.y * BULLET_SPEED)
         return None
 
 
-    def update_ai(self, target_obj, dt, track_waypoints=None):
+    @property
+    def heading(self):
+        """
+        The cached heading of the car: forward and right unit vectors, sine and cosine of its angle.
+        Computed once per angle change, however many times it is read during a step.
+        """
+        return self._heading.update(self.angle)
+
+    def update_ai(self, target_obj, dt, track_waypoints=None, distance_field=None, race_line=None, flow_field=None, ray_caster=None, whiskers=None):
         """
         Simple AI logic for the car.
 
         Args:
-            target_obj (pygame.sprite.Sprite): The target to follow or attack.
+            target_obj (Car or PickupTarget): The target to follow or attack.
             dt (float): The time delta since the last frame.
             track_waypoints (list, optional): A list of waypoints for the AI to follow in race mode. Defaults to None.
+            distance_field (DistanceField, optional): The track distance field used for wall avoidance. Defaults to None.
+            race_line (RaceLine, optional): The precomputed racing line to follow in race mode. Defaults to None.
+            flow_field (FlowField, optional): The shared flow field leading to the target in free play. Defaults to None.
+            ray_caster (RayCaster, optional): The ray caster used for line-of-sight checks before firing. Defaults to None.
+            whiskers (WhiskerView, optional): The sensor ray readings of the car, used for obstacle avoidance. Defaults to None.
 
         Returns:
-            Bullet or None: A new Bullet object if the car fires, otherwise None.
+            tuple or None: The position and velocity (x, y, vx, vy) of the bullet fired, otherwise None.
         """
         if self.is_disabled: # Ne pas traiter l'IA si la voiture est désactivée
             self.accelerating = self.braking = self.turning_left = self.turning_right = False
@@ -274,7 +355,15 @@ class Car(pygame.sprite.Sprite):
         
         bullet = None
 
-        if self.game_mode == GAME_MODE_RACE and track_waypoints:
+        if self.game_mode == GAME_MODE_RACE and race_line:
+            # Race AI logic: follow the precomputed racing line and its speed profile
+            self.follow_race_line(race_line)
+            # Dodge the cars ahead (the distance field takes care of the walls)
+            avoiding_car = whiskers is not None and self.avoid_obstacles(whiskers, ray_caster, ignore_walls=True)
+            if distance_field and not avoiding_car:
+                self.avoid_walls(distance_field)
+
+        elif self.game_mode == GAME_MODE_RACE and track_waypoints:
             # Race AI logic: follow waypoints
             target_waypoint = pygame.math.Vector2(track_waypoints[self.current_waypoint_index])
             direction_to_target = target_waypoint - self.position
@@ -295,9 +384,8 @@ class Car(pygame.sprite.Sprite):
             self.accelerating = True
 
             # Calculate target angle
-            target_angle = math.degrees(math.atan2(-direction_to_target.y, direction_to_target.x))
-            target_angle = (90 - target_angle) % 360
-            angle_diff = (target_angle - self.angle + 180) % 360 - 180
+            target_angle = ai_heading_to(direction_to_target.x, direction_to_target.y)
+            angle_diff = angle_difference(target_angle, self.angle)
 
             # Turn towards target waypoint
             if abs(angle_diff) > 2: # Smaller threshold for turning, more precise
@@ -306,11 +394,12 @@ class Car(pygame.sprite.Sprite):
                 else:
                     self.turning_left = True
             
-            # Simple wall avoidance (if too close to a wall, try to turn away)
-            # This is a very basic avoidance, a more robust solution would involve raycasting
-            # For simplicity, if velocity is low and not facing waypoint, try random turn
-            if self.velocity.length() < 50 and abs(angle_diff) > 45:
-                if random.random() < 0.5:
+            # Wall avoidance: steer along the distance field gradient when a wall is close
+            # Without a distance field, if velocity is low and not facing waypoint, try random turn
+            if distance_field:
+                self.avoid_walls(distance_field)
+            elif self.velocity.length() < 50 and abs(angle_diff) > 45:
+                if self.rng.random() < 0.5:
                     self.turning_left = True
                 else:
                     self.turning_right = True
@@ -327,9 +416,15 @@ class Car(pygame.sprite.Sprite):
                 direction_to_target = target_obj.position - self.position
                 
                 # Calculate target angle so it's available for both movement and firing logic
-                target_angle = math.degrees(math.atan2(-direction_to_target.y, direction_to_target.x))
-                target_angle = (90 - target_angle) % 360
-                angle_diff = (target_angle - self.angle + 180) % 360 - 180
+                target_angle = ai_heading_to(direction_to_target.x, direction_to_target.y)
+                angle_diff = angle_difference(target_angle, self.angle)
+
+                # Far from the target, follow the shared flow field around the walls instead of driving straight at it
+                steer_angle_diff = angle_diff
+                if flow_field and direction_to_target.length() > NAV_GRID_CELL_SIZE * 2:
+                    flow_heading = flow_field.heading(self._x_column[self.store_row], self._y_column[self.store_row])
+                    if flow_heading is not None:
+                        steer_angle_diff = angle_difference(flow_heading, self.angle)
 
                 # If the target is very close, just try to ram it
                 if direction_to_target.length() < CAR_LENGTH * 2: # Within 2 car lengths
@@ -337,34 +432,49 @@ class Car(pygame.sprite.Sprite):
                     # No braking here, just ram
                 else:
                     # Turn towards target
-                    if abs(angle_diff) > 2: # Smaller threshold for turning, more precise
-                        if angle_diff > 0:
+                    if abs(steer_angle_diff) > 2: # Smaller threshold for turning, more precise
+                        if steer_angle_diff > 0:
                             self.turning_right = True
                         else:
                             self.turning_left = True
                     
                     # Accelerate if generally facing the target (wider angle)
-                    if abs(angle_diff) < 60: # Accelerate if target is within +/- 60 degrees
+                    if abs(steer_angle_diff) < 60: # Accelerate if target is within +/- 60 degrees
                         self.accelerating = True
                     
+                    # Steer around obstacles seen by the sensors, and away from nearby walls instead of grinding along them
+                    avoiding_wall = whiskers is not None and self.avoid_obstacles(whiskers, ray_caster, ignored_obj=target_obj,
+                                                                                 ignore_walls=distance_field is not None)
+                    avoiding_wall = avoiding_wall or (distance_field is not None and self.avoid_walls(distance_field))
+
                     # If AI is stuck or moving very slowly, try to accelerate and turn randomly to get unstuck
-                    if self.velocity.length() < 10 and not self.accelerating: # If almost stopped and not trying to accelerate
+                    if avoiding_wall:
                         self.accelerating = True
-                        if random.random() < 0.5: # Random turn to try and get unstuck
+                    elif self.velocity.length() < 10 and not self.accelerating: # If almost stopped and not trying to accelerate
+                        self.accelerating = True
+                        if self.rng.random() < 0.5: # Random turn to try and get unstuck
                             self.turning_left = True
                         else:
                             self.turning_right = True
                 
+                # Aim ahead of a moving target using the bullet flight time of the current plan
+                aim_angle_diff = angle_diff
+                plan = self.ai_plan
+                if isinstance(target_obj, Car) and plan and plan.target_token == target_obj.entity_id and plan.lead_time > 0:
+                    aim_vector = direction_to_target + target_obj.velocity * plan.lead_time
+                    aim_angle_diff = angle_difference(ai_heading_to(aim_vector.x, aim_vector.y), self.angle)
+
                 # AI Firing Logic (only in Free Play, targeting other cars)
-                if isinstance(target_obj, Car) and self.can_fire and direction_to_target.length() < 300 and abs(angle_diff) < 10:
-                    # Fire if target is a car, within range, and mostly in front
+                if isinstance(target_obj, Car) and self.can_fire and direction_to_target.length() < 300 and abs(aim_angle_diff) < 10 \
+                        and (ray_caster is None or ray_caster.line_of_sight(self.position, target_obj.position)):
+                    # Fire if target is a car, within range, mostly in front and not behind a wall
                     bullet = self.fire_cannon()
 
             else: # If no target (e.g., all players disabled), try to move forward a bit
                 self.accelerating = True
                 # Maybe add some random turning if no target to explore
-                if random.random() < 0.01: # Small chance to turn
-                    if random.random() < 0.5:
+                if self.rng.random() < 0.01: # Small chance to turn
+                    if self.rng.random() < 0.5:
                         self.turning_left = True
                     else:
                         self.turning_right = True
@@ -372,6 +482,103 @@ class Car(pygame.sprite.Sprite):
         return bullet # Return bullet if AI fired, else None
 
 
+    def follow_race_line(self, race_line):
+        """
+        Steers and throttles the car along a precomputed racing line.
+
+        The closest line sample is tracked from frame to frame, so the per-frame cost is a
+        few array lookups and a cross product with the cached heading (no atan2).
+
+        Args:
+            race_line (RaceLine): The racing line to follow.
+        """
+        position = self.position
+        self.race_progress = race_line.nearest_index(position.x, position.y, self.race_progress)
+        self.current_waypoint_index = race_line.next_waypoint[self.race_progress]
+
+        speed = self.velocity.length()
+        target_index = race_line.index_ahead(self.race_progress, RACE_LINE_LOOKAHEAD + speed * RACE_LINE_LOOKAHEAD_TIME)
+        to_target_x = race_line.xs[target_index] - position.x
+        to_target_y = race_line.ys[target_index] - position.y
+
+        heading = self.heading
+        cross = heading.right.x * to_target_x + heading.right.y * to_target_y # Positive: target on the right
+        dot = heading.forward.x * to_target_x + heading.forward.y * to_target_y
+
+        # Turn unless the target is within ~2 degrees of the heading (sin(2°) ≈ 0.035)
+        if dot < 0 or abs(cross) > 0.035 * math.hypot(to_target_x, to_target_y):
+            if cross >= 0:
+                self.turning_right = True
+            else:
+                self.turning_left = True
+
+        # Past a braking point, brake down to the speed of the corner, otherwise follow the speed profile
+        corner = race_line.corner_sample[self.race_progress]
+        if speed > race_line.speeds[corner if corner >= 0 else self.race_progress]:
+            self.braking = True
+        else:
+            self.accelerating = True
+
+    def avoid_obstacles(self, whiskers, ray_caster=None, ignored_obj=None, ignore_walls=False):
+        """
+        Steers towards the clearer side when the sensor rays detect an obstacle ahead.
+
+        Args:
+            whiskers (WhiskerView): The sensor readings of the car (ray 0 forward, then clockwise).
+            ray_caster (RayCaster, optional): The ray caster that produced the readings, used to identify hit cars. Defaults to None.
+            ignored_obj (Car or PickupTarget, optional): The target the AI wants to reach, not an obstacle. Defaults to None.
+            ignore_walls (bool, optional): Whether wall hits are ignored. Defaults to False.
+
+        Returns:
+            bool: True if the steering was overridden to avoid an obstacle, False otherwise.
+        """
+        distances, kinds, ids = whiskers
+        count = len(distances)
+
+        def clearance(k):
+            kind = kinds[k]
+            if kind == HIT_NONE or (kind == HIT_WALL and ignore_walls):
+                return AI_WHISKER_RANGE
+            if kind == HIT_CAR and ray_caster is not None and ray_caster.cars[ids[k]] is ignored_obj:
+                return AI_WHISKER_RANGE
+            return distances[k]
+
+        if min(clearance(0), clearance(1), clearance(count - 1)) >= AI_WHISKER_AVOID_DISTANCE:
+            return False
+
+        # Rays 1..count/4 look to the right, the last count/4 rays to the left
+        quarter = count // 4
+        right_clearance = sum(clearance(k) for k in range(1, quarter + 1))
+        left_clearance = sum(clearance(k) for k in range(count - quarter, count))
+        self.turning_right = right_clearance >= left_clearance
+        self.turning_left = not self.turning_right
+        return True
+
+    def avoid_walls(self, distance_field):
+        """
+        Steers the car away from the closest wall if it is heading towards it.
+
+        Args:
+            distance_field (DistanceField): The track distance field.
+
+        Returns:
+            bool: True if the steering was overridden to avoid a wall, False otherwise.
+        """
+        row = self.store_row
+        distance, push_x, push_y = distance_field.sample(self._x_column[row], self._y_column[row])
+        if distance >= AI_WALL_AVOID_DISTANCE:
+            return False
+
+        forward_vector = self.heading.forward
+        if forward_vector.x * push_x + forward_vector.y * push_y >= 0: # Already heading away from the wall
+            return False
+
+        # Turn towards the push-away direction (positive cross product means turning right)
+        cross = forward_vector.x * push_y - forward_vector.y * push_x
+        self.turning_left = cross < 0
+        self.turning_right = cross >= 0
+        return True
+
     def apply_forces(self, dt):
         """
         Calculates and applies linear and angular forces to the car.
@@ -379,24 +586,44 @@ class Car(pygame.sprite.Sprite):
         Args:
             dt (float): The time delta since the last frame.
         """
-        forward_vector = pygame.math.Vector2(0, -1).rotate(self.angle)
+        # The forces are summed in place in the scratch vectors, in the order (engine + friction) + drag
+        velocity = self.velocity # A copy of the kinematics columns, written back below
+        speed = velocity.length()
+        total_linear_force = self._force
+        term = self._force_term
 
-        engine_force = pygame.math.Vector2(0, 0)
+        # Engine force
         if self.accelerating:
-            engine_force = forward_vector * ENGINE_FORCE * self.speed_multiplier # Apply speed multiplier for AI
-        elif self.braking:
-            if self.velocity.length() > 0:
-                engine_force = -self.velocity.normalize() * BRAKE_FORCE * self.speed_multiplier # Apply speed multiplier for AI
-
-        friction_force = -self.velocity * FRICTION_COEFF * self.mass
-        drag_force = pygame.math.Vector2(0,0)
-        if self.velocity.length() > 0:
-            drag_force = -self.velocity.normalize() * DRAG_COEFF * self.velocity.length_squared()
-
-        total_linear_force = engine_force + friction_force + drag_force
-        acceleration = total_linear_force / self.mass
-
-        self.velocity += acceleration * dt
+            total_linear_force.update(self.heading.forward)
+            total_linear_force *= ENGINE_FORCE
+            total_linear_force *= self.speed_multiplier # Apply speed multiplier for AI
+        elif self.braking and speed > 0:
+            total_linear_force.update(velocity)
+            total_linear_force.normalize_ip()
+            total_linear_force *= -BRAKE_FORCE
+            total_linear_force *= self.speed_multiplier # Apply speed multiplier for AI
+        else:
+            total_linear_force.update(0, 0)
+
+        # Friction force: -velocity * FRICTION_COEFF * mass
+        term.update(velocity)
+        term *= -FRICTION_COEFF
+        term *= self.mass
+        total_linear_force += term
+
+        # Drag force: -direction * DRAG_COEFF * speed²
+        if speed > 0:
+            term.update(velocity)
+            term.normalize_ip()
+            term *= -DRAG_COEFF
+            term *= velocity.length_squared()
+            total_linear_force += term
+
+        # acceleration = force / mass, velocity += acceleration * dt
+        total_linear_force /= self.mass
+        total_linear_force *= dt
+        velocity += total_linear_force
+        self.velocity = velocity
 
         angular_acceleration = 0
         if self.turning_left:
@@ -412,10 +639,14 @@ class Car(pygame.sprite.Sprite):
 
     def update_physics(self, dt):
         """
-        Updates the car's position and angle based on physics.
+        Updates the cannon cooldown, the disabled timer and the forces of the car. The World then moves
+        the cars that drive this frame along their velocity, in one pass over the car store (see World.move_cars).
 
         Args:
             dt (float): The time delta since the last frame.
+
+        Returns:
+            bool: True if the car drives this frame, False if it is disabled (or has just respawned).
         """
         # Update cannon cooldown
         if not self.can_fire:
@@ -424,13 +655,7 @@ class Car(pygame.sprite.Sprite):
                 self.can_fire = True
 
         if self.hp <= 0 and not self.is_disabled: # Si HP <=0 et pas encore désactivée, on la désactive
-            self.is_disabled = True
-            self.disabled_timer = DISABLED_DURATION
-            self.velocity = pygame.math.Vector2(0,0) # Arrêter la voiture
-            self.angular_velocity = 0
-            # if self.engine_sound: # REMOVED
-            #     self.engine_sound.stop() # REMOVED
-            print(f"Voiture {self.color} est désactivée pour {DISABLED_DURATION} secondes.")
+            self.disable()
 
         if self.is_disabled: # Gérer le timer de désactivation
             self.disabled_timer -= dt
@@ -439,25 +664,104 @@ class Car(pygame.sprite.Sprite):
                 self.is_disabled = False
                 self.position = self.initial_position # Revenir à la position initiale
                 self.angle = self.initial_angle
-                self.velocity = pygame.math.Vector2(0,0)
+                self.velocity = (0, 0)
                 self.angular_velocity = 0
                 # if self.engine_sound and self.is_player: # REMOVED
                 #     self.engine_sound.play(-1) # REMOVED
                 print(f"Voiture {self.color} est réactivée.")
-            return # Ne pas appliquer la physique si désactivée
+            return False # Ne pas appliquer la physique si désactivée
 
         self.apply_forces(dt)
+        return True
 
-        self.position += self.velocity * dt
-        self.angle += self.angular_velocity * dt
-        self.angle %= 360
+    def disable(self):
+        """
+        Stops a destroyed car for DISABLED_DURATION seconds (it respawns afterwards, see update_physics).
+        """
+        self.is_disabled = True
+        self.disabled_timer = DISABLED_DURATION
+        self.velocity = (0, 0) # Arrêter la voiture
+        self.angular_velocity = 0
+        # if self.engine_sound: # REMOVED
+        #     self.engine_sound.stop() # REMOVED
+        print(f"Voiture {self.color} est désactivée pour {DISABLED_DURATION} secondes.")
+
+    def update_contact(self):
+        """
+        Updates the car after a collision moved it, as a physics step of zero duration: damps its spin
+        (see apply_forces) and records the corrected pose. A disabled car keeps the geometry of its last active frame.
+        """
+        if self.is_disabled:
+            return
+        self.angular_velocity *= 0.95
+        self.update_transform()
 
-        self.image = pygame.transform.rotate(self.original_image, -self.angle)
-        self.rect = self.image.get_rect(center=(int(self.position.x), int(self.position.y)))
+    def update_transform(self):
+        """
+        Records the position and angle as the pose of the car: the collision polygon, the rect and the
+        rotated image are recomputed from it when next used.
+        """
+        row = self.store_row
+        self._pose_x, self._pose_y, self._pose_angle = self._x_column[row], self._y_column[row], self._angle_column[row]
+        self._polygon_dirty = self._rect_dirty = True
+        self._image_dirty = self.angle != self._image_angle
 
-        for i, point in enumerate(self.base_points):
-            self.rotated_points[i] = point.rotate(self.angle) + self.position
+    def restore_transform(self, rect, points):
+        """
+        Sets the rect and the collision polygon of a restored state (see snapshot.restore), and the angle as
+        the one of the image.
 
+        Args:
+            rect (tuple): The x, y, width and height of the rect.
+            points (sequence): The x and y of each vertex of the collision polygon.
+        """
+        self._rect.update(rect)
+        self._rect_angle = None # Size restored: recomputed for the next pose
+        for i, point in enumerate(self._rotated_points):
+            point.update(points[i * 2], points[i * 2 + 1])
+        self._pose_angle = self.angle
+        self._polygon_dirty = self._rect_dirty = False
+        self._image_dirty = self.angle != self._image_angle
+
+    @property
+    def rotated_points(self):
+        """
+        The vertices of the collision polygon at the recorded pose (pygame.math.Vector2, updated in place).
+        """
+        if self._polygon_dirty:
+            self._polygon_dirty = False
+            angle, x, y = self._pose_angle, self._pose_x, self._pose_y
+            for base_point, point in zip(self.base_points, self._rotated_points):
+                point.update(base_point)
+                point.rotate_ip(angle)
+                point.x += x
+                point.y += y
+        return self._rotated_points
+
+    @property
+    def rect(self):
+        """
+        The rect of the rotated image at the recorded pose (the bounding box of the broad phase, updated in place).
+        """
+        if self._rect_dirty:
+            self._rect_dirty = False
+            rect = self._rect
+            if self._pose_angle != self._rect_angle:
+                self._rect_angle = self._pose_angle
+                rect.size = _rotated_size(self.original_image.get_width(), self.original_image.get_height(), -self._pose_angle)
+            rect.center = (int(self._pose_x), int(self._pose_y))
+        return self._rect
+
+    @property
+    def image(self):
+        """
+        The image rotated to the recorded pose.
+        """
+        if self._image_dirty:
+            self._image_dirty = False
+            self._image = pygame.transform.rotate(self.original_image, -self._pose_angle)
+            self._image_angle = self._pose_angle
+        return self._image
 
     def get_collision_polygon(self):
         """
@@ -495,38 +799,84 @@ class Car(pygame.sprite.Sprite):
 
     def take_damage(self, impact_force, impact_point_world, attacker=None):
         """
-        Calculates and applies damage to the car.
+        Calculates and applies damage to the car, then prints it and plays the collision sound.
 
         Args:
             impact_force (float): The magnitude of the impact force.
             impact_point_world (pygame.math.Vector2): The point of contact in world coordinates.
             attacker (Car, optional): The car that inflicted the damage. Defaults to None.
         """
-        if self.hp <= 0: # Si déjà détruite, ne prend pas plus de dégâts
+        result = self.damage_from_impact(impact_force, impact_point_world)
+        if result is None or not self.apply_damage(result[0], attacker):
             return
+        self.report_damage(*result, self.hp, attacker=attacker)
+        if self.collision_sound and Car.sounds_enabled:
+            self.collision_sound.play()
+
+    def damage_from_impact(self, impact_force, impact_point_world):
+        """
+        Calculates the damage of an impact on the car, without applying it (see apply_damage).
+
+        Args:
+            impact_force (float): The magnitude of the impact force.
+            impact_point_world (pygame.math.Vector2): The point of contact in world coordinates.
+
+        Returns:
+            tuple: The damage and the impact zone, None if the impact does no damage.
+        """
+        if self.hp <= 0: # Si déjà détruite, ne prend pas plus de dégâts
+            return None
 
         if impact_force < MIN_IMPACT_FORCE_FOR_DAMAGE:
-            return
+            return None
 
         impact_zone_key = self.get_zone_from_impact_point(impact_point_world)
         zone_resistance = self.damage_zones.get(impact_zone_key, {"resistance": 1.0})["resistance"]
 
-        damage = (impact_force * DAMAGE_FACTOR) / zone_resistance
+        return (impact_force * DAMAGE_FACTOR) / zone_resistance, impact_zone_key
+
+    def apply_damage(self, damage, attacker=None):
+        """
+        Applies damage to the car, without messages nor sound (see report_damage).
+        Scores a point for the attacker if the car is destroyed.
+
+        Args:
+            damage (float): The damage, as returned by damage_from_impact.
+            attacker (Car, optional): The car that inflicted the damage. Defaults to None.
+
+        Returns:
+            bool: True if the damage was applied, False if the car was already destroyed.
+        """
+        if self.hp <= 0: # Si déjà détruite, ne prend pas plus de dégâts
+            return False
 
         self.hp -= damage
-        print(f"Voiture {self.color} a subi {damage:.2f} dégâts sur la zone '{impact_zone_key}'. HP restants: {self.hp:.2f}")
 
         if self.hp <= 0: # Si les PV tombent à 0
             self.hp = 0 # S'assurer que les PV ne sont pas négatifs
             if attacker and attacker != self: # Si un attaquant est spécifié et n'est pas soi-même
                 attacker.score += SCORE_INCREMENT
-                print(f"Voiture {attacker.color} marque un point ! Score: {attacker.score}")
-            print(f"La voiture {self.color} est détruite !")
-            # La voiture n'est pas tuée ici, mais désactivée par update_physics
+            # La voiture n'est pas tuée ici, mais désactivée par update_physics (ou par le World à la fin du pas)
             # self.kill() # Retire le sprite de tous les groupes (si on voulait la retirer définitivement)
+        return True
 
-        if self.collision_sound:
-            self.collision_sound.play()
+    def report_damage(self, damage, impact_zone_key, hp, attacker=None, verbose=True):
+        """
+        Prints the damage applied by apply_damage.
+
+        Args:
+            damage (float): The damage.
+            impact_zone_key (str): The impact zone.
+            hp (float): The HP left right after the impact.
+            attacker (Car, optional): The car that inflicted the damage. Defaults to None.
+            verbose (bool, optional): False to only print the destruction of the car. Defaults to True.
+        """
+        if verbose:
+            print(f"Voiture {self.color} a subi {damage:.2f} dégâts sur la zone '{impact_zone_key}'. HP restants: {hp:.2f}")
+        if hp <= 0:
+            if attacker and attacker != self:
+                print(f"Voiture {attacker.color} marque un point ! Score: {attacker.score}")
+            print(f"La voiture {self.color} est détruite !")
 
     def heal(self, amount):
         """
@@ -540,43 +890,68 @@ class Car(pygame.sprite.Sprite):
         old_hp = self.hp
         self.hp = min(MAX_HP, self.hp + amount)
         print(f"Voiture {self.color} a récupéré {self.hp - old_hp:.2f} PV. HP actuels: {self.hp:.2f}")
-        if self.pickup_sound:
+        if self.pickup_sound and Car.sounds_enabled:
             self.pickup_sound.play()
 
 
-    def draw(self, screen):
+    def submit(self, queue, scale=1.0):
         """
-        Draws the car on the screen.
+        Adds the car, its HP bar and its disabled timer to a render queue.
 
         Args:
-            screen (pygame.Surface): The screen to draw the car on.
+            queue (RenderQueue): The render queue of the frame.
+            scale (float, optional): The size of a world pixel on the target. Defaults to 1.0.
         """
         if self.hp <= 0 and not self.is_disabled: # Ne pas dessiner si détruite et pas en phase de désactivation
             return
         
         # Rendre la voiture semi-transparente si désactivée
-        if self.is_disabled:
-            temp_image = self.image.copy()
-            temp_image.fill((255, 255, 255, 128), None, pygame.BLEND_RGBA_MULT) # Applique une transparence
-            screen.blit(temp_image, self.rect)
+        # Only the exact rotation at full scale reads self.image (rotated from the full-size sprite when the pose changed)
+        rect = self.rect
+        if Car.rotation_step:
+            # Pre-rotated sprite of the nearest angle step, shared by the cars of this color
+            image = assets.rotated_car_image(self.color, round(self.angle / Car.rotation_step) * Car.rotation_step % 360, scale)
+            image_rect = image.get_rect(center=(rect.centerx * scale, rect.centery * scale))
+        elif scale != 1:
+            image = pygame.transform.rotate(assets.scaled_car_image(self.color, scale), -self.angle)
+            image_rect = image.get_rect(center=(rect.centerx * scale, rect.centery * scale))
         else:
-            screen.blit(self.image, self.rect)
+            image, image_rect = self.image, rect
+        if self.is_disabled:
+            image = image.copy()
+            image.fill((255, 255, 255, 128), None, pygame.BLEND_RGBA_MULT) # Applique une transparence
+        queue.add(LAYER_CARS, image, image_rect)
 
         # Dessiner la barre de vie (même si désactivée pour montrer le timer ou l'état)
+        # Shared stamp per color and filled width, at the pixels pygame.draw.rect would fill (truncated coordinates)
         hp_bar_width = CAR_WIDTH
         hp_bar_height = 5
         hp_ratio = self.hp / MAX_HP
         hp_bar_color = GREEN if hp_ratio > 0.5 else ORANGE if hp_ratio > 0.2 else RED
         
-        hp_bar_x = self.rect.centerx - hp_bar_width / 2
-        hp_bar_y = self.rect.centery + CAR_LENGTH / 2 + 5
+        hp_bar_x = (rect.centerx - hp_bar_width / 2) * scale
+        hp_bar_y = (rect.centery + CAR_LENGTH / 2 + 5) * scale
+        hp_bar_width *= scale
+        hp_bar_height = max(3, round(hp_bar_height * scale)) # The outline leaves the bar visible
         
-        pygame.draw.rect(screen, hp_bar_color, (hp_bar_x, hp_bar_y, hp_bar_width * hp_ratio, hp_bar_height))
-        pygame.draw.rect(screen, BLACK, (hp_bar_x, hp_bar_y, hp_bar_width, hp_bar_height), 1)
+        queue.add(LAYER_HP_BARS, stamps.hp_bar(hp_bar_color, int(hp_bar_width * hp_ratio), int(hp_bar_width), hp_bar_height),
+                  (int(hp_bar_x), int(hp_bar_y)))
 
         # Afficher le timer de désactivation si la voiture est désactivée
         if self.is_disabled:
-            font_timer = pygame.font.Font(None, 24)
+            font_timer = assets.font(max(1, round(24 * scale)))
             timer_text = font_timer.render(f"{self.disabled_timer:.1f}s", True, WHITE)
-            screen.blit(timer_text, timer_text.get_rect(center=(self.rect.centerx, self.rect.top - 15)))
+            queue.add(LAYER_LABELS, timer_text, timer_text.get_rect(center=(rect.centerx * scale, (rect.top - 15) * scale)))
+
+    def draw(self, screen, scale=1.0):
+        """
+        Draws the car on the screen.
+
+        Args:
+            screen (pygame.Surface): The screen to draw the car on.
+            scale (float, optional): The size of a world pixel on the screen. Defaults to 1.0.
+        """
+        queue = RenderQueue()
+        self.submit(queue, scale)
+        queue.flush(screen)
 
@@ -0,0 +1,88 @@
+from array import array
+from constants import * # Import all constants
+
+# --- Event kinds ---
+EVENT_CAR_CAR = 0 # A car hit by the front of another car (other: the other car)
+EVENT_CAR_WALL = 1 # A car hitting a wall (other: -1)
+EVENT_BULLET = 2 # A car hit by a bullet (other: the bullet entity id)
+
+# Impact zones of the cars (see Car.get_zone_from_impact_point), stored by index
+IMPACT_ZONES = ("front", "sides", "rear")
+_ZONE_INDEX = {zone: i for i, zone in enumerate(IMPACT_ZONES)}
+
+class CollisionEventQueue:
+    """
+    Compact queue of the damage events of a simulation step.
+
+    The collision solver and the bullet hits do not change the HP of the cars: they compute the
+    damage of each impact and append an event (one row per car taking damage: kind, target and
+    source entity ids, damage, zone and impact point). The World consumes them once per step, in
+    the order they happened, for the damage, the scores, the messages and the sounds
+    (World._apply_collision_events). The queue also remembers the recent contacts, so that a scrape
+    along a wall or two cars pushing against each other only produce effects when the contact starts.
+    """
+    def __init__(self):
+        self.kinds = array('B')
+        self.targets = array('q') # Entity id of the car taking the impact
+        self.sources = array('q') # Entity id of the car inflicting it, -1 if none (scores the kill)
+        self.others = array('q') # What was hit (see EVENT_*), part of the contact key
+        self.damages = array('d')
+        self.zones = array('B') # Index in IMPACT_ZONES
+        self.xs = array('d') # Impact point
+        self.ys = array('d')
+        self.contacts = {} # (kind, target, other) -> step of the last event of that contact
+        self.step = 0 # Steps consumed (clear() calls)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def push(self, kind, target, source, other, damage, zone, x, y):
+        """
+        Appends an event.
+
+        Args:
+            kind (int): The EVENT_* kind.
+            target (int): The entity id of the car taking the impact.
+            source (int): The entity id of the car inflicting it, -1 if none.
+            other (int): The other party of the contact (see EVENT_*).
+            damage (float): The damage to apply.
+            zone (str): The impact zone (one of IMPACT_ZONES).
+            x (float): The x coordinate of the impact point.
+            y (float): The y coordinate of the impact point.
+        """
+        self.kinds.append(kind)
+        self.targets.append(target)
+        self.sources.append(source)
+        self.others.append(other)
+        self.damages.append(damage)
+        self.zones.append(_ZONE_INDEX[zone])
+        self.xs.append(x)
+        self.ys.append(y)
+
+    def is_new_contact(self, row):
+        """
+        Records the contact of an event and returns whether it starts a contact (no event with the
+        same kind, target and other party in the last COLLISION_CONTACT_GRACE steps).
+
+        Args:
+            row (int): The event.
+
+        Returns:
+            bool: True for the first event of a contact, False while the contact goes on.
+        """
+        key = (self.kinds[row], self.targets[row], self.others[row])
+        step = self.step
+        last_step = self.contacts.get(key)
+        self.contacts[key] = step
+        return last_step is None or step - last_step > COLLISION_CONTACT_GRACE
+
+    def clear(self):
+        """
+        Removes the events of the step once consumed, and forgets the contacts that ended.
+        """
+        for column in (self.kinds, self.targets, self.sources, self.others, self.damages, self.zones, self.xs, self.ys):
+            del column[:]
+        self.step += 1
+        step = self.step
+        if self.contacts and step % COLLISION_CONTACT_GRACE == 0:
+            self.contacts = {key: last_step for key, last_step in self.contacts.items() if step - last_step <= COLLISION_CONTACT_GRACE}
@@ -1,6 +1,7 @@
 import pygame
 import math
 from constants import * # Import all constants
+from collision_events import EVENT_CAR_CAR, EVENT_CAR_WALL # Import the collision event kinds
 # We will need to import Car class for type checking in resolve_collision,
 # but to avoid circular import, we'll import it inside the function if needed,
 # or assume it's passed correctly. For now, let's keep it simple.
@@ -22,10 +23,48 @@ def project_polygon(axis, polygon_points):
     max_proj = float('-inf')
     for p in polygon_points:
         proj = p.dot(axis)
-        min_proj = min(min_proj, proj)
-        max_proj = max(max_proj, proj)
+        if proj < min_proj:
+            min_proj = proj
+        if proj > max_proj:
+            max_proj = proj
     return min_proj, max_proj
 
+# --- Scratch buffers ---
+# The collision functions run once per car pair and per nearby wall on every step: they compute into these
+# preallocated vectors instead of allocating temporaries (the simulation runs on a single thread).
+# In-place Vector2 operations round exactly like the operators they replace, so the results are unchanged.
+_axes = [] # Edge normals of the moving polygons (grown on demand)
+_normal = pygame.math.Vector2() # Normal returned by collide_polygons_sat
+_resolution = pygame.math.Vector2()
+_relative_velocity = pygame.math.Vector2()
+_impulse = pygame.math.Vector2()
+_tangent = pygame.math.Vector2()
+_step = pygame.math.Vector2() # Share of a separation or impulse applied to one object
+_impact_point = pygame.math.Vector2()
+
+def compute_axes(polygon_points, axes, start=0):
+    """
+    Writes the normal axes to each edge of a polygon into a list of vectors, in place.
+
+    Args:
+        polygon_points (list): A list of pygame.math.Vector2 objects representing the polygon's vertices.
+        axes (list): The vectors to write into (extended with new vectors when too short).
+        start (int, optional): The index of the first vector written. Defaults to 0.
+
+    Returns:
+        int: The index after the last vector written.
+    """
+    count = len(polygon_points)
+    while len(axes) < start + count:
+        axes.append(pygame.math.Vector2())
+    for i in range(count):
+        p1 = polygon_points[i]
+        p2 = polygon_points[i + 1] if i + 1 < count else polygon_points[0]
+        axis = axes[start + i]
+        axis.update(-(p2.y - p1.y), p2.x - p1.x) # (-edge.y, edge.x)
+        axis.normalize_ip()
+    return start + count
+
 def get_axes(polygon_points):
     """
     Returns the normal axes to each edge of a polygon.
@@ -37,33 +76,46 @@ def get_axes(polygon_points):
         list: A list of pygame.math.Vector2 objects representing the normal axes.
     """
     axes = []
-    for i in range(len(polygon_points)):
-        p1 = polygon_points[i]
-        p2 = polygon_points[(i + 1) % len(polygon_points)]
-        edge = p2 - p1
-        axis = pygame.math.Vector2(-edge.y, edge.x).normalize()
-        axes.append(axis)
+    compute_axes(polygon_points, axes)
     return axes
 
-def collide_polygons_sat(poly1_points, poly2_points):
+def _center(polygon_points):
+    """
+    Returns the center of a polygon as two floats (same rounding as summing its Vector2 points).
+    """
+    x = y = 0.0
+    for p in polygon_points:
+        x += p.x
+        y += p.y
+    scale = 1. / len(polygon_points) # Vector2 divisions multiply by the inverse
+    return x * scale, y * scale
+
+def collide_polygons_sat(poly1_points, poly2_points, poly2_axes=None):
     """
     Detects collision between two convex polygons using the Separating Axis Theorem (SAT).
 
     Args:
         poly1_points (list): A list of pygame.math.Vector2 objects representing the vertices of the first polygon.
         poly2_points (list): A list of pygame.math.Vector2 objects representing the vertices of the second polygon.
+        poly2_axes (list, optional): Precomputed axes of the second polygon (e.g. a static wall). Defaults to None (computed).
 
     Returns:
         tuple: A tuple containing a boolean indicating if a collision occurred,
                the collision normal (pygame.math.Vector2), and the penetration depth (float).
                Returns (False, None, None) if there is no collision.
+               The normal is a scratch vector, only valid until the next call.
     """
-    axes = get_axes(poly1_points) + get_axes(poly2_points)
-    
+    axes = _axes
+    axis_count = compute_axes(poly1_points, axes)
+    if poly2_axes is None:
+        axis_count = compute_axes(poly2_points, axes, axis_count)
+        poly2_axes = ()
+
     min_overlap = float('inf')
     collision_normal = None
 
-    for axis in axes:
+    for k in range(axis_count + len(poly2_axes)):
+        axis = axes[k] if k < axis_count else poly2_axes[k - axis_count]
         proj1_min, proj1_max = project_polygon(axis, poly1_points)
         proj2_min, proj2_max = project_polygon(axis, poly2_points)
 
@@ -76,14 +128,16 @@ def collide_polygons_sat(poly1_points, poly2_points):
             min_overlap = overlap
             collision_normal = axis
 
-    center1 = sum(poly1_points, pygame.math.Vector2(0,0)) / len(poly1_points)
-    center2 = sum(poly2_points, pygame.math.Vector2(0,0)) / len(poly2_points)
-    
-    direction = center2 - center1
-    if collision_normal.dot(direction) < 0:
-        collision_normal *= -1
+    center1_x, center1_y = _center(poly1_points)
+    center2_x, center2_y = _center(poly2_points)
+
+    # The normal points from the first polygon to the second (copied: the axis may belong to a shared axis list)
+    normal = _normal
+    normal.update(collision_normal)
+    if collision_normal.dot((center2_x - center1_x, center2_y - center1_y)) < 0:
+        normal *= -1
 
-    return True, collision_normal, min_overlap
+    return True, normal, min_overlap
 
 def collide_car_wall_sat(car, wall):
     """
@@ -95,73 +149,66 @@ def collide_car_wall_sat(car, wall):
 
     Returns:
         tuple: A tuple containing a boolean indicating if a collision occurred,
-               the collision normal (pygame.math.Vector2), and the penetration depth (float).
+               the collision normal (pygame.math.Vector2, pointing from the car to the wall), and the penetration depth (float).
                Returns (False, None, None) if there is no collision.
     """
-    car_points = car.get_collision_polygon()
-    wall_p1, wall_p2, wall_normal = wall.get_collision_line_segment()
-
-    # Convert wall segment to a "thick" polygon for SAT
-    wall_thickness = wall.thickness
-    wall_perp = pygame.math.Vector2(-wall_normal.y, wall_normal.x)
-    
-    # Create a polygon representing the thick wall
-    wall_poly = [
-        wall_p1 + wall_perp * wall_thickness/2,
-        wall_p2 + wall_perp * wall_thickness/2,
-        wall_p2 - wall_perp * wall_thickness/2,
-        wall_p1 - wall_perp * wall_thickness/2
-    ]
-    
-    # Use standard SAT between car polygon and wall polygon
-    collided, normal, penetration = collide_polygons_sat(car_points, wall_poly)
-    
-    if collided:
-        # Make sure normal points from car to wall
-        car_center = sum(car_points, pygame.math.Vector2(0,0)) / len(car_points)
-        wall_center = sum(wall_poly, pygame.math.Vector2(0,0)) / len(wall_poly)
-        direction = wall_center - car_center
-        if normal.dot(direction) < 0:
-            normal *= -1
-        
-        return True, normal, penetration
-    
-    return False, None, None
+    # The "thick" polygon of the wall and its axes are precomputed (walls are static).
+    # collide_polygons_sat already orients the normal from the car center to the wall center.
+    return collide_polygons_sat(car.get_collision_polygon(), wall.get_collision_polygon(), wall.axes)
 
-def resolve_collision(obj1, obj2, normal, penetration):
+def resolve_collision(obj1, obj2, normal, penetration, elapsed_ms=None, events=None):
     """
     Resolves a collision between two objects (car-car or car-wall).
+    With an event queue, the damage is computed but not applied: it is queued, and the World applies it once per step.
 
     Args:
         obj1 (Car): The first object (always a car).
         obj2 (Car or Wall): The second object.
         normal (pygame.math.Vector2): The collision normal (unit vector).
         penetration (float): The penetration depth.
+        elapsed_ms (int, optional): The game clock in milliseconds (the simulation clock, so that replays are deterministic).
+            Defaults to None (pygame.time.get_ticks()).
+        events (CollisionEventQueue, optional): The queue receiving the damage events. Defaults to None (damage applied immediately).
     """
     # Import Car here to avoid circular dependency at module level
     from car import Car 
 
+    is_car_pair = isinstance(obj2, Car)
+    step = _step
+
     # 1. Separate objects (resolve penetration)
-    if isinstance(obj2, Car): # Car-car collision
+    if is_car_pair: # Car-car collision
         total_inv_mass = (1 / obj1.mass) + (1 / obj2.mass)
         if total_inv_mass == 0: return
 
-        resolution_vector = normal * penetration / total_inv_mass
-        obj1.position -= resolution_vector / obj1.mass
-        obj2.position += resolution_vector / obj2.mass
+        resolution_vector = _resolution # normal * penetration / total_inv_mass
+        resolution_vector.update(normal)
+        resolution_vector *= penetration
+        resolution_vector /= total_inv_mass
+        step.update(resolution_vector)
+        step /= obj1.mass
+        obj1.position -= step
+        step.update(resolution_vector)
+        step /= obj2.mass
+        obj2.position += step
     else: # Car-wall collision (obj2 is a Wall)
-        obj1.position -= normal * penetration
+        step.update(normal)
+        step *= penetration
+        obj1.position -= step
 
-    # Update objects' rects and points after penetration resolution
-    obj1.update_physics(0)
-    if isinstance(obj2, Car):
-        obj2.update_physics(0)
+    # Update objects' poses after penetration resolution
+    obj1.update_contact()
+    if is_car_pair:
+        obj2.update_contact()
 
     # 2. Calculate impulse (only for cars)
-    if isinstance(obj2, Car): # Car-car collision
-        relative_velocity = obj2.velocity - obj1.velocity
+    relative_velocity = _relative_velocity
+    if is_car_pair: # Car-car collision
+        relative_velocity.update(obj2.velocity)
+        relative_velocity -= obj1.velocity
     else: # Car-wall collision
-        relative_velocity = -obj1.velocity # Relative velocity is just the opposite of the car's velocity
+        relative_velocity.update(obj1.velocity)
+        relative_velocity *= -1 # Relative velocity is just the opposite of the car's velocity
 
     vel_along_normal = relative_velocity.dot(normal)
 
@@ -171,26 +218,30 @@ def resolve_collision(obj1, obj2, normal, penetration):
     e = COLLISION_ELASTICITY
 
     # Calculate scalar impulse
-    if isinstance(obj2, Car):
+    if is_car_pair:
         j = -(1 + e) * vel_along_normal
         j /= total_inv_mass
     else: # Car-wall collision (infinite mass for the wall)
         j = -(1 + e) * vel_along_normal * obj1.mass # J = -(1+e) * v_rel_n * m
 
-    impulse = normal * j
-    obj1.velocity -= impulse / obj1.mass
-    if isinstance(obj2, Car):
-        obj2.velocity += impulse / obj2.mass
+    impulse = _impulse # normal * j
+    impulse.update(normal)
+    impulse *= j
+    _apply_impulse(obj1, obj2 if is_car_pair else None, impulse)
 
     # 3. Resolve friction (simple)
-    tangent = relative_velocity - (vel_along_normal * normal)
+    tangent = _tangent # relative_velocity - (vel_along_normal * normal)
+    tangent.update(relative_velocity)
+    step.update(normal)
+    step *= vel_along_normal
+    tangent -= step
     if tangent.length() > 0:
-        tangent = tangent.normalize()
+        tangent.normalize_ip()
 
     sf = COLLISION_FRICTION
 
     jt = -relative_velocity.dot(tangent)
-    if isinstance(obj2, Car):
+    if is_car_pair:
         jt /= total_inv_mass
     else: # Car-wall collision
         jt *= obj1.mass # Jt = -v_rel_t * m
@@ -198,30 +249,74 @@ def resolve_collision(obj1, obj2, normal, penetration):
     if abs(jt) > j * sf:
         jt = j * sf * (-1 if jt < 0 else 1)
 
-    friction_impulse = tangent * jt
-    obj1.velocity -= friction_impulse / obj1.mass
-    if isinstance(obj2, Car):
-        obj2.velocity += friction_impulse / obj2.mass
+    friction_impulse = _impulse # tangent * jt
+    friction_impulse.update(tangent)
+    friction_impulse *= jt
+    _apply_impulse(obj1, obj2 if is_car_pair else None, friction_impulse)
 
     # 4. Calculate damage
-    impact_force = (j / pygame.time.get_ticks() * 1000) # Approximation of F = dp/dt
+    if elapsed_ms is None:
+        elapsed_ms = pygame.time.get_ticks()
+    impact_force = (j / elapsed_ms * 1000) # Approximation of F = dp/dt
 
-    if isinstance(obj2, Car): # Car-car damage
+    if is_car_pair: # Car-car damage
         impact_force *= COLLISION_DAMAGE_MULTIPLIER
-        impact_point = (obj1.position + obj2.position) / 2
-
-        car_a_forward = pygame.math.Vector2(0, -1).rotate(obj1.angle)
-        dot_prod_a_normal = car_a_forward.dot(normal)
+        impact_point = _impact_point # (obj1.position + obj2.position) / 2
+        impact_point.update(obj1.position)
+        impact_point += obj2.position
+        impact_point /= 2
 
-        car_b_forward = pygame.math.Vector2(0, -1).rotate(obj2.angle)
-        dot_prod_b_neg_normal = car_b_forward.dot(-normal)
+        dot_prod_a_normal = obj1.heading.forward.dot(normal)
+        dot_prod_b_neg_normal = -obj2.heading.forward.dot(normal)
 
         car_a_inflicts_damage = dot_prod_a_normal > FRONT_IMPACT_THRESHOLD
         car_b_inflicts_damage = dot_prod_b_neg_normal > FRONT_IMPACT_THRESHOLD
 
         if car_a_inflicts_damage:
-            obj2.take_damage(impact_force, impact_point, attacker=obj1)
+            inflict_damage(obj2, impact_force, impact_point, obj1, events, EVENT_CAR_CAR, obj1.entity_id)
         if car_b_inflicts_damage:
-            obj1.take_damage(impact_force, impact_point, attacker=obj2)
+            inflict_damage(obj1, impact_force, impact_point, obj2, events, EVENT_CAR_CAR, obj2.entity_id)
     else: # Car-wall damage
-        obj1.take_damage(WALL_DAMAGE_FACTOR, obj1.position) # Impact point approximated by car position
+        inflict_damage(obj1, WALL_DAMAGE_FACTOR, obj1.position, None, events, EVENT_CAR_WALL, -1) # Impact point approximated by car position
+
+def inflict_damage(car, impact_force, impact_point, attacker, events, kind, other):
+    """
+    Computes the damage of an impact on a car and queues it, without changing the car: the World applies
+    the damage of the step and reports it (World._apply_collision_events). Without a queue, the damage is
+    applied and reported immediately (Car.take_damage).
+
+    Args:
+        car (Car): The car taking the impact.
+        impact_force (float): The magnitude of the impact force.
+        impact_point (pygame.math.Vector2): The point of contact in world coordinates.
+        attacker (Car): The car that inflicted the damage, None if none.
+        events (CollisionEventQueue): The queue receiving the damage event, None to apply it immediately.
+        kind (int): The EVENT_* kind of the impact.
+        other (int): The other party of the contact (see EVENT_*).
+    """
+    if events is None:
+        car.take_damage(impact_force, impact_point, attacker=attacker)
+        return
+    result = car.damage_from_impact(impact_force, impact_point)
+    if result is not None:
+        damage, zone = result
+        events.push(kind, car.entity_id, -1 if attacker is None else attacker.entity_id, other,
+                    damage, zone, impact_point.x, impact_point.y)
+
+def _apply_impulse(obj1, obj2, impulse):
+    """
+    Applies an impulse to a colliding pair: obj1.velocity -= impulse / obj1.mass, obj2.velocity += impulse / obj2.mass.
+
+    Args:
+        obj1 (Car): The first object.
+        obj2 (Car): The second object, None for a wall (infinite mass).
+        impulse (pygame.math.Vector2): The impulse (left unchanged).
+    """
+    step = _step
+    step.update(impulse)
+    step /= obj1.mass
+    obj1.velocity -= step
+    if obj2 is not None:
+        step.update(impulse)
+        step /= obj2.mass
+        obj2.velocity += step
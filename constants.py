@@ -45,6 +45,8 @@ COLLISION_DAMAGE_MULTIPLIER = 5.0  # Damage multiplier for car-on-car impacts
 WALL_DAMAGE_FACTOR = 500.0  # Damage taken when colliding with walls
 MIN_IMPACT_FORCE_FOR_DAMAGE = 500.0  # Minimum impact force threshold to inflict damage
 FRONT_IMPACT_THRESHOLD = 0.7  # Dot product threshold to determine a "front" impact
+COLLISION_CONTACT_GRACE = 10  # Steps without impact after which a scrape or push counts as a new contact (sound, message)
+COLLISION_LOG_LIMIT = 4  # Impact messages printed per step at most (the others are counted)
 
 # --- Game Parameters ---
 DISABLED_DURATION = 3.0  # Duration in seconds a car is disabled after destruction
@@ -74,6 +76,40 @@ AI_SPEED_MULTIPLIERS = {
 
 # --- Display Parameters ---
 COORD_FONT_SIZE = 18  # Font size for coordinates
+SCORE_FONT_SIZE = 36  # Font size for the score board
+RENDER_SCALE_SMOOTH = False  # Scale the internal render resolution to the window with smoothscale (filtered, slower) instead of scale
+RENDER_HUD_NATIVE = True  # Draw the HUD at the window resolution over the scaled scene (sharp text)
+MENU_EVENT_TIMEOUT = 500  # Milliseconds the menu sleeps waiting for an event before checking again
+STARTUP_BENCHMARK_KEY_INTERVAL = 0.3  # Seconds between the simulated menu key presses of --startup-benchmark
+
+# --- Frame Pacing ---
+# Render detail levels (World.draw)
+RENDER_DETAIL_MINIMAL = 0  # Track, entities and player HUD only
+RENDER_DETAIL_REDUCED = 1  # Adds the AI score board
+RENDER_DETAIL_FULL = 2  # Adds the debug overlays (wall normals, racing line, waypoints, coordinates)
+# Pacing levels, from full rendering to the lightest: (render one frame out of N, render detail)
+PACING_LEVELS = ((1, RENDER_DETAIL_FULL), (2, RENDER_DETAIL_FULL), (2, RENDER_DETAIL_REDUCED), (3, RENDER_DETAIL_MINIMAL))
+PACING_OVERLOAD_RATIO = 0.95  # Fraction of the frame budget above which a frame counts as overloaded
+PACING_RECOVER_RATIO = 0.6  # Fraction of the frame budget the lighter level must fit in to recover
+PACING_DEGRADE_FRAMES = 20  # Consecutive overloaded frames before lowering the render load
+PACING_RECOVER_FRAMES = 120  # Consecutive light frames before raising it back (doubled after each bounce)
+PACING_SMOOTHING = 0.1  # Weight of the latest frame in the frame time averages
+PACING_MAX_STEP_MS = 25  # Longest simulation step: longer frames are split into several steps
+PACING_MAX_STEPS = 4  # Most simulation steps per frame (the rest of a longer frame is dropped)
+FRAME_GC_ENABLED = True  # Run the garbage collector between frames (automatic collection off during sessions)
+
+# --- Performance Profiles ---
+DEFAULT_PERF_PROFILE = "high"  # Profile of the game when none is chosen (see perf_profiles.py)
+
+# --- Allocation Diagnostics ---
+ALLOC_REPORT_FRAMES = 600  # Frames between two allocation reports (--alloc-diagnostics)
+ALLOC_TOP_LINES = 8  # Source lines listed in an allocation report
+ALLOC_TRACEBACK_DEPTH = 1  # Frames stored per traced allocation (1: the allocating line only, cheapest)
+ALLOC_BUDGET_STEPS = 120  # Simulated steps measured by measure_step_allocations
+ALLOC_BUDGET_WARMUP = 60  # Steps simulated before measuring (caches filling up)
+
+# --- Telemetry ---
+TELEMETRY_SLOTS = 256  # Frames kept in the live telemetry ring file (about 4 seconds)
 
 # --- Sounds ---
 # Path to sound files (adapt by user)
@@ -81,3 +117,76 @@ COORD_FONT_SIZE = 18  # Font size for coordinates
 SOUND_COLLISION_PATH = "assets/collision.mp3"  # Collision sound
 SOUND_MENU_SELECT_PATH = "assets/menu_select.mp3"  # Menu selection sound
 SOUND_PICKUP_PATH = "assets/pickup.mp3"  # Health pickup sound
+
+# --- Track Analysis Parameters ---
+DISTANCE_FIELD_CELL_SIZE = 10  # Size in pixels of a distance field grid cell
+DISTANCE_FIELD_MAX_DISTANCE = 200.0  # Distances are clamped to this value (pixels)
+SPAWN_WALL_CLEARANCE = 20  # Extra free space required around spawned cars and pickups
+AI_SPAWN_MAX_ATTEMPTS = 50  # Spawn points tried per free-play AI car before it is left out
+AI_WALL_AVOID_DISTANCE = 45.0  # AI steers away from walls closer than this (pixels)
+RACE_LINE_SPACING = 10.0  # Distance in pixels between two samples of the racing line
+RACE_LINE_SMOOTHING_PASSES = 40  # Number of smoothing passes applied to the waypoint polygon
+RACE_LINE_WALL_CLEARANCE = CAR_LENGTH * 0.6  # Minimum distance between the racing line and the walls
+RACE_LINE_MAX_LATERAL_ACCEL = 300.0  # Lateral acceleration the cars can hold in a corner (pixels/s^2)
+RACE_LINE_BRAKE_DECEL = 250.0  # Deceleration assumed when braking before a corner (pixels/s^2)
+RACE_LINE_LOOKAHEAD = CAR_LENGTH * 1.5  # Base distance ahead of the car used as steering target
+RACE_LINE_LOOKAHEAD_TIME = 0.25  # Extra steering lookahead per unit of speed (seconds)
+RACE_LINE_RESYNC_DISTANCE = 150.0  # Distance to the line beyond which the car position is searched again
+NAV_GRID_CELL_SIZE = 40  # Size in pixels of a navigation grid cell
+NAV_GRID_CLEARANCE = CAR_WIDTH / 2  # Minimum distance to the walls for a navigation cell to be walkable
+FLOW_FIELD_CELLS_PER_UPDATE = 400  # Wavefront cells expanded per frame when a flow field is refreshed
+WALL_GRID_CELL_SIZE = 100  # Size in pixels of a cell of the static wall index
+AI_WHISKER_COUNT = 16  # Number of sensor rays cast around each AI car (ray 0 points forward)
+AI_WHISKER_RANGE = 250.0  # Length of the AI sensor rays in pixels
+AI_WHISKER_AVOID_DISTANCE = CAR_LENGTH * 1.5  # AI steers around obstacles detected closer than this ahead
+AI_WHISKER_INTERVAL = 3  # Frames between two whisker casts of an AI car (the cars take turns)
+RAYCAST_NUMPY = True  # Cast the large ray batches with the vectorized numpy kernel, if numpy is installed
+RAYCAST_NUMPY_MIN_RAYS = 16  # Smaller batches are cast in Python (cheaper than the numpy call overhead)
+AI_ANGLE_LUT = False  # AI headings towards targets from a quantized arctangent table instead of math.atan2 (platform-independent, slower in CPython)
+ANGLE_LUT_SIZE = 1024  # Steps of the arctangent table between 0 and 45 degrees (error below 29 / size degrees)
+
+# --- AI Planner Parameters ---
+AI_PLANNER_ENABLED = True  # Run the high-level AI plans in a worker process pool
+AI_PLANNER_INTERVAL = 10  # Frames between two world snapshots sent to the planner
+AI_PLAN_MAX_AGE = 60  # Frames after which a plan is considered stale and ignored
+AI_RETREAT_HP_RATIO = 0.4  # Below this HP ratio, AI plans to grab a health pickup instead of attacking
+
+# --- Tracks ---
+DEFAULT_TRACK_PATH = "tracks/default.json"  # Track loaded by default
+TRACK_CACHE_EXTENSION = ".trackc"  # Extension of the compiled track sidecar files
+TRACK_IMPORT_TILE_SIZE = 50  # Size in pixels of a tile of an imported tile-grid track
+TRACK_IMPORT_MASK_SCALE = 10  # Size in pixels of a pixel of an imported bitmap track mask
+TRACK_IMPORT_SIMPLIFY_TOLERANCE = 0.75  # Max deviation (in tiles/mask pixels) when simplifying imported wall contours
+TRACK_IMPORT_WALL_THICKNESS = 10  # Thickness of the walls of an imported track
+
+# --- Controls and Replays ---
+CONTROL_ACCELERATE = 1  # Control flag bits of a car for one frame (see Car.apply_controls)
+CONTROL_BRAKE = 2
+CONTROL_TURN_LEFT = 4
+CONTROL_TURN_RIGHT = 8
+CONTROL_FIRE = 16
+CONTROL_BITS = 5  # Number of control flag bits per car
+REPLAY_EXTENSION = ".aprep"  # Extension of the replay files
+REPLAY_KEYFRAME_INTERVAL = 2.0  # Seconds between two full world snapshots in a replay (seek granularity)
+REPLAY_SEEK_STEP = 10.0  # Seconds skipped by the replay seek keys
+REPLAY_FAST_FORWARD = 8  # Simulation frames per displayed frame when fast-forwarding a replay
+
+# --- Network ---
+NET_DEFAULT_HOST = "127.0.0.1"  # Address of the multiplayer server
+NET_DEFAULT_PORT = 47800  # UDP port of the multiplayer server
+NET_TICK_RATE = 60  # Simulation ticks per second on the server
+NET_SNAPSHOT_INTERVAL = 2  # Ticks between two snapshots sent to the clients (30 per second)
+NET_HISTORY_SIZE = 64  # Snapshots kept as delta baselines (server and client)
+NET_MAX_BULLETS = 128  # Maximum number of bullets sent in a snapshot
+NET_MAX_PACKET_SIZE = 1400  # Receive buffer size of a datagram
+NET_CLIENT_TIMEOUT = 5.0  # Seconds without packets before a client is dropped
+NET_CONNECT_RETRY = 0.5  # Seconds between two connection requests of a client
+NET_INTERPOLATION_DELAY = 0.1  # Seconds remote cars are displayed in the past (interpolation buffer)
+NET_STATS_INTERVAL = 5.0  # Seconds between two bandwidth reports
+ROLLBACK_INPUT_DELAY = 1  # Frames between reading the local inputs and applying them (peer-to-peer rollback)
+ROLLBACK_MAX_FRAMES = 8  # Maximum number of frames re-simulated by a rollback (a peer further ahead waits)
+ROLLBACK_CHECKSUM_INTERVAL = 30  # Frames between two state checksums exchanged to detect desyncs
+ROLLBACK_START_TICKS = 5000  # Game clock at the start of a peer-to-peer session (identical on every peer)
+BROADCAST_DEFAULT_PORT = 47900  # TCP port of the spectator broadcast
+BROADCAST_KEYFRAME_INTERVAL = 2.0  # Seconds between two full states in the spectator stream (deltas in between)
+BROADCAST_MAX_BUFFER = 256 * 1024  # Bytes queued for a spectator before it is dropped as too slow
@@ -0,0 +1,230 @@
+import math
+import random
+from array import array
+from constants import * # Import all constants
+
+class DistanceField:
+    """
+    Precomputed signed distance field of the track walls.
+
+    The track is sampled on a regular grid once per session. Every cell stores the
+    distance from its center to the surface of the closest wall (negative inside the
+    wall thickness), the unit direction pointing away from that wall and the index of
+    the wall. Queries are then a single array lookup, whatever the number of walls.
+    """
+    def __init__(self, walls, cell_size=DISTANCE_FIELD_CELL_SIZE, max_distance=DISTANCE_FIELD_MAX_DISTANCE):
+        """
+        Builds the distance field from the walls of the track.
+
+        Args:
+            walls (iterable): The Wall objects of the track.
+            cell_size (int, optional): The size of a grid cell in pixels. Defaults to DISTANCE_FIELD_CELL_SIZE.
+            max_distance (float, optional): The distance at which the field is clamped. Defaults to DISTANCE_FIELD_MAX_DISTANCE.
+        """
+        walls = list(walls)
+        self.cell_size = cell_size
+        self.max_distance = max_distance
+
+        # The grid covers the bounding box of the walls (the arena)
+        self.min_x = min(min(w.p1.x, w.p2.x) for w in walls)
+        self.max_x = max(max(w.p1.x, w.p2.x) for w in walls)
+        self.min_y = min(min(w.p1.y, w.p2.y) for w in walls)
+        self.max_y = max(max(w.p1.y, w.p2.y) for w in walls)
+        self.origin_x = self.min_x - cell_size
+        self.origin_y = self.min_y - cell_size
+        self.cols = int(math.ceil((self.max_x - self.origin_x) / cell_size)) + 2
+        self.rows = int(math.ceil((self.max_y - self.origin_y) / cell_size)) + 2
+
+        cell_count = self.cols * self.rows
+        self.distances = array('f', [max_distance]) * cell_count
+        self.gradient_x = array('f', [0.0]) * cell_count
+        self.gradient_y = array('f', [0.0]) * cell_count
+        self.nearest_wall = array('i', [-1]) * cell_count
+
+        for wall_index, wall in enumerate(walls):
+            self._rasterize_wall(wall_index, wall)
+
+    # Grid parameters saved alongside the arrays when a track is compiled
+    METADATA_FIELDS = ("cell_size", "max_distance", "min_x", "max_x", "min_y", "max_y",
+                       "origin_x", "origin_y", "cols", "rows")
+
+    @classmethod
+    def from_arrays(cls, metadata, distances, gradient_x, gradient_y, nearest_wall):
+        """
+        Rebuilds a distance field from precomputed data (see Track compilation).
+
+        Args:
+            metadata (dict): The grid parameters returned by metadata().
+            distances (sequence): The signed distance of each cell.
+            gradient_x (sequence): The x-component of the push-away direction of each cell.
+            gradient_y (sequence): The y-component of the push-away direction of each cell.
+            nearest_wall (sequence): The index of the closest wall of each cell.
+
+        Returns:
+            DistanceField: The distance field.
+        """
+        field = cls.__new__(cls)
+        for name in cls.METADATA_FIELDS:
+            setattr(field, name, metadata[name])
+        field.distances = distances
+        field.gradient_x = gradient_x
+        field.gradient_y = gradient_y
+        field.nearest_wall = nearest_wall
+        return field
+
+    def metadata(self):
+        """
+        Returns the grid parameters needed by from_arrays.
+        """
+        return {name: getattr(self, name) for name in self.METADATA_FIELDS}
+
+    def _rasterize_wall(self, wall_index, wall):
+        """
+        Updates the cells within max_distance of a wall with their distance to it.
+
+        Args:
+            wall_index (int): The index of the wall in the track.
+            wall (Wall): The wall to rasterize.
+        """
+        cs = self.cell_size
+        half_thickness = wall.thickness / 2
+        reach = self.max_distance + half_thickness
+        ax, ay = wall.p1.x, wall.p1.y
+        sx, sy = wall.p2.x - ax, wall.p2.y - ay
+        seg_len_sq = sx * sx + sy * sy
+        nx, ny = wall.normal.x, wall.normal.y
+
+        col_start = max(0, int((min(ax, ax + sx) - reach - self.origin_x) / cs))
+        col_end = min(self.cols - 1, int((max(ax, ax + sx) + reach - self.origin_x) / cs) + 1)
+        row_start = max(0, int((min(ay, ay + sy) - reach - self.origin_y) / cs))
+        row_end = min(self.rows - 1, int((max(ay, ay + sy) + reach - self.origin_y) / cs) + 1)
+
+        distances = self.distances
+        gradient_x = self.gradient_x
+        gradient_y = self.gradient_y
+        nearest_wall = self.nearest_wall
+
+        for row in range(row_start, row_end + 1):
+            py = self.origin_y + (row + 0.5) * cs
+            base = row * self.cols
+            for col in range(col_start, col_end + 1):
+                px = self.origin_x + (col + 0.5) * cs
+
+                # Closest point on the wall center line
+                t = 0.0
+                if seg_len_sq > 0:
+                    t = ((px - ax) * sx + (py - ay) * sy) / seg_len_sq
+                    t = 0.0 if t < 0.0 else 1.0 if t > 1.0 else t
+                dx = px - (ax + sx * t)
+                dy = py - (ay + sy * t)
+                center_distance = math.sqrt(dx * dx + dy * dy)
+                distance = center_distance - half_thickness
+
+                index = base + col
+                if distance < distances[index]:
+                    distances[index] = distance
+                    if center_distance > 1e-6:
+                        gradient_x[index] = dx / center_distance
+                        gradient_y[index] = dy / center_distance
+                    else: # Exactly on the wall line, push along the wall normal
+                        gradient_x[index] = nx
+                        gradient_y[index] = ny
+                    nearest_wall[index] = wall_index
+
+    def cell_index(self, x, y):
+        """
+        Returns the index of the grid cell containing a point (clamped to the grid).
+
+        Args:
+            x (float): The x-coordinate of the point.
+            y (float): The y-coordinate of the point.
+
+        Returns:
+            int: The index of the cell in the field arrays.
+        """
+        col = int((x - self.origin_x) / self.cell_size)
+        row = int((y - self.origin_y) / self.cell_size)
+        col = 0 if col < 0 else self.cols - 1 if col >= self.cols else col
+        row = 0 if row < 0 else self.rows - 1 if row >= self.rows else row
+        return row * self.cols + col
+
+    def distance(self, x, y):
+        """
+        Returns the signed distance from a point to the closest wall surface.
+
+        Args:
+            x (float): The x-coordinate of the point.
+            y (float): The y-coordinate of the point.
+
+        Returns:
+            float: The distance in pixels, negative inside a wall, clamped to max_distance.
+        """
+        return self.distances[self.cell_index(x, y)]
+
+    def gradient(self, x, y):
+        """
+        Returns the unit direction pointing away from the closest wall.
+
+        Args:
+            x (float): The x-coordinate of the point.
+            y (float): The y-coordinate of the point.
+
+        Returns:
+            tuple: The (x, y) components of the direction, (0, 0) if no wall is within max_distance.
+        """
+        index = self.cell_index(x, y)
+        return self.gradient_x[index], self.gradient_y[index]
+
+    def sample(self, x, y):
+        """
+        Returns the distance and push-away direction at a point with a single lookup.
+
+        Args:
+            x (float): The x-coordinate of the point.
+            y (float): The y-coordinate of the point.
+
+        Returns:
+            tuple: The signed distance and the (x, y) components of the push-away direction.
+        """
+        index = self.cell_index(x, y)
+        return self.distances[index], self.gradient_x[index], self.gradient_y[index]
+
+    def is_clear(self, x, y, clearance):
+        """
+        Checks whether a point is inside the arena and at least `clearance` away from any wall.
+
+        Args:
+            x (float): The x-coordinate of the point.
+            y (float): The y-coordinate of the point.
+            clearance (float): The required free space in pixels.
+
+        Returns:
+            bool: True if the point is clear.
+        """
+        if not (self.min_x <= x <= self.max_x and self.min_y <= y <= self.max_y):
+            return False
+        # Cell centers are up to half a cell diagonal away from the point
+        return self.distance(x, y) >= clearance + self.cell_size * 0.71
+
+    def random_clear_point(self, clearance, rng=random, attempts=200, zone=None):
+        """
+        Picks a random point of the arena that is clear of walls.
+
+        Args:
+            clearance (float): The required free space in pixels.
+            rng (random.Random, optional): The random generator to use. Defaults to the random module.
+            attempts (int, optional): The maximum number of samples. Defaults to 200.
+            zone (tuple, optional): An (x, y, width, height) area to pick the point in. Defaults to None (whole arena).
+
+        Returns:
+            tuple or None: The (x, y) integer coordinates of the point, or None if no clear point was found.
+        """
+        if zone is None:
+            zone = (self.min_x, self.min_y, self.max_x - self.min_x, self.max_y - self.min_y)
+        zone_x, zone_y, zone_width, zone_height = (int(v) for v in zone)
+        for _ in range(attempts):
+            x = rng.randint(zone_x, zone_x + zone_width)
+            y = rng.randint(zone_y, zone_y + zone_height)
+            if self.is_clear(x, y, clearance):
+                return x, y
+        return None
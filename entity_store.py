@@ -0,0 +1,247 @@
+import struct
+from array import array
+
+# --- Components ---
+# A component is a bit of the entity mask and the typed columns it owns. Every entity has a row in
+# every column (0 for the components it does not have), so a row index addresses all of its data.
+COMPONENT_TRANSFORM = 1
+COMPONENT_KINEMATICS = 2
+COMPONENT_HEALTH = 4
+COMPONENT_WEAPON = 8
+COMPONENT_OWNER = 16
+
+COMPONENT_COLUMNS = {
+    COMPONENT_TRANSFORM: (("x", "d"), ("y", "d")), # Position, in pixels
+    COMPONENT_KINEMATICS: (("vx", "d"), ("vy", "d")), # Velocity, in pixels per second
+    COMPONENT_HEALTH: (("hp", "d"),),
+    COMPONENT_WEAPON: (("damage", "d"), ("radius", "i")), # Damage dealt on hit, hit radius in pixels
+    COMPONENT_OWNER: (("owner", "q"), ("team", "I")) # Entity id of the owner car, packed color of its team
+}
+
+BULLET_MASK = COMPONENT_TRANSFORM | COMPONENT_KINEMATICS | COMPONENT_WEAPON | COMPONENT_OWNER
+
+# Cars: the columns behind Car.position, Car.angle, Car.velocity, Car.angular_velocity, Car.hp,
+# Car.bullets_remaining and Car.fire_cooldown_timer, plus the team of the car
+CAR_COMPONENT_COLUMNS = {
+    COMPONENT_TRANSFORM: (("x", "d"), ("y", "d"), ("angle", "d")), # Position in pixels, heading in degrees (0 = up, 90 = right)
+    COMPONENT_KINEMATICS: (("vx", "d"), ("vy", "d"), ("spin", "d")), # Velocity in pixels per second, angular velocity in degrees per second
+    COMPONENT_HEALTH: (("hp", "d"),),
+    COMPONENT_WEAPON: (("ammo", "i"), ("cooldown", "d")), # Bullets left, seconds until the cannon can fire again
+    COMPONENT_OWNER: (("team", "I"),) # Packed color of the car (its bullets carry the same team)
+}
+
+CAR_MASK = COMPONENT_TRANSFORM | COMPONENT_KINEMATICS | COMPONENT_HEALTH | COMPONENT_WEAPON | COMPONENT_OWNER
+
+# Health pickups: a position and the HP they restore
+PICKUP_COMPONENT_COLUMNS = {
+    COMPONENT_TRANSFORM: (("x", "d"), ("y", "d")), # Position, in pixels
+    COMPONENT_HEALTH: (("hp", "i"),) # HP restored to the car that picks it up
+}
+
+PICKUP_MASK = COMPONENT_TRANSFORM | COMPONENT_HEALTH
+
+STORE_HEADER_FORMAT = struct.Struct("<Iq") # Row count, next entity id
+
+def pack_color(color):
+    """
+    Packs an RGB color into an int (team column).
+    """
+    return (color[0] << 16) | (color[1] << 8) | color[2]
+
+def unpack_color(packed):
+    return ((packed >> 16) & 0xFF, (packed >> 8) & 0xFF, packed & 0xFF)
+
+class EntityStore:
+    """
+    Compact entity storage: integer entity ids and one typed array per component field.
+
+    Rows stay in creation order (removals compact the arrays in one pass), so that iterating the
+    store is deterministic and a restored store iterates exactly like the original one.
+    Columns are attributes of the store (store.x, store.vx...) and are meant to be iterated directly.
+    """
+    def __init__(self, components=COMPONENT_COLUMNS):
+        """
+        Initializes an empty store.
+
+        Args:
+            components (dict, optional): Component bit -> ((column name, array typecode), ...). Defaults to COMPONENT_COLUMNS.
+        """
+        self.components = components
+        self.ids = array('q')
+        self.masks = array('H')
+        self.columns = {}
+        for fields in components.values():
+            for name, typecode in fields:
+                self.columns[name] = array(typecode)
+                setattr(self, name, self.columns[name])
+        self.next_id = 0
+        self._rows = None # Entity id -> row, built on demand
+        self._queries = {} # Mask -> rows having all its components, dropped on every insertion or removal
+
+    def __len__(self):
+        return len(self.ids)
+
+    def create(self, mask, entity_id=None, **values):
+        """
+        Adds an entity.
+
+        Args:
+            mask (int): The COMPONENT_* bits of the entity.
+            entity_id (int, optional): The id of the entity, if it is assigned elsewhere (e.g. the stable ids of the World).
+                Defaults to None (the next id of the store).
+            **values: The initial column values (missing ones are 0).
+
+        Returns:
+            int: The entity id.
+        """
+        if entity_id is None:
+            entity_id = self.next_id
+        self.next_id = max(self.next_id, entity_id + 1)
+        self.ids.append(entity_id)
+        self.masks.append(mask)
+        for name, column in self.columns.items():
+            column.append(values.get(name, 0))
+        self._changed()
+        return entity_id
+
+    def remove(self, entity_ids):
+        """
+        Removes entities (unknown ids are ignored). The remaining rows keep their order.
+
+        Args:
+            entity_ids (iterable): The ids of the entities to remove.
+        """
+        removed = set(entity_ids)
+        if not removed:
+            return
+        keep = [row for row, entity_id in enumerate(self.ids) if entity_id not in removed]
+        if len(keep) == len(self.ids):
+            return
+        for column in [self.ids, self.masks, *self.columns.values()]:
+            column[:] = array(column.typecode, [column[row] for row in keep])
+        self._changed()
+
+    def clear(self):
+        """
+        Removes every entity.
+        """
+        for column in [self.ids, self.masks, *self.columns.values()]:
+            del column[:]
+        self._changed()
+
+    def row(self, entity_id):
+        """
+        Returns the row of an entity, None if it is not in the store.
+        """
+        if self._rows is None:
+            self._rows = {entity_id: row for row, entity_id in enumerate(self.ids)}
+        return self._rows.get(entity_id)
+
+    def query(self, mask):
+        """
+        Returns the rows of the entities having all the components of a mask (e.g. every armed, owned, moving entity).
+
+        Args:
+            mask (int): The COMPONENT_* bits required.
+
+        Returns:
+            list: The row indices, in creation order (cached until the next insertion or removal).
+        """
+        rows = self._queries.get(mask)
+        if rows is None:
+            rows = self._queries[mask] = [row for row, entity_mask in enumerate(self.masks) if entity_mask & mask == mask]
+        return rows
+
+    def _changed(self):
+        self._rows = None
+        self._queries.clear()
+
+    # --- Flat state (snapshots) ---
+
+    def write_state(self, out):
+        """
+        Appends the rows of the store to a snapshot buffer (each column as its raw machine values).
+
+        Args:
+            out (bytearray): The buffer.
+        """
+        out += STORE_HEADER_FORMAT.pack(len(self.ids), self.next_id)
+        for column in [self.ids, self.masks, *self.columns.values()]:
+            out += column.tobytes()
+
+    def read_state(self, data, offset):
+        """
+        Restores the rows written by write_state.
+
+        Args:
+            data (memoryview): The snapshot.
+            offset (int): The position of the store state in it.
+
+        Returns:
+            int: The position after the store state.
+        """
+        count, self.next_id = STORE_HEADER_FORMAT.unpack_from(data, offset)
+        offset += STORE_HEADER_FORMAT.size
+        for column in [self.ids, self.masks, *self.columns.values()]:
+            size = count * column.itemsize
+            del column[:]
+            column.frombytes(data[offset:offset + size])
+            offset += size
+        self._changed()
+        return offset
+
+    def memory_usage(self):
+        """
+        Returns the number of bytes used by the rows of the store (column storage, without the array headers).
+        """
+        return sum(len(column) * column.itemsize for column in [self.ids, self.masks, *self.columns.values()])
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    import time
+    import pygame
+
+    parser = argparse.ArgumentParser(description="Compare the entity store with pygame sprites for bullets.")
+    parser.add_argument("--count", type=int, default=5000, help="Number of bullets")
+    parser.add_argument("--frames", type=int, default=100, help="Number of updates measured")
+    args = parser.parse_args()
+
+    class SpriteBullet(pygame.sprite.Sprite):
+        # The former bullet sprite, for comparison
+        def __init__(self, x, y, vx, vy):
+            super().__init__()
+            self.position = pygame.math.Vector2(x, y)
+            self.velocity = pygame.math.Vector2(vx, vy)
+            self.radius = 3
+            self.damage = 1.0
+            self.owner_car_color = (255, 255, 0)
+            self.rect = pygame.Rect(x - 3, y - 3, 6, 6)
+
+        def update(self, dt):
+            self.position += self.velocity * dt
+            self.rect.center = (int(self.position.x), int(self.position.y))
+
+    group = pygame.sprite.Group(*(SpriteBullet(i % 1000, i // 1000, 10.0, -5.0) for i in range(args.count)))
+    store = EntityStore()
+    for i in range(args.count):
+        store.create(BULLET_MASK, x=i % 1000, y=i // 1000, vx=10.0, vy=-5.0, damage=1.0, radius=3, team=0xFFFF00)
+
+    sprite = next(iter(group))
+    sprite_bytes = (sys.getsizeof(sprite) + sys.getsizeof(sprite.__dict__) + sys.getsizeof(sprite.position) * 2
+                    + sys.getsizeof(sprite.rect) + sys.getsizeof(sprite.owner_car_color) + sys.getsizeof(sprite.damage))
+    print(f"Mémoire par balle: sprite ~{sprite_bytes} octets, entity store {store.memory_usage() / args.count:.0f} octets")
+
+    start = time.perf_counter()
+    for _ in range(args.frames):
+        for bullet in group:
+            bullet.update(0.016)
+    sprite_time = (time.perf_counter() - start) / args.frames
+    start = time.perf_counter()
+    for _ in range(args.frames):
+        x, y, vx, vy = store.x, store.y, store.vx, store.vy
+        for row in range(len(store)):
+            x[row] += vx[row] * 0.016
+            y[row] += vy[row] * 0.016
+    store_time = (time.perf_counter() - start) / args.frames
+    print(f"Mise à jour de {args.count} balles: sprites {sprite_time * 1000:.2f} ms, entity store {store_time * 1000:.2f} ms")
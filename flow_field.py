@@ -0,0 +1,336 @@
+import heapq
+import math
+import struct
+from array import array
+from constants import * # Import all constants
+
+# Neighbor offsets (column, row) and their unit directions, 4 straight moves then 4 diagonals.
+# Opposite directions are stored in pairs so that `direction ^ 1` is the reverse move.
+NEIGHBOR_OFFSETS = [(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (-1, -1), (1, -1), (-1, 1)]
+NEIGHBOR_COSTS = [1.0, 1.0, 1.0, 1.0, math.sqrt(2), math.sqrt(2), math.sqrt(2), math.sqrt(2)]
+NEIGHBOR_DIRECTIONS = [(dc / math.hypot(dc, dr), dr / math.hypot(dc, dr)) for dc, dr in NEIGHBOR_OFFSETS]
+# Car headings of the neighbor directions, in degrees (0 = up, 90 = right, see Car.angle)
+NEIGHBOR_HEADINGS = [(90 - math.degrees(math.atan2(-dr, dc))) % 360 for dc, dr in NEIGHBOR_OFFSETS]
+NO_DIRECTION = (0.0, 0.0)
+
+# Snapshot records (see FlowFieldCache.write_state): field count, then per field its target key,
+# published and pending cells, heap size and arrays
+FIELD_COUNT_FORMAT = struct.Struct("<I")
+FIELD_KEY_FORMAT = struct.Struct("<q")
+FIELD_STATE_FORMAT = struct.Struct("<iiI")
+
+class NavigationGrid:
+    """
+    Coarse walkability grid of the arena, derived from the track distance field.
+    """
+    def __init__(self, distance_field, cell_size=NAV_GRID_CELL_SIZE, clearance=NAV_GRID_CLEARANCE):
+        """
+        Builds the navigation grid.
+
+        Args:
+            distance_field (DistanceField): The track distance field.
+            cell_size (int, optional): The size of a navigation cell in pixels. Defaults to NAV_GRID_CELL_SIZE.
+            clearance (float, optional): The distance to the walls required for a cell to be walkable. Defaults to NAV_GRID_CLEARANCE.
+        """
+        self.cell_size = cell_size
+        self.origin_x = distance_field.min_x
+        self.origin_y = distance_field.min_y
+        self.cols = int(math.ceil((distance_field.max_x - self.origin_x) / cell_size))
+        self.rows = int(math.ceil((distance_field.max_y - self.origin_y) / cell_size))
+        self.cell_count = self.cols * self.rows
+
+        self.walkable = array('b', [0]) * self.cell_count
+        for row in range(self.rows):
+            for col in range(self.cols):
+                x, y = self.cell_center(row * self.cols + col)
+                if distance_field.distance(x, y) >= clearance:
+                    self.walkable[row * self.cols + col] = 1
+
+        # Walkable neighbors of each cell: (neighbor index, direction index, cost).
+        # Diagonal moves are only allowed if both adjacent straight cells are walkable (no corner cutting).
+        self.neighbors = []
+        for index in range(self.cell_count):
+            col, row = index % self.cols, index // self.cols
+            cell_neighbors = []
+            if self.walkable[index]:
+                for direction, (dc, dr) in enumerate(NEIGHBOR_OFFSETS):
+                    if not self._is_walkable(col + dc, row + dr):
+                        continue
+                    if dc and dr and not (self._is_walkable(col + dc, row) and self._is_walkable(col, row + dr)):
+                        continue
+                    cell_neighbors.append(((row + dr) * self.cols + col + dc, direction, NEIGHBOR_COSTS[direction]))
+            self.neighbors.append(cell_neighbors)
+
+    def _is_walkable(self, col, row):
+        return 0 <= col < self.cols and 0 <= row < self.rows and self.walkable[row * self.cols + col] == 1
+
+    def cell_index(self, x, y):
+        """
+        Returns the index of the navigation cell containing a point (clamped to the grid).
+
+        Args:
+            x (float): The x-coordinate of the point.
+            y (float): The y-coordinate of the point.
+
+        Returns:
+            int: The cell index.
+        """
+        col = int((x - self.origin_x) / self.cell_size)
+        row = int((y - self.origin_y) / self.cell_size)
+        col = 0 if col < 0 else self.cols - 1 if col >= self.cols else col
+        row = 0 if row < 0 else self.rows - 1 if row >= self.rows else row
+        return row * self.cols + col
+
+    def cell_center(self, index):
+        """
+        Returns the world coordinates of the center of a navigation cell.
+
+        Args:
+            index (int): The cell index.
+
+        Returns:
+            tuple: The (x, y) coordinates of the cell center.
+        """
+        return (self.origin_x + (index % self.cols + 0.5) * self.cell_size,
+                self.origin_y + (index // self.cols + 0.5) * self.cell_size)
+
+class FlowField:
+    """
+    Direction to follow from every navigation cell to reach one target.
+
+    The field is built with a Dijkstra wavefront from the target cell. When the target
+    moves to another cell, the new wavefront is expanded over several frames (a bounded
+    number of cells per frame) while the previous field keeps being used, then swapped in.
+    """
+    def __init__(self, grid):
+        """
+        Initializes an empty flow field.
+
+        Args:
+            grid (NavigationGrid): The navigation grid of the track.
+        """
+        self.grid = grid
+        self.target_cell = -1 # Cell of the published field
+        self.directions = array('b', [-1]) * grid.cell_count # Published field: neighbor direction index per cell
+
+        # Wavefront being expanded (double buffer)
+        self.pending_cell = -1
+        self._costs = array('d', [math.inf]) * grid.cell_count
+        self._directions = array('b', [-1]) * grid.cell_count
+        self._heap = []
+
+    def retarget(self, x, y):
+        """
+        Starts refreshing the field if the target moved to another cell.
+
+        Args:
+            x (float): The x-coordinate of the target.
+            y (float): The y-coordinate of the target.
+        """
+        cell = self.grid.cell_index(x, y)
+        if cell == self.pending_cell or (cell == self.target_cell and self.pending_cell == -1):
+            return
+        self.pending_cell = cell
+        costs = self._costs
+        directions = self._directions
+        for i in range(self.grid.cell_count):
+            costs[i] = math.inf
+            directions[i] = -1
+        costs[cell] = 0.0
+        self._heap = [(0.0, cell)]
+        if self.target_cell == -1: # First build: nothing to fall back on, complete it now
+            self.advance(self.grid.cell_count)
+
+    def advance(self, budget=FLOW_FIELD_CELLS_PER_UPDATE):
+        """
+        Expands the pending wavefront by at most `budget` cells, publishing it once complete.
+
+        Args:
+            budget (int, optional): The maximum number of cells to settle. Defaults to FLOW_FIELD_CELLS_PER_UPDATE.
+        """
+        if self.pending_cell == -1:
+            return
+        heap = self._heap
+        costs = self._costs
+        directions = self._directions
+        neighbors = self.grid.neighbors
+        while heap and budget > 0:
+            cost, cell = heapq.heappop(heap)
+            if cost > costs[cell]: # Stale heap entry
+                continue
+            budget -= 1
+            for neighbor, direction, step_cost in neighbors[cell]:
+                new_cost = cost + step_cost
+                if new_cost < costs[neighbor]:
+                    costs[neighbor] = new_cost
+                    # The neighbor reaches the target by moving back towards this cell (opposite direction index)
+                    directions[neighbor] = direction ^ 1
+                    heapq.heappush(heap, (new_cost, neighbor))
+
+        if not heap: # Wavefront complete: publish it
+            self.directions, self._directions = self._directions, self.directions
+            self.target_cell = self.pending_cell
+            self.pending_cell = -1
+
+    def write_state(self, out):
+        """
+        Appends the state of the field (published field and pending wavefront) to a snapshot buffer.
+        The wavefront arrays are only written while a wavefront is pending (they are reset by retarget otherwise).
+
+        Args:
+            out (bytearray): The snapshot buffer.
+        """
+        pending = self.pending_cell != -1
+        heap_size = len(self._heap) if pending else 0
+        out += FIELD_STATE_FORMAT.pack(self.target_cell, self.pending_cell, heap_size)
+        out += self.directions
+        if pending:
+            out += self._costs
+            out += self._directions
+            heap = self._heap
+            out += array('d', [entry[0] for entry in heap])
+            out += array('i', [entry[1] for entry in heap])
+
+    def read_state(self, data, offset):
+        """
+        Restores the state written by write_state, in place.
+
+        Args:
+            data (memoryview): The snapshot buffer.
+            offset (int): The position of the field state in the buffer.
+
+        Returns:
+            int: The position following the field state.
+        """
+        self.target_cell, self.pending_cell, heap_size = FIELD_STATE_FORMAT.unpack_from(data, offset)
+        offset += FIELD_STATE_FORMAT.size
+        cell_count = self.grid.cell_count
+        # Copied into the existing arrays (no allocation)
+        memoryview(self.directions).cast('B')[:] = data[offset:offset + cell_count]
+        offset += cell_count
+        if self.pending_cell != -1:
+            memoryview(self._costs).cast('B')[:] = data[offset:offset + cell_count * 8]
+            offset += cell_count * 8
+            memoryview(self._directions).cast('B')[:] = data[offset:offset + cell_count]
+            offset += cell_count
+            heap_costs = data[offset:offset + heap_size * 8].cast('d')
+            offset += heap_size * 8
+            heap_cells = data[offset:offset + heap_size * 4].cast('i')
+            offset += heap_size * 4
+            self._heap = list(zip(heap_costs.tolist(), heap_cells.tolist()))
+        else:
+            self._heap = []
+        return offset
+
+    def direction(self, x, y):
+        """
+        Returns the unit direction to follow from a point to reach the target.
+
+        Args:
+            x (float): The x-coordinate of the point.
+            y (float): The y-coordinate of the point.
+
+        Returns:
+            tuple: The (x, y) direction, (0, 0) in the target cell or if the target is unreachable.
+        """
+        direction = self.directions[self.grid.cell_index(x, y)]
+        return NEIGHBOR_DIRECTIONS[direction] if direction >= 0 else NO_DIRECTION
+
+    def heading(self, x, y):
+        """
+        Returns the car heading to follow from a point to reach the target.
+
+        Args:
+            x (float): The x-coordinate of the point.
+            y (float): The y-coordinate of the point.
+
+        Returns:
+            float or None: The heading in degrees, None in the target cell or if the target is unreachable.
+        """
+        direction = self.directions[self.grid.cell_index(x, y)]
+        return NEIGHBOR_HEADINGS[direction] if direction >= 0 else None
+
+class FlowFieldCache:
+    """
+    Shares one flow field per pursuit target between all the AI cars chasing it.
+    """
+    def __init__(self, grid):
+        """
+        Initializes the cache.
+
+        Args:
+            grid (NavigationGrid): The navigation grid of the track.
+        """
+        self.grid = grid
+        self.fields = {} # Target key -> FlowField
+        self.used_this_frame = set()
+        self.pool = [] # Released fields, reused to avoid reallocating the arrays
+
+    def get(self, target, key=None):
+        """
+        Returns the flow field leading to a target, creating or retargeting it if needed.
+
+        Args:
+            target (pygame.sprite.Sprite): The pursued object (it must have a `position`).
+            key (hashable, optional): The stable key of the target. Defaults to None (id of the target).
+
+        Returns:
+            FlowField: The shared flow field of the target.
+        """
+        if key is None:
+            key = id(target)
+        field = self.fields.get(key)
+        if field is None:
+            field = self.pool.pop() if self.pool else FlowField(self.grid)
+            field.target_cell = field.pending_cell = -1
+            self.fields[key] = field
+        field.retarget(target.position.x, target.position.y)
+        self.used_this_frame.add(key)
+        return field
+
+    def write_state(self, out):
+        """
+        Appends the fields in use (target key and field state) to a snapshot buffer.
+
+        Args:
+            out (bytearray): The snapshot buffer.
+        """
+        out += FIELD_COUNT_FORMAT.pack(len(self.fields))
+        for key, field in self.fields.items():
+            out += FIELD_KEY_FORMAT.pack(key) # Stable entity id of the target (see World)
+            field.write_state(out)
+
+    def read_state(self, data, offset):
+        """
+        Restores the fields written by write_state, reusing the pooled fields.
+
+        Args:
+            data (memoryview): The snapshot buffer.
+            offset (int): The position of the fields in the buffer.
+
+        Returns:
+            int: The position following the fields.
+        """
+        self.pool.extend(self.fields.values())
+        self.fields = {}
+        self.used_this_frame.clear()
+        (field_count,) = FIELD_COUNT_FORMAT.unpack_from(data, offset)
+        offset += FIELD_COUNT_FORMAT.size
+        for _ in range(field_count):
+            (key,) = FIELD_KEY_FORMAT.unpack_from(data, offset)
+            field = self.pool.pop() if self.pool else FlowField(self.grid)
+            offset = field.read_state(data, offset + FIELD_KEY_FORMAT.size)
+            self.fields[key] = field
+        return offset
+
+    def update(self):
+        """
+        Advances the pending wavefronts and releases the fields nobody followed this frame.
+        Called once per frame, after the AI updates.
+        """
+        for key in list(self.fields):
+            if key not in self.used_this_frame:
+                self.pool.append(self.fields.pop(key))
+            else:
+                self.fields[key].advance()
+        self.used_this_frame.clear()
@@ -0,0 +1,211 @@
+import gc
+import time
+from constants import * # Import all constants
+
+DETAIL_NAMES = {RENDER_DETAIL_FULL: "complets", RENDER_DETAIL_REDUCED: "réduits", RENDER_DETAIL_MINIMAL: "minimaux"}
+
+class FramePacer:
+    """
+    Adaptive frame pacing: keeps the simulation running at full speed when frames run long.
+
+    The pacer averages the simulation and render times of the frames. When a frame costs more than
+    its budget for PACING_DEGRADE_FRAMES frames in a row, it moves to the next of PACING_LEVELS:
+    render one frame out of two, then lower the render detail. It moves back once the lighter
+    level would fit well within the budget for PACING_RECOVER_FRAMES frames (a level that is
+    left again right after recovering waits twice as long the next time).
+    Long frames are simulated in several steps of at most PACING_MAX_STEP_MS.
+    """
+    def __init__(self, fps=FPS, verbose=True, max_step_ms=PACING_MAX_STEP_MS, max_detail=RENDER_DETAIL_FULL):
+        """
+        Initializes the pacer.
+
+        Args:
+            fps (int, optional): The target frame rate. Defaults to FPS.
+            verbose (bool, optional): Whether to print the level changes. Defaults to True.
+            max_step_ms (int, optional): The longest simulation step. Defaults to PACING_MAX_STEP_MS.
+            max_detail (int, optional): The highest render detail (RENDER_DETAIL_*) of any level. Defaults to RENDER_DETAIL_FULL.
+        """
+        self.budget_ms = 1000.0 / fps
+        self.max_step_ms = max_step_ms
+        self.max_detail = max_detail
+        self.verbose = verbose
+        self.level = 0
+        self.frame = 0
+        self.sim_ms = 0.0 # Average simulation time per frame
+        self.render_ms = 0.0 # Average time of a rendered frame
+        self.overloaded_frames = 0
+        self.light_frames = 0
+        self.recover_frames = [PACING_RECOVER_FRAMES] * len(PACING_LEVELS) # Frames needed to leave each level
+        self.last_change_frame = 0
+        self.rendered = 0
+        self.skipped = 0
+        self.dropped_ms = 0
+        self.level_frames = [0] * len(PACING_LEVELS)
+        self.decisions = [] # (frame, old level, new level, reason)
+
+    # --- Frame loop ---
+
+    def steps(self, dt_ms):
+        """
+        Splits a frame duration into simulation steps of at most max_step_ms.
+
+        Args:
+            dt_ms (int): The frame duration, in milliseconds.
+
+        Returns:
+            list: The step durations (whole milliseconds, at most PACING_MAX_STEPS of them).
+        """
+        max_step_ms = self.max_step_ms
+        if dt_ms <= max_step_ms:
+            return [dt_ms]
+        count = min(PACING_MAX_STEPS, -(-dt_ms // max_step_ms))
+        if dt_ms > count * max_step_ms:
+            self.dropped_ms += dt_ms - count * max_step_ms
+            dt_ms = count * max_step_ms
+        return [(i + 1) * dt_ms // count - i * dt_ms // count for i in range(count)]
+
+    @property
+    def render_interval(self):
+        """
+        One frame out of render_interval is drawn at the current level.
+        """
+        return PACING_LEVELS[self.level][0]
+
+    @property
+    def detail(self):
+        """
+        The render detail of the current level (RENDER_DETAIL_*), at most max_detail.
+        """
+        return min(PACING_LEVELS[self.level][1], self.max_detail)
+
+    def should_render(self):
+        """
+        Returns whether the current frame is drawn.
+        """
+        return self.frame % self.render_interval == 0
+
+    def end_frame(self, sim_seconds, render_seconds=None):
+        """
+        Records the cost of a frame and changes the pacing level if needed.
+
+        Args:
+            sim_seconds (float): The time spent simulating the frame.
+            render_seconds (float, optional): The time spent drawing it. Defaults to None (frame not drawn).
+        """
+        self.sim_ms += (sim_seconds * 1000 - self.sim_ms) * PACING_SMOOTHING
+        if render_seconds is None:
+            self.skipped += 1
+        else:
+            self.rendered += 1
+            self.render_ms += (render_seconds * 1000 - self.render_ms) * PACING_SMOOTHING
+        self.level_frames[self.level] += 1
+        self.frame += 1
+
+        load = self.sim_ms + self.render_ms / self.render_interval
+        if load > self.budget_ms * PACING_OVERLOAD_RATIO:
+            self.overloaded_frames += 1
+            self.light_frames = 0
+            if self.overloaded_frames >= PACING_DEGRADE_FRAMES and self.level < len(PACING_LEVELS) - 1:
+                # Leaving a level soon after recovering to it: wait longer before recovering again
+                recovered = self.decisions and self.decisions[-1][1] == self.level + 1
+                if recovered and self.frame - self.last_change_frame < self.recover_frames[self.level + 1]:
+                    self.recover_frames[self.level + 1] *= 2
+                self._change_level(self.level + 1, f"{load:.1f} ms par image pour un budget de {self.budget_ms:.1f} ms")
+            return
+        self.overloaded_frames = 0
+        if self.level == 0:
+            return
+        # The render time of the lighter level is estimated from the current one (its detail costs a little more)
+        lighter_load = self.sim_ms + self.render_ms / PACING_LEVELS[self.level - 1][0]
+        if lighter_load < self.budget_ms * PACING_RECOVER_RATIO:
+            self.light_frames += 1
+            if self.light_frames >= self.recover_frames[self.level]:
+                self._change_level(self.level - 1, f"{lighter_load:.1f} ms par image estimées")
+        else:
+            self.light_frames = 0
+
+    def _change_level(self, level, reason):
+        self.decisions.append((self.frame, self.level, level, reason))
+        if self.verbose:
+            interval, detail = PACING_LEVELS[level]
+            detail = min(detail, self.max_detail)
+            print(f"Rythme: niveau {self.level} -> {level} (rendu d'une image sur {interval}, effets {DETAIL_NAMES[detail]}): {reason}")
+        self.level = level
+        self.overloaded_frames = self.light_frames = 0
+        self.last_change_frame = self.frame
+
+    def report(self):
+        """
+        Prints a summary of the pacing of the session.
+        """
+        if not self.frame:
+            return
+        levels = ", ".join(f"niveau {level}: {count * 100 / self.frame:.0f}%" for level, count in enumerate(self.level_frames) if count)
+        print(f"Rythme: {self.frame} images, {self.rendered} dessinées, {self.skipped} sautées, {len(self.decisions)} changements de niveau "
+              f"({levels}), simulation {self.sim_ms:.1f} ms, rendu {self.render_ms:.1f} ms, {self.dropped_ms} ms de simulation abandonnés")
+
+class FrameGarbageCollector:
+    """
+    Runs the garbage collector between frames instead of in the middle of one.
+
+    start() collects everything created while setting up the session and freezes it (the track data,
+    sprites and caches are never scanned again), then disables the automatic collection. collect(),
+    called once a frame is over, runs the generations whose thresholds were reached, as the automatic
+    collector would have, so that the memory still gets reclaimed.
+    """
+    def __init__(self, enabled=FRAME_GC_ENABLED):
+        """
+        Initializes the collector.
+
+        Args:
+            enabled (bool, optional): Whether to move the collections between frames (False keeps the automatic collector). Defaults to FRAME_GC_ENABLED.
+        """
+        self.enabled = enabled
+        self.collections = [0, 0, 0]
+        self.pause_total = 0.0 # Seconds
+        self.pause_max = 0.0
+        self._was_enabled = False
+
+    def start(self):
+        """
+        Freezes the objects of the session setup and disables the automatic collection.
+        """
+        if not self.enabled:
+            return
+        self._was_enabled = gc.isenabled()
+        gc.collect()
+        gc.freeze()
+        gc.disable()
+
+    def collect(self):
+        """
+        Runs the collections that are due (call between two frames).
+        """
+        if not self.enabled:
+            return
+        threshold0, threshold1, threshold2 = gc.get_threshold()
+        count0, count1, count2 = gc.get_count()
+        if count0 < threshold0:
+            return
+        # The oldest generation due is collected with the younger ones, as the automatic collector does
+        generation = 2 if count2 >= threshold2 else 1 if count1 >= threshold1 else 0
+        start = time.perf_counter()
+        gc.collect(generation)
+        pause = time.perf_counter() - start
+        self.collections[generation] += 1
+        self.pause_total += pause
+        self.pause_max = max(self.pause_max, pause)
+
+    def stop(self):
+        """
+        Restores the automatic collection and prints a summary of the collections.
+        """
+        if not self.enabled:
+            return
+        gc.unfreeze()
+        if self._was_enabled:
+            gc.enable()
+        count = sum(self.collections)
+        if count:
+            print(f"GC: {count} collectes entre les images ({self.collections[0]}/{self.collections[1]}/{self.collections[2]} "
+                  f"par génération), pause max {self.pause_max * 1000:.2f} ms, total {self.pause_total * 1000:.1f} ms")
@@ -0,0 +1,107 @@
+import math
+from array import array
+import pygame
+from constants import * # Import all constants
+
+# Headings follow the Car.angle convention: degrees, 0 = up, 90 = right (clockwise on screen),
+# forward vector (sin a, -cos a).
+
+class Heading:
+    """
+    Cached heading vectors of a car: forward and right unit vectors, sine and cosine of the angle.
+
+    The values are recomputed only when the angle changed since the last update, so a car that
+    is read several times in a step (physics, AI, firing, collisions) computes them once.
+    The forward vector is the rotation of (0, -1) by the angle, exactly as Vector2.rotate computes it.
+    """
+    __slots__ = ("angle", "forward", "right", "sin", "cos")
+
+    def __init__(self):
+        self.angle = None
+        self.forward = pygame.math.Vector2(0, -1)
+        self.right = pygame.math.Vector2(1, 0)
+        self.sin = 0.0
+        self.cos = 1.0
+
+    def update(self, angle):
+        """
+        Brings the cached values up to date with an angle.
+
+        Args:
+            angle (float): The heading, in degrees.
+
+        Returns:
+            Heading: The heading itself (shared vectors: read them, never modify them).
+        """
+        if angle != self.angle:
+            self.angle = angle
+            forward = self.forward
+            forward.update(0, -1)
+            forward.rotate_ip(angle)
+            self.right.update(-forward.y, forward.x)
+            self.sin = forward.x
+            self.cos = -forward.y
+        return self
+
+def heading_to(dx, dy):
+    """
+    Returns the heading of a direction.
+
+    Args:
+        dx (float): The x component of the direction.
+        dy (float): The y component of the direction.
+
+    Returns:
+        float: The heading in degrees, in [0, 360).
+    """
+    return (90 - math.degrees(math.atan2(-dy, dx))) % 360
+
+def angle_difference(target_angle, angle):
+    """
+    Returns the signed difference between two headings, in degrees in [-180, 180) (positive: turn right).
+    """
+    return (target_angle - angle + 180) % 360 - 180
+
+class AtanTable:
+    """
+    Quantized arctangent lookup table: headings of directions without math.atan2.
+
+    The table holds the arctangent of ANGLE_LUT_SIZE + 1 ratios in [0, 1]; the other octants are
+    folded onto it. The error stays below 29 / ANGLE_LUT_SIZE degrees (0.03 degrees with 1024 steps).
+    The headings only depend on the table and on exact float operations, not on the platform's atan2.
+    In CPython the lookup costs more than the math.atan2 call it replaces (the arithmetic runs in the
+    interpreter), so the AI only uses it when AI_ANGLE_LUT is set.
+    """
+    def __init__(self, size=ANGLE_LUT_SIZE):
+        """
+        Builds the table.
+
+        Args:
+            size (int, optional): The number of steps between 0 and 45 degrees. Defaults to ANGLE_LUT_SIZE.
+        """
+        self.size = size
+        # Rounded, so that the last-bit differences between the math libraries of two platforms vanish
+        self.degrees = array('d', (round(math.degrees(math.atan(i / size)), 9) for i in range(size + 1)))
+
+    def heading_to(self, dx, dy):
+        """
+        Returns the heading of a direction, looked up in the table (see heading_to).
+        """
+        # Heading = angle of (dx, -dy) measured from the up axis
+        along = -dy
+        abs_dx = dx if dx >= 0 else -dx
+        abs_along = along if along >= 0 else -along
+        if abs_dx <= abs_along:
+            if abs_along == 0:
+                return 90.0 # Same as heading_to (atan2(0, 0) = 0)
+            angle = self.degrees[int(abs_dx / abs_along * self.size + 0.5)]
+        else:
+            angle = 90.0 - self.degrees[int(abs_along / abs_dx * self.size + 0.5)]
+        if along < 0:
+            angle = 180.0 - angle
+        if dx < 0:
+            angle = 360.0 - angle
+        return angle % 360
+
+# The function the AI uses to compute the heading towards its targets
+ai_heading_to = AtanTable().heading_to if AI_ANGLE_LUT else heading_to
@@ -1,28 +1,66 @@
+import time
+STARTUP_START = time.perf_counter() # Start of the imports (startup benchmark)
+
+import argparse
+import os
+import threading
 import pygame
-import random
-import math # Added for car placement calculations
 from constants import * # Import all constants
-from car import Car, Bullet # Import Car class and now Bullet class
-from health_pickup import HealthPickup # Import HealthPickup class
-from wall import Wall # Import Wall class from wall.py
-from collision_utils import collide_polygons_sat, collide_car_wall_sat, resolve_collision # Import collision functions
+from car import Car # Import Car class (player controls)
+from world import World, PLANNER_ASYNC, PLANNER_INLINE # Import the game simulation
+from replay import ReplayRecorder, MAX_FRAME_MS, play_replay # Import the replay recorder and viewer
+from broadcast import BroadcastService # Import the spectator broadcast
+from net_client import play_online # Import the multiplayer client
+from asset_loader import assets # Import the shared assets (preloaded while the menu is shown)
+from frame_pacing import FramePacer, FrameGarbageCollector # Import the adaptive frame pacing and the between-frame GC
+from alloc_diagnostics import AllocationDiagnostics # Import the allocation diagnostics
+from telemetry import TelemetryWriter # Import the live telemetry
+from perf_profiles import PERF_PROFILE_NAMES, get_profile, apply_profile, max_render_detail # Import the performance profiles
+from render_scaling import ScaledRenderer # Import the internal render resolution
+
+IMPORT_TIME = time.perf_counter() - STARTUP_START
+startup_times = {} # Startup milestones, in seconds since the start of the imports
+
+def mark_startup(milestone):
+    """
+    Records the first time a startup milestone is reached (--startup-benchmark).
+    """
+    startup_times.setdefault(milestone, time.perf_counter() - STARTUP_START)
+
+def simulate_menu_keys():
+    """
+    Goes through the menu like a player would (free play, 1 player, 4 AI), then quits one second into the session (--startup-benchmark).
+    """
+    for key in (pygame.K_RETURN, pygame.K_RETURN, pygame.K_UP, pygame.K_UP, pygame.K_UP, pygame.K_UP, pygame.K_RETURN):
+        time.sleep(STARTUP_BENCHMARK_KEY_INTERVAL)
+        pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=key))
+    time.sleep(1.0)
+    pygame.event.post(pygame.event.Event(pygame.QUIT))
 
 # --- Main Menu Function ---
-def main_menu(screen):
+def main_menu(screen, profile_name=DEFAULT_PERF_PROFILE):
     """
     Displays the main menu and allows the user to select game options.
 
     Args:
         screen (pygame.Surface): The screen to draw the menu on.
+        profile_name (str, optional): The performance profile selected first. Defaults to DEFAULT_PERF_PROFILE.
 
     Returns:
-        tuple: A tuple containing the selected player count, AI count, game mode, and difficulty.
-               Returns (None, None, None, None) if the user quits the game from the menu.
+        tuple: A tuple containing the selected player count, AI count, game mode, difficulty and performance profile name.
+               Returns (None, None, None, None, None) if the user quits the game from the menu.
     """
-    font_title = pygame.font.Font(None, 74)
-    font_options = pygame.font.Font(None, 48)
+    font_title = assets.font(74)
+    font_options = assets.font(48)
     
     title_text = font_title.render(GAME_TITLE, True, WHITE)
+    rendered_options = {} # (text, color) -> rendered surface, so that a state shown again is not re-rendered
+
+    def render_option(text, color):
+        surface = rendered_options.get((text, color))
+        if surface is None:
+            surface = rendered_options[(text, color)] = font_options.render(text, True, color)
+        return surface
     
     # Menu states and options
     menu_state = "game_mode" # "game_mode", "player_count", "ai_count", "difficulty"
@@ -49,22 +87,73 @@ def main_menu(screen):
     ]
     selected_difficulty_index = 1 # Default to Medium
 
-    menu_select_sound = None
-    try:
-        menu_select_sound = pygame.mixer.Sound(SOUND_MENU_SELECT_PATH)
-        menu_select_sound.set_volume(0.7)
-    except pygame.error as e:
-        print(f"Error loading menu sound: {e}")
+    selected_profile_index = PERF_PROFILE_NAMES.index(profile_name)
+
+    menu_select_sound = None # Fetched from the asset loader once it is ready (the menu never waits for it)
+
+    def draw_menu():
+        """
+        Draws the menu in its current state.
+        """
+        screen.fill(BLACK)
+        screen.blit(title_text, title_text.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 - 150)))
+
+        # Display options based on current menu_state
+        if menu_state == "game_mode":
+            for i, (text, mode) in enumerate(game_mode_options):
+                option_text = render_option(f"Game Mode: {text}", YELLOW if i == selected_game_mode_index else WHITE)
+                screen.blit(option_text, option_text.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 - 50 + i * 50)))
+            prompt_text = render_option("Use UP/DOWN to select mode, ENTER to confirm, ESC to quit", WHITE) # Updated prompt
+            screen.blit(prompt_text, prompt_text.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 + 100)))
+            profile_text = render_option(f"Quality: < {PERF_PROFILE_NAMES[selected_profile_index].capitalize()} > (LEFT/RIGHT)", WHITE)
+            screen.blit(profile_text, profile_text.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 + 170)))
+
+        elif menu_state == "player_count":
+            for i, count in enumerate(player_count_options):
+                option_text = render_option(f"Players: {count}", YELLOW if i == selected_player_count_index else WHITE)
+                screen.blit(option_text, option_text.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 - 50 + i * 50)))
+            prompt_text = render_option("Use UP/DOWN to select players, ENTER to confirm, ESC to go back", WHITE) # Updated prompt
+            screen.blit(prompt_text, prompt_text.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 + 100)))
 
+        elif menu_state == "ai_count":
+            ai_count_text = render_option(f"AI Opponents: {selected_ai_count}", YELLOW)
+            screen.blit(ai_count_text, ai_count_text.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2)))
+            prompt_text = render_option("Use UP/DOWN to adjust AI, ENTER to start game, ESC to go back", WHITE) # Updated prompt
+            screen.blit(prompt_text, prompt_text.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 + 50)))
+            # If in Race mode, show difficulty selection as well
+            if selected_game_mode == GAME_MODE_RACE:
+                difficulty_text_display = render_option(f"Difficulty: {selected_difficulty.capitalize()}", WHITE)
+                screen.blit(difficulty_text_display, difficulty_text_display.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 - 50)))
+
+        elif menu_state == "difficulty":
+            for i, diff in enumerate(difficulty_options):
+                option_text = render_option(f"Difficulty: {diff.capitalize()}", YELLOW if i == selected_difficulty_index else WHITE)
+                screen.blit(option_text, option_text.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 - 50 + i * 50)))
+            prompt_text = render_option("Use UP/DOWN to select difficulty, ENTER to confirm, ESC to go back", WHITE) # Updated prompt
+            screen.blit(prompt_text, prompt_text.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 + 100)))
+
+        pygame.display.flip()
+        mark_startup("menu_ready")
+
+    # The menu sleeps until an event arrives and only redraws when its state changed
+    redraw = True
     running = True
     while running:
-        for event in pygame.event.get():
+        if redraw:
+            draw_menu()
+            redraw = False
+        for event in [pygame.event.wait(MENU_EVENT_TIMEOUT)] + pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 exit()
-            if event.type == pygame.K_F11: # Toggle Fullscreen
-                pygame.display.toggle_fullscreen()
+            if event.type in (pygame.WINDOWEXPOSED, pygame.WINDOWSIZECHANGED):
+                redraw = True
             if event.type == pygame.KEYDOWN:
+                redraw = True
+                if event.key == pygame.K_F11: # Toggle Fullscreen
+                    pygame.display.toggle_fullscreen()
+                if menu_select_sound is None:
+                    menu_select_sound = assets.sound(SOUND_MENU_SELECT_PATH, wait=False)
                 if event.key == pygame.K_UP:
                     if menu_select_sound: menu_select_sound.play()
                     if menu_state == "game_mode":
@@ -94,6 +183,11 @@ def main_menu(screen):
                         selected_difficulty_index = (selected_difficulty_index + 1) % len(difficulty_options)
                         selected_difficulty = difficulty_options[selected_difficulty_index]
 
+                elif event.key in (pygame.K_LEFT, pygame.K_RIGHT) and menu_state == "game_mode":
+                    if menu_select_sound: menu_select_sound.play()
+                    step = 1 if event.key == pygame.K_RIGHT else -1
+                    selected_profile_index = (selected_profile_index + step) % len(PERF_PROFILE_NAMES)
+
                 elif event.key == pygame.K_RETURN:
                     if menu_select_sound: menu_select_sound.play()
                     if menu_state == "game_mode":
@@ -105,7 +199,8 @@ def main_menu(screen):
                             menu_state = "ai_count" # For Free Play, choose AI count
                     elif menu_state == "ai_count":
                         # If we are in Free Play and chose AI count, or in Race Mode and chose AI count
-                        return selected_player_count, selected_ai_count, selected_game_mode, selected_difficulty
+                        return (selected_player_count, selected_ai_count, selected_game_mode, selected_difficulty,
+                                PERF_PROFILE_NAMES[selected_profile_index])
                     elif menu_state == "difficulty":
                         # This state is only reached from Race Mode -> Player Count -> Difficulty
                         # After selecting difficulty, we need to go to AI count if in Race mode
@@ -125,52 +220,16 @@ def main_menu(screen):
                     elif menu_state == "player_count":
                         menu_state = "game_mode" # From player count, go back to game mode selection
                     elif menu_state == "game_mode":
-                        return None, None, None, None # Signal to quit the application
+                        return None, None, None, None, None # Signal to quit the application
         
-        screen.fill(BLACK)
-        screen.blit(title_text, title_text.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 - 150)))
-
-        # Display options based on current menu_state
-        if menu_state == "game_mode":
-            for i, (text, mode) in enumerate(game_mode_options):
-                option_text = font_options.render(f"Game Mode: {text}", True, YELLOW if i == selected_game_mode_index else WHITE)
-                screen.blit(option_text, option_text.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 - 50 + i * 50)))
-            prompt_text = font_options.render("Use UP/DOWN to select mode, ENTER to confirm, ESC to quit", True, WHITE) # Updated prompt
-            screen.blit(prompt_text, prompt_text.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 + 100)))
-
-        elif menu_state == "player_count":
-            for i, count in enumerate(player_count_options):
-                option_text = font_options.render(f"Players: {count}", True, YELLOW if i == selected_player_count_index else WHITE)
-                screen.blit(option_text, option_text.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 - 50 + i * 50)))
-            prompt_text = font_options.render("Use UP/DOWN to select players, ENTER to confirm, ESC to go back", True, WHITE) # Updated prompt
-            screen.blit(prompt_text, prompt_text.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 + 100)))
-
-        elif menu_state == "ai_count":
-            ai_count_text = font_options.render(f"AI Opponents: {selected_ai_count}", True, YELLOW)
-            screen.blit(ai_count_text, ai_count_text.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2)))
-            prompt_text = font_options.render("Use UP/DOWN to adjust AI, ENTER to start game, ESC to go back", True, WHITE) # Updated prompt
-            screen.blit(prompt_text, prompt_text.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 + 50)))
-            # If in Race mode, show difficulty selection as well
-            if selected_game_mode == GAME_MODE_RACE:
-                difficulty_text_display = font_options.render(f"Difficulty: {selected_difficulty.capitalize()}", True, WHITE)
-                screen.blit(difficulty_text_display, difficulty_text_display.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 - 50)))
-
-        elif menu_state == "difficulty":
-            for i, diff in enumerate(difficulty_options):
-                option_text = font_options.render(f"Difficulty: {diff.capitalize()}", True, YELLOW if i == selected_difficulty_index else WHITE)
-                screen.blit(option_text, option_text.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 - 50 + i * 50)))
-            prompt_text = font_options.render("Use UP/DOWN to select difficulty, ENTER to confirm, ESC to go back", True, WHITE) # Updated prompt
-            screen.blit(prompt_text, prompt_text.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 + 100)))
-
-        pygame.display.flip()
-        pygame.time.Clock().tick(FPS)
     
     # Fallback return in case loop exits unexpectedly
-    return selected_player_count, selected_ai_count, selected_game_mode, selected_difficulty
+    return selected_player_count, selected_ai_count, selected_game_mode, selected_difficulty, PERF_PROFILE_NAMES[selected_profile_index]
 
 
 # --- Main Game Loop Function (renamed to run_game_session) ---
-def run_game_session(screen, player_count, ai_count, game_mode, difficulty):
+def run_game_session(screen, player_count, ai_count, game_mode, difficulty, track_path=DEFAULT_TRACK_PATH, seed=None, record_path=None,
+                     broadcast_port=None, alloc_diagnostics=False, telemetry_path=None, profile=None):
     """
     Runs the main game loop.
 
@@ -180,338 +239,190 @@ def run_game_session(screen, player_count, ai_count, game_mode, difficulty):
         ai_count (int): The number of AI opponents.
         game_mode (str): The selected game mode ("free_play" or "race").
         difficulty (str): The selected AI difficulty.
+        track_path (str, optional): The track file to race on. Defaults to DEFAULT_TRACK_PATH.
+        seed (int, optional): The seed of the session random generator. Defaults to None (random seed).
+        record_path (str, optional): The replay file to record the session to. Defaults to None (no recording).
+        broadcast_port (int, optional): The TCP port to stream the session to spectators on. Defaults to None (no broadcast).
+        alloc_diagnostics (bool, optional): Whether to trace the allocations of each frame phase and report them. Defaults to False.
+        telemetry_path (str, optional): The file to publish the live telemetry of the cars to. Defaults to None (no telemetry).
+        profile (PerformanceProfile, optional): The performance profile of the session. Defaults to None (DEFAULT_PERF_PROFILE).
 
     Returns:
         bool: True if the user wants to return to the main menu, False if the user wants to quit.
     """
+    mark_startup("session_start")
+    if profile is None:
+        profile = get_profile(DEFAULT_PERF_PROFILE)
+    apply_profile(profile)
     # Initialisation de l'écran et de l'horloge (déjà fait dans le bloc principal)
     pygame.display.set_caption(GAME_TITLE)
     clock = pygame.time.Clock()
 
-    # Define the track walls with explicit normals (pointing outwards from the track)
-    # Each tuple: (start_point, end_point, normal_vector)
-    track_walls_data = [
-        # Outer Walls (Defined counter-clockwise for normal to point outward)
-        ((50, 50), (50, SCREEN_HEIGHT - 50), pygame.math.Vector2(-1, 0)), # Left Outer (normal points left)
-        ((50, SCREEN_HEIGHT - 50), (SCREEN_WIDTH - 50, SCREEN_HEIGHT - 50), pygame.math.Vector2(0, 1)), # Bottom Outer (normal points down)
-        ((SCREEN_WIDTH - 50, SCREEN_HEIGHT - 50), (SCREEN_WIDTH - 50, 50), pygame.math.Vector2(1, 0)), # Right Outer (normal points right)
-        ((SCREEN_WIDTH - 50, 50), (50, 50), pygame.math.Vector2(0, -1)), # Top Outer (normal points up)
-
-        # Inner Walls (Defined clockwise for normal to point outward from the track, i.e., inwards from the wall segment)
-        ((150, 150), (SCREEN_WIDTH - 150, 150), pygame.math.Vector2(0, 1)), # Top Inner (normal points down, into track)
-        ((SCREEN_WIDTH - 150, 150), (SCREEN_WIDTH - 150, SCREEN_HEIGHT - 150), pygame.math.Vector2(-1, 0)), # Right Inner (normal points left, into track)
-        ((SCREEN_WIDTH - 150, SCREEN_HEIGHT - 150), (150, SCREEN_HEIGHT - 150), pygame.math.Vector2(0, -1)), # Bottom Inner (normal points up, into track)
-        ((150, SCREEN_HEIGHT - 150), (150, 150), pygame.math.Vector2(1, 0)) # Left Inner (normal points right, into track)
-    ]
-    walls = pygame.sprite.Group()
-    for p1, p2, normal in track_walls_data:
-        walls.add(Wall(p1, p2, normal)) # Pass the normal vector to the Wall constructor
-
-    # Define waypoints for race mode (simple rectangular path for now)
-    # These points should be inside the track and follow the racing line
-    TRACK_WAYPOINTS = [
-        (SCREEN_WIDTH // 2, 120), # Start line / Top middle (inside track)
-        (SCREEN_WIDTH - 120, 120), # Top right corner (inside track)
-        (SCREEN_WIDTH - 120, SCREEN_HEIGHT - 120), # Bottom right corner (inside track)
-        (120, SCREEN_HEIGHT - 120), # Bottom left corner (inside track)
-        (120, 120) # Top left corner (inside track, completing the loop)
-    ]
-
-
-    player_cars = []
-    ai_cars = []
-    all_bullets = pygame.sprite.Group() # Group to manage all bullets
-
-    # Dynamic initial car placement based on game mode
-    if game_mode == GAME_MODE_RACE:
-        # Starting line placement
-        # Place cars horizontally near the top inner wall, facing down (angle=180)
-        total_cars_on_start = player_count + ai_count
-        start_x_spacing = CAR_WIDTH * 1.5
-        start_x_base = SCREEN_WIDTH // 2 - (start_x_spacing * (total_cars_on_start - 1)) / 2
-        start_y = 200 # A bit below the top inner wall, on the track
-
-        current_car_index = 0
-        for i in range(player_count):
-            x_pos = start_x_base + current_car_index * start_x_spacing
-            player_cars.append(Car(x_pos, start_y, angle=180, color=BLUE if i == 0 else GREEN, is_player=True, game_mode=game_mode, difficulty=difficulty))
-            current_car_index += 1
-        
-        for i in range(ai_count):
-            x_pos = start_x_base + current_car_index * start_x_spacing
-            ai_cars.append(Car(x_pos, start_y, angle=180, color=YELLOW, is_player=False, game_mode=game_mode, difficulty=difficulty))
-            current_car_index += 1
-
-    else: # GAME_MODE_FREE_PLAY
-        # Calculate spawn area (inside inner track)
-        spawn_min_x = 150 + CAR_LENGTH
-        spawn_max_x = SCREEN_WIDTH - 150 - CAR_LENGTH
-        spawn_min_y = 150 + CAR_LENGTH
-        spawn_max_y = SCREEN_HEIGHT - 150 - CAR_LENGTH
-
-        # Place player cars
-        player_cars.append(Car(SCREEN_WIDTH // 2 - CAR_WIDTH, SCREEN_HEIGHT // 2 - CAR_LENGTH * 2, angle=0, color=BLUE, is_player=True, game_mode=game_mode, difficulty=difficulty))
-        if player_count == 2:
-            player_cars.append(Car(SCREEN_WIDTH // 2 + CAR_WIDTH, SCREEN_HEIGHT // 2 - CAR_LENGTH * 2, angle=0, color=GREEN, is_player=True, game_mode=game_mode, difficulty=difficulty))
-
-        # Place AI cars randomly within the track boundaries, avoiding initial player positions
-        for i in range(ai_count):
-            while True:
-                x = random.randint(spawn_min_x, spawn_max_x)
-                y = random.randint(spawn_min_y, spawn_max_y)
-                new_pos = pygame.math.Vector2(x, y)
-                too_close = False
-                # Check distance to all existing cars (players and other AIs)
-                for car in player_cars + ai_cars:
-                    if (car.position - new_pos).length() < CAR_LENGTH * 2.5: # Increased buffer
-                        too_close = True
-                        break
-                if not too_close:
-                    ai_cars.append(Car(x, y, angle=random.randint(0, 359), color=YELLOW, is_player=False, game_mode=game_mode, difficulty=difficulty))
-                    print(f"AI Car {i+1} spawned at: ({x}, {y})") # Added print statement for debugging
-                    break
-
-    all_cars = pygame.sprite.Group(*(player_cars + ai_cars))
-    print(f"Total cars in game: {len(all_cars.sprites())} (Players: {len(player_cars)}, AI: {len(ai_cars)})")
-
-    health_pickups = pygame.sprite.Group() # Group for health pickups
-
-    health_pickup_spawn_timer = 0.0
-    font_score = pygame.font.Font(None, 36)
-    font_coords = pygame.font.Font(None, COORD_FONT_SIZE) # Police pour les coordonnées
+    # Load the track: walls, waypoints, spawn points and its compiled collision data
+    # (wall polygons and axes, wall index, distance field, racing line), memory-mapped from the track cache.
+    # The asset loader has usually loaded it (and decoded the sounds) while the menu was shown.
+    track = assets.track(track_path)
+    # Recorded sessions plan the AI inline, so that the replay reproduces the plans exactly
+    world = World(track, player_count, ai_count, game_mode, difficulty, seed=seed,
+                  planner_mode=PLANNER_INLINE if record_path else PLANNER_ASYNC, ai_planner_interval=profile.ai_planner_interval)
+    world.collision_log_limit = profile.effects_budget
+    recorder = ReplayRecorder(record_path, world, track_path, steps_per_second=profile.fps) if record_path else None
+    broadcaster = BroadcastService(world, track_path, host="", port=broadcast_port) if broadcast_port else None
+    if broadcaster:
+        broadcaster.start()
+    telemetry = TelemetryWriter(telemetry_path, world) if telemetry_path else None
+
+    font_score = assets.font(SCORE_FONT_SIZE)
+    font_coords = assets.font(COORD_FONT_SIZE) # Police pour les coordonnées
+
+    # Under sustained load, frames are drawn less often and with fewer effects instead of slowing the game down
+    pacer = FramePacer(profile.fps, max_step_ms=profile.max_step_ms, max_detail=max_render_detail(profile))
+    # The scene is drawn at the internal resolution of the profile and scaled to the window
+    renderer = ScaledRenderer(screen, profile.render_scale)
+    # The garbage collector runs between frames, never in the middle of one
+    garbage_collector = FrameGarbageCollector()
+    garbage_collector.start()
+
+    diagnostics = AllocationDiagnostics() if alloc_diagnostics else None
+    if diagnostics:
+        diagnostics.start()
+        world.phase_hook = diagnostics.phase
+
+    def end_session(return_to_menu):
+        pacer.report()
+        garbage_collector.stop()
+        if diagnostics:
+            diagnostics.stop()
+        world.shutdown()
+        if recorder:
+            recorder.close()
+        if broadcaster:
+            broadcaster.stop()
+        if telemetry:
+            telemetry.close()
+        return return_to_menu
 
     running = True
     while running:
-        dt = clock.tick(FPS) / 1000.0
+        dt_ms = min(clock.tick(profile.fps), MAX_FRAME_MS) # Frame duration in whole ms, as stored in replays
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                return False # Signal to quit the application
+                return end_session(False) # Signal to quit the application
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_F11: # Toggle Fullscreen
                     pygame.display.toggle_fullscreen()
                 elif event.key == pygame.K_ESCAPE: # NOUVEAU: Retour au menu principal
-                    return True # Signal to go back to the main menu
+                    return end_session(True) # Signal to go back to the main menu
 
         keys = pygame.key.get_pressed()
-        # Handle inputs for all human players and collect bullets
-        if player_count >= 1:
-            bullet_p1 = player_cars[0].handle_input(keys, player_num=1)
-            if bullet_p1:
-                all_bullets.add(bullet_p1)
-        if player_count >= 2:
-            bullet_p2 = player_cars[1].handle_input(keys, player_num=2)
-            if bullet_p2:
-                all_bullets.add(bullet_p2)
-
-        # AI updates for all AI cars and collect bullets
-        for ai_car in ai_cars:
-            if game_mode == GAME_MODE_RACE:
-                bullet_ai = ai_car.update_ai(None, dt, track_waypoints=TRACK_WAYPOINTS) # No direct target, follow waypoints
-            else: # Free Play mode
-                target = None
-                # Prioritize targeting active human players
-                active_human_players = [p_car for p_car in player_cars if p_car.hp > 0]
-                if active_human_players:
-                    # AI targets the closest active human player
-                    target = min(active_human_players, key=lambda p: (ai_car.position - p.position).length())
-                elif health_pickups.sprites():
-                    # If no human players, target the closest health pickup
-                    target = min(health_pickups.sprites(), key=lambda p: (ai_car.position - p.position).length())
-                
-                bullet_ai = ai_car.update_ai(target, dt)
-            
-            if bullet_ai:
-                all_bullets.add(bullet_ai)
-
+        # Control flags of all human players for this frame
+        player_controls = [Car.read_controls(keys, player_num=i + 1) for i in range(len(world.player_cars))]
 
         # --- Game Update ---
-        for car in all_cars:
-            car.update_physics(dt)
-        
-        for bullet in all_bullets:
-            bullet.update(dt)
-
-        # Check and resolve collisions between cars
-        # Only consider cars that are alive or temporarily disabled for collision physics
-        live_or_disabled_cars = [car for car in all_cars if car.hp > 0 or car.is_disabled]
-        for i, car_a in enumerate(live_or_disabled_cars):
-            for j, car_b in enumerate(live_or_disabled_cars):
-                if i < j:
-                    # If either car is disabled, they don't actively participate in new collisions
-                    # (they can still be hit, but won't resolve movement against other disabled cars)
-                    if car_a.is_disabled and car_b.is_disabled:
-                        continue 
-
-                    poly_a = car_a.get_collision_polygon()
-                    poly_b = car_b.get_collision_polygon()
-
-                    collided, normal, penetration = collide_polygons_sat(poly_a, poly_b)
-                    if collided:
-                        resolve_collision(car_a, car_b, normal, penetration)
-        
-        # Check and resolve collisions between cars and walls
-        for car in all_cars:
-            if car.hp <= 0 and not car.is_disabled: # Do not check collisions for destroyed cars
-                continue
-            for wall in walls:
-                poly_car = car.get_collision_polygon()
-                # Use wall's rect for a quick initial check
-                if car.rect.colliderect(wall.rect):
-                    collided, normal, penetration = collide_car_wall_sat(car, wall)
-                    if collided:
-                        resolve_collision(car, wall, normal, penetration)
-        
-        # Collisions balles-voitures
-        bullets_to_remove = []
-        for bullet in all_bullets:
-            for car in all_cars:
-                # Prevent bullet from hitting its own car
-                if car.color == bullet.owner_car_color:
-                    continue
-                
-                # Vérification plus précise de la collision
-                # D'abord un test rapide avec les rects
-                if pygame.sprite.collide_rect(bullet, car):
-                    # Ensuite un test plus précis avec les polygones
-                    car_poly = car.get_collision_polygon()
-                    bullet_pos = pygame.math.Vector2(bullet.position)
-                    
-                    # Vérifier la distance entre la balle et chaque segment du polygone de la voiture
-                    for i in range(len(car_poly)):
-                        p1 = car_poly[i]
-                        p2 = car_poly[(i + 1) % len(car_poly)]
-                        
-                        # Distance point-segment
-                        segment = p2 - p1
-                        to_point = bullet_pos - p1
-                        segment_length = segment.length()
-                        segment = segment.normalize()
-                        
-                        projection = to_point.dot(segment)
-                        projection = max(0, min(projection, segment_length))
-                        closest_point = p1 + segment * projection
-                        
-                        distance = (bullet_pos - closest_point).length()
-                        
-                        if distance <= bullet.radius:
-                            car.take_damage(bullet.damage * 100, bullet.position)
-                            bullets_to_remove.append(bullet)
-                            break
-
-        # Collisions balles-murs
-        for bullet in all_bullets:
-            for wall in walls:
-                # Check for collision between bullet (circle) and wall (line segment)
-                # This is a simplified check, a more accurate one would use line-circle intersection
-                # For now, if bullet rect overlaps wall rect, consider it a hit
-                if pygame.sprite.collide_rect(bullet, wall):
-                    bullets_to_remove.append(bullet)
-                    break
-
-        for bullet in bullets_to_remove:
-            if bullet in all_bullets: # Ensure it's still in the group before removing
-                all_bullets.remove(bullet)
-
-        # --- Health Pickup Management ---
-        # Health pickups only spawn in Free Play mode
-        if game_mode == GAME_MODE_FREE_PLAY:
-            health_pickup_spawn_timer += dt
-            if health_pickup_spawn_timer >= HEALTH_PICKUP_SPAWN_INTERVAL:
-                health_pickup_spawn_timer = 0.0
-                # Générer un point aléatoire sur l'écran
-                # Ensure pickups don't spawn too close to walls
-                x = random.randint(150 + HEALTH_PICKUP_RADIUS, SCREEN_WIDTH - 150 - HEALTH_PICKUP_RADIUS)
-                y = random.randint(150 + HEALTH_PICKUP_RADIUS, SCREEN_HEIGHT - 150 - HEALTH_PICKUP_RADIUS)
-                hp_value = random.randint(HEALTH_PICKUP_MIN_HP, HEALTH_PICKUP_MAX_HP)
-                new_pickup = HealthPickup(x, y, hp_value)
-                health_pickups.add(new_pickup)
-                print(f"Bonus de vie apparu à ({x},{y}) avec {hp_value} PV.")
-
-            # Collisions entre voitures et bonus de vie
-            for car in all_cars:
-                if car.hp > 0: # Only active cars can pick up health
-                    # Utilisation de la nouvelle constante HEALTH_PICKUP_COLLISION_RATIO
-                    collided_pickups = pygame.sprite.spritecollide(car, health_pickups, True, pygame.sprite.collide_circle_ratio(HEALTH_PICKUP_COLLISION_RATIO))
-                    for pickup in collided_pickups:
-                        car.heal(pickup.hp_value)
-                        print(f"Voiture {car.color} a ramassé un bonus de vie de {pickup.hp_value} PV.")
+        # A long frame is simulated in several steps, so that the game keeps its speed
+        frame_start = time.perf_counter()
+        for step_ms in pacer.steps(dt_ms):
+            world.step(step_ms, player_controls)
+            if diagnostics:
+                diagnostics.phase("publish") # Replay recording, broadcast and telemetry
+            if recorder:
+                recorder.record_frame(step_ms, player_controls)
+            if broadcaster:
+                broadcaster.publish()
+            if telemetry:
+                telemetry.publish(player_controls)
+        sim_seconds = time.perf_counter() - frame_start
 
         # --- Rendu ---
-        screen.fill(DARK_GRAY) # Fond de la piste
-
-        for wall in walls:
-            wall.draw(screen)
-            # Dessiner la normale du mur pour le débogage (en rouge)
-            wall_center = (wall.p1 + wall.p2) / 2
-            pygame.draw.line(screen, RED, wall_center, wall_center + wall.normal * 30, 2) # Dessine la normale
-
-        # Draw waypoints for debugging in Race Mode
-        if game_mode == GAME_MODE_RACE:
-            for i, wp in enumerate(TRACK_WAYPOINTS):
-                pygame.draw.circle(screen, BLUE, wp, 10, 2) # Draw waypoint circle
-                font_wp = pygame.font.Font(None, 20)
-                wp_text = font_wp.render(str(i), True, BLUE)
-                screen.blit(wp_text, wp_text.get_rect(center=(wp[0], wp[1] - 15)))
-
-
-        for pickup in health_pickups:
-            pickup.draw(screen)
-
-        for car in all_cars:
-            car.draw(screen)
-        
-        for bullet in all_bullets: # Draw all active bullets
-            bullet.draw(screen)
-
-        # Display scores and HP for all cars
-        score_y_offset = 10
-        for i, car in enumerate(player_cars):
-            status = " (Disabled)" if car.is_disabled else ""
-            score_text = font_score.render(
-                f"P{i+1} ({car.color}): Score: {car.score} HP: {car.hp:.0f} Bullets: {car.bullets_remaining}/{car.max_bullets}{status}", 
-                True, car.color)
-            screen.blit(score_text, (10, score_y_offset + i * 40))
-            
-            coord_text = font_coords.render(f"Coords: ({int(car.position.x)}, {int(car.position.y)})", True, car.color)
-            screen.blit(coord_text, (10, score_y_offset + i * 40 + 25))
-
-        ai_score_y_offset = 10
-        for i, car in enumerate(ai_cars):
-            status = " (Disabled)" if car.is_disabled else ""
-            score_text = font_score.render(f"AI {i+1} ({car.color}): Score: {car.score} HP: {car.hp:.0f}{status}", True, YELLOW)
-            screen.blit(score_text, (SCREEN_WIDTH - score_text.get_width() - 10, ai_score_y_offset + i * 40)) # Augmenté le décalage Y
-            
-            # Affichage des coordonnées des IA dans le coin supérieur droit
-            coord_text = font_coords.render(f"Coords: ({int(car.position.x)}, {int(car.position.y)})", True, YELLOW)
-            screen.blit(coord_text, (SCREEN_WIDTH - coord_text.get_width() - 10, ai_score_y_offset + i * 40 + 25)) # Décalé sous le score
-
-
-        pygame.display.flip()
-
-    return False # Default return if loop exits without ESC (e.g., QUIT event)
+        if diagnostics:
+            diagnostics.phase("render")
+        if profile.render and pacer.should_render():
+            render_start = time.perf_counter()
+            renderer.draw(world, font_score, font_coords, pacer.detail)
+            pygame.display.flip()
+            pacer.end_frame(sim_seconds, time.perf_counter() - render_start)
+        else:
+            pacer.end_frame(sim_seconds)
+        mark_startup("first_frame")
+        if diagnostics:
+            diagnostics.end_frame()
+        garbage_collector.collect()
+
+    return end_session(False) # Default return if loop exits without ESC (e.g., QUIT event)
 
 # --- Run the game ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=GAME_TITLE)
+    parser.add_argument("--track", default=DEFAULT_TRACK_PATH, help="The track file to play on")
+    parser.add_argument("--seed", type=int, help="The seed of the session random generator")
+    parser.add_argument("--record", metavar="REPLAY", help="Record the sessions to this replay file (numbered after the first one)")
+    parser.add_argument("--replay", metavar="REPLAY", help="Play a replay file instead of the game")
+    parser.add_argument("--connect", metavar="HOST[:PORT]", help="Join a multiplayer server (see net_server.py)")
+    parser.add_argument("--broadcast", type=int, metavar="PORT", help="Stream the sessions to spectators on this TCP port (see broadcast.py)")
+    parser.add_argument("--startup-benchmark", action="store_true", help="Go through the menu with simulated key presses and report the startup times")
+    parser.add_argument("--profile", choices=PERF_PROFILE_NAMES, default=DEFAULT_PERF_PROFILE,
+                        help="Performance profile: frame rate, physics step, AI plans, sprite rotation, effects, HUD detail and render resolution (also in the menu)")
+    parser.add_argument("--render-scale", type=float, metavar="SCALE",
+                        help="Internal render resolution, as a fraction of the window size (above 0, at most 1, e.g. 0.5; overrides the profile)")
+    parser.add_argument("--telemetry", metavar="FILE", help="Publish the live state of the cars to this memory-mapped file (see telemetry.py)")
+    parser.add_argument("--alloc-diagnostics", action="store_true", help="Report the allocations of each frame phase and the garbage collections")
+    parser.add_argument("--no-preload", action="store_true", help="Do not preload the assets while the menu is shown (startup comparisons)")
+    args = parser.parse_args()
+    if args.render_scale is not None and not 0 < args.render_scale <= 1:
+        parser.error(f"--render-scale must be above 0 and at most 1 (got {args.render_scale})")
+
     pygame.init()
     try:
         pygame.mixer.init()
     except pygame.error as e:
         print(f"Warning: Could not initialize mixer: {e}")
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    if not args.no_preload:
+        assets.preload((args.track,)) # Sounds, car sprites and track, decoded while the menu is shown
+
+    if args.startup_benchmark:
+        threading.Thread(target=simulate_menu_keys, daemon=True).start()
+
+    if args.replay:
+        play_replay(screen, args.replay)
+        pygame.quit()
+        exit()
+
+    if args.connect:
+        host, _, port = args.connect.partition(":")
+        play_online(screen, host, int(port) if port else NET_DEFAULT_PORT)
+        pygame.quit()
+        exit()
 
+    session_number = 0
+    profile_name = args.profile
     while True:
-        player_count, ai_count, game_mode, difficulty = main_menu(screen)
+        player_count, ai_count, game_mode, difficulty, profile_name = main_menu(screen, profile_name)
         
         # If main_menu signals to quit (ESC pressed on game_mode screen)
         if game_mode is None:
             break 
         
         # Run the game session
-        return_to_menu = run_game_session(screen, player_count, ai_count, game_mode, difficulty)
+        profile = get_profile(profile_name)
+        if args.render_scale is not None:
+            profile = profile._replace(render_scale=args.render_scale)
+        session_number += 1
+        record_path = args.record
+        if record_path and session_number > 1:
+            record_path = f"{os.path.splitext(record_path)[0]}-{session_number}{REPLAY_EXTENSION}"
+        return_to_menu = run_game_session(screen, player_count, ai_count, game_mode, difficulty,
+                                          track_path=args.track, seed=args.seed, record_path=record_path,
+                                          broadcast_port=args.broadcast, alloc_diagnostics=args.alloc_diagnostics,
+                                          telemetry_path=args.telemetry, profile=profile)
         
         # If run_game_session returns False, it means QUIT event was triggered, so break
         if not return_to_menu:
             break
 
     pygame.quit()
+    if args.startup_benchmark:
+        print(f"Démarrage: imports {IMPORT_TIME * 1000:.0f} ms, menu prêt à {startup_times.get('menu_ready', 0) * 1000:.0f} ms, "
+              f"assets préchargés en {(assets.preload_time or 0) * 1000:.0f} ms, première image de jeu "
+              f"{(startup_times.get('first_frame', 0) - startup_times.get('session_start', 0)) * 1000:.0f} ms après le lancement de la partie")
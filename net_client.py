@@ -0,0 +1,336 @@
+import argparse
+import asyncio
+import os
+import random
+import time
+from collections import deque
+import pygame
+from constants import * # Import all constants
+from car import Car # Import Car class (player controls)
+from entity_store import BULLET_MASK, PICKUP_MASK # Import the bullet and pickup components (displayed bullets and pickups)
+from track import load_track # Import the track loader
+from world import World, PLANNER_OFF # Import the simulation (local display and prediction)
+from asset_loader import assets # Import the shared fonts
+from replay import file_digest # Import the track file hash
+from net_protocol import ( # Import the packet formats and the state encoding
+    PROTOCOL_VERSION, PACKET_WELCOME, PACKET_REJECT, PACKET_SNAPSHOT, PACKET_BYE, PACKET_HELLO, PACKET_INPUT,
+    NO_BASELINE, HELLO_FORMAT, INPUT_FORMAT, SNAPSHOT_FORMAT, TYPE_FORMAT, POSITION_SCALE, ANGLE_SCALE, FLAG_DISABLED,
+    decode_state, apply_car_state, parse_welcome)
+
+INTERPOLATION_MAX_JUMP = 100 * POSITION_SCALE # A remote car moving more than this between two snapshots respawned: no interpolation
+
+def display_state(world, snapshots, render_tick, skip_car=None):
+    """
+    Displays received states in a world: the cars interpolated at a tick between the two snapshots
+    around it, the bullets and pickups of the newer one.
+
+    Args:
+        world (World): The local view of the session.
+        snapshots (sequence): The (tick, NetState) received, oldest first (not empty).
+        render_tick (float): The server tick to display.
+        skip_car (Car, optional): A car not to update (the predicted local car). Defaults to None.
+    """
+    older = newer = snapshots[-1]
+    for index, snapshot in enumerate(snapshots):
+        if snapshot[0] >= render_tick:
+            newer = snapshot
+            older = snapshots[index - 1] if index > 0 else snapshot
+            break
+    span = newer[0] - older[0]
+    t = min(1.0, max(0.0, (render_tick - older[0]) / span)) if span > 0 else 1.0
+
+    for index, car in enumerate(world.car_list):
+        if car is skip_car:
+            continue
+        start, end = older[1].cars[index], newer[1].cars[index]
+        apply_car_state(car, end)
+        if (abs(end.x - start.x) < INTERPOLATION_MAX_JUMP and abs(end.y - start.y) < INTERPOLATION_MAX_JUMP
+                and (start.flags & FLAG_DISABLED) == (end.flags & FLAG_DISABLED)):
+            car.position = ((start.x + (end.x - start.x) * t) / POSITION_SCALE,
+                            (start.y + (end.y - start.y) * t) / POSITION_SCALE)
+            turn = (end.angle - start.angle + 32768) % 65536 - 32768 # Shortest way around
+            car.angle = ((start.angle + turn * t) % 65536) / ANGLE_SCALE
+        car.update_transform()
+
+    # Bullets and pickups of the newer snapshot
+    world.bullets.clear()
+    for x, y in newer[1].bullets:
+        world.bullets.create(BULLET_MASK, x=x, y=y, radius=BULLET_RADIUS)
+    world.pickups.clear()
+    for entity_id, x, y, hp_value in newer[1].pickups:
+        world.pickups.create(PICKUP_MASK, entity_id=entity_id, x=x, y=y, hp=hp_value)
+
+class ClientProtocol(asyncio.DatagramProtocol):
+    """
+    Queues the datagrams received from the server until the game loop reads them.
+    """
+    def __init__(self):
+        self.packets = deque()
+
+    def datagram_received(self, data, address):
+        self.packets.append(data)
+
+    def error_received(self, exc):
+        print(f"Erreur réseau: {exc}")
+
+class NetClient:
+    """
+    Client side of a multiplayer session: sends the local control flags, predicts the local car
+    and displays the remote cars interpolated between the server snapshots.
+    """
+    def __init__(self, transport, protocol, slot, session):
+        """
+        Builds the local view of the session described by the server.
+
+        Args:
+            transport (asyncio.DatagramTransport): The connected UDP transport.
+            protocol (ClientProtocol): The protocol receiving the server packets.
+            slot (int): The player slot assigned by the server.
+            session (dict): The session description sent by the server.
+        """
+        self.transport = transport
+        self.protocol = protocol
+        self.slot = slot
+        self.session = session
+        if file_digest(session["track"]) != session["track_digest"]:
+            print(f"Attention: la piste {session['track']} est différente de celle du serveur.")
+        # Same arguments as the server world: same cars in the same order (no AI runs here, only the display and prediction)
+        self.world = World(load_track(session["track"]), session["player_count"], session["ai_count"], session["game_mode"],
+                           session["difficulty"], seed=session["seed"], start_ticks=session["start_ticks"], planner_mode=PLANNER_OFF)
+        self.car = self.world.player_cars[slot]
+        self.tick_rate = session["tick_rate"]
+
+        self.states = {} # Tick -> NetState, the delta baselines
+        self.snapshots = deque() # (tick, NetState) received, for the interpolation of the remote cars
+        self.latest_tick = None
+        self.latest_time = 0.0
+        self.input_sequence = 0
+        self.pending_inputs = deque() # (sequence, controls, dt_ms) not yet applied by the server
+
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.snapshots_received = 0
+        self.full_snapshots_received = 0
+        self.corrections = 0
+        self.correction_total = 0.0
+        self.server_closed = False
+
+    def send(self, packet):
+        self.transport.sendto(packet)
+        self.bytes_sent += len(packet)
+
+    def update(self, controls, dt_ms, now):
+        """
+        Runs one client frame: reads the server packets, sends and predicts the local inputs, interpolates the remote cars.
+
+        Args:
+            controls (int): The CONTROL_* flags of the local player.
+            dt_ms (int): The duration of the frame in milliseconds.
+            now (float): The current time (time.perf_counter()).
+        """
+        while self.protocol.packets:
+            self._receive(self.protocol.packets.popleft(), now)
+
+        self.input_sequence += 1
+        self.pending_inputs.append((self.input_sequence, controls, dt_ms))
+        self.send(INPUT_FORMAT.pack(PACKET_INPUT, self.input_sequence,
+                                    NO_BASELINE if self.latest_tick is None else self.latest_tick, controls))
+        if self.latest_tick is not None:
+            self.world.predict_car(self.car, dt_ms, controls)
+            self._interpolate(now)
+
+    def _receive(self, data, now):
+        """
+        Handles a packet from the server.
+        """
+        self.bytes_received += len(data)
+        packet_type = data[0]
+        if packet_type == PACKET_BYE:
+            self.server_closed = True
+        if packet_type != PACKET_SNAPSHOT or len(data) < SNAPSHOT_FORMAT.size:
+            return
+        _, tick, baseline_tick, input_ack = SNAPSHOT_FORMAT.unpack_from(data, 0)
+        if self.latest_tick is not None and tick <= self.latest_tick:
+            return # Late (reordered) snapshot
+        baseline = None
+        if baseline_tick != NO_BASELINE:
+            baseline = self.states.get(baseline_tick)
+            if baseline is None:
+                return # Baseline already dropped: wait for a snapshot against a newer one
+        state = decode_state(data, SNAPSHOT_FORMAT.size, baseline)
+
+        self.snapshots_received += 1
+        if baseline is None:
+            self.full_snapshots_received += 1
+        self.states[tick] = state
+        self.states.pop(tick - NET_HISTORY_SIZE * self.session["snapshot_interval"], None)
+        self.snapshots.append((tick, state))
+        while len(self.snapshots) > 2 and self.snapshots[1][0] < tick - self.tick_rate:
+            self.snapshots.popleft() # Keep about one second of snapshots
+        first_snapshot = self.latest_tick is None
+        self.latest_tick = tick
+        self.latest_time = now
+        self._reconcile(state, input_ack, first_snapshot)
+
+    def _reconcile(self, state, input_ack, first_snapshot):
+        """
+        Resets the local car to the server state and re-applies the inputs the server has not processed yet.
+        """
+        predicted = pygame.math.Vector2(self.car.position)
+        while self.pending_inputs and self.pending_inputs[0][0] <= input_ack:
+            self.pending_inputs.popleft()
+        apply_car_state(self.car, state.cars[self.slot])
+        self.car.update_transform()
+        for _, controls, dt_ms in self.pending_inputs:
+            self.world.predict_car(self.car, dt_ms, controls)
+        if not first_snapshot:
+            self.corrections += 1
+            self.correction_total += predicted.distance_to(self.car.position)
+
+    def _interpolate(self, now):
+        """
+        Displays the remote cars, bullets and pickups slightly in the past, between the two snapshots around that time.
+        """
+        render_tick = (self.latest_tick + (now - self.latest_time) * self.tick_rate
+                       - NET_INTERPOLATION_DELAY * self.tick_rate)
+        display_state(self.world, self.snapshots, render_tick, skip_car=self.car)
+
+    def report(self, elapsed):
+        """
+        Prints the traffic and prediction statistics of the session.
+
+        Args:
+            elapsed (float): The duration of the session in seconds.
+        """
+        mean_size = self.bytes_received / self.snapshots_received if self.snapshots_received else 0
+        mean_correction = self.correction_total / self.corrections if self.corrections else 0
+        print(f"Joueur {self.slot + 1}: reçu {self.bytes_received / 1024:.1f} KB ({self.bytes_received / elapsed / 1024:.2f} KB/s, "
+              f"{self.snapshots_received} snapshots, {self.full_snapshots_received} complets, {mean_size:.0f} octets en moyenne), "
+              f"envoyé {self.bytes_sent / 1024:.1f} KB ({self.bytes_sent / elapsed / 1024:.2f} KB/s), "
+              f"correction de prédiction moyenne {mean_correction:.2f} px")
+
+async def connect(host, port, timeout=NET_CLIENT_TIMEOUT):
+    """
+    Connects to a server.
+
+    Args:
+        host (str): The address of the server.
+        port (int): The UDP port of the server.
+        timeout (float, optional): The number of seconds to wait for an answer. Defaults to NET_CLIENT_TIMEOUT.
+
+    Returns:
+        tuple: The transport, the protocol, the player slot and the session description.
+
+    Raises:
+        ConnectionError: If the server rejected the client or did not answer.
+    """
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(ClientProtocol, remote_addr=(host, port))
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        transport.sendto(HELLO_FORMAT.pack(PACKET_HELLO, PROTOCOL_VERSION))
+        await asyncio.sleep(NET_CONNECT_RETRY)
+        while protocol.packets:
+            data = protocol.packets.popleft()
+            if data[0] == PACKET_WELCOME:
+                slot, session = parse_welcome(data)
+                protocol.packets.clear() # Snapshots sent before the client is ready are dropped
+                return transport, protocol, slot, session
+            if data[0] == PACKET_REJECT:
+                transport.close()
+                raise ConnectionError(f"Connexion refusée par {host}:{port}: {data[1:].decode('utf-8', 'replace')}")
+    transport.close()
+    raise ConnectionError(f"Pas de réponse de {host}:{port}")
+
+async def run_client(screen, host=NET_DEFAULT_HOST, port=NET_DEFAULT_PORT, bot=False, duration=None, seed=None):
+    """
+    Plays a multiplayer session on a server.
+
+    Args:
+        screen (pygame.Surface or None): The screen to draw on, None to run without display (bots).
+        host (str, optional): The address of the server. Defaults to NET_DEFAULT_HOST.
+        port (int, optional): The UDP port of the server. Defaults to NET_DEFAULT_PORT.
+        bot (bool, optional): Whether random inputs drive the car instead of the keyboard. Defaults to False.
+        duration (float, optional): The number of seconds to play. Defaults to None (until ESC or the server stops).
+        seed (int, optional): The seed of the bot inputs. Defaults to None.
+
+    Returns:
+        bool: True if the user wants to return to the main menu, False if the user wants to quit.
+    """
+    transport, protocol, slot, session = await connect(host, port)
+    client = NetClient(transport, protocol, slot, session)
+    print(f"Connecté à {host}:{port}: joueur {slot + 1} ({session['game_mode']}, {session['player_count']} joueurs, {session['ai_count']} IA)")
+    font_score = assets.font(SCORE_FONT_SIZE)
+    font_coords = assets.font(COORD_FONT_SIZE)
+    bot_rng = random.Random(seed)
+    bot_controls = 0
+
+    start = last_frame = next_frame = time.perf_counter()
+    return_to_menu = True
+    frame = 0
+    while not client.server_closed and (duration is None or last_frame - start < duration):
+        now = time.perf_counter()
+        dt_ms = max(1, min(round((now - last_frame) * 1000), 0xFFFF))
+        last_frame = now
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return_to_menu = False
+                client.server_closed = True
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                client.server_closed = True
+
+        if bot:
+            if frame % 30 == 0: # New random inputs twice a second, mostly accelerating
+                bot_controls = bot_rng.randrange(1 << CONTROL_BITS) | (CONTROL_ACCELERATE if bot_rng.random() < 0.8 else 0)
+            controls = bot_controls
+        else:
+            controls = Car.read_controls(pygame.key.get_pressed(), player_num=1)
+        client.update(controls, dt_ms, now)
+        frame += 1
+
+        if screen is not None:
+            client.world.draw(screen, font_score, font_coords)
+            pygame.display.flip()
+
+        next_frame += 1.0 / FPS
+        await asyncio.sleep(max(0.0, next_frame - time.perf_counter()))
+
+    client.send(TYPE_FORMAT.pack(PACKET_BYE))
+    client.report(time.perf_counter() - start)
+    transport.close()
+    return return_to_menu
+
+def play_online(screen, host=NET_DEFAULT_HOST, port=NET_DEFAULT_PORT):
+    """
+    Plays a multiplayer session on a server (blocking, for the menu).
+
+    Returns:
+        bool: True if the user wants to return to the main menu, False if the user wants to quit.
+    """
+    try:
+        return asyncio.run(run_client(screen, host, port))
+    except ConnectionError as e:
+        print(e)
+        return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=f"{GAME_TITLE} multiplayer client.")
+    parser.add_argument("--host", default=NET_DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=NET_DEFAULT_PORT)
+    parser.add_argument("--bot", action="store_true", help="Drive the car with random inputs")
+    parser.add_argument("--headless", action="store_true", help="No window (with --bot, for local load tests)")
+    parser.add_argument("--duration", type=float, help="Disconnect after this many seconds")
+    parser.add_argument("--seed", type=int, help="The seed of the bot inputs")
+    args = parser.parse_args()
+
+    if args.headless:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        os.environ["SDL_AUDIODRIVER"] = "dummy"
+    pygame.init()
+    screen = pygame.display.set_mode((1, 1) if args.headless else (SCREEN_WIDTH, SCREEN_HEIGHT))
+    try:
+        asyncio.run(run_client(None if args.headless else screen, args.host, args.port, args.bot, args.duration, args.seed))
+    except ConnectionError as e:
+        print(e)
+    pygame.quit()
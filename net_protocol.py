@@ -0,0 +1,261 @@
+import json
+import struct
+from collections import namedtuple
+from constants import * # Import all constants
+from replay import file_digest # Import the track file hash (clients check they have the same track)
+from entity_store import BULLET_MASK, PICKUP_MASK # Import the bullet and pickup components
+
+# --- Packets ---
+# Every datagram starts with its type byte.
+#   client -> server: HELLO (protocol version), INPUT (input sequence, last snapshot tick received, control flags), BYE
+#   server -> client: WELCOME (player slot + JSON session description), REJECT (reason), SNAPSHOT, BYE
+# A SNAPSHOT carries the server tick, the tick of the state it is delta-encoded against (NO_BASELINE for a
+# full state), the last input sequence of the client applied by the server, then the encoded world state.
+PROTOCOL_VERSION = 1
+PACKET_HELLO = 1
+PACKET_WELCOME = 2
+PACKET_REJECT = 3
+PACKET_INPUT = 4
+PACKET_SNAPSHOT = 5
+PACKET_BYE = 6
+NO_BASELINE = 0xFFFFFFFF
+
+HELLO_FORMAT = struct.Struct("<BH")
+WELCOME_FORMAT = struct.Struct("<BB")
+INPUT_FORMAT = struct.Struct("<BIIB")
+SNAPSHOT_FORMAT = struct.Struct("<BIII")
+TYPE_FORMAT = struct.Struct("<B")
+
+# --- Quantized world state ---
+# Cars are sent as small integers (1/8 pixel positions, 1/100 degree headings...), one tuple per car
+# in World.car_list order. Pickups are (entity id, x, y, hp) and bullets (x, y), in pixels.
+POSITION_SCALE = 8
+VELOCITY_SCALE = 8
+ANGLE_SCALE = 65536 / 360
+ANGULAR_VELOCITY_SCALE = 16
+HP_SCALE = 10
+TIMER_SCALE = 10
+
+CAR_FIELDS = ("x", "y", "vx", "vy", "angle", "angular_velocity", "hp", "score", "flags", "bullets", "disabled_timer", "waypoint")
+CAR_FIELD_FORMATS = [struct.Struct(f"<{code}") for code in ("h", "h", "h", "h", "H", "h", "h", "H", "B", "B", "B", "B")]
+CarState = namedtuple("CarState", CAR_FIELDS)
+NetState = namedtuple("NetState", ["cars", "pickups", "bullets"])
+
+# Car state flag bits
+FLAG_ACCELERATING = 1
+FLAG_BRAKING = 2
+FLAG_TURNING_LEFT = 4
+FLAG_TURNING_RIGHT = 8
+FLAG_DISABLED = 16
+FLAG_CAN_FIRE = 32
+
+COUNT_FORMAT = struct.Struct("<B")
+MASK_FORMAT = struct.Struct("<H")
+PICKUP_FORMAT = struct.Struct("<Ihhh")
+BULLET_FORMAT = struct.Struct("<hh")
+
+def _clamp(value, low, high):
+    return low if value < low else high if value > high else value
+
+def quantize_car(car):
+    """
+    Returns the quantized network state of a car.
+
+    Args:
+        car (Car): The car.
+
+    Returns:
+        CarState: The quantized state.
+    """
+    flags = ((FLAG_ACCELERATING if car.accelerating else 0) | (FLAG_BRAKING if car.braking else 0) |
+             (FLAG_TURNING_LEFT if car.turning_left else 0) | (FLAG_TURNING_RIGHT if car.turning_right else 0) |
+             (FLAG_DISABLED if car.is_disabled else 0) | (FLAG_CAN_FIRE if car.can_fire else 0))
+    return CarState(
+        _clamp(round(car.position.x * POSITION_SCALE), -32768, 32767),
+        _clamp(round(car.position.y * POSITION_SCALE), -32768, 32767),
+        _clamp(round(car.velocity.x * VELOCITY_SCALE), -32768, 32767),
+        _clamp(round(car.velocity.y * VELOCITY_SCALE), -32768, 32767),
+        round(car.angle % 360 * ANGLE_SCALE) & 0xFFFF,
+        _clamp(round(car.angular_velocity * ANGULAR_VELOCITY_SCALE), -32768, 32767),
+        _clamp(round(car.hp * HP_SCALE), -32768, 32767),
+        _clamp(car.score, 0, 0xFFFF),
+        flags,
+        _clamp(car.bullets_remaining, 0, 0xFF),
+        _clamp(round(max(0.0, car.disabled_timer) * TIMER_SCALE), 0, 0xFF),
+        _clamp(car.current_waypoint_index, 0, 0xFF))
+
+def quantize_world(world):
+    """
+    Returns the quantized network state of a world.
+
+    Args:
+        world (World): The simulation.
+
+    Returns:
+        NetState: The state sent to the clients.
+    """
+    cars = tuple(quantize_car(car) for car in world.car_list)
+    pickup_store = world.pickups
+    pickups = tuple((pickup_store.ids[row], round(pickup_store.x[row]), round(pickup_store.y[row]), pickup_store.hp[row])
+                    for row in pickup_store.query(PICKUP_MASK))
+    bullet_store = world.bullets
+    bullets = tuple((round(bullet_store.x[row]), round(bullet_store.y[row])) for row in bullet_store.query(BULLET_MASK)[:NET_MAX_BULLETS])
+    return NetState(cars, pickups, bullets)
+
+def apply_car_state(car, state):
+    """
+    Writes a quantized car state into a car (position, motion, HP, controls, timers).
+
+    Args:
+        car (Car): The car to update.
+        state (CarState): The quantized state.
+    """
+    car.position = (state.x / POSITION_SCALE, state.y / POSITION_SCALE)
+    car.velocity = (state.vx / VELOCITY_SCALE, state.vy / VELOCITY_SCALE)
+    car.angle = state.angle / ANGLE_SCALE
+    car.angular_velocity = state.angular_velocity / ANGULAR_VELOCITY_SCALE
+    car.hp = state.hp / HP_SCALE
+    car.score = state.score
+    flags = state.flags
+    car.accelerating = bool(flags & FLAG_ACCELERATING)
+    car.braking = bool(flags & FLAG_BRAKING)
+    car.turning_left = bool(flags & FLAG_TURNING_LEFT)
+    car.turning_right = bool(flags & FLAG_TURNING_RIGHT)
+    car.is_disabled = bool(flags & FLAG_DISABLED)
+    car.can_fire = bool(flags & FLAG_CAN_FIRE)
+    car.fire_cooldown_timer = 0.0 if car.can_fire else car.fire_cooldown
+    car.bullets_remaining = state.bullets
+    car.disabled_timer = state.disabled_timer / TIMER_SCALE
+    car.current_waypoint_index = state.waypoint
+
+# --- Delta encoding ---
+# Cars: per car, a 16-bit mask of the fields that differ from the baseline, then those fields only
+# (an unchanged car costs 2 bytes). Pickups: a byte telling whether the list changed, then the list.
+# Bullets move every tick and are always sent in full.
+
+def encode_state(state, baseline=None):
+    """
+    Encodes a world state, delta-compressed against a baseline state the client already has.
+
+    Args:
+        state (NetState): The state to send.
+        baseline (NetState, optional): The reference state. Defaults to None (full state).
+
+    Returns:
+        bytes: The encoded state.
+    """
+    parts = [COUNT_FORMAT.pack(len(state.cars))]
+    base_cars = baseline.cars if baseline is not None and len(baseline.cars) == len(state.cars) else None
+    for index, car in enumerate(state.cars):
+        base = base_cars[index] if base_cars else None
+        mask = 0
+        values = []
+        for field, value in enumerate(car):
+            if base is None or base[field] != value:
+                mask |= 1 << field
+                values.append(CAR_FIELD_FORMATS[field].pack(value))
+        parts.append(MASK_FORMAT.pack(mask))
+        parts.extend(values)
+
+    if baseline is not None and baseline.pickups == state.pickups:
+        parts.append(COUNT_FORMAT.pack(0))
+    else:
+        parts.append(COUNT_FORMAT.pack(1))
+        parts.append(COUNT_FORMAT.pack(len(state.pickups)))
+        parts.extend(PICKUP_FORMAT.pack(*pickup) for pickup in state.pickups)
+
+    parts.append(COUNT_FORMAT.pack(len(state.bullets)))
+    parts.extend(BULLET_FORMAT.pack(*bullet) for bullet in state.bullets)
+    return b"".join(parts)
+
+def decode_state(data, offset, baseline=None):
+    """
+    Decodes a state encoded by encode_state.
+
+    Args:
+        data (bytes): The packet.
+        offset (int): The position of the encoded state in the packet.
+        baseline (NetState, optional): The state it was encoded against. Defaults to None (full state).
+
+    Returns:
+        NetState: The decoded state.
+
+    Raises:
+        ValueError: If a delta refers to fields the baseline does not have.
+    """
+    (car_count,) = COUNT_FORMAT.unpack_from(data, offset)
+    offset += COUNT_FORMAT.size
+    cars = []
+    for index in range(car_count):
+        (mask,) = MASK_FORMAT.unpack_from(data, offset)
+        offset += MASK_FORMAT.size
+        if baseline is not None and index < len(baseline.cars):
+            values = list(baseline.cars[index])
+        elif mask == (1 << len(CAR_FIELDS)) - 1:
+            values = [0] * len(CAR_FIELDS)
+        else:
+            raise ValueError("Car delta without baseline")
+        for field, field_format in enumerate(CAR_FIELD_FORMATS):
+            if mask & (1 << field):
+                (values[field],) = field_format.unpack_from(data, offset)
+                offset += field_format.size
+        cars.append(CarState(*values))
+
+    (pickups_changed,) = COUNT_FORMAT.unpack_from(data, offset)
+    offset += COUNT_FORMAT.size
+    if pickups_changed:
+        (pickup_count,) = COUNT_FORMAT.unpack_from(data, offset)
+        offset += COUNT_FORMAT.size
+        pickups = tuple(PICKUP_FORMAT.unpack_from(data, offset + i * PICKUP_FORMAT.size) for i in range(pickup_count))
+        offset += pickup_count * PICKUP_FORMAT.size
+    elif baseline is not None:
+        pickups = baseline.pickups
+    else:
+        raise ValueError("Pickup delta without baseline")
+
+    (bullet_count,) = COUNT_FORMAT.unpack_from(data, offset)
+    offset += COUNT_FORMAT.size
+    bullets = tuple(BULLET_FORMAT.unpack_from(data, offset + i * BULLET_FORMAT.size) for i in range(bullet_count))
+    return NetState(tuple(cars), pickups, bullets)
+
+# --- Packet helpers ---
+
+def describe_session(world, track_path):
+    """
+    Returns the description of a session sent to the clients, which build an identical World from it.
+
+    Args:
+        world (World): The simulation.
+        track_path (str): The track file of the session.
+
+    Returns:
+        dict: The session description (JSON-serializable).
+    """
+    return {
+        "track": track_path,
+        "track_digest": file_digest(track_path),
+        "player_count": len(world.player_cars),
+        "ai_count": len(world.ai_cars),
+        "game_mode": world.game_mode,
+        "difficulty": world.difficulty,
+        "seed": world.seed,
+        "start_ticks": world.start_ticks,
+        "tick_rate": NET_TICK_RATE,
+        "snapshot_interval": NET_SNAPSHOT_INTERVAL
+    }
+
+def make_welcome(slot, session):
+    """
+    Builds the WELCOME packet: the player slot of the client and the session description.
+    """
+    return WELCOME_FORMAT.pack(PACKET_WELCOME, slot) + json.dumps(session).encode("utf-8")
+
+def parse_welcome(data):
+    """
+    Parses a WELCOME packet.
+
+    Returns:
+        tuple: The player slot and the session description (dict).
+    """
+    _, slot = WELCOME_FORMAT.unpack_from(data, 0)
+    return slot, json.loads(data[WELCOME_FORMAT.size:].decode("utf-8"))
@@ -0,0 +1,262 @@
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy") # Headless: no window on the server
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+from constants import * # Import all constants
+from track import load_track # Import the track loader
+from world import World # Import the simulation
+from broadcast import BroadcastService # Import the spectator broadcast
+from net_protocol import ( # Import the packet formats and the state encoding
+    PROTOCOL_VERSION, PACKET_HELLO, PACKET_REJECT, PACKET_INPUT, PACKET_SNAPSHOT, PACKET_BYE, NO_BASELINE,
+    HELLO_FORMAT, INPUT_FORMAT, SNAPSHOT_FORMAT, TYPE_FORMAT, quantize_world, encode_state, make_welcome, describe_session)
+
+class ClientConnection:
+    """
+    A connected client: its player slot, latest inputs, acknowledged snapshot and traffic counters.
+    """
+    def __init__(self, address, slot, now):
+        self.address = address
+        self.slot = slot
+        self.last_seen = now
+        self.input_sequence = 0 # Last input sequence received (and applied from the next tick)
+        self.controls = 0
+        self.ack_tick = NO_BASELINE # Last snapshot the client received (delta baseline)
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.snapshots_sent = 0
+        self.full_snapshots_sent = 0
+
+class GameServer(asyncio.DatagramProtocol):
+    """
+    Server-authoritative multiplayer session: runs the World at a fixed tick rate and streams
+    delta-compressed snapshots to the clients, which only send their control flags.
+    """
+    def __init__(self, world, track_path, broadcaster=None):
+        """
+        Initializes the server of a session.
+
+        Args:
+            world (World): The simulation (one human player car per client slot).
+            track_path (str): The track file of the session (sent to the clients).
+            broadcaster (BroadcastService, optional): The spectator broadcast of the session. Defaults to None.
+        """
+        self.world = world
+        self.broadcaster = broadcaster
+        self.transport = None
+        self.clients = {} # Address -> ClientConnection
+        self.tick = 0
+        self.history = {} # Tick -> NetState, the delta baselines
+        self.session = describe_session(world, track_path)
+
+    # --- asyncio.DatagramProtocol ---
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, address):
+        if not data:
+            return
+        now = time.perf_counter()
+        client = self.clients.get(address)
+        packet_type = data[0]
+        if packet_type == PACKET_HELLO:
+            self._accept(data, address, now)
+        elif client is None:
+            return
+        elif packet_type == PACKET_INPUT and len(data) >= INPUT_FORMAT.size:
+            _, sequence, ack_tick, controls = INPUT_FORMAT.unpack_from(data, 0)
+            client.last_seen = now
+            client.bytes_received += len(data)
+            if sequence > client.input_sequence: # Late (reordered) inputs are ignored
+                client.input_sequence = sequence
+                client.controls = controls
+            if ack_tick != NO_BASELINE and (client.ack_tick == NO_BASELINE or ack_tick > client.ack_tick):
+                client.ack_tick = ack_tick
+        elif packet_type == PACKET_BYE:
+            print(f"Client {address} (joueur {client.slot + 1}) déconnecté.")
+            del self.clients[address]
+
+    def _accept(self, data, address, now):
+        """
+        Answers a HELLO packet: assigns a free player slot (or the one already assigned) or rejects the client.
+        """
+        if len(data) < HELLO_FORMAT.size or HELLO_FORMAT.unpack_from(data, 0)[1] != PROTOCOL_VERSION:
+            self.transport.sendto(TYPE_FORMAT.pack(PACKET_REJECT) + b"protocol version mismatch", address)
+            return
+        client = self.clients.get(address)
+        if client is None:
+            used_slots = {c.slot for c in self.clients.values()}
+            free_slots = [slot for slot in range(len(self.world.player_cars)) if slot not in used_slots]
+            if not free_slots:
+                self.transport.sendto(TYPE_FORMAT.pack(PACKET_REJECT) + b"server full", address)
+                return
+            client = ClientConnection(address, free_slots[0], now)
+            self.clients[address] = client
+            print(f"Client {address} connecté: joueur {client.slot + 1}.")
+        client.last_seen = now
+        self.transport.sendto(make_welcome(client.slot, self.session), address)
+
+    # --- Simulation ---
+
+    def step(self):
+        """
+        Runs one tick of the simulation with the latest inputs of the clients, then sends the snapshots.
+        """
+        controls = [0] * len(self.world.player_cars)
+        for client in self.clients.values():
+            controls[client.slot] = client.controls
+        # Integer frame durations averaging exactly 1000 / NET_TICK_RATE ms
+        dt_ms = (self.tick + 1) * 1000 // NET_TICK_RATE - self.tick * 1000 // NET_TICK_RATE
+        self.world.step(dt_ms, controls)
+        self.tick += 1
+        if self.tick % NET_SNAPSHOT_INTERVAL == 0:
+            self.send_snapshots()
+        if self.broadcaster:
+            self.broadcaster.publish()
+
+    def send_snapshots(self):
+        """
+        Sends the current state to every client, delta-encoded against the last snapshot it acknowledged.
+        Clients acknowledging the same snapshot share the same encoded payload.
+        """
+        state = quantize_world(self.world)
+        self.history[self.tick] = state
+        self.history.pop(self.tick - NET_HISTORY_SIZE * NET_SNAPSHOT_INTERVAL, None)
+        payloads = {}
+        for client in self.clients.values():
+            baseline_tick = client.ack_tick if client.ack_tick in self.history else NO_BASELINE
+            payload = payloads.get(baseline_tick)
+            if payload is None:
+                payload = encode_state(state, self.history.get(baseline_tick))
+                payloads[baseline_tick] = payload
+            packet = SNAPSHOT_FORMAT.pack(PACKET_SNAPSHOT, self.tick, baseline_tick, client.input_sequence) + payload
+            self.transport.sendto(packet, client.address)
+            client.bytes_sent += len(packet)
+            client.snapshots_sent += 1
+            if baseline_tick == NO_BASELINE:
+                client.full_snapshots_sent += 1
+
+    def drop_idle_clients(self, now):
+        """
+        Drops the clients that have not sent anything for NET_CLIENT_TIMEOUT seconds.
+        """
+        for address, client in list(self.clients.items()):
+            if now - client.last_seen > NET_CLIENT_TIMEOUT:
+                print(f"Client {address} (joueur {client.slot + 1}) expiré.")
+                del self.clients[address]
+
+    def report(self, elapsed):
+        """
+        Prints the bandwidth of each client since the last report and resets the counters.
+
+        Args:
+            elapsed (float): The duration covered by the counters, in seconds.
+        """
+        for client in self.clients.values():
+            mean_size = client.bytes_sent / client.snapshots_sent if client.snapshots_sent else 0
+            print(f"Joueur {client.slot + 1} {client.address}: down {client.bytes_sent / elapsed / 1024:.2f} KB/s "
+                  f"({client.snapshots_sent} snapshots, {mean_size:.0f} octets en moyenne, {client.full_snapshots_sent} complets), "
+                  f"up {client.bytes_received / elapsed / 1024:.2f} KB/s")
+            client.bytes_sent = client.bytes_received = client.snapshots_sent = client.full_snapshots_sent = 0
+
+    async def run(self, duration=None):
+        """
+        Runs the fixed-tick simulation loop.
+
+        Args:
+            duration (float, optional): The number of seconds to run. Defaults to None (forever).
+        """
+        start = next_tick = last_report = time.perf_counter()
+        tick_duration = 1.0 / NET_TICK_RATE
+        while duration is None or time.perf_counter() - start < duration:
+            now = time.perf_counter()
+            # Catch up on late ticks (bounded, so an overloaded server slows down instead of spiraling)
+            for _ in range(5):
+                if now < next_tick:
+                    break
+                self.step()
+                next_tick += tick_duration
+            else:
+                next_tick = now + tick_duration
+            if now - last_report >= NET_STATS_INTERVAL:
+                self.drop_idle_clients(now)
+                self.report(now - last_report)
+                last_report = now
+            await asyncio.sleep(max(0.0, next_tick - time.perf_counter()))
+        for client in self.clients.values():
+            self.transport.sendto(TYPE_FORMAT.pack(PACKET_BYE), client.address)
+
+async def serve(track_path, player_count, ai_count, game_mode, difficulty, host=NET_DEFAULT_HOST, port=NET_DEFAULT_PORT,
+                seed=None, duration=None, bot_count=0, broadcast_port=None):
+    """
+    Starts a headless server and runs a session.
+
+    Args:
+        track_path (str): The track file.
+        player_count (int): The number of client slots (human player cars).
+        ai_count (int): The number of AI opponents.
+        game_mode (str): The game mode ("free_play" or "race").
+        difficulty (str): The AI difficulty.
+        host (str, optional): The address to listen on. Defaults to NET_DEFAULT_HOST.
+        port (int, optional): The UDP port. Defaults to NET_DEFAULT_PORT.
+        seed (int, optional): The seed of the session. Defaults to None (random seed).
+        duration (float, optional): The number of seconds to run. Defaults to None (forever).
+        bot_count (int, optional): The number of headless bot client processes to start (local testing). Defaults to 0.
+        broadcast_port (int, optional): The TCP port to stream the session to spectators on. Defaults to None (no broadcast).
+    """
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    world = World(load_track(track_path), player_count, ai_count, game_mode, difficulty, seed=seed)
+    broadcaster = BroadcastService(world, track_path, host, broadcast_port) if broadcast_port else None
+    if broadcaster:
+        broadcaster.start()
+    loop = asyncio.get_running_loop()
+    transport, server = await loop.create_datagram_endpoint(lambda: GameServer(world, track_path, broadcaster), local_addr=(host, port))
+    print(f"Serveur {GAME_TITLE} sur {host}:{port} ({player_count} joueurs, {ai_count} IA, {game_mode}, {NET_TICK_RATE} ticks/s)")
+
+    bots = []
+    for i in range(bot_count):
+        command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "net_client.py"),
+                   "--host", host, "--port", str(port), "--bot", "--headless", "--seed", str(i)]
+        if duration is not None:
+            command += ["--duration", str(max(1.0, duration - 1.0))]
+        bots.append(subprocess.Popen(command))
+    try:
+        await server.run(duration)
+    finally:
+        transport.close()
+        if broadcaster:
+            broadcaster.stop()
+        world.shutdown()
+        for bot in bots:
+            try:
+                bot.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                bot.terminate()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=f"Headless {GAME_TITLE} multiplayer server.")
+    parser.add_argument("--host", default=NET_DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=NET_DEFAULT_PORT)
+    parser.add_argument("--track", default=DEFAULT_TRACK_PATH, help="The track file to play on")
+    parser.add_argument("--players", type=int, default=2, help="Number of client slots")
+    parser.add_argument("--ai", type=int, default=4, help="Number of AI cars")
+    parser.add_argument("--mode", choices=[GAME_MODE_FREE_PLAY, GAME_MODE_RACE], default=GAME_MODE_FREE_PLAY)
+    parser.add_argument("--difficulty", choices=list(AI_SPEED_MULTIPLIERS), default=DIFFICULTY_MEDIUM)
+    parser.add_argument("--seed", type=int, help="The seed of the session random generator")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds")
+    parser.add_argument("--bots", type=int, default=0, help="Start this many headless bot clients (local testing)")
+    parser.add_argument("--broadcast", type=int, metavar="PORT", help="Stream the session to spectators on this TCP port (see broadcast.py)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.track, args.players, args.ai, args.mode, args.difficulty, args.host, args.port,
+                          args.seed, args.duration, args.bots, args.broadcast))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,66 @@
+from collections import namedtuple
+from constants import * # Import all constants
+from car import Car # Import Car class (sprite rotation step)
+
+# A performance profile trades fidelity for speed, for the whole game:
+#   fps: target frame rate of the game loop
+#   max_step_ms: longest simulation step (the physics tick: longer frames are split into several steps)
+#   ai_planner_interval: frames between two high-level AI plans (World, recorded in the replays)
+#   rotation_step: angle step in degrees of the drawn car sprites, taken from a shared cache (0: exact rotation)
+#   effects_budget: impact messages printed per simulation step (see World._apply_collision_events)
+#   hud_detail: RENDER_DETAIL_MINIMAL (player HUD only) or RENDER_DETAIL_REDUCED (AI score board too)
+#   debug_overlays: whether the debug overlays are drawn (wall normals, racing line, waypoints, coordinates)
+#   render: whether the frames are drawn at all
+#   render_scale: internal render resolution of the scene, as a fraction of the window size (see render_scaling)
+PerformanceProfile = namedtuple("PerformanceProfile", ["name", "fps", "max_step_ms", "ai_planner_interval", "rotation_step",
+                                                       "effects_budget", "hud_detail", "debug_overlays", "render", "render_scale"])
+
+PERF_PROFILES = {
+    "low": PerformanceProfile("low", 30, 34, 20, 10, 1, RENDER_DETAIL_MINIMAL, False, True, 0.5),
+    "medium": PerformanceProfile("medium", FPS, PACING_MAX_STEP_MS, AI_PLANNER_INTERVAL, 5, 2, RENDER_DETAIL_REDUCED, False, True, 1.0),
+    "high": PerformanceProfile("high", FPS, PACING_MAX_STEP_MS, AI_PLANNER_INTERVAL, 0, COLLISION_LOG_LIMIT, RENDER_DETAIL_REDUCED, True, True, 1.0),
+    "headless": PerformanceProfile("headless", FPS, PACING_MAX_STEP_MS, AI_PLANNER_INTERVAL, 0, 0, RENDER_DETAIL_MINIMAL, False, False, 1.0)
+}
+PERF_PROFILE_NAMES = tuple(PERF_PROFILES) # Menu order, from the lightest
+
+def max_render_detail(profile):
+    """
+    Returns the highest render detail a profile allows (the frame pacing may lower it further).
+
+    Args:
+        profile (PerformanceProfile): The profile.
+
+    Returns:
+        int: The RENDER_DETAIL_* level.
+    """
+    return RENDER_DETAIL_FULL if profile.debug_overlays else profile.hud_detail
+
+def get_profile(name):
+    """
+    Returns a performance profile by name.
+
+    Args:
+        name (str): The name of the profile ("low", "medium", "high" or "headless").
+
+    Returns:
+        PerformanceProfile: The profile.
+
+    Raises:
+        ValueError: If there is no profile of that name.
+    """
+    profile = PERF_PROFILES.get(name)
+    if profile is None:
+        raise ValueError(f"Unknown performance profile {name!r} (expected one of {', '.join(PERF_PROFILE_NAMES)})")
+    return profile
+
+def apply_profile(profile):
+    """
+    Applies the process-wide settings of a profile (the session ones are passed to the World and the
+    frame pacer by run_game_session).
+
+    Args:
+        profile (PerformanceProfile): The profile.
+    """
+    Car.rotation_step = profile.rotation_step
+    print(f"Profil de performance: {profile.name} ({profile.fps} images/s, pas de simulation de {profile.max_step_ms} ms au plus, "
+          f"plans IA toutes les {profile.ai_planner_interval} images)")
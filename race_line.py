@@ -0,0 +1,278 @@
+import math
+from array import array
+from constants import * # Import all constants
+
+def car_top_speed(speed_multiplier=1.0):
+    """
+    Returns the terminal speed of a car accelerating in a straight line.
+
+    The engine force is balanced by tire friction (linear in speed) and air drag
+    (quadratic in speed), see Car.apply_forces.
+
+    Args:
+        speed_multiplier (float, optional): The engine force multiplier of the car. Defaults to 1.0.
+
+    Returns:
+        float: The top speed in pixels per second.
+    """
+    a = DRAG_COEFF
+    b = FRICTION_COEFF * CAR_MASS
+    c = -ENGINE_FORCE * speed_multiplier
+    return (-b + math.sqrt(b * b - 4 * a * c)) / (2 * a)
+
+class RaceLine:
+    """
+    Smoothed, arc-length parameterized racing line with a target speed profile.
+
+    The line is built once per track from the race waypoints (and the distance field
+    of the walls, if available). Samples are evenly spaced along the line so the AI
+    can look up positions, target speeds and the next waypoint by index.
+    """
+    def __init__(self, waypoints, distance_field=None, spacing=RACE_LINE_SPACING):
+        """
+        Builds the racing line.
+
+        Args:
+            waypoints (list): The (x, y) race waypoints, in driving order (closed loop).
+            distance_field (DistanceField, optional): The track distance field, used to keep the line clear of walls. Defaults to None.
+            spacing (float, optional): The distance between two samples of the line. Defaults to RACE_LINE_SPACING.
+        """
+        self.waypoints = [(float(x), float(y)) for x, y in waypoints]
+        self.spacing = spacing
+
+        points = self._densify(self.waypoints, spacing)
+        points = self._smooth(points, distance_field)
+        self.xs, self.ys = self._resample(points, spacing)
+        self.count = len(self.xs)
+        self.length = self.count * spacing
+        self.points = list(zip(self.xs, self.ys)) # For drawing
+
+        self._compute_headings_and_curvature()
+        self._compute_speed_profile()
+        self._compute_next_waypoints()
+
+    # Arrays and parameters saved when a track is compiled
+    ARRAY_FIELDS = ("xs", "ys", "dir_x", "dir_y", "curvature", "speeds", "corner_sample", "next_waypoint")
+    METADATA_FIELDS = ("waypoints", "spacing", "count", "length", "top_speed", "braking_points")
+
+    @classmethod
+    def from_arrays(cls, metadata, arrays):
+        """
+        Rebuilds a racing line from precomputed data (see Track compilation).
+
+        Args:
+            metadata (dict): The parameters returned by metadata().
+            arrays (dict): The per-sample arrays, by name (see ARRAY_FIELDS).
+
+        Returns:
+            RaceLine: The racing line.
+        """
+        race_line = cls.__new__(cls)
+        for name in cls.METADATA_FIELDS:
+            setattr(race_line, name, metadata[name])
+        race_line.waypoints = [tuple(w) for w in race_line.waypoints]
+        for name in cls.ARRAY_FIELDS:
+            setattr(race_line, name, arrays[name])
+        race_line.points = list(zip(race_line.xs, race_line.ys))
+        return race_line
+
+    def metadata(self):
+        """
+        Returns the parameters needed by from_arrays.
+        """
+        return {name: getattr(self, name) for name in self.METADATA_FIELDS}
+
+    # --- Preprocessing ---
+
+    @staticmethod
+    def _densify(waypoints, spacing):
+        """
+        Subdivides the closed waypoint polygon into points about `spacing` apart.
+        """
+        points = []
+        for i, (ax, ay) in enumerate(waypoints):
+            bx, by = waypoints[(i + 1) % len(waypoints)]
+            steps = max(1, int(math.hypot(bx - ax, by - ay) / spacing))
+            for step in range(steps):
+                t = step / steps
+                points.append([ax + (bx - ax) * t, ay + (by - ay) * t])
+        return points
+
+    @staticmethod
+    def _smooth(points, distance_field):
+        """
+        Rounds the corners of the closed polygon and pushes the points away from the walls.
+        """
+        count = len(points)
+        clearance = RACE_LINE_WALL_CLEARANCE
+        for _ in range(RACE_LINE_SMOOTHING_PASSES):
+            smoothed = []
+            for i in range(count):
+                prev_point = points[i - 1]
+                point = points[i]
+                next_point = points[(i + 1) % count]
+                smoothed.append([
+                    (prev_point[0] + 2 * point[0] + next_point[0]) / 4,
+                    (prev_point[1] + 2 * point[1] + next_point[1]) / 4
+                ])
+            points = smoothed
+
+            if distance_field:
+                for point in points:
+                    distance, push_x, push_y = distance_field.sample(point[0], point[1])
+                    if distance < clearance:
+                        point[0] += push_x * (clearance - distance)
+                        point[1] += push_y * (clearance - distance)
+        return points
+
+    @staticmethod
+    def _resample(points, spacing):
+        """
+        Resamples the closed polyline at a constant arc length.
+        """
+        xs = array('d')
+        ys = array('d')
+        count = len(points)
+        carry = 0.0 # Arc length left over from the previous segment
+        for i in range(count):
+            ax, ay = points[i]
+            bx, by = points[(i + 1) % count]
+            segment_length = math.hypot(bx - ax, by - ay)
+            position = carry
+            while position < segment_length:
+                t = position / segment_length
+                xs.append(ax + (bx - ax) * t)
+                ys.append(ay + (by - ay) * t)
+                position += spacing
+            carry = position - segment_length
+        return xs, ys
+
+    def _compute_headings_and_curvature(self):
+        """
+        Computes the unit direction and the curvature of the line at each sample.
+        """
+        count = self.count
+        xs, ys = self.xs, self.ys
+        self.dir_x = array('d', [0.0]) * count
+        self.dir_y = array('d', [0.0]) * count
+        self.curvature = array('d', [0.0]) * count
+        for i in range(count):
+            px, py = xs[i - 1], ys[i - 1]
+            nx, ny = xs[(i + 1) % count], ys[(i + 1) % count]
+            dx, dy = nx - px, ny - py
+            chord = math.hypot(dx, dy)
+            if chord > 0:
+                self.dir_x[i] = dx / chord
+                self.dir_y[i] = dy / chord
+
+            # Menger curvature of the three consecutive samples
+            ax, ay = xs[i] - px, ys[i] - py
+            bx, by = nx - xs[i], ny - ys[i]
+            cross = ax * by - ay * bx
+            denominator = math.hypot(ax, ay) * math.hypot(bx, by) * chord
+            if denominator > 0:
+                self.curvature[i] = 2 * cross / denominator
+
+    def _compute_speed_profile(self):
+        """
+        Computes the target speed at each sample from the curvature and the braking distance.
+        """
+        count = self.count
+        top_speed = car_top_speed()
+        speeds = array('d', [top_speed]) * count
+        for i in range(count):
+            k = abs(self.curvature[i])
+            if k > 1e-6:
+                speeds[i] = min(top_speed, math.sqrt(RACE_LINE_MAX_LATERAL_ACCEL / k))
+
+        # Backward pass: start braking early enough to reach the corner speed.
+        # Two laps so the constraint wraps around the start of the loop.
+        two_ds_decel = 2 * RACE_LINE_BRAKE_DECEL * self.spacing
+        for step in range(2 * count):
+            i = (-step - 1) % count
+            reachable = math.sqrt(speeds[(i + 1) % count] ** 2 + two_ds_decel)
+            if reachable < speeds[i]:
+                speeds[i] = reachable
+
+        self.speeds = speeds
+        self.top_speed = top_speed
+        # Braking points: samples where the target speed starts to drop
+        self.braking_points = [i for i in range(count) if speeds[i - 1] <= speeds[i] > speeds[(i + 1) % count]]
+        self._compute_corner_samples()
+
+    def _compute_corner_samples(self):
+        """
+        Computes, for each sample between a braking point and the slowest sample of its corner,
+        the index of that slowest sample (-1 for the other samples).
+        """
+        count, speeds = self.count, self.speeds
+        self.corner_sample = array('i', [-1]) * count
+        for start in self.braking_points:
+            # Walk down the braking zone to the corner speed
+            corner = start
+            while speeds[(corner + 1) % count] < speeds[corner] and (corner + 1) % count != start:
+                corner = (corner + 1) % count
+            i = start
+            while i != corner:
+                self.corner_sample[i] = corner
+                i = (i + 1) % count
+
+    def _compute_next_waypoints(self):
+        """
+        Computes, for each sample, the index of the next race waypoint along the line.
+        """
+        waypoint_indices = [self.nearest_index(x, y) for x, y in self.waypoints]
+        self.next_waypoint = array('i', [0]) * self.count
+        for w, start in enumerate(waypoint_indices):
+            end = waypoint_indices[(w + 1) % len(waypoint_indices)]
+            i = start
+            while i != end:
+                self.next_waypoint[i] = (w + 1) % len(self.waypoints)
+                i = (i + 1) % self.count
+
+    # --- Queries ---
+
+    def nearest_index(self, x, y, hint=None):
+        """
+        Returns the index of the sample closest to a point.
+
+        With a hint (the index returned on the previous frame), the search only walks a
+        few samples from it, so tracking a car along the line is O(1) per frame.
+
+        Args:
+            x (float): The x-coordinate of the point.
+            y (float): The y-coordinate of the point.
+            hint (int, optional): The previous closest index. Defaults to None (full search).
+
+        Returns:
+            int: The index of the closest sample.
+        """
+        xs, ys, count = self.xs, self.ys, self.count
+        if hint is not None:
+            best = hint
+            best_dist = (xs[best] - x) ** 2 + (ys[best] - y) ** 2
+            for direction in (1, -1):
+                while True:
+                    i = (best + direction) % count
+                    dist = (xs[i] - x) ** 2 + (ys[i] - y) ** 2
+                    if dist >= best_dist:
+                        break
+                    best, best_dist = i, dist
+            if best_dist <= RACE_LINE_RESYNC_DISTANCE ** 2:
+                return best
+
+        # Full search (first lookup or car far from the line, e.g. after a respawn)
+        return min(range(count), key=lambda i: (xs[i] - x) ** 2 + (ys[i] - y) ** 2)
+
+    def index_ahead(self, index, distance):
+        """
+        Returns the index of the sample `distance` pixels further along the line.
+
+        Args:
+            index (int): The starting sample index.
+            distance (float): The distance along the line in pixels.
+
+        Returns:
+            int: The sample index.
+        """
+        return (index + int(distance / self.spacing)) % self.count
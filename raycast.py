@@ -0,0 +1,573 @@
+import math
+import struct
+from array import array
+from collections import namedtuple
+from constants import * # Import all constants
+
+try:
+    import numpy # Optional: vectorized ray-cast kernel
+except ImportError:
+    numpy = None
+
+# Kinds of entity a ray can hit
+HIT_NONE = 0
+HIT_WALL = 1
+HIT_CAR = 2
+
+# Car collision triangle circumradius (distance from the car center to the rear corners)
+CAR_BOUNDING_RADIUS = math.hypot(CAR_WIDTH / 2, CAR_LENGTH / 2)
+
+# Per car in the ray caster: center x, y, bounding radius, then the 3 triangle points (x, y)
+CAR_DATA_SIZE = 9
+
+# Snapshot of a batch of readings: ray count, rays per car (then the distances, kinds and ids)
+HITS_HEADER_FORMAT = struct.Struct("<ii")
+
+FAR_CAR_DATA = array('d', [1e12, 1e12, 0.0] + [0.0] * 6) # Car data of a destroyed car
+
+# Sensor readings of one car: memoryview slices of a RayHits batch (no copy)
+WhiskerView = namedtuple("WhiskerView", ["distances", "kinds", "ids"])
+
+class WallGrid:
+    """
+    Uniform grid index of the static walls (broad phase).
+
+    Each cell lists the walls whose bounding rect overlaps it. The segment data of the
+    walls is also flattened into arrays for the ray-cast kernel.
+    """
+    def __init__(self, walls, cell_size=WALL_GRID_CELL_SIZE):
+        """
+        Builds the wall index.
+
+        Args:
+            walls (iterable): The Wall objects of the track.
+            cell_size (int, optional): The size of a grid cell in pixels. Defaults to WALL_GRID_CELL_SIZE.
+        """
+        self.walls = list(walls)
+        self.cell_size = cell_size
+        self.origin_x = min(w.rect.left for w in self.walls)
+        self.origin_y = min(w.rect.top for w in self.walls)
+        self.cols = int(math.ceil((max(w.rect.right for w in self.walls) - self.origin_x) / cell_size)) + 1
+        self.rows = int(math.ceil((max(w.rect.bottom for w in self.walls) - self.origin_y) / cell_size)) + 1
+
+        cells = [[] for _ in range(self.cols * self.rows)]
+        for wall_index, wall in enumerate(self.walls):
+            col_start, col_end, row_start, row_end = self._cell_range(wall.rect)
+            for row in range(row_start, row_end + 1):
+                for col in range(col_start, col_end + 1):
+                    cells[row * self.cols + col].append(wall_index)
+
+        # Cells stored as flat arrays: the walls of cell c are cell_walls[cell_offsets[c]:cell_offsets[c + 1]]
+        self.cell_offsets = array('i', [0])
+        self.cell_walls = array('i')
+        for cell in cells:
+            self.cell_walls.extend(cell)
+            self.cell_offsets.append(len(self.cell_walls))
+        self._init_segments()
+
+    @classmethod
+    def from_arrays(cls, walls, metadata, cell_offsets, cell_walls):
+        """
+        Rebuilds a wall index from precomputed data (see Track compilation).
+
+        Args:
+            walls (list): The Wall objects of the track, in the indexed order.
+            metadata (dict): The grid parameters returned by metadata().
+            cell_offsets (sequence): The precomputed cell offsets.
+            cell_walls (sequence): The precomputed wall indices of the cells.
+
+        Returns:
+            WallGrid: The wall index.
+        """
+        grid = cls.__new__(cls)
+        grid.walls = list(walls)
+        grid.cell_size = metadata["cell_size"]
+        grid.origin_x = metadata["origin_x"]
+        grid.origin_y = metadata["origin_y"]
+        grid.cols = metadata["cols"]
+        grid.rows = metadata["rows"]
+        grid.cell_offsets = cell_offsets
+        grid.cell_walls = cell_walls
+        grid._init_segments()
+        return grid
+
+    def metadata(self):
+        """
+        Returns the grid parameters needed by from_arrays.
+        """
+        return {"cell_size": self.cell_size, "origin_x": self.origin_x, "origin_y": self.origin_y,
+                "cols": self.cols, "rows": self.rows}
+
+    def _init_segments(self):
+        """
+        Flattens the segment data of the walls for the ray-cast kernel.
+        """
+        # Flat segment data: start point, direction (end - start) and half thickness
+        self.seg_ax = array('d', [w.p1.x for w in self.walls])
+        self.seg_ay = array('d', [w.p1.y for w in self.walls])
+        self.seg_sx = array('d', [w.p2.x - w.p1.x for w in self.walls])
+        self.seg_sy = array('d', [w.p2.y - w.p1.y for w in self.walls])
+        self.seg_len = array('d', [(w.p2 - w.p1).length() for w in self.walls])
+        self.seg_half_thickness = array('d', [w.thickness / 2 for w in self.walls])
+
+        # Query stamps, used to report each wall once per query without building sets
+        self._stamps = array('l', [0]) * len(self.walls)
+        self._stamp = 0
+
+    def _cell_range(self, rect):
+        """
+        Returns the (clamped) column and row range of the cells overlapped by a rect.
+        """
+        cs = self.cell_size
+        col_start = max(0, int((rect.left - self.origin_x) // cs))
+        col_end = min(self.cols - 1, int((rect.right - self.origin_x) // cs))
+        row_start = max(0, int((rect.top - self.origin_y) // cs))
+        row_end = min(self.rows - 1, int((rect.bottom - self.origin_y) // cs))
+        return col_start, col_end, row_start, row_end
+
+    def walls_near(self, rect):
+        """
+        Returns the walls registered in the cells overlapped by a rect.
+
+        Args:
+            rect (pygame.Rect): The query rect (e.g. a car or bullet rect).
+
+        Returns:
+            list: The candidate Wall objects, each listed once.
+        """
+        self._stamp += 1
+        stamp = self._stamp
+        stamps = self._stamps
+        cell_offsets = self.cell_offsets
+        cell_walls = self.cell_walls
+        result = []
+        col_start, col_end, row_start, row_end = self._cell_range(rect)
+        for row in range(row_start, row_end + 1):
+            base = row * self.cols
+            for col in range(col_start, col_end + 1):
+                cell = base + col
+                for k in range(cell_offsets[cell], cell_offsets[cell + 1]):
+                    wall_index = cell_walls[k]
+                    if stamps[wall_index] != stamp:
+                        stamps[wall_index] = stamp
+                        result.append(self.walls[wall_index])
+        return result
+
+class RayHits:
+    """
+    Results of a batch of rays: hit distance, kind of entity hit and its id, per ray.
+
+    Ids are wall indices (in WallGrid.walls) for HIT_WALL and car indices (in the car
+    list given to RayCaster.set_cars) for HIT_CAR.
+    """
+    def __init__(self, ray_count, rays_per_car=0):
+        self.ray_count = ray_count
+        self.rays_per_car = rays_per_car
+        self.distances = array('d', [0.0]) * ray_count
+        self.kinds = array('b', [HIT_NONE]) * ray_count
+        self.ids = array('i', [-1]) * ray_count
+
+    def write_state(self, out):
+        """
+        Appends the readings to a snapshot buffer (the whisker readings of the cars that did not cast this frame are part of the state).
+
+        Args:
+            out (bytearray): The buffer.
+        """
+        out += HITS_HEADER_FORMAT.pack(self.ray_count, self.rays_per_car)
+        out += self.distances.tobytes()
+        out += self.kinds.tobytes()
+        out += self.ids.tobytes()
+
+    def read_state(self, data, offset):
+        """
+        Restores the readings written by write_state, in place.
+
+        Args:
+            data (memoryview): The snapshot.
+            offset (int): The position of the readings in it.
+
+        Returns:
+            int: The position after the readings.
+
+        Raises:
+            ValueError: If the readings do not have the size of this batch.
+        """
+        ray_count, rays_per_car = HITS_HEADER_FORMAT.unpack_from(data, offset)
+        if ray_count != self.ray_count or rays_per_car != self.rays_per_car:
+            raise ValueError(f"The snapshot has {ray_count} sensor rays, the world {self.ray_count}")
+        offset += HITS_HEADER_FORMAT.size
+        for column in (self.distances, self.kinds, self.ids):
+            size = ray_count * column.itemsize
+            memoryview(column).cast('B')[:] = data[offset:offset + size] # In place: the WhiskerView slices stay valid
+            offset += size
+        return offset
+
+    def for_car(self, car_index):
+        """
+        Returns the sensor readings of one car of a whisker batch, without copying.
+
+        Args:
+            car_index (int): The index of the car in the batch.
+
+        Returns:
+            WhiskerView: Memoryview slices of the distances, kinds and ids of the car rays.
+        """
+        start = car_index * self.rays_per_car
+        end = start + self.rays_per_car
+        return WhiskerView(memoryview(self.distances)[start:end],
+                           memoryview(self.kinds)[start:end],
+                           memoryview(self.ids)[start:end])
+
+class RayCaster:
+    """
+    Batched ray casts against the walls (through the static wall index) and the car triangles.
+
+    A ray is tested against the walls of the index cells overlapped by its bounding box, and
+    against every car triangle. With numpy, the whole batch goes through one vectorized pass
+    (every ray against the walls of its cells, then against the cars near it); otherwise, or for
+    a few rays, a Python loop does the same tests ray by ray. Both kernels return the same
+    readings to the last bit (the closest hit, ties going to the wall, then to the lowest id),
+    so the simulation does not depend on numpy being installed.
+    """
+    def __init__(self, walls, cell_size=WALL_GRID_CELL_SIZE, wall_grid=None, use_numpy=RAYCAST_NUMPY):
+        """
+        Initializes the ray caster.
+
+        Args:
+            walls (iterable): The Wall objects of the track.
+            cell_size (int, optional): The size of a wall index cell in pixels. Defaults to WALL_GRID_CELL_SIZE.
+            wall_grid (WallGrid, optional): A prebuilt wall index (e.g. loaded with the track). Defaults to None (built).
+            use_numpy (bool, optional): Whether large batches use the numpy kernel, if numpy is installed. Defaults to RAYCAST_NUMPY.
+        """
+        self.wall_grid = wall_grid if wall_grid is not None else WallGrid(walls, cell_size)
+        self.cars = []
+        self.car_indices = {} # id(car) -> index in cars
+        self._car_data = array('d') # CAR_DATA_SIZE values per car
+        self.use_numpy = use_numpy and numpy is not None
+        if self.use_numpy:
+            grid = self.wall_grid
+            self._np_cell_offsets = numpy.asarray(grid.cell_offsets, dtype=numpy.int64)
+            self._np_cell_walls = numpy.asarray(grid.cell_walls, dtype=numpy.int64)
+            self._np_segments = [numpy.asarray(column, dtype=numpy.float64) for column in
+                                 (grid.seg_ax, grid.seg_ay, grid.seg_sx, grid.seg_sy, grid.seg_len, grid.seg_half_thickness)]
+        # Whisker batches: ray buffers reused from frame to frame
+        self._whisker_rays = None
+        self._whisker_scratch = None
+        self._whisker_angles = []
+
+    def set_cars(self, cars):
+        """
+        Captures the car triangles for the following queries. Called once per frame, after physics.
+
+        Args:
+            cars (list): The cars that rays can hit (destroyed cars are ignored).
+        """
+        if len(cars) != len(self.cars) or any(car is not known for car, known in zip(cars, self.cars)):
+            self.cars = list(cars)
+            self.car_indices = {id(car): i for i, car in enumerate(self.cars)}
+            self._car_data = array('d', [0.0]) * (len(self.cars) * CAR_DATA_SIZE)
+        data = self._car_data
+        base = 0
+        for car in self.cars:
+            if car.hp <= 0 and not car.is_disabled:
+                data[base:base + CAR_DATA_SIZE] = FAR_CAR_DATA # Far away, never hit
+            else:
+                center_x, center_y = car.position.x, car.position.y
+                data[base] = center_x
+                data[base + 1] = center_y
+                # Bounding radius of the actual triangle (a disabled car keeps the one of its last active frame)
+                radius = CAR_BOUNDING_RADIUS
+                p = base + 3
+                for point in car.get_collision_polygon():
+                    data[p] = point.x
+                    data[p + 1] = point.y
+                    radius = max(radius, math.hypot(point.x - center_x, point.y - center_y))
+                    p += 2
+                data[base + 2] = radius
+            base += CAR_DATA_SIZE
+
+    def cast_rays(self, origins_x, origins_y, dirs_x, dirs_y, max_distance, exclude=None, hits=None, include_cars=True, ray_count=None):
+        """
+        Casts a batch of rays and returns the closest hit of each one.
+
+        Args:
+            origins_x (sequence): The x-coordinates of the ray origins.
+            origins_y (sequence): The y-coordinates of the ray origins.
+            dirs_x (sequence): The x-components of the unit ray directions.
+            dirs_y (sequence): The y-components of the unit ray directions.
+            max_distance (float): The length of the rays.
+            exclude (sequence, optional): Per ray, the index of a car the ray ignores (-1 for none). Defaults to None.
+            hits (RayHits, optional): A results buffer to reuse. Defaults to None (a new one is allocated).
+            include_cars (bool, optional): Whether the rays can hit cars or only walls. Defaults to True.
+            ray_count (int, optional): The number of rays, if only the start of the sequences is used. Defaults to None (their length).
+
+        Returns:
+            RayHits: The hit distance (max_distance if nothing was hit), kind and id of each ray.
+        """
+        if ray_count is None:
+            ray_count = len(origins_x)
+        if hits is None or hits.ray_count < ray_count:
+            hits = RayHits(ray_count)
+        if self.use_numpy and ray_count >= RAYCAST_NUMPY_MIN_RAYS:
+            self._cast_rays_numpy(origins_x, origins_y, dirs_x, dirs_y, max_distance, exclude, hits, include_cars, ray_count)
+        else:
+            self._cast_rays_python(origins_x, origins_y, dirs_x, dirs_y, max_distance, exclude, hits, include_cars, ray_count)
+        return hits
+
+    def _cast_rays_python(self, origins_x, origins_y, dirs_x, dirs_y, max_distance, exclude, hits, include_cars, ray_count):
+        """
+        Ray-cast kernel in pure Python, one ray at a time (see cast_rays).
+        """
+        out_distances, out_kinds, out_ids = hits.distances, hits.kinds, hits.ids
+
+        grid = self.wall_grid
+        cs = grid.cell_size
+        grid_x, grid_y, last_col, last_row = grid.origin_x, grid.origin_y, grid.cols - 1, grid.rows - 1
+        cols = grid.cols
+        cell_offsets, cell_walls = grid.cell_offsets, grid.cell_walls
+        seg_ax, seg_ay, seg_sx, seg_sy = grid.seg_ax, grid.seg_ay, grid.seg_sx, grid.seg_sy
+        seg_len, seg_half_thickness = grid.seg_len, grid.seg_half_thickness
+        stamps = grid._stamps
+        car_data = self._car_data
+        car_count = len(car_data) // CAR_DATA_SIZE if include_cars else 0
+
+        for r in range(ray_count):
+            ox, oy, dx, dy = origins_x[r], origins_y[r], dirs_x[r], dirs_y[r]
+            best = max_distance
+            kind = HIT_NONE
+            ident = -1
+
+            # --- Walls: the walls of the cells overlapped by the bounding box of the ray ---
+            grid._stamp += 1
+            stamp = grid._stamp
+            end_x, end_y = ox + dx * max_distance, oy + dy * max_distance
+            col_start = max(0, int((min(ox, end_x) - grid_x) // cs))
+            col_end = min(last_col, int((max(ox, end_x) - grid_x) // cs))
+            row_start = max(0, int((min(oy, end_y) - grid_y) // cs))
+            row_end = min(last_row, int((max(oy, end_y) - grid_y) // cs))
+            for row in range(row_start, row_end + 1):
+                for cell in range(row * cols + col_start, row * cols + col_end + 1):
+                    for k in range(cell_offsets[cell], cell_offsets[cell + 1]):
+                        w = cell_walls[k]
+                        if stamps[w] == stamp:
+                            continue
+                        stamps[w] = stamp
+                        sx, sy = seg_sx[w], seg_sy[w]
+                        denom = dx * sy - dy * sx
+                        if -1e-9 < denom < 1e-9: # Parallel
+                            continue
+                        ax, ay = seg_ax[w] - ox, seg_ay[w] - oy
+                        u = (ax * dy - ay * dx) / denom
+                        if u < 0.0 or u > 1.0:
+                            continue
+                        t_center = (ax * sy - ay * sx) / denom
+                        if t_center < 0.0: # Wall behind the origin
+                            continue
+                        # The ray enters the wall thickness before reaching its center line
+                        t = t_center - seg_half_thickness[w] * seg_len[w] / abs(denom)
+                        if t < 0.0: # Origin inside the wall
+                            t = 0.0
+                        if t < best or (t == best and kind == HIT_WALL and w < ident):
+                            best, kind, ident = t, HIT_WALL, w
+
+            # --- Cars: bounding circle rejection, then the three triangle edges ---
+            excluded = exclude[r] if exclude is not None else -1
+            for c in range(car_count):
+                if c == excluded:
+                    continue
+                base = c * CAR_DATA_SIZE
+                radius = car_data[base + 2]
+                to_center_x = car_data[base] - ox
+                to_center_y = car_data[base + 1] - oy
+                along = to_center_x * dx + to_center_y * dy
+                if along < -radius or along - radius > best:
+                    continue
+                across = to_center_x * dy - to_center_y * dx
+                if across > radius or across < -radius:
+                    continue
+                for e in range(3):
+                    p = base + 3 + e * 2
+                    q = base + 3 + ((e + 1) % 3) * 2
+                    sx = car_data[q] - car_data[p]
+                    sy = car_data[q + 1] - car_data[p + 1]
+                    denom = dx * sy - dy * sx
+                    if -1e-9 < denom < 1e-9:
+                        continue
+                    ax, ay = car_data[p] - ox, car_data[p + 1] - oy
+                    u = (ax * dy - ay * dx) / denom
+                    if u < 0.0 or u > 1.0:
+                        continue
+                    t = (ax * sy - ay * sx) / denom
+                    if 0.0 <= t < best:
+                        best, kind, ident = t, HIT_CAR, c
+
+            out_distances[r] = best
+            out_kinds[r] = kind
+            out_ids[r] = ident
+
+    def _cast_rays_numpy(self, origins_x, origins_y, dirs_x, dirs_y, max_distance, exclude, hits, include_cars, ray_count):
+        """
+        Vectorized ray-cast kernel (see cast_rays): the (ray, wall) pairs of the cells overlapped by each ray are
+        tested in one pass, then the (ray, car) pairs that pass the bounding circle rejection.
+        Same operations, in the same order, as _cast_rays_python.
+        """
+        np = numpy
+        ox = np.asarray(origins_x[:ray_count], dtype=np.float64)
+        oy = np.asarray(origins_y[:ray_count], dtype=np.float64)
+        dx = np.asarray(dirs_x[:ray_count], dtype=np.float64)
+        dy = np.asarray(dirs_y[:ray_count], dtype=np.float64)
+        best = np.full(ray_count, float(max_distance))
+        kinds = np.zeros(ray_count, dtype=np.int8)
+        ids = np.full(ray_count, -1, dtype=np.int64)
+
+        # --- Walls: expand each ray into the cells of its bounding box, then into the walls of the cells ---
+        grid = self.wall_grid
+        cs = grid.cell_size
+        end_x, end_y = ox + dx * max_distance, oy + dy * max_distance
+        col_start = np.maximum(0, (np.minimum(ox, end_x) - grid.origin_x) // cs).astype(np.int64)
+        col_end = np.minimum(grid.cols - 1, (np.maximum(ox, end_x) - grid.origin_x) // cs).astype(np.int64)
+        row_start = np.maximum(0, (np.minimum(oy, end_y) - grid.origin_y) // cs).astype(np.int64)
+        row_end = np.minimum(grid.rows - 1, (np.maximum(oy, end_y) - grid.origin_y) // cs).astype(np.int64)
+        span_cols = np.maximum(0, col_end - col_start + 1)
+        cell_counts = span_cols * np.maximum(0, row_end - row_start + 1)
+        cell_rays = np.repeat(np.arange(ray_count), cell_counts)
+        local = np.arange(len(cell_rays)) - np.repeat(np.cumsum(cell_counts) - cell_counts, cell_counts)
+        cells = (row_start[cell_rays] + local // span_cols[cell_rays]) * grid.cols + col_start[cell_rays] + local % span_cols[cell_rays]
+        first_wall = self._np_cell_offsets[cells]
+        wall_counts = self._np_cell_offsets[cells + 1] - first_wall
+        pair_rays = np.repeat(cell_rays, wall_counts)
+        local = np.arange(len(pair_rays)) - np.repeat(np.cumsum(wall_counts) - wall_counts, wall_counts)
+        walls = self._np_cell_walls[np.repeat(first_wall, wall_counts) + local]
+
+        if len(walls):
+            seg_ax, seg_ay, seg_sx, seg_sy, seg_len, seg_half_thickness = self._np_segments
+            ray_ox, ray_oy, ray_dx, ray_dy = ox[pair_rays], oy[pair_rays], dx[pair_rays], dy[pair_rays]
+            sx, sy = seg_sx[walls], seg_sy[walls]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                denom = ray_dx * sy - ray_dy * sx
+                ax, ay = seg_ax[walls] - ray_ox, seg_ay[walls] - ray_oy
+                u = (ax * ray_dy - ay * ray_dx) / denom
+                t_center = (ax * sy - ay * sx) / denom
+                t = t_center - seg_half_thickness[walls] * seg_len[walls] / np.abs(denom)
+            t = np.where(t < 0.0, 0.0, t)
+            valid = ~((denom > -1e-9) & (denom < 1e-9)) & (u >= 0.0) & (u <= 1.0) & (t_center >= 0.0) & (t < max_distance)
+            pair_rays, walls, t = pair_rays[valid], walls[valid], t[valid]
+            np.minimum.at(best, pair_rays, t)
+            closest = t == best[pair_rays] # Ties: the lowest wall index
+            wall_ids = np.full(ray_count, len(grid.walls), dtype=np.int64)
+            np.minimum.at(wall_ids, pair_rays[closest], walls[closest])
+            hit = wall_ids < len(grid.walls)
+            kinds[hit] = HIT_WALL
+            ids[hit] = wall_ids[hit]
+
+        # --- Cars: bounding circle rejection for every (car, ray) pair, then the triangle edges of the others ---
+        car_count = len(self._car_data) // CAR_DATA_SIZE if include_cars else 0
+        if car_count:
+            car_data = np.frombuffer(self._car_data, dtype=np.float64).reshape(car_count, CAR_DATA_SIZE)
+            radius = car_data[:, 2:3]
+            to_center_x = car_data[:, 0:1] - ox
+            to_center_y = car_data[:, 1:2] - oy
+            along = to_center_x * dx + to_center_y * dy
+            across = to_center_x * dy - to_center_y * dx
+            near = (along >= -radius) & (along - radius <= best) & (np.abs(across) <= radius)
+            if exclude is not None:
+                near &= np.arange(car_count)[:, None] != np.asarray(exclude[:ray_count])
+            pair_cars, pair_rays = np.nonzero(near)
+            if len(pair_cars):
+                points = car_data[pair_cars, 3:].T # Rows: x0, y0, x1, y1, x2, y2
+                px, py = points[0::2], points[1::2]
+                sx, sy = np.roll(px, -1, axis=0) - px, np.roll(py, -1, axis=0) - py
+                ray_ox, ray_oy, ray_dx, ray_dy = ox[pair_rays], oy[pair_rays], dx[pair_rays], dy[pair_rays]
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    denom = ray_dx * sy - ray_dy * sx
+                    ax, ay = px - ray_ox, py - ray_oy
+                    u = (ax * ray_dy - ay * ray_dx) / denom
+                    t = (ax * sy - ay * sx) / denom
+                valid = ~((denom > -1e-9) & (denom < 1e-9)) & (u >= 0.0) & (u <= 1.0) & (t >= 0.0)
+                t = np.where(valid, t, np.inf).min(axis=0)
+                car_best = np.full(ray_count, np.inf)
+                np.minimum.at(car_best, pair_rays, t)
+                closest = (t == car_best[pair_rays]) & (t < np.inf) # Ties: the lowest car index
+                car_ids = np.full(ray_count, car_count, dtype=np.int64)
+                np.minimum.at(car_ids, pair_rays[closest], pair_cars[closest])
+                hit = car_best < best
+                best[hit] = car_best[hit]
+                kinds[hit] = HIT_CAR
+                ids[hit] = car_ids[hit]
+
+        np.frombuffer(hits.distances, dtype=np.float64)[:ray_count] = best
+        np.frombuffer(hits.kinds, dtype=np.int8)[:ray_count] = kinds
+        np.frombuffer(hits.ids, dtype=np.intc)[:ray_count] = ids
+
+    def cast_whiskers(self, cars, count=AI_WHISKER_COUNT, max_distance=AI_WHISKER_RANGE, hits=None, frame=0, interval=1):
+        """
+        Casts `count` rays evenly spread around each car (ray 0 forward, then clockwise).
+
+        The car list must be the one given to set_cars (or a prefix of it), so each car
+        ignores its own triangle. With an interval, the casts are spread over the frames:
+        car i only casts on the frames where (frame + i) % interval == 0 and keeps its
+        previous readings in `hits` otherwise.
+
+        Args:
+            cars (list): The cars casting rays.
+            count (int, optional): The number of rays per car. Defaults to AI_WHISKER_COUNT.
+            max_distance (float, optional): The length of the rays. Defaults to AI_WHISKER_RANGE.
+            hits (RayHits, optional): The readings of the cars, updated in place. Defaults to None (new readings, all cars cast).
+            frame (int, optional): The current frame. Defaults to 0.
+            interval (int, optional): The number of frames between two casts of a car. Defaults to 1 (every frame).
+
+        Returns:
+            RayHits: The readings of all cars, use RayHits.for_car to get the rays of one car.
+        """
+        ray_count = len(cars) * count
+        if hits is None:
+            hits = RayHits(ray_count, count)
+            interval = 1
+        if self._whisker_rays is None or len(self._whisker_rays[0]) < ray_count or len(self._whisker_angles) != count:
+            self._whisker_rays = [array('d', [0.0]) * ray_count for _ in range(4)] + [array('i', [-1]) * ray_count]
+            self._whisker_scratch = RayHits(ray_count, count)
+            self._whisker_angles = [360.0 * k / count for k in range(count)]
+        origins_x, origins_y, dirs_x, dirs_y, exclude = self._whisker_rays
+        car_indices = self.car_indices
+        casting = [i for i in range(len(cars)) if (frame + i) % interval == 0]
+        r = 0
+        for i in casting:
+            car = cars[i]
+            own_index = car_indices.get(id(car), -1)
+            x, y, angle = car.position.x, car.position.y, car.angle
+            for offset in self._whisker_angles:
+                angle_rad = math.radians(angle + offset)
+                origins_x[r] = x
+                origins_y[r] = y
+                dirs_x[r] = math.sin(angle_rad)
+                dirs_y[r] = -math.cos(angle_rad)
+                exclude[r] = own_index
+                r += 1
+        if len(casting) == len(cars):
+            return self.cast_rays(origins_x, origins_y, dirs_x, dirs_y, max_distance, exclude, hits, ray_count=r)
+        scratch = self.cast_rays(origins_x, origins_y, dirs_x, dirs_y, max_distance, exclude, self._whisker_scratch, ray_count=r)
+        for k, i in enumerate(casting): # Copy the new readings to the slots of the cars
+            source, target = k * count, i * count
+            hits.distances[target:target + count] = scratch.distances[source:source + count]
+            hits.kinds[target:target + count] = scratch.kinds[source:source + count]
+            hits.ids[target:target + count] = scratch.ids[source:source + count]
+        return hits
+
+    def line_of_sight(self, from_pos, to_pos):
+        """
+        Checks that no wall stands between two points.
+
+        Args:
+            from_pos (pygame.math.Vector2): The start point.
+            to_pos (pygame.math.Vector2): The end point.
+
+        Returns:
+            bool: True if the segment between the points does not cross any wall.
+        """
+        dx, dy = to_pos.x - from_pos.x, to_pos.y - from_pos.y
+        distance = math.hypot(dx, dy)
+        if distance == 0:
+            return True
+        hits = self.cast_rays((from_pos.x,), (from_pos.y,), (dx / distance,), (dy / distance,), distance, include_cars=False)
+        return hits.kinds[0] != HIT_WALL
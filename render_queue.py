@@ -0,0 +1,128 @@
+import pygame
+from constants import * # Import all constants
+from asset_loader import assets # Import the shared fonts
+
+# Layers of the render queue, drawn in this order
+LAYER_PICKUPS = 0
+LAYER_CARS = 1
+LAYER_HP_BARS = 2
+LAYER_LABELS = 3 # Disabled car timers
+LAYER_BULLETS = 4
+LAYER_COUNT = 5
+
+STAMP_COLORKEY = (255, 0, 254) # Transparent pixels of the opaque stamps (a color they never draw)
+
+def _keyed_surface(size):
+    """
+    Returns an empty stamp of opaque pixels: colorkeyed and RLE-encoded, it blits faster than a per-pixel alpha one.
+    """
+    surface = pygame.Surface(size)
+    surface.fill(STAMP_COLORKEY)
+    surface.set_colorkey(STAMP_COLORKEY, pygame.RLEACCEL)
+    return surface
+
+class RenderQueue:
+    """
+    The sprites of a frame, gathered as (surface, position) pairs and submitted with one
+    Surface.blits call per layer instead of one draw call per primitive.
+    """
+    def __init__(self):
+        self.layers = [[] for _ in range(LAYER_COUNT)]
+
+    def add(self, layer, surface, position):
+        """
+        Adds a sprite to a layer.
+
+        Args:
+            layer (int): The LAYER_* layer.
+            surface (pygame.Surface): The sprite.
+            position (tuple or pygame.Rect): The top-left corner of the sprite on the target.
+        """
+        self.layers[layer].append((surface, position))
+
+    def flush(self, target):
+        """
+        Draws the sprites of every layer onto a surface and empties the queue.
+
+        Args:
+            target (pygame.Surface): The surface to draw on.
+        """
+        for layer in self.layers:
+            if layer:
+                target.blits(layer, doreturn=False)
+                layer.clear()
+
+class StampCache:
+    """
+    Pre-rendered sprites of the primitives drawn many times per frame (bullets, health pickups,
+    HP bars), keyed by everything that changes their pixels. Each stamp reproduces the pixels of
+    the pygame.draw calls it replaces, once blitted at the returned offset (main thread only).
+    """
+    def __init__(self):
+        self.bullets = {} # (radius, scale) -> (surface, offset of the center)
+        self.pickups = {} # (hp value, radius, scale) -> (surface, offset of the center)
+        self.hp_bars = {} # (color, filled width, width, height) -> surface
+
+    def bullet(self, radius, scale=1.0):
+        """
+        Returns the sprite of a bullet and the position of its center in the sprite.
+
+        Args:
+            radius (int): The radius of the bullet.
+            scale (float, optional): The size of a world pixel on the target. Defaults to 1.0.
+        """
+        key = (radius, scale)
+        stamp = self.bullets.get(key)
+        if stamp is None:
+            radius = max(1, round(radius * scale))
+            surface = _keyed_surface((radius * 2 + 2, radius * 2 + 2))
+            pygame.draw.circle(surface, BULLET_COLOR, (radius, radius), radius)
+            pygame.draw.circle(surface, BLACK, (radius, radius), radius, 1) # Contour
+            stamp = self.bullets[key] = (surface, radius)
+        return stamp
+
+    def pickup(self, hp_value, radius, color, scale=1.0):
+        """
+        Returns the sprite of a health pickup (disc, outline and value) and the position of its center in the sprite.
+
+        Args:
+            hp_value (int): The HP the pickup restores.
+            radius (int): The radius of the pickup.
+            color (tuple): The color of the disc.
+            scale (float, optional): The size of a world pixel on the target. Defaults to 1.0.
+        """
+        key = (hp_value, radius, color, scale)
+        stamp = self.pickups.get(key)
+        if stamp is None:
+            radius = max(1, round(radius * scale))
+            text = assets.font(max(1, round(20 * scale))).render(f"+{hp_value}", True, WHITE)
+            center = max(radius + 1, text.get_width() // 2 + 1, text.get_height() // 2 + 1)
+            surface = pygame.Surface((center * 2 + 1, center * 2 + 1), pygame.SRCALPHA)
+            pygame.draw.circle(surface, color, (center, center), radius)
+            pygame.draw.circle(surface, BLACK, (center, center), radius, 1) # Outline
+            surface.blit(text, text.get_rect(center=(center, center)))
+            stamp = self.pickups[key] = (surface, center)
+        return stamp
+
+    def hp_bar(self, color, filled_width, width, height):
+        """
+        Returns the sprite of an HP bar: filled_width pixels of color in a black outline.
+
+        Args:
+            color (tuple): The color of the filled part.
+            filled_width (int): The width of the filled part, in pixels.
+            width (int): The width of the bar, in pixels.
+            height (int): The height of the bar, in pixels.
+        """
+        key = (color, filled_width, width, height)
+        surface = self.hp_bars.get(key)
+        if surface is None:
+            surface = _keyed_surface((max(1, width), max(1, height)))
+            if filled_width > 0:
+                pygame.draw.rect(surface, color, (0, 0, filled_width, height))
+            pygame.draw.rect(surface, BLACK, (0, 0, width, height), 1)
+            self.hp_bars[key] = surface
+        return surface
+
+# The stamps of the process
+stamps = StampCache()
@@ -0,0 +1,59 @@
+import pygame
+from constants import * # Import all constants
+from asset_loader import assets # Import the shared fonts
+
+class ScaledRenderer:
+    """
+    Draws the world at an internal render resolution, then scales it to the window in one pass.
+
+    Filling and blitting cost in proportion to the pixels drawn: at a scale of 0.5 the scene has a
+    quarter of the pixels of the window. The scene is drawn into an offscreen surface of the window
+    size times the scale (World.draw_scene), then pygame.transform.scale (or smoothscale) writes it
+    into the window. The HUD is drawn afterwards at the native resolution (RENDER_HUD_NATIVE), or
+    into the offscreen surface with fonts sized for the scale.
+    At a scale of 1, the world is drawn straight into the window, as World.draw does.
+    """
+    def __init__(self, screen, scale=1.0, smooth=RENDER_SCALE_SMOOTH, hud_native=RENDER_HUD_NATIVE):
+        """
+        Initializes the renderer of a window.
+
+        Args:
+            screen (pygame.Surface): The window surface.
+            scale (float, optional): The internal resolution, as a fraction of the window size. Defaults to 1.0.
+            smooth (bool, optional): Whether to scale with smoothscale (filtered) instead of scale. Defaults to RENDER_SCALE_SMOOTH.
+            hud_native (bool, optional): Whether the HUD is drawn at the native resolution. Defaults to RENDER_HUD_NATIVE.
+        """
+        self.screen = screen
+        self.scale = scale
+        self.smooth = smooth
+        self.hud_native = hud_native
+        self.surface = None
+        if scale != 1:
+            width, height = screen.get_size()
+            self.surface = pygame.Surface((max(1, round(width * scale)), max(1, round(height * scale)))).convert(screen)
+            print(f"Rendu interne en {self.surface.get_width()}x{self.surface.get_height()} ({scale:.0%} de la fenêtre)")
+
+    def draw(self, world, font_score, font_coords, detail=RENDER_DETAIL_FULL):
+        """
+        Draws a frame of a world into the window (without flipping the display).
+
+        Args:
+            world (World): The world to draw.
+            font_score (pygame.font.Font): The font of the score board at the native resolution.
+            font_coords (pygame.font.Font): The font of the coordinates at the native resolution.
+            detail (int, optional): The render detail (RENDER_DETAIL_*). Defaults to RENDER_DETAIL_FULL.
+        """
+        surface, screen, scale = self.surface, self.screen, self.scale
+        if surface is None:
+            world.draw(screen, font_score, font_coords, detail)
+            return
+        world.draw_scene(surface, detail, scale)
+        if not self.hud_native:
+            world.draw_hud(surface, assets.font(max(1, round(SCORE_FONT_SIZE * scale))),
+                           assets.font(max(1, round(COORD_FONT_SIZE * scale))), detail, scale)
+        if self.smooth:
+            pygame.transform.smoothscale(surface, screen.get_size(), screen)
+        else:
+            pygame.transform.scale(surface, screen.get_size(), screen)
+        if self.hud_native:
+            world.draw_hud(screen, font_score, font_coords, detail)
@@ -0,0 +1,374 @@
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import random
+import struct
+import sys
+import time
+import zlib
+from array import array
+import pygame
+from constants import * # Import all constants
+from track import load_track # Import the track loader
+from world import World, PLANNER_INLINE # Import the simulation
+from asset_loader import assets # Import the shared fonts
+
+# --- Replay file format ---
+# Header: magic, format version, length of the JSON session description (track, cars, mode, seed, clock...)
+# Then a stream of records, each starting with a one-byte tag:
+#   frame:    dt in ms (uint16) + the control flags of the human players, CONTROL_BITS per player, little-endian
+#   keyframe: frame number, blob length + zlib-compressed World.snapshot()
+# A truncated file (crash while recording) stays playable up to its last complete record.
+REPLAY_MAGIC = b"APREPLAY"
+REPLAY_VERSION = 7
+HEADER_FORMAT = "<8sHI"
+RECORD_FRAME = 1
+RECORD_KEYFRAME = 2
+FRAME_FORMAT = "<BH"
+KEYFRAME_FORMAT = "<BII"
+MAX_FRAME_MS = 0xFFFF # Largest frame duration a frame record can hold
+
+CONTROL_MASK = (1 << CONTROL_BITS) - 1
+
+def file_digest(path):
+    """
+    Returns the SHA-256 hex digest of a file (used to detect a track modified since the recording).
+    """
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def pack_controls(controls):
+    """
+    Packs the control flags of the players into one integer, CONTROL_BITS per player.
+    """
+    packed = 0
+    for i, flags in enumerate(controls):
+        packed |= (flags & CONTROL_MASK) << (i * CONTROL_BITS)
+    return packed
+
+def unpack_controls(packed, player_count):
+    """
+    Unpacks the control flags of the players packed by pack_controls.
+    """
+    return [(packed >> (i * CONTROL_BITS)) & CONTROL_MASK for i in range(player_count)]
+
+class ReplayRecorder:
+    """
+    Writes the inputs of a session (and periodic keyframes) to a replay file as the game runs.
+    """
+    def __init__(self, path, world, track_path, steps_per_second=FPS):
+        """
+        Opens the replay file and writes the session description and the initial keyframe.
+
+        Args:
+            path (str): The path of the replay file.
+            world (World): The session to record (its AI planner must run inline to be replayable).
+            track_path (str): The track file of the session.
+            steps_per_second (int, optional): The simulation steps per second of the session (the frame rate of its
+                performance profile), so that keyframes are REPLAY_KEYFRAME_INTERVAL seconds apart. Defaults to FPS.
+        """
+        self.path = path
+        self.world = world
+        self.player_count = len(world.player_cars)
+        self.control_bytes = (self.player_count * CONTROL_BITS + 7) // 8
+        self.keyframe_frames = max(1, round(REPLAY_KEYFRAME_INTERVAL * steps_per_second))
+        session = {
+            "track": track_path,
+            "track_digest": file_digest(track_path),
+            "player_count": self.player_count,
+            "ai_count": len(world.ai_cars),
+            "game_mode": world.game_mode,
+            "difficulty": world.difficulty,
+            "seed": world.seed,
+            "start_ticks": world.start_ticks,
+            "planner_mode": world.planner_mode,
+            "ai_planner_interval": world.ai_planner_interval,
+            "keyframe_frames": self.keyframe_frames
+        }
+        description = json.dumps(session).encode("utf-8")
+        self.file = open(path, "wb")
+        self.file.write(struct.pack(HEADER_FORMAT, REPLAY_MAGIC, REPLAY_VERSION, len(description)))
+        self.file.write(description)
+        self.write_keyframe()
+
+    def record_frame(self, dt_ms, controls):
+        """
+        Records one frame. Called after World.step with the same arguments.
+
+        Args:
+            dt_ms (int): The duration of the frame in milliseconds (at most MAX_FRAME_MS).
+            controls (sequence): The CONTROL_* flags of each human player.
+        """
+        self.file.write(struct.pack(FRAME_FORMAT, RECORD_FRAME, dt_ms))
+        self.file.write(pack_controls(controls).to_bytes(self.control_bytes, "little"))
+        if self.world.frame % self.keyframe_frames == 0:
+            self.write_keyframe()
+
+    def write_keyframe(self):
+        """
+        Writes a full snapshot of the world (seek point).
+        """
+        blob = zlib.compress(self.world.snapshot(), 1)
+        self.file.write(struct.pack(KEYFRAME_FORMAT, RECORD_KEYFRAME, self.world.frame, len(blob)))
+        self.file.write(blob)
+
+    def close(self):
+        """
+        Closes the replay file.
+        """
+        if not self.file.closed:
+            self.file.close()
+            print(f"Replay enregistré: {self.path} ({self.world.frame} frames)")
+
+class ReplayReader:
+    """
+    Loads a replay file: session description, per-frame inputs and keyframe index.
+    """
+    def __init__(self, path):
+        """
+        Reads and indexes a replay file.
+
+        Args:
+            path (str): The path of the replay file.
+
+        Raises:
+            ValueError: If the file is not a replay or has an unsupported version.
+        """
+        with open(path, "rb") as f:
+            self.data = f.read()
+        magic, version, description_length = struct.unpack_from(HEADER_FORMAT, self.data, 0)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError(f"{path} is not a version {REPLAY_VERSION} replay file")
+        position = struct.calcsize(HEADER_FORMAT)
+        self.session = json.loads(self.data[position:position + description_length].decode("utf-8"))
+        position += description_length
+
+        self.player_count = self.session["player_count"]
+        control_bytes = (self.player_count * CONTROL_BITS + 7) // 8
+        frame_size = struct.calcsize(FRAME_FORMAT) + control_bytes
+        keyframe_size = struct.calcsize(KEYFRAME_FORMAT)
+        self.dt_ms = array('H') # Duration of frame n + 1 at index n
+        self.controls = array('Q') # Packed controls of frame n + 1 at index n
+        self.keyframe_frames = [] # Frame numbers of the keyframes (sorted)
+        self.keyframe_spans = [] # (offset, length) of the keyframe blobs
+        data = self.data
+        end = len(data)
+        while position < end:
+            tag = data[position]
+            if tag == RECORD_FRAME and position + frame_size <= end:
+                self.dt_ms.append(struct.unpack_from("<H", data, position + 1)[0])
+                self.controls.append(int.from_bytes(data[position + 3:position + frame_size], "little"))
+                position += frame_size
+            elif tag == RECORD_KEYFRAME and position + keyframe_size <= end:
+                _, frame, length = struct.unpack_from(KEYFRAME_FORMAT, data, position)
+                if position + keyframe_size + length > end:
+                    break
+                self.keyframe_frames.append(frame)
+                self.keyframe_spans.append((position + keyframe_size, length))
+                position += keyframe_size + length
+            else:
+                break # Unknown tag or truncated record
+
+        self.frame_count = len(self.dt_ms)
+        # Game time at the end of each frame, in ms (time_ms[n] is the time after n frames)
+        self.time_ms = array('Q', [0])
+        total = 0
+        for dt_ms in self.dt_ms:
+            total += dt_ms
+            self.time_ms.append(total)
+
+    def keyframe_state(self, index):
+        """
+        Returns the world state stored in a keyframe.
+
+        Args:
+            index (int): The index of the keyframe.
+
+        Returns:
+            bytes: The snapshot, as returned by World.snapshot.
+        """
+        offset, length = self.keyframe_spans[index]
+        return zlib.decompress(self.data[offset:offset + length])
+
+    def frame_at_time(self, seconds):
+        """
+        Returns the number of frames played at a given game time.
+        """
+        return min(self.frame_count, bisect.bisect_left(self.time_ms, int(seconds * 1000)))
+
+    def create_world(self):
+        """
+        Builds the world of the recorded session, in its initial state.
+
+        Returns:
+            World: The world, with an inline (deterministic) AI planner.
+        """
+        session = self.session
+        if os.path.exists(session["track"]) and file_digest(session["track"]) != session["track_digest"]:
+            print(f"Attention: la piste {session['track']} a changé depuis l'enregistrement, le replay peut diverger.")
+        return World(load_track(session["track"]), session["player_count"], session["ai_count"], session["game_mode"],
+                     session["difficulty"], seed=session["seed"], start_ticks=session["start_ticks"], planner_mode=PLANNER_INLINE,
+                     ai_planner_interval=session.get("ai_planner_interval", AI_PLANNER_INTERVAL))
+
+class ReplayPlayer:
+    """
+    Plays a replay back through the simulation, with keyframe-based seeking.
+    """
+    def __init__(self, reader, world=None, verify=False):
+        """
+        Initializes the player at the start of the replay.
+
+        Args:
+            reader (ReplayReader): The loaded replay.
+            world (World, optional): The world of the session. Defaults to None (built from the replay).
+            verify (bool, optional): Whether to compare the world with the keyframes it passes (desync detection). Defaults to False.
+        """
+        self.reader = reader
+        self.world = world if world is not None else reader.create_world()
+        self.verify = verify
+        self.desync_frames = [] # Keyframes that did not match the simulation (verify mode)
+        self.keyframe_lookup = {frame: index for index, frame in enumerate(reader.keyframe_frames)}
+
+    @property
+    def frame(self):
+        return self.world.frame
+
+    def step(self):
+        """
+        Plays the next recorded frame.
+
+        Returns:
+            bool: False if the end of the replay is reached, True otherwise.
+        """
+        frame = self.world.frame
+        if frame >= self.reader.frame_count:
+            return False
+        self.world.step(self.reader.dt_ms[frame], unpack_controls(self.reader.controls[frame], self.reader.player_count))
+        if self.verify and self.world.frame in self.keyframe_lookup:
+            expected = self.reader.keyframe_state(self.keyframe_lookup[self.world.frame])
+            if self.world.snapshot() != expected:
+                print(f"Désynchronisation du replay à la frame {self.world.frame}")
+                self.desync_frames.append(self.world.frame)
+        return True
+
+    def seek(self, frame):
+        """
+        Moves the replay to a frame: restores the closest keyframe before it, then simulates the remaining frames.
+
+        Args:
+            frame (int): The target frame number (clamped to the replay length).
+        """
+        frame = max(0, min(frame, self.reader.frame_count))
+        index = bisect.bisect_right(self.reader.keyframe_frames, frame) - 1
+        keyframe = self.reader.keyframe_frames[index] if index >= 0 else None
+        # Simulate from the current frame if it is between the keyframe and the target, otherwise restore the keyframe
+        if keyframe is not None and not (keyframe <= self.world.frame <= frame):
+            self.world.restore(self.reader.keyframe_state(index))
+        elif keyframe is None and self.world.frame > frame:
+            raise ValueError("Cannot seek backwards: the replay has no keyframe before this frame")
+        while self.world.frame < frame:
+            self.step()
+
+    def seek_time(self, seconds):
+        """
+        Moves the replay to a game time in seconds.
+        """
+        self.seek(self.reader.frame_at_time(seconds))
+
+def play_replay(screen, path):
+    """
+    Replay viewer: plays a replay file with pause, seeking and fast-forward.
+
+    Args:
+        screen (pygame.Surface): The screen to draw the replay on.
+        path (str): The path of the replay file.
+
+    Returns:
+        bool: True if the user wants to return to the main menu, False if the user wants to quit.
+    """
+    pygame.display.set_caption(f"{GAME_TITLE} - Replay")
+    clock = pygame.time.Clock()
+    reader = ReplayReader(path)
+    player = ReplayPlayer(reader)
+    world = player.world
+    font_score = assets.font(SCORE_FONT_SIZE)
+    font_coords = assets.font(COORD_FONT_SIZE)
+    total_time = reader.time_ms[-1] / 1000.0
+
+    paused = False
+    fast_forward = False
+    try:
+        while True:
+            clock.tick(FPS)
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    return False
+                if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_ESCAPE:
+                        return True
+                    elif event.key == pygame.K_SPACE:
+                        paused = not paused
+                    elif event.key == pygame.K_f:
+                        fast_forward = not fast_forward
+                    elif event.key in (pygame.K_LEFT, pygame.K_RIGHT):
+                        current_time = reader.time_ms[world.frame] / 1000.0
+                        offset = REPLAY_SEEK_STEP if event.key == pygame.K_RIGHT else -REPLAY_SEEK_STEP
+                        player.seek_time(max(0.0, current_time + offset))
+                    elif event.key == pygame.K_HOME:
+                        player.seek(0)
+                    elif event.key == pygame.K_F11: # Toggle Fullscreen
+                        pygame.display.toggle_fullscreen()
+
+            if not paused:
+                for _ in range(REPLAY_FAST_FORWARD if fast_forward else 1):
+                    if not player.step():
+                        paused = True
+                        break
+
+            world.draw(screen, font_score, font_coords)
+            status = "PAUSE" if paused else f"x{REPLAY_FAST_FORWARD}" if fast_forward else "PLAY"
+            replay_text = font_score.render(
+                f"Replay {reader.time_ms[world.frame] / 1000.0:.1f}s / {total_time:.1f}s [{status}]  "
+                f"SPACE: pause  LEFT/RIGHT: -/+{REPLAY_SEEK_STEP:.0f}s  F: fast-forward  ESC: menu", True, WHITE)
+            screen.blit(replay_text, replay_text.get_rect(midbottom=(SCREEN_WIDTH / 2, SCREEN_HEIGHT - 10)))
+            pygame.display.flip()
+    finally:
+        world.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play or check an AeroPizza replay file.")
+    parser.add_argument("replay", help="The replay file (.aprep)")
+    parser.add_argument("--verify", action="store_true", help="Play the whole replay headless and check it against its keyframes")
+    parser.add_argument("--benchmark", type=int, metavar="N", help="Time N seeks to random positions (headless)")
+    args = parser.parse_args()
+
+    pygame.init()
+    if not args.verify and not args.benchmark:
+        window = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        play_replay(window, args.replay)
+        pygame.quit()
+        sys.exit()
+
+    replay_reader = ReplayReader(args.replay)
+    print(f"{args.replay}: {replay_reader.frame_count} frames ({replay_reader.time_ms[-1] / 1000.0:.1f}s), "
+          f"{len(replay_reader.keyframe_frames)} keyframes, {len(replay_reader.data)} bytes")
+    replay_player = ReplayPlayer(replay_reader, verify=args.verify)
+    if args.verify:
+        start = time.perf_counter()
+        while replay_player.step():
+            pass
+        elapsed = time.perf_counter() - start
+        result = "OK" if not replay_player.desync_frames else f"{len(replay_player.desync_frames)} desynchronized keyframes"
+        print(f"Verification: {result}, simulated in {elapsed:.2f}s")
+    if args.benchmark:
+        seek_rng = random.Random(0)
+        seek_times = []
+        for _ in range(args.benchmark):
+            target = seek_rng.randint(0, replay_reader.frame_count)
+            start = time.perf_counter()
+            replay_player.seek(target)
+            seek_times.append(time.perf_counter() - start)
+        print(f"Seeks: mean {sum(seek_times) / len(seek_times) * 1000:.1f} ms, max {max(seek_times) * 1000:.1f} ms")
+    replay_player.world.shutdown()
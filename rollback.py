@@ -0,0 +1,506 @@
+import argparse
+import asyncio
+import heapq
+import json
+import os
+import random
+import struct
+import time
+import zlib
+import pygame
+from constants import * # Import all constants
+from car import Car # Import Car class (player controls, sound muting)
+from track import load_track # Import the track loader
+from replay import file_digest # Import the track file hash (part of the session id)
+from world import World, PLANNER_INLINE # Import the simulation (AI planned inline: deterministic on every peer)
+from asset_loader import assets # Import the shared fonts
+
+# --- Peer-to-peer input packets ---
+# type, session id, sender slot, sender frame, ack (last frame of the receiver's inputs the sender has),
+# first input frame, input count, checksum frame (-1: none), checksum, then one control byte per frame.
+# Every packet repeats all the inputs the receiver has not acknowledged yet, so a lost packet costs nothing.
+PACKET_INPUTS = 1
+INPUTS_FORMAT = struct.Struct("<BIBIiiBiI")
+MAX_INPUTS_PER_PACKET = 255
+
+def frame_duration_ms(frame):
+    """
+    Returns the duration of a frame in milliseconds (integers averaging exactly 1000 / NET_TICK_RATE ms).
+    """
+    return (frame + 1) * 1000 // NET_TICK_RATE - frame * 1000 // NET_TICK_RATE
+
+def session_id(session):
+    """
+    Returns the id of a session description (peers only accept the packets of the same session).
+    """
+    return zlib.crc32(json.dumps(session, sort_keys=True).encode("utf-8"))
+
+class RollbackSession:
+    """
+    GGPO-style rollback on top of a deterministic World.
+
+    Every peer simulates the whole session. Only the control flags are exchanged: a frame is
+    simulated as soon as the local input is known, with the missing remote inputs predicted
+    (the last input received from that player is repeated). When a remote input arrives and
+    differs from the prediction, the state saved before that frame is restored and the frames
+    since are simulated again with the right inputs. A peer running more than max_rollback
+    frames ahead of the inputs it has waits for the others.
+    """
+    def __init__(self, world, local_slot, session_id, input_delay=ROLLBACK_INPUT_DELAY, max_rollback=ROLLBACK_MAX_FRAMES):
+        """
+        Initializes the rollback state of a peer.
+
+        Args:
+            world (World): The simulation, built identically on every peer (same seed, start ticks, inline planner).
+            local_slot (int): The player car of this peer.
+            session_id (int): The id of the session (see session_id()).
+            input_delay (int, optional): Frames between reading the local inputs and applying them. Defaults to ROLLBACK_INPUT_DELAY.
+            max_rollback (int, optional): The maximum number of frames re-simulated. Defaults to ROLLBACK_MAX_FRAMES.
+        """
+        self.world = world
+        self.local_slot = local_slot
+        self.session_id = session_id
+        self.player_count = len(world.player_cars)
+        self.input_delay = input_delay
+        self.max_rollback = max_rollback
+        self.frame = world.frame # Next frame to simulate
+
+        # The first input_delay frames have no inputs: they are known (0) for everybody
+        self.inputs = [{frame: 0 for frame in range(input_delay)} for _ in range(self.player_count)]
+        self.confirmed = [input_delay - 1] * self.player_count # Last frame up to which the inputs of each player are all known
+        self.acked = [input_delay - 1] * self.player_count # Last local input frame each peer has received
+        self.pruned = [0] * self.player_count # Inputs before these frames are forgotten
+        self.used_inputs = {} # Frame -> inputs it was simulated with (predictions included)
+        self.snapshots = [bytearray() for _ in range(max_rollback + 2)] # State before frame f at f % len (ring)
+        self.rollback_frame = None # Earliest frame simulated with a wrong prediction
+
+        self.checksums = {} # Frame -> checksum of the state before that frame, once all the inputs before it are known
+        self.remote_checksums = {}
+        self.last_remote_checksum_frame = [-1] * self.player_count
+        self.last_checksum_frame = -1
+        self.desyncs = 0
+        self.checksums_matched = 0
+
+        self.rollbacks = 0
+        self.resimulated_frames = 0
+        self.max_resimulated = 0
+        self.rollback_time = 0.0
+        self.max_rollback_time = 0.0
+        self.over_budget = 0 # Rollbacks that took longer than one frame
+        self.stalls = 0
+
+    # --- Inputs ---
+
+    def add_local_input(self, controls):
+        """
+        Records the local inputs, applied input_delay frames after the next frame.
+
+        Args:
+            controls (int): The CONTROL_* flags of the local player.
+        """
+        frame = self.frame + self.input_delay
+        if frame > self.confirmed[self.local_slot]:
+            self.inputs[self.local_slot][frame] = controls
+            self.confirmed[self.local_slot] = frame
+
+    def _input(self, slot, frame):
+        """
+        Returns the inputs of a player for a frame, predicted if they are not known yet.
+        """
+        inputs = self.inputs[slot]
+        controls = inputs.get(frame)
+        if controls is None:
+            controls = inputs[self.confirmed[slot]] # Prediction: the player keeps doing the same thing
+        return controls
+
+    def build_packet(self, slot):
+        """
+        Builds the packet for a peer: the local inputs it has not acknowledged and the latest checksum.
+
+        Args:
+            slot (int): The player slot of the peer.
+
+        Returns:
+            bytes: The packet.
+        """
+        first = self.acked[slot] + 1
+        last = min(self.confirmed[self.local_slot], first + MAX_INPUTS_PER_PACKET - 1)
+        local_inputs = self.inputs[self.local_slot]
+        controls = bytes(local_inputs[frame] for frame in range(first, last + 1))
+        checksum_frame = self.last_checksum_frame
+        return INPUTS_FORMAT.pack(PACKET_INPUTS, self.session_id, self.local_slot, self.frame, self.confirmed[slot],
+                                  first, len(controls), checksum_frame, self.checksums.get(checksum_frame, 0)) + controls
+
+    def receive(self, packet):
+        """
+        Handles a packet from a peer: stores its new inputs and schedules a rollback if a prediction was wrong.
+
+        Args:
+            packet (bytes): The packet.
+        """
+        if len(packet) < INPUTS_FORMAT.size or packet[0] != PACKET_INPUTS:
+            return
+        (_, packet_session, slot, _, ack, first, count, checksum_frame,
+         checksum) = INPUTS_FORMAT.unpack_from(packet, 0)
+        if packet_session != self.session_id or slot == self.local_slot or slot >= self.player_count:
+            return
+        self.acked[slot] = max(self.acked[slot], ack)
+        inputs = self.inputs[slot]
+        for index in range(count):
+            frame = first + index
+            if frame != self.confirmed[slot] + 1:
+                continue # Already known (or after a gap, which cannot happen as packets repeat every unacknowledged input)
+            controls = packet[INPUTS_FORMAT.size + index]
+            inputs[frame] = controls
+            self.confirmed[slot] = frame
+            used = self.used_inputs.get(frame)
+            if used is not None and used[slot] != controls and (self.rollback_frame is None or frame < self.rollback_frame):
+                self.rollback_frame = frame
+
+        if checksum_frame > self.last_remote_checksum_frame[slot]: # Each checksum is repeated until the next one
+            self.last_remote_checksum_frame[slot] = checksum_frame
+            self.remote_checksums[(slot, checksum_frame)] = checksum
+            self._check_desync(checksum_frame)
+
+    # --- Simulation ---
+
+    def can_advance(self):
+        """
+        Returns whether the next frame can be simulated without exceeding the rollback window.
+        """
+        return self.frame - min(self.confirmed) <= self.max_rollback
+
+    def advance(self):
+        """
+        Applies a pending rollback, then simulates the next frame.
+        """
+        self.synchronize()
+        self._simulate(self.frame)
+        self._update_checksum()
+
+        # Forget what a rollback can no longer need (keeping the last input of each player for the
+        # predictions, and the local inputs the other peers have not received yet)
+        limit = self.frame - len(self.snapshots)
+        self.used_inputs.pop(limit - 1, None)
+        other_acked = min((acked for slot, acked in enumerate(self.acked) if slot != self.local_slot), default=limit)
+        for slot, inputs in enumerate(self.inputs):
+            slot_limit = min(limit, self.confirmed[slot], other_acked + 1 if slot == self.local_slot else limit)
+            while self.pruned[slot] < slot_limit:
+                inputs.pop(self.pruned[slot], None)
+                self.pruned[slot] += 1
+
+    def synchronize(self):
+        """
+        Restores the state before the earliest mispredicted frame and simulates again up to the current frame.
+        """
+        if self.rollback_frame is None:
+            return
+        start = time.perf_counter()
+        first_frame, current_frame = self.rollback_frame, self.frame
+        self.rollback_frame = None
+        self.world.restore(self.snapshots[first_frame % len(self.snapshots)])
+        Car.sounds_enabled = False # The sounds of these frames were already played
+        try:
+            for frame in range(first_frame, current_frame):
+                self._simulate(frame)
+        finally:
+            Car.sounds_enabled = True
+        elapsed = time.perf_counter() - start
+        frames = current_frame - first_frame
+        self.rollbacks += 1
+        self.resimulated_frames += frames
+        self.max_resimulated = max(self.max_resimulated, frames)
+        self.rollback_time += elapsed
+        self.max_rollback_time = max(self.max_rollback_time, elapsed)
+        if elapsed > 1.0 / NET_TICK_RATE:
+            self.over_budget += 1
+
+    def _simulate(self, frame):
+        """
+        Saves the state before a frame, then simulates it with the known or predicted inputs.
+        """
+        self.world.snapshot(self.snapshots[frame % len(self.snapshots)])
+        controls = tuple(self._input(slot, frame) for slot in range(self.player_count))
+        self.used_inputs[frame] = controls
+        self.world.step(frame_duration_ms(frame), controls)
+        self.frame = frame + 1
+
+    # --- Desync detection ---
+
+    def _update_checksum(self):
+        """
+        Computes the checksum of the latest checkpoint frame whose state is final (all the inputs before it known).
+        """
+        final_frame = min(min(self.confirmed) + 1, self.frame - 1)
+        frame = final_frame - final_frame % ROLLBACK_CHECKSUM_INTERVAL
+        if frame <= self.last_checksum_frame or self.frame - frame >= len(self.snapshots):
+            return
+        self.checksums[frame] = zlib.crc32(self.snapshots[frame % len(self.snapshots)])
+        self.last_checksum_frame = frame
+        old_frame = frame - 8 * ROLLBACK_CHECKSUM_INTERVAL
+        self.checksums.pop(old_frame, None)
+        for key in [key for key in self.remote_checksums if key[1] <= old_frame]:
+            del self.remote_checksums[key]
+        self._check_desync(frame)
+
+    def _check_desync(self, frame):
+        """
+        Compares the local checksum of a frame with those the other peers sent.
+        """
+        local = self.checksums.get(frame)
+        if local is None:
+            return # Not computed locally yet
+        for slot in range(self.player_count):
+            remote = self.remote_checksums.pop((slot, frame), None)
+            if remote is None:
+                continue
+            if local != remote:
+                self.desyncs += 1
+                print(f"Désynchronisation détectée à la frame {frame} avec le joueur {slot + 1}")
+            else:
+                self.checksums_matched += 1
+
+    def report(self):
+        """
+        Prints the rollback statistics of the peer.
+        """
+        mean_frames = self.resimulated_frames / self.rollbacks if self.rollbacks else 0
+        mean_time = self.rollback_time / self.rollbacks if self.rollbacks else 0
+        print(f"Joueur {self.local_slot + 1}: {self.frame} frames, {self.rollbacks} rollbacks "
+              f"({mean_frames:.1f} frames en moyenne, {self.max_resimulated} max), "
+              f"durée {mean_time * 1000:.2f} ms en moyenne, {self.max_rollback_time * 1000:.2f} ms max, "
+              f"{self.over_budget} au-delà d'une frame, {self.stalls} attentes, "
+              f"{self.checksums_matched} checksums identiques, {self.desyncs} désynchronisations")
+
+def create_peer_world(session):
+    """
+    Builds the world of a peer-to-peer session (identical on every peer).
+
+    Args:
+        session (dict): The session description (track, players, ai, mode, difficulty, seed).
+
+    Returns:
+        World: The simulation.
+
+    Raises:
+        ValueError: If the track does not have a starting slot for every peer.
+    """
+    world = World(load_track(session["track"]), session["players"], session["ai"], session["game_mode"], session["difficulty"],
+                  seed=session["seed"], start_ticks=ROLLBACK_START_TICKS, planner_mode=PLANNER_INLINE)
+    if len(world.player_cars) != session["players"]:
+        world.shutdown()
+        raise ValueError(f"The track {session['track']} has no starting slot for {session['players']} players in {session['game_mode']} mode")
+    return world
+
+def make_session(track_path, players, ai, game_mode, difficulty, seed):
+    return {"track": track_path, "track_digest": file_digest(track_path), "players": players, "ai": ai,
+            "game_mode": game_mode, "difficulty": difficulty, "seed": seed}
+
+class BotInputs:
+    """
+    Random inputs changing twice a second, mostly accelerating (load tests and the loopback harness).
+    """
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.controls = 0
+
+    def next(self, frame):
+        if frame % 30 == 0:
+            self.controls = self.rng.randrange(1 << CONTROL_BITS) | (CONTROL_ACCELERATE if self.rng.random() < 0.8 else 0)
+        return self.controls
+
+# --- Local loopback harness ---
+
+class LoopbackNetwork:
+    """
+    In-process packet delivery with artificial latency, jitter and loss (simulated time).
+    """
+    def __init__(self, latency_ms, jitter_ms, loss, seed):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.loss = loss
+        self.rng = random.Random(seed)
+        self.queue = [] # (delivery time, order, destination slot, packet)
+        self.order = 0
+        self.packets_sent = 0
+        self.bytes_sent = 0
+
+    def send(self, destination, packet, now_ms):
+        self.packets_sent += 1
+        self.bytes_sent += len(packet)
+        if self.rng.random() < self.loss:
+            return
+        delay = max(0.0, self.latency_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms))
+        self.order += 1
+        heapq.heappush(self.queue, (now_ms + delay, self.order, destination, packet))
+
+    def deliver(self, now_ms):
+        """
+        Returns the (destination slot, packet) pairs due at a time.
+        """
+        delivered = []
+        while self.queue and self.queue[0][0] <= now_ms:
+            _, _, destination, packet = heapq.heappop(self.queue)
+            delivered.append((destination, packet))
+        return delivered
+
+def run_loopback(session, frames, latency_ms, jitter_ms, loss, seed=0):
+    """
+    Plays a session between bot peers in one process over a simulated lossy network, then checks
+    that every peer ended in exactly the same state.
+
+    Args:
+        session (dict): The session description.
+        frames (int): The number of frames to play.
+        latency_ms (float): The one-way latency of the network.
+        jitter_ms (float): The maximum deviation of the latency.
+        loss (float): The probability of losing a packet.
+        seed (int, optional): The seed of the network and bot inputs. Defaults to 0.
+
+    Returns:
+        bool: True if all the peers ended in the same state.
+    """
+    id_ = session_id(session)
+    peers = [RollbackSession(create_peer_world(session), slot, id_) for slot in range(session["players"])]
+    bots = [BotInputs(seed * 100 + slot) for slot in range(len(peers))]
+    network = LoopbackNetwork(latency_ms, jitter_ms, loss, seed)
+    tick = 0
+    start = time.perf_counter()
+    while True:
+        now_ms = tick * 1000.0 / NET_TICK_RATE
+        for destination, packet in network.deliver(now_ms):
+            peers[destination].receive(packet)
+        for peer in peers:
+            if peer.frame >= frames:
+                peer.synchronize()
+            elif peer.can_advance():
+                peer.add_local_input(bots[peer.local_slot].next(peer.frame))
+                peer.advance()
+            else:
+                peer.stalls += 1
+        if all(peer.frame >= frames and min(peer.confirmed) >= frames - 1 and peer.rollback_frame is None for peer in peers):
+            break
+        for peer in peers:
+            for other in peers:
+                if other is not peer:
+                    network.send(other.local_slot, peer.build_packet(other.local_slot), now_ms)
+        tick += 1
+    elapsed = time.perf_counter() - start
+
+    states = [peer.world.snapshot() for peer in peers]
+    identical = all(state == states[0] for state in states)
+    print(f"Loopback: {frames} frames, {session['players']} joueurs, latence {latency_ms} ms ± {jitter_ms} ms, "
+          f"pertes {loss * 100:.0f}%, {tick} ticks, {elapsed:.1f} s, "
+          f"{network.bytes_sent / max(1, network.packets_sent):.0f} octets par paquet")
+    for peer in peers:
+        peer.report()
+        peer.world.shutdown()
+    print(f"États finaux identiques: {identical}")
+    return identical
+
+# --- Network peers ---
+
+class PeerProtocol(asyncio.DatagramProtocol):
+    """
+    Queues the datagrams received from the other peers.
+    """
+    def __init__(self):
+        self.packets = []
+
+    def datagram_received(self, data, address):
+        self.packets.append(data)
+
+    def error_received(self, exc):
+        pass # Peer not started yet (ICMP port unreachable): its inputs will be sent again
+
+async def run_peer(screen, session, slot, local_port, peer_addresses, bot=False, duration=None):
+    """
+    Plays a peer-to-peer session over UDP.
+
+    Args:
+        screen (pygame.Surface or None): The screen to draw on, None to run without display.
+        session (dict): The session description (identical on every peer).
+        slot (int): The player slot of this peer.
+        local_port (int): The UDP port of this peer.
+        peer_addresses (dict): The (host, port) address of each other player slot.
+        bot (bool, optional): Whether random inputs drive the car instead of the keyboard. Defaults to False.
+        duration (float, optional): The number of seconds to play. Defaults to None (until ESC).
+    """
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(PeerProtocol, local_addr=("0.0.0.0", local_port))
+    peer = RollbackSession(create_peer_world(session), slot, session_id(session))
+    bot_inputs = BotInputs(slot)
+    font_score = assets.font(SCORE_FONT_SIZE)
+    font_coords = assets.font(COORD_FONT_SIZE)
+
+    start = next_tick = time.perf_counter()
+    running = True
+    while running and (duration is None or time.perf_counter() - start < duration):
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                running = False
+        for packet in protocol.packets:
+            peer.receive(packet)
+        protocol.packets.clear()
+
+        if peer.can_advance():
+            controls = bot_inputs.next(peer.frame) if bot else Car.read_controls(pygame.key.get_pressed(), player_num=1)
+            peer.add_local_input(controls)
+            peer.advance()
+        else:
+            peer.stalls += 1
+        for other_slot, address in peer_addresses.items():
+            transport.sendto(peer.build_packet(other_slot), address)
+
+        if screen is not None:
+            peer.world.draw(screen, font_score, font_coords)
+            pygame.display.flip()
+        next_tick += 1.0 / NET_TICK_RATE
+        await asyncio.sleep(max(0.0, next_tick - time.perf_counter()))
+
+    peer.report()
+    transport.close()
+    peer.world.shutdown()
+
+def parse_address(text):
+    host, _, port = text.rpartition(":")
+    return host or NET_DEFAULT_HOST, int(port)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=f"{GAME_TITLE} peer-to-peer rollback sessions.")
+    parser.add_argument("--track", default=DEFAULT_TRACK_PATH, help="The track file to play on")
+    parser.add_argument("--players", type=int, default=2, help="Number of peers")
+    parser.add_argument("--ai", type=int, default=2, help="Number of AI cars")
+    parser.add_argument("--mode", choices=[GAME_MODE_FREE_PLAY, GAME_MODE_RACE], default=GAME_MODE_FREE_PLAY)
+    parser.add_argument("--difficulty", choices=list(AI_SPEED_MULTIPLIERS), default=DIFFICULTY_MEDIUM)
+    parser.add_argument("--seed", type=int, default=1, help="The seed of the session (identical on every peer)")
+    # Loopback harness
+    parser.add_argument("--loopback", action="store_true", help="Run the local loopback harness (bot peers, simulated network)")
+    parser.add_argument("--frames", type=int, default=1200, help="Frames played by the loopback harness")
+    parser.add_argument("--latency", type=float, default=60.0, help="One-way latency of the loopback network (ms)")
+    parser.add_argument("--jitter", type=float, default=20.0, help="Latency jitter of the loopback network (ms)")
+    parser.add_argument("--loss", type=float, default=0.02, help="Packet loss of the loopback network (0-1)")
+    # Network peer
+    parser.add_argument("--slot", type=int, default=0, help="The player slot of this peer")
+    parser.add_argument("--port", type=int, default=NET_DEFAULT_PORT + 10, help="The local UDP port")
+    parser.add_argument("--peer", action="append", default=[], metavar="HOST:PORT",
+                        help="The address of another peer, in slot order (skipping this peer's slot)")
+    parser.add_argument("--bot", action="store_true", help="Drive the car with random inputs")
+    parser.add_argument("--headless", action="store_true", help="No window")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds")
+    args = parser.parse_args()
+
+    if args.loopback or args.headless:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        os.environ["SDL_AUDIODRIVER"] = "dummy"
+    pygame.init()
+    screen = pygame.display.set_mode((1, 1) if args.loopback or args.headless else (SCREEN_WIDTH, SCREEN_HEIGHT))
+    session = make_session(args.track, args.players, args.ai, args.mode, args.difficulty, args.seed)
+    if args.loopback:
+        run_loopback(session, args.frames, args.latency, args.jitter, args.loss, args.seed)
+    else:
+        other_slots = [slot for slot in range(args.players) if slot != args.slot]
+        peer_addresses = {slot: parse_address(address) for slot, address in zip(other_slots, args.peer)}
+        asyncio.run(run_peer(None if args.headless else screen, session, args.slot, args.port, peer_addresses,
+                             args.bot, args.duration))
+    pygame.quit()
@@ -0,0 +1,158 @@
+import struct
+from array import array
+import pygame
+from constants import * # Import all constants
+from ai_planner import AIPlan # Import the AI plan record
+
+# --- World snapshot format ---
+# A snapshot is a flat little-endian buffer, no sprite is pickled:
+#   header:  magic, version, counts, frame, game clock, next entity id, pickup spawn timer
+#   rng:     the Mersenne Twister state of the session (625 uint32) and its cached gauss value
+#   cars:    the columns of the car entity store (transform, kinematics, health, weapon, team; see EntityStore.write_state),
+#            then one fixed-size record per car, in World.car_list order (score, flags, timers, plan...)
+#   bullets: the columns of the bullet entity store
+#   pickups: the columns of the pickup entity store
+#   whiskers: the sensor readings of the AI cars (see RayHits.write_state)
+#   then the flow fields of the free-play AI (see FlowFieldCache.write_state)
+# Restoring writes the values back into the existing stores and cars.
+SNAPSHOT_MAGIC = b"APSN"
+SNAPSHOT_VERSION = 4
+HEADER_FORMAT = struct.Struct("<4sHHIIqqqd?d")
+RNG_STATE_WORDS = 625 # random.getstate(): 624 state words and the position in them
+# respawn x, y and angle, score, accelerating, braking, turning left, turning right, can fire, disabled, disabled timer,
+# waypoint, race progress (-1: None), plan (present, frame, target token (-1: None), target is a pickup, lead time),
+# rect, then the polygon
+CAR_FORMAT = "<3di6?dii?iq?d4i"
+CAR_FIELD_COUNT = 22 # Values of CAR_FORMAT, before the polygon
+
+def _car_struct(world):
+    """
+    Returns the Struct of the car records of a world (the polygon size depends on the car shape).
+    """
+    point_count = len(world.car_list[0].rotated_points) if world.car_list else 0
+    return struct.Struct(f"{CAR_FORMAT}{point_count * 2}d")
+
+def snapshot(world, out=None):
+    """
+    Packs the complete simulation state of a world into a flat buffer.
+
+    Args:
+        world (World): The session to capture.
+        out (bytearray, optional): A buffer to reuse (cleared first). Defaults to None (new buffer).
+
+    Returns:
+        bytearray: The snapshot.
+    """
+    if out is None:
+        out = bytearray()
+    else:
+        del out[:]
+    rng_version, rng_words, gauss_next = world.rng.getstate()
+    out += HEADER_FORMAT.pack(
+        SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(world.car_list), len(world.bullets), len(world.pickups),
+        world.frame, world.clock_ms, world.next_entity_id, world.health_pickup_spawn_timer,
+        gauss_next is not None, gauss_next or 0.0)
+    out += array('I', rng_words)
+
+    world.car_store.write_state(out)
+    car_struct = _car_struct(world)
+    for car in world.car_list:
+        plan = car.ai_plan
+        points = [c for p in car.rotated_points for c in (p.x, p.y)]
+        out += car_struct.pack(
+            car.initial_position.x, car.initial_position.y, car.initial_angle, car.score, car.accelerating, car.braking, car.turning_left, car.turning_right,
+            car.can_fire, car.is_disabled, car.disabled_timer, car.current_waypoint_index, -1 if car.race_progress is None else car.race_progress,
+            plan is not None, plan.frame if plan else 0,
+            -1 if plan is None or plan.target_token is None else plan.target_token,
+            plan.target_is_pickup if plan else False, plan.lead_time if plan else 0.0,
+            *car.rect, *points)
+
+    world.bullets.write_state(out)
+    world.pickups.write_state(out)
+    world.whisker_hits.write_state(out)
+
+    if world.flow_fields:
+        world.flow_fields.write_state(out)
+    return out
+
+def restore(world, data):
+    """
+    Restores a snapshot into a world built with the same track, cars and game mode.
+
+    Args:
+        world (World): The session to restore.
+        data (bytes-like): The snapshot returned by snapshot().
+
+    Raises:
+        ValueError: If the buffer is not a snapshot or does not match the cars of the world.
+    """
+    data = memoryview(data)
+    (magic, version, car_count, bullet_count, pickup_count, world.frame, world.clock_ms, world.next_entity_id,
+     world.health_pickup_spawn_timer, has_gauss, gauss_next) = HEADER_FORMAT.unpack_from(data, 0)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError(f"Not a version {SNAPSHOT_VERSION} world snapshot")
+    if car_count != len(world.car_list):
+        raise ValueError(f"The snapshot has {car_count} cars, the world {len(world.car_list)}")
+    offset = HEADER_FORMAT.size
+    rng_words = data[offset:offset + RNG_STATE_WORDS * 4].cast('I')
+    offset += RNG_STATE_WORDS * 4
+    world.rng.setstate((3, tuple(rng_words), gauss_next if has_gauss else None))
+
+    offset = world.car_store.read_state(data, offset) # The cars keep their rows (same cars, same order)
+    car_struct = _car_struct(world)
+    for car in world.car_list:
+        values = car_struct.unpack_from(data, offset)
+        offset += car_struct.size
+        (initial_x, initial_y, car.initial_angle, car.score, car.accelerating, car.braking, car.turning_left, car.turning_right,
+         car.can_fire, car.is_disabled, car.disabled_timer, car.current_waypoint_index, race_progress,
+         has_plan, plan_frame, target_token, target_is_pickup, lead_time,
+         rect_x, rect_y, rect_w, rect_h) = values[:CAR_FIELD_COUNT]
+        car.race_progress = None if race_progress == -1 else race_progress
+        car.ai_plan = AIPlan(plan_frame, None if target_token == -1 else target_token, target_is_pickup, lead_time) if has_plan else None
+        car.initial_position.update(initial_x, initial_y)
+        # The rect and polygon are those of the last active frame (a disabled car keeps them), the image is rotated when next drawn
+        car.restore_transform((rect_x, rect_y, rect_w, rect_h), values[CAR_FIELD_COUNT:])
+
+    offset = world.bullets.read_state(data, offset)
+    offset = world.pickups.read_state(data, offset)
+    offset = world.whisker_hits.read_state(data, offset)
+
+    if world.flow_fields:
+        world.flow_fields.read_state(data, offset)
+
+if __name__ == "__main__":
+    import argparse
+    import random
+    import time
+    from track import load_track # Import the track loader
+    from world import World, PLANNER_INLINE # Import the simulation
+
+    parser = argparse.ArgumentParser(description="Measure the world snapshot and restore round trip.")
+    parser.add_argument("--mode", choices=[GAME_MODE_FREE_PLAY, GAME_MODE_RACE], default=GAME_MODE_FREE_PLAY)
+    parser.add_argument("--ai", type=int, default=8, help="Number of AI cars")
+    parser.add_argument("--frames", type=int, default=300, help="Frames simulated before measuring")
+    parser.add_argument("--rounds", type=int, default=2000, help="Number of round trips measured")
+    args = parser.parse_args()
+
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    world = World(load_track(), 2, args.ai, args.mode, DIFFICULTY_PRO, seed=1, planner_mode=PLANNER_INLINE)
+    controls_rng = random.Random(1)
+    for frame in range(args.frames):
+        world.step(16, [controls_rng.randrange(1 << CONTROL_BITS) for _ in world.player_cars])
+
+    state = world.snapshot()
+    buffer = bytearray()
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        world.snapshot(buffer)
+    snapshot_time = (time.perf_counter() - start) / args.rounds
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        world.restore(state)
+    restore_time = (time.perf_counter() - start) / args.rounds
+    world.shutdown()
+
+    print(f"{len(state)} bytes ({len(world.car_list)} cars, {len(world.bullets)} bullets, "
+          f"{len(world.pickups)} pickups): snapshot {snapshot_time * 1e6:.1f} us, "
+          f"restore {restore_time * 1e6:.1f} us, round trip exact: {world.snapshot() == state}")
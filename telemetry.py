@@ -0,0 +1,214 @@
+import mmap
+import os
+import struct
+import time
+from constants import * # Import all constants
+
+# --- Telemetry file format ---
+# A fixed-size file, memory-mapped by the game and by any number of readers on the same host:
+#   header: magic, version, car count, slot count, slot size, car record size, header size,
+#           then at SEQUENCE_OFFSET the number of frames published so far and at STATE_OFFSET the
+#           session state (1 while the game writes, 0 once it is over)
+#   slots:  a ring of TELEMETRY_SLOTS slots, frame n (1-based) in slot (n - 1) % slot count:
+#           sequence, frame, game clock (ms), wall clock (s), one record per car in World.car_list
+#           order, then the sequence again
+# Each slot is written in one pass, from its first sequence to its last one. A reader copies a
+# slot, then reads its first sequence again: the copy is consistent if the three sequences are
+# equal (no lock, the game never waits for its readers).
+TELEMETRY_MAGIC = b"APTL"
+TELEMETRY_VERSION = 1
+HEADER_FORMAT = struct.Struct("<4sHHIIII")
+HEADER_SIZE = 64
+SEQUENCE_OFFSET = 24
+STATE_OFFSET = 32
+SEQUENCE_FORMAT = struct.Struct("<q")
+STATE_FORMAT = struct.Struct("<I")
+SLOT_HEADER_FORMAT = "<qqqd"
+SLOT_TRAILER_FORMAT = "q"
+# x, y, vx, vy, angle, hp, entity id, score, waypoint index, control flags
+CAR_RECORD_FORMAT = "6d4i"
+CAR_FIELDS = ("x", "y", "vx", "vy", "angle", "hp", "entity_id", "score", "waypoint", "controls")
+
+# Layout of the records as numpy dtype descriptions (numpy is not needed by the game): a reader can view
+# the whole ring without copying it, numpy.frombuffer(mapped, numpy.dtype(slot_dtype(car_count)), offset=HEADER_SIZE),
+# and check the sequences of a slot as TelemetryReader.read does
+CAR_DTYPE = [(name, "<f8") for name in CAR_FIELDS[:6]] + [(name, "<i4") for name in CAR_FIELDS[6:]]
+
+def slot_dtype(car_count):
+    """
+    Returns the numpy dtype description of a slot of a file with car_count cars.
+    """
+    return [("sequence", "<i8"), ("frame", "<i8"), ("clock_ms", "<i8"), ("time", "<f8"),
+            ("cars", CAR_DTYPE, (car_count,)), ("sequence_end", "<i8")]
+
+def _slot_struct(car_count):
+    return struct.Struct(SLOT_HEADER_FORMAT + CAR_RECORD_FORMAT * car_count + SLOT_TRAILER_FORMAT)
+
+class TelemetryWriter:
+    """
+    Publishes the state of the cars of a session, every simulated frame, to a memory-mapped ring file
+    that dashboards, replay tools or AI trainers can watch live (see TelemetryReader).
+
+    Publishing packs the values of the frame straight into the mapping (a single Struct.pack_into):
+    no system call, no copy, a few microseconds per frame.
+    """
+    def __init__(self, path, world, slots=TELEMETRY_SLOTS):
+        """
+        Creates (or replaces) the telemetry file of a session.
+
+        Args:
+            path (str): The path of the telemetry file.
+            world (World): The session to publish.
+            slots (int, optional): The number of frames kept in the ring. Defaults to TELEMETRY_SLOTS.
+        """
+        self.path = path
+        self.world = world
+        self.cars = world.car_list
+        self.slot_struct = _slot_struct(len(self.cars))
+        self.slots = slots
+        self.sequence = 0
+        size = HEADER_SIZE + self.slot_struct.size * slots
+
+        # A new file replaces the previous session's one: its readers keep their mapping (never truncated
+        # under them) and see it end, then open the new file
+        temp_path = path + ".tmp"
+        with open(temp_path, "w+b") as f:
+            f.truncate(size)
+            self.mapped = mmap.mmap(f.fileno(), size)
+        HEADER_FORMAT.pack_into(self.mapped, 0, TELEMETRY_MAGIC, TELEMETRY_VERSION, len(self.cars), slots,
+                                self.slot_struct.size, struct.calcsize("<" + CAR_RECORD_FORMAT), HEADER_SIZE)
+        STATE_FORMAT.pack_into(self.mapped, STATE_OFFSET, 1)
+        os.replace(temp_path, path)
+        print(f"Télémétrie publiée dans {path} ({slots} images, {size // 1024} KB)")
+
+    def publish(self, player_controls=()):
+        """
+        Writes the state of the current frame into the next slot of the ring.
+
+        Args:
+            player_controls (sequence, optional): The CONTROL_* flags of the human players for the frame.
+                The other cars publish the flags of their driving state (no CONTROL_FIRE).
+        """
+        world = self.world
+        self.sequence = sequence = self.sequence + 1
+        values = [sequence, world.frame, world.clock_ms, time.time()]
+        player_count = len(player_controls)
+        for i, car in enumerate(self.cars):
+            if i < player_count:
+                controls = player_controls[i]
+            else:
+                controls = (car.accelerating * CONTROL_ACCELERATE + car.braking * CONTROL_BRAKE
+                            + car.turning_left * CONTROL_TURN_LEFT + car.turning_right * CONTROL_TURN_RIGHT)
+            position, velocity = car.position, car.velocity
+            values += (position.x, position.y, velocity.x, velocity.y, car.angle, car.hp,
+                       car.entity_id, car.score, car.current_waypoint_index, controls)
+        values.append(sequence)
+        self.slot_struct.pack_into(self.mapped, HEADER_SIZE + (sequence - 1) % self.slots * self.slot_struct.size, *values)
+        SEQUENCE_FORMAT.pack_into(self.mapped, SEQUENCE_OFFSET, sequence)
+
+    def close(self):
+        """
+        Marks the session as over and unmaps the file (the file stays, with the last frames).
+        """
+        if self.mapped is None:
+            return
+        STATE_FORMAT.pack_into(self.mapped, STATE_OFFSET, 0)
+        self.mapped.close()
+        self.mapped = None
+        print(f"Télémétrie: {self.sequence} images publiées")
+
+class TelemetryReader:
+    """
+    Reads a telemetry file written by a running (or finished) session, without locking it.
+    """
+    def __init__(self, path):
+        """
+        Memory-maps a telemetry file.
+
+        Args:
+            path (str): The path of the telemetry file.
+
+        Raises:
+            ValueError: If the file is not a telemetry file of this version.
+        """
+        with open(path, "rb") as f:
+            self.mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.car_count, self.slots, slot_size, _, header_size = HEADER_FORMAT.unpack_from(self.mapped, 0)
+        if magic != TELEMETRY_MAGIC or version != TELEMETRY_VERSION:
+            raise ValueError(f"{path} is not a telemetry file (version {TELEMETRY_VERSION})")
+        self.slot_struct = _slot_struct(self.car_count)
+        if slot_size != self.slot_struct.size or header_size != HEADER_SIZE:
+            raise ValueError(f"{path} has an unexpected layout")
+
+    @property
+    def sequence(self):
+        """
+        The number of frames published so far.
+        """
+        return SEQUENCE_FORMAT.unpack_from(self.mapped, SEQUENCE_OFFSET)[0]
+
+    @property
+    def running(self):
+        """
+        Whether the session is still writing to the file.
+        """
+        return STATE_FORMAT.unpack_from(self.mapped, STATE_OFFSET)[0] == 1
+
+    def read(self, sequence):
+        """
+        Reads a published frame.
+
+        Args:
+            sequence (int): The frame to read (1 to self.sequence).
+
+        Returns:
+            tuple: The frame number, the game clock in ms, the wall clock and the car records
+                ({field: value}, CAR_FIELDS) of the frame, None if it was overwritten (or is being written).
+        """
+        offset = HEADER_SIZE + (sequence - 1) % self.slots * self.slot_struct.size
+        values = self.slot_struct.unpack_from(self.mapped, offset)
+        if values[0] != sequence or values[-1] != sequence or SEQUENCE_FORMAT.unpack_from(self.mapped, offset)[0] != sequence:
+            return None
+        field_count = len(CAR_FIELDS)
+        cars = [dict(zip(CAR_FIELDS, values[4 + i * field_count:4 + (i + 1) * field_count])) for i in range(self.car_count)]
+        return values[1], values[2], values[3], cars
+
+    def latest(self):
+        """
+        Reads the last published frame (see read), None if no frame is readable yet.
+        """
+        for _ in range(3): # The writer may be overwriting the slot: try again with the newer frame
+            sequence = self.sequence
+            if sequence == 0:
+                return None
+            frame = self.read(sequence)
+            if frame is not None:
+                return frame
+        return None
+
+    def close(self):
+        self.mapped.close()
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Print the live telemetry of a session (see --telemetry in main.py).")
+    parser.add_argument("path", help="The telemetry file")
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds between two prints")
+    args = parser.parse_args()
+
+    reader = TelemetryReader(args.path)
+    last_sequence = None
+    try:
+        while True:
+            frame = reader.latest()
+            if frame and reader.sequence != last_sequence:
+                last_sequence = reader.sequence
+                frame_number, clock_ms, _, cars = frame
+                print(f"Frame {frame_number} ({clock_ms / 1000.0:.1f}s): " + ", ".join(
+                    f"#{car['entity_id']} ({car['x']:.0f},{car['y']:.0f}) {car['hp']:.0f} PV" for car in cars))
+            if not reader.running:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    reader.close()
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The game modules are flat modules at the root of the repository, and the tests run without a window or sound
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
@@ -0,0 +1,52 @@
+import os
+import pygame
+import pytest
+from constants import * # Import all constants
+from car import Car # Import Car class (sounds)
+from track import load_track # Import the track loader
+from world import World, PLANNER_INLINE # Import the simulation
+from alloc_diagnostics import assert_step_allocations # Import the step budget
+
+STEP_PEAK_BUDGET = 16 * 1024 # Bytes a simulated step may allocate above its start (about 7 KB with 8 AI cars)
+STEP_RETAINED_BUDGET = 2 # Blocks a simulated step may leave allocated, on average
+NUMPY_STEP_PEAK_BUDGET = 96 * 1024 # Same with the numpy ray-cast kernel, whose arrays are a few large temporaries (about 55 KB)
+
+@pytest.fixture(scope="module")
+def track():
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    Car.sounds_enabled = False
+    return load_track(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), DEFAULT_TRACK_PATH))
+
+def make_world(track, game_mode, use_numpy=False):
+    world = World(track, 2, 8, game_mode, DIFFICULTY_PRO, seed=1, start_ticks=1000, planner_mode=PLANNER_INLINE)
+    world.ray_caster.use_numpy = world.ray_caster.use_numpy and use_numpy
+    return world
+
+@pytest.mark.parametrize("game_mode", [GAME_MODE_FREE_PLAY, GAME_MODE_RACE])
+def test_step_allocations_within_budget(track, game_mode):
+    world = make_world(track, game_mode)
+    try:
+        assert_step_allocations(world, [CONTROL_ACCELERATE | CONTROL_FIRE] * 2, STEP_PEAK_BUDGET, max_blocks=STEP_RETAINED_BUDGET)
+    finally:
+        world.shutdown()
+
+@pytest.mark.parametrize("game_mode", [GAME_MODE_FREE_PLAY, GAME_MODE_RACE])
+def test_numpy_step_allocations_within_budget(track, game_mode):
+    # No retained budget: numpy keeps the small buffers it frees in a cache (bounded, one bucket per size)
+    pytest.importorskip("numpy")
+    world = make_world(track, game_mode, use_numpy=True)
+    try:
+        assert_step_allocations(world, [CONTROL_ACCELERATE | CONTROL_FIRE] * 2, NUMPY_STEP_PEAK_BUDGET)
+    finally:
+        world.shutdown()
+
+def test_step_temporaries_exceed_budget(track):
+    # Temporaries freed before the end of the step leave nothing allocated, but still count at their peak
+    world = make_world(track, GAME_MODE_FREE_PLAY)
+    world.phase_hook = lambda phase: [pygame.math.Vector2(i, i) for i in range(2000)] if phase == "physics" else None
+    try:
+        with pytest.raises(AssertionError, match="at its peak"):
+            assert_step_allocations(world, [CONTROL_ACCELERATE] * 2, STEP_PEAK_BUDGET, max_blocks=STEP_RETAINED_BUDGET)
+    finally:
+        world.shutdown()
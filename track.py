@@ -0,0 +1,272 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import time
+from array import array
+import pygame
+from constants import * # Import all constants
+from wall import Wall # Import Wall class from wall.py
+from distance_field import DistanceField # Import the track distance field
+from race_line import RaceLine # Import the racing line preprocessor
+from raycast import WallGrid # Import the static wall index
+
+# --- Compiled track sidecar format ---
+# Header: magic, format version, section count, content hash of the track file
+# Section table: name, array typecode, byte offset, item count (one entry per section)
+# Sections: raw native arrays, 8-byte aligned, memory-mapped on load
+TRACK_CACHE_MAGIC = b"APTRACK\0"
+TRACK_CACHE_VERSION = 2
+HEADER_FORMAT = "<8sHxxI32s"
+SECTION_FORMAT = "<16s4sQQ"
+
+# Constants the baked data depends on: changing one of them invalidates the sidecars
+BAKE_PARAMETERS = (
+    DISTANCE_FIELD_CELL_SIZE, DISTANCE_FIELD_MAX_DISTANCE, WALL_GRID_CELL_SIZE,
+    RACE_LINE_SPACING, RACE_LINE_SMOOTHING_PASSES, RACE_LINE_WALL_CLEARANCE,
+    RACE_LINE_MAX_LATERAL_ACCEL, RACE_LINE_BRAKE_DECEL,
+    CAR_MASS, ENGINE_FORCE, FRICTION_COEFF, DRAG_COEFF
+)
+
+class Track:
+    """
+    A track: walls, race waypoints, spawn points, pickup zones and the derived data baked for it
+    (wall SAT polygons and axes, wall index, distance field and racing line).
+    """
+    def __init__(self, data, path=None):
+        """
+        Initializes a track from its parsed file content (derived data is attached by load_track).
+
+        Args:
+            data (dict): The parsed track file.
+            path (str, optional): The path of the track file. Defaults to None.
+        """
+        self.path = path
+        self.name = data.get("name", os.path.basename(path) if path else "Track")
+        self.wall_data = [
+            ((float(w["p1"][0]), float(w["p1"][1])), (float(w["p2"][0]), float(w["p2"][1])),
+             (float(w["normal"][0]), float(w["normal"][1])), w.get("thickness", 10))
+            for w in data["walls"]
+        ]
+        self.waypoints = [tuple(p) for p in data.get("waypoints", [])]
+        spawn_grids = data.get("spawn_grids", {})
+        self.race_grid = [tuple(p) for p in spawn_grids.get("race", [])] # (x, y, angle) slots
+        self.player_spawns = [tuple(p) for p in spawn_grids.get("free_play", [])] # (x, y, angle) slots
+        self.ai_spawn_zones = [tuple(z) for z in data.get("ai_spawn_zones", [])] # (x, y, width, height) areas
+        self.pickup_zones = [tuple(z) for z in data.get("pickup_zones", [])] # (x, y, width, height) areas
+
+        self.walls = pygame.sprite.Group()
+        self.wall_list = []
+        self.distance_field = None
+        self.wall_grid = None
+        self.race_line = None
+        self._cache_mmap = None # Keeps the memory-mapped sidecar alive while its arrays are used
+
+    def create_walls(self, polygons=None, axes=None):
+        """
+        Creates the Wall sprites of the track.
+
+        Args:
+            polygons (sequence, optional): The precomputed wall polygons, 8 floats per wall. Defaults to None (computed).
+            axes (sequence, optional): The precomputed wall axes, 4 floats per wall. Defaults to None (computed).
+        """
+        self.wall_list = []
+        for i, (p1, p2, normal, thickness) in enumerate(self.wall_data):
+            polygon = wall_axes = None
+            if polygons is not None:
+                polygon = [(polygons[i * 8 + k], polygons[i * 8 + k + 1]) for k in range(0, 8, 2)]
+                wall_axes = [(axes[i * 4], axes[i * 4 + 1]), (axes[i * 4 + 2], axes[i * 4 + 3])]
+            self.wall_list.append(Wall(p1, p2, pygame.math.Vector2(normal), thickness, polygon=polygon, axes=wall_axes))
+        self.walls = pygame.sprite.Group(*self.wall_list)
+
+    def build_derived_data(self):
+        """
+        Computes the derived data of the track from its walls and waypoints.
+        """
+        self.create_walls()
+        self.distance_field = DistanceField(self.wall_list)
+        self.wall_grid = WallGrid(self.wall_list)
+        self.race_line = RaceLine(self.waypoints, self.distance_field) if len(self.waypoints) >= 2 else None
+
+    # --- Sidecar serialization ---
+
+    def _sections(self):
+        """
+        Returns the baked data as (name, array) pairs.
+        """
+        polygons = array('d', [c for w in self.wall_list for p in w.polygon for c in (p.x, p.y)])
+        axes = array('d', [c for w in self.wall_list for a in w.axes for c in (a.x, a.y)])
+        metadata = {
+            "distance_field": self.distance_field.metadata(),
+            "wall_grid": self.wall_grid.metadata(),
+            "race_line": self.race_line.metadata() if self.race_line else None
+        }
+        sections = [
+            ("meta", array('B', json.dumps(metadata).encode("utf-8"))),
+            ("wall_polygons", polygons),
+            ("wall_axes", axes),
+            ("grid_offsets", self.wall_grid.cell_offsets),
+            ("grid_walls", self.wall_grid.cell_walls),
+            ("sdf_distances", self.distance_field.distances),
+            ("sdf_gradient_x", self.distance_field.gradient_x),
+            ("sdf_gradient_y", self.distance_field.gradient_y),
+            ("sdf_nearest_wall", self.distance_field.nearest_wall)
+        ]
+        if self.race_line:
+            sections += [("rl_" + name, getattr(self.race_line, name)) for name in RaceLine.ARRAY_FIELDS]
+        return sections
+
+    def write_cache(self, cache_path, digest):
+        """
+        Writes the baked data to a sidecar file.
+
+        Args:
+            cache_path (str): The path of the sidecar file.
+            digest (bytes): The content hash of the track file.
+        """
+        sections = self._sections()
+        table_size = struct.calcsize(HEADER_FORMAT) + struct.calcsize(SECTION_FORMAT) * len(sections)
+        offset = (table_size + 7) & ~7
+        table = []
+        for name, values in sections:
+            table.append((name, values, offset))
+            offset = (offset + len(values) * values.itemsize + 7) & ~7
+
+        temp_path = cache_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(struct.pack(HEADER_FORMAT, TRACK_CACHE_MAGIC, TRACK_CACHE_VERSION, len(sections), digest))
+            for name, values, section_offset in table:
+                f.write(struct.pack(SECTION_FORMAT, name.encode("ascii"), values.typecode.encode("ascii"),
+                                    section_offset, len(values)))
+            for name, values, section_offset in table:
+                f.write(b"\0" * (section_offset - f.tell()))
+                f.write(memoryview(values).cast('B'))
+        os.replace(temp_path, cache_path) # Atomic: readers never see a partial file
+
+    def read_cache(self, cache_path, digest):
+        """
+        Memory-maps a sidecar file and attaches its baked data to the track.
+
+        Args:
+            cache_path (str): The path of the sidecar file.
+            digest (bytes): The expected content hash of the track file.
+
+        Returns:
+            bool: True if the sidecar was valid and loaded, False otherwise (stale or corrupted).
+        """
+        with open(cache_path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(mapped) < struct.calcsize(HEADER_FORMAT):
+            return False
+        magic, version, section_count, file_digest = struct.unpack_from(HEADER_FORMAT, mapped, 0)
+        if magic != TRACK_CACHE_MAGIC or version != TRACK_CACHE_VERSION or file_digest != digest:
+            return False
+
+        view = memoryview(mapped)
+        sections = {}
+        position = struct.calcsize(HEADER_FORMAT)
+        for _ in range(section_count):
+            name, typecode, offset, count = struct.unpack_from(SECTION_FORMAT, mapped, position)
+            position += struct.calcsize(SECTION_FORMAT)
+            typecode = typecode.rstrip(b"\0").decode("ascii")
+            itemsize = array(typecode).itemsize
+            sections[name.rstrip(b"\0").decode("ascii")] = view[offset:offset + count * itemsize].cast(typecode)
+
+        metadata = json.loads(bytes(sections["meta"]).decode("utf-8"))
+        self.create_walls(sections["wall_polygons"], sections["wall_axes"])
+        self.distance_field = DistanceField.from_arrays(
+            metadata["distance_field"], sections["sdf_distances"], sections["sdf_gradient_x"],
+            sections["sdf_gradient_y"], sections["sdf_nearest_wall"])
+        self.wall_grid = WallGrid.from_arrays(self.wall_list, metadata["wall_grid"],
+                                              sections["grid_offsets"], sections["grid_walls"])
+        if metadata["race_line"]:
+            self.race_line = RaceLine.from_arrays(
+                metadata["race_line"], {name: sections["rl_" + name] for name in RaceLine.ARRAY_FIELDS})
+        self._cache_mmap = mapped
+        return True
+
+def track_digest(raw_data):
+    """
+    Returns the content hash keying the compiled data of a track file.
+
+    Args:
+        raw_data (bytes): The content of the track file.
+
+    Returns:
+        bytes: The SHA-256 digest of the file content, sidecar version and bake parameters.
+    """
+    digest = hashlib.sha256(raw_data)
+    digest.update(repr((TRACK_CACHE_VERSION, BAKE_PARAMETERS)).encode("ascii"))
+    return digest.digest()
+
+def cache_path_for(path):
+    """
+    Returns the path of the compiled sidecar of a track file.
+    """
+    return os.path.splitext(path)[0] + TRACK_CACHE_EXTENSION
+
+def compile_track(path):
+    """
+    Bakes the derived data of a track file into its sidecar.
+
+    Args:
+        path (str): The path of the track file.
+
+    Returns:
+        Track: The compiled track.
+    """
+    with open(path, "rb") as f:
+        raw_data = f.read()
+    track = Track(json.loads(raw_data), path)
+    track.build_derived_data()
+    try:
+        track.write_cache(cache_path_for(path), track_digest(raw_data))
+    except OSError as e:
+        print(f"Impossible d'écrire le cache de la piste {path}: {e}")
+    return track
+
+def load_track(path=DEFAULT_TRACK_PATH, use_cache=True):
+    """
+    Loads a track file, memory-mapping its compiled sidecar if it is up to date
+    (the sidecar is compiled first otherwise).
+
+    Args:
+        path (str, optional): The path of the track file. Defaults to DEFAULT_TRACK_PATH.
+        use_cache (bool, optional): Whether to use (and write) the compiled sidecar. Defaults to True.
+
+    Returns:
+        Track: The loaded track.
+    """
+    if not use_cache:
+        with open(path, "rb") as f:
+            track = Track(json.loads(f.read()), path)
+        track.build_derived_data()
+        return track
+
+    with open(path, "rb") as f:
+        raw_data = f.read()
+    cache_path = cache_path_for(path)
+    if os.path.exists(cache_path):
+        track = Track(json.loads(raw_data), path)
+        try:
+            if track.read_cache(cache_path, track_digest(raw_data)):
+                return track
+        except (OSError, ValueError, KeyError, struct.error) as e:
+            print(f"Cache de piste invalide {cache_path}: {e}")
+    return compile_track(path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile AeroPizza track files into their cached sidecars.")
+    parser.add_argument("tracks", nargs="+", help="Track files (.json) to compile")
+    args = parser.parse_args()
+    for track_path in args.tracks:
+        start = time.perf_counter()
+        compiled = compile_track(track_path)
+        compile_time = time.perf_counter() - start
+        start = time.perf_counter()
+        load_track(track_path)
+        load_time = time.perf_counter() - start
+        print(f"{track_path}: {len(compiled.wall_list)} walls, compiled in {compile_time * 1000:.1f} ms, "
+              f"loaded from {cache_path_for(track_path)} in {load_time * 1000:.1f} ms")
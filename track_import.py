@@ -0,0 +1,486 @@
+import argparse
+import json
+import math
+import os
+from collections import deque
+import pygame
+from constants import * # Import all constants
+from wall import Wall # Import Wall class from wall.py
+from distance_field import DistanceField # Import the track distance field
+from track import compile_track # Import the track compiler
+
+# --- Tile grid format ---
+# One character per tile: '#' is a wall tile, any other character is drivable.
+# 'P' marks a free-play player spawn, '0'-'9' then 'a'-'z' mark the race waypoints in driving order.
+# Missing tiles (short lines) are walls.
+SOLID_TILE = "#"
+PLAYER_TILE = "P"
+WAYPOINT_TILES = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+RACE_GRID_SLOTS = 12 # Number of starting grid slots generated behind the first waypoint
+
+class TrackGrid:
+    """
+    Solid/drivable cell grid of a track being imported, with its markers.
+    """
+    def __init__(self, cols, rows, cell_size):
+        """
+        Initializes an empty grid (every cell drivable).
+
+        Args:
+            cols (int): The number of columns.
+            rows (int): The number of rows.
+            cell_size (float): The size of a cell in pixels.
+        """
+        self.cols = cols
+        self.rows = rows
+        self.cell_size = cell_size
+        self.solid = bytearray(cols * rows) # 1 = wall, 0 = drivable
+        self.player_cells = [] # (col, row) of the player spawn markers
+        self.waypoint_cells = {} # Waypoint order -> (col, row)
+
+    def is_solid(self, col, row):
+        """
+        Returns True if a cell is a wall (cells outside the grid are walls).
+        """
+        if 0 <= col < self.cols and 0 <= row < self.rows:
+            return self.solid[row * self.cols + col] == 1
+        return True
+
+    def cell_center(self, col, row):
+        """
+        Returns the world coordinates of the center of a cell.
+        """
+        return (col + 0.5) * self.cell_size, (row + 0.5) * self.cell_size
+
+def read_tile_grid(path, tile_size=TRACK_IMPORT_TILE_SIZE):
+    """
+    Reads a tile-grid track file.
+
+    Args:
+        path (str): The path of the text file.
+        tile_size (float, optional): The size of a tile in pixels. Defaults to TRACK_IMPORT_TILE_SIZE.
+
+    Returns:
+        TrackGrid: The grid of the track.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [line.rstrip("\r\n") for line in f]
+    while lines and not lines[-1].strip():
+        lines.pop()
+    grid = TrackGrid(max(len(line) for line in lines), len(lines), tile_size)
+    for row in range(grid.rows):
+        for col in range(grid.cols):
+            tile = lines[row][col] if col < len(lines[row]) else SOLID_TILE
+            if tile == SOLID_TILE:
+                grid.solid[row * grid.cols + col] = 1
+            elif tile == PLAYER_TILE:
+                grid.player_cells.append((col, row))
+            elif tile.lower() in WAYPOINT_TILES:
+                grid.waypoint_cells[WAYPOINT_TILES.index(tile.lower())] = (col, row)
+    return grid
+
+def read_mask(path, scale=TRACK_IMPORT_MASK_SCALE, threshold=128, invert=False):
+    """
+    Reads a bitmap track mask (dark pixels are walls, light pixels are drivable).
+
+    Args:
+        path (str): The path of the image (PNG, BMP...).
+        scale (float, optional): The size of a mask pixel in pixels. Defaults to TRACK_IMPORT_MASK_SCALE.
+        threshold (int, optional): The luminance under which a pixel is a wall. Defaults to 128.
+        invert (bool, optional): Whether light pixels are the walls instead. Defaults to False.
+
+    Returns:
+        TrackGrid: The grid of the track.
+    """
+    image = pygame.image.load(path)
+    width, height = image.get_size()
+    pixels = pygame.image.tobytes(image, "RGB")
+    grid = TrackGrid(width, height, scale)
+    for index in range(width * height):
+        r, g, b = pixels[index * 3], pixels[index * 3 + 1], pixels[index * 3 + 2]
+        is_dark = (r * 299 + g * 587 + b * 114) // 1000 < threshold
+        grid.solid[index] = 1 if is_dark != invert else 0
+    return grid
+
+# --- Contour extraction ---
+
+def boundary_edges(grid):
+    """
+    Returns the unit edges between drivable and wall cells, as directed edges
+    keeping the drivable cell on the left (walking along an edge, the wall is on its right-hand normal).
+
+    Args:
+        grid (TrackGrid): The grid of the track.
+
+    Returns:
+        dict: The outgoing edges of each vertex, (col, row) -> list of (col, row) end vertices.
+    """
+    edges = {}
+    for row in range(grid.rows):
+        for col in range(grid.cols):
+            if grid.is_solid(col, row):
+                continue
+            if grid.is_solid(col, row - 1): # Wall above: edge going left
+                edges.setdefault((col + 1, row), []).append((col, row))
+            if grid.is_solid(col, row + 1): # Wall below: edge going right
+                edges.setdefault((col, row + 1), []).append((col + 1, row + 1))
+            if grid.is_solid(col - 1, row): # Wall on the left: edge going down
+                edges.setdefault((col, row), []).append((col, row + 1))
+            if grid.is_solid(col + 1, row): # Wall on the right: edge going up
+                edges.setdefault((col + 1, row + 1), []).append((col + 1, row))
+    return edges
+
+def trace_contours(edges):
+    """
+    Chains the boundary edges into closed contours.
+
+    Args:
+        edges (dict): The outgoing edges of each vertex (consumed).
+
+    Returns:
+        list: The contours, each a list of (col, row) vertices (closed, the first vertex is not repeated).
+    """
+    contours = []
+    for start in list(edges):
+        while edges.get(start):
+            contour = [start]
+            previous_direction = None
+            vertex = start
+            while True:
+                outgoing = edges[vertex]
+                if len(outgoing) > 1 and previous_direction is not None:
+                    # Two regions touching at a corner: turn towards the wall side to keep them separate
+                    dx, dy = previous_direction
+                    preferred = (vertex[0] - dy, vertex[1] + dx)
+                    end = preferred if preferred in outgoing else outgoing[0]
+                else:
+                    end = outgoing[0]
+                outgoing.remove(end)
+                previous_direction = (end[0] - vertex[0], end[1] - vertex[1])
+                vertex = end
+                if vertex == start:
+                    break
+                contour.append(vertex)
+            contours.append(contour)
+    return contours
+
+def merge_collinear(contour):
+    """
+    Removes the contour vertices lying between two edges of the same direction.
+
+    Args:
+        contour (list): The closed contour vertices.
+
+    Returns:
+        list: The corner vertices of the contour.
+    """
+    corners = []
+    count = len(contour)
+    for i in range(count):
+        px, py = contour[i - 1]
+        x, y = contour[i]
+        nx, ny = contour[(i + 1) % count]
+        if (x - px) * (ny - y) - (y - py) * (nx - x) != 0: # Direction changes: keep the corner
+            corners.append(contour[i])
+    return corners
+
+def _point_line_distance(point, a, b):
+    abx, aby = b[0] - a[0], b[1] - a[1]
+    length = math.hypot(abx, aby)
+    if length == 0:
+        return math.hypot(point[0] - a[0], point[1] - a[1])
+    return abs(abx * (point[1] - a[1]) - aby * (point[0] - a[0])) / length
+
+def _simplify_open(points, tolerance):
+    # Ramer-Douglas-Peucker on an open polyline (iterative, keeps both ends)
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        farthest, max_distance = -1, tolerance
+        for i in range(first + 1, last):
+            distance = _point_line_distance(points[i], points[first], points[last])
+            if distance > max_distance:
+                farthest, max_distance = i, distance
+        if farthest != -1:
+            keep[farthest] = True
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+    return [p for p, k in zip(points, keep) if k]
+
+def simplify_contour(corners, tolerance):
+    """
+    Simplifies a closed contour with the Ramer-Douglas-Peucker algorithm
+    (turns the staircases of diagonal borders into single segments).
+
+    Args:
+        corners (list): The corner vertices of the closed contour.
+        tolerance (float): The maximum deviation from the original contour, in cells (0 keeps every corner).
+
+    Returns:
+        list: The simplified contour vertices.
+    """
+    if tolerance <= 0 or len(corners) <= 4:
+        return corners
+    # Split the loop at the vertex farthest from the first one and simplify both halves
+    split = max(range(len(corners)), key=lambda i: math.hypot(corners[i][0] - corners[0][0], corners[i][1] - corners[0][1]))
+    first_half = _simplify_open(corners[:split + 1], tolerance)
+    second_half = _simplify_open(corners[split:] + corners[:1], tolerance)
+    simplified = first_half[:-1] + second_half[:-1]
+    return simplified if len(simplified) >= 3 else corners
+
+def contour_walls(grid, tolerance=TRACK_IMPORT_SIMPLIFY_TOLERANCE):
+    """
+    Converts the wall boundaries of a grid into the fewest wall segments.
+
+    Args:
+        grid (TrackGrid): The grid of the track.
+        tolerance (float, optional): The contour simplification tolerance, in cells. Defaults to TRACK_IMPORT_SIMPLIFY_TOLERANCE.
+
+    Returns:
+        tuple: The wall segments as (p1, p2, normal) tuples in pixels, and the number of unit boundary edges.
+    """
+    edges = boundary_edges(grid)
+    edge_count = sum(len(ends) for ends in edges.values())
+    walls = []
+    for contour in trace_contours(edges):
+        vertices = simplify_contour(merge_collinear(contour), tolerance)
+        for i in range(len(vertices)):
+            ax, ay = vertices[i]
+            bx, by = vertices[(i + 1) % len(vertices)]
+            length = math.hypot(bx - ax, by - ay)
+            # The wall is on the right-hand side of the contour: the normal points out of the track
+            normal = (round(-(by - ay) / length, 6) + 0.0, round((bx - ax) / length, 6) + 0.0)
+            walls.append(((ax * grid.cell_size, ay * grid.cell_size), (bx * grid.cell_size, by * grid.cell_size), normal))
+    return walls, edge_count
+
+# --- Spawn points and zones ---
+
+def drivable_component(grid, seed_cells=()):
+    """
+    Returns the cells of the drivable region the players start in (4-connected flood fill).
+
+    Args:
+        grid (TrackGrid): The grid of the track.
+        seed_cells (iterable, optional): Cells of the region to keep. Defaults to () (largest region).
+
+    Returns:
+        set: The (col, row) cells of the region.
+    """
+    unvisited = {(c, r) for r in range(grid.rows) for c in range(grid.cols) if not grid.is_solid(c, r)}
+    best = set()
+    seed_cells = [cell for cell in seed_cells if cell in unvisited]
+    starts = seed_cells[:1] or list(unvisited)
+    while starts and unvisited:
+        start = starts.pop()
+        if start not in unvisited:
+            continue
+        region = {start}
+        unvisited.discard(start)
+        queue = deque([start])
+        while queue:
+            col, row = queue.popleft()
+            for neighbor in ((col + 1, row), (col - 1, row), (col, row + 1), (col, row - 1)):
+                if neighbor in unvisited:
+                    unvisited.discard(neighbor)
+                    region.add(neighbor)
+                    queue.append(neighbor)
+        if len(region) > len(best):
+            best = region
+        if seed_cells:
+            break
+    return best
+
+def region_zones(grid, region):
+    """
+    Covers a region with rectangles (row runs merged with the identical runs of the next rows).
+
+    Args:
+        grid (TrackGrid): The grid of the track.
+        region (set): The (col, row) cells of the region.
+
+    Returns:
+        list: The (x, y, width, height) zones in pixels.
+    """
+    open_zones = {} # (first col, last col) -> [first row, last row]
+    zones = []
+    for row in range(grid.rows + 1):
+        runs = []
+        col = 0
+        while row < grid.rows and col < grid.cols:
+            if (col, row) in region:
+                start = col
+                while (col + 1, row) in region:
+                    col += 1
+                runs.append((start, col))
+            col += 1
+        for run in list(open_zones):
+            if run not in runs:
+                first_row, last_row = open_zones.pop(run)
+                zones.append((run[0], first_row, run[1] - run[0] + 1, last_row - first_row + 1))
+        for run in runs:
+            if run in open_zones:
+                open_zones[run][1] = row
+            else:
+                open_zones[run] = [row, row]
+    cs = grid.cell_size
+    return [(col * cs, row * cs, width * cs, height * cs) for col, row, width, height in sorted(zones, key=lambda z: (z[1], z[0]))]
+
+def heading_to(ax, ay, bx, by):
+    """
+    Returns the car heading from a point towards another, in degrees (0 = up, 90 = right, see Car.angle).
+    """
+    return math.degrees(math.atan2(bx - ax, -(by - ay))) % 360
+
+def race_grid_slots(waypoints, distance_field, slot_count=RACE_GRID_SLOTS):
+    """
+    Places the starting grid on two staggered lanes behind the first waypoint, facing the second one.
+
+    Args:
+        waypoints (list): The (x, y) race waypoints.
+        distance_field (DistanceField): The distance field of the track walls.
+        slot_count (int, optional): The number of slots. Defaults to RACE_GRID_SLOTS.
+
+    Returns:
+        list: The (x, y, angle) grid slots clear of walls.
+    """
+    if len(waypoints) < 2:
+        return []
+    (sx, sy), (nx, ny) = waypoints[0], waypoints[1]
+    length = math.hypot(nx - sx, ny - sy)
+    ux, uy = (nx - sx) / length, (ny - sy) / length
+    angle = round(heading_to(sx, sy, nx, ny), 3)
+    row_spacing = CAR_LENGTH * 1.25
+    lane_offset = CAR_WIDTH * 0.375
+    slots = []
+    for index in range(slot_count * 2): # Some candidates may be blocked by walls
+        back = CAR_LENGTH + (index // 2) * row_spacing + (index % 2) * row_spacing / 2
+        side = -lane_offset if index % 2 == 0 else lane_offset
+        x, y = sx - ux * back - uy * side, sy - uy * back + ux * side
+        if distance_field.is_clear(x, y, CAR_WIDTH / 2):
+            slots.append((round(x, 1), round(y, 1), angle))
+            if len(slots) == slot_count:
+                break
+    return slots
+
+def player_spawn_points(grid, region, distance_field, count=2):
+    """
+    Returns the free-play player spawns: the 'P' markers, or the most open cells of the region.
+
+    Args:
+        grid (TrackGrid): The grid of the track.
+        region (set): The (col, row) cells of the drivable region.
+        distance_field (DistanceField): The distance field of the track walls.
+        count (int, optional): The number of spawns. Defaults to 2.
+
+    Returns:
+        list: The (x, y, angle) spawns.
+    """
+    if grid.player_cells:
+        return [grid.cell_center(col, row) + (0,) for col, row in grid.player_cells]
+    centers = sorted((grid.cell_center(col, row) for col, row in region),
+                     key=lambda p: (-distance_field.distance(p[0], p[1]), p[1], p[0]))
+    spawns = []
+    for x, y in centers:
+        if all(math.hypot(x - sx, y - sy) >= CAR_LENGTH * 2 for sx, sy, _ in spawns):
+            spawns.append((x, y, 0))
+            if len(spawns) == count:
+                break
+    return spawns
+
+# --- Track file ---
+
+def build_track_data(grid, name, waypoints=None, tolerance=TRACK_IMPORT_SIMPLIFY_TOLERANCE, thickness=TRACK_IMPORT_WALL_THICKNESS):
+    """
+    Builds the content of a track file from a grid.
+
+    Args:
+        grid (TrackGrid): The grid of the track.
+        name (str): The name of the track.
+        waypoints (list, optional): The (x, y) race waypoints in pixels. Defaults to None (the grid markers).
+        tolerance (float, optional): The contour simplification tolerance, in cells. Defaults to TRACK_IMPORT_SIMPLIFY_TOLERANCE.
+        thickness (int, optional): The thickness of the walls. Defaults to TRACK_IMPORT_WALL_THICKNESS.
+
+    Returns:
+        tuple: The track data (dict) and the number of unit boundary edges it was built from.
+    """
+    segments, edge_count = contour_walls(grid, tolerance)
+    if waypoints is None:
+        waypoints = [grid.cell_center(*grid.waypoint_cells[order]) for order in sorted(grid.waypoint_cells)]
+    distance_field = DistanceField([Wall(p1, p2, pygame.math.Vector2(normal), thickness) for p1, p2, normal in segments])
+
+    seed_cells = list(grid.player_cells) + [(int(x // grid.cell_size), int(y // grid.cell_size)) for x, y in waypoints]
+    region = drivable_component(grid, seed_cells)
+    zones = region_zones(grid, region)
+    data = {
+        "name": name,
+        "walls": [{"p1": list(p1), "p2": list(p2), "normal": list(normal), "thickness": thickness} for p1, p2, normal in segments],
+        "waypoints": [list(p) for p in waypoints],
+        "spawn_grids": {
+            "race": [list(slot) for slot in race_grid_slots(waypoints, distance_field)],
+            "free_play": [list(spawn) for spawn in player_spawn_points(grid, region, distance_field)]
+        },
+        "ai_spawn_zones": [list(zone) for zone in zones],
+        "pickup_zones": [list(zone) for zone in zones]
+    }
+    return data, edge_count
+
+def write_track_file(data, path):
+    """
+    Writes a track file (one wall, slot or zone per line, like the hand-written tracks).
+
+    Args:
+        data (dict): The track data.
+        path (str): The path of the track file.
+    """
+    def items(values, indent):
+        return (",\n" + indent).join(json.dumps(v) for v in values)
+
+    text = "{\n"
+    text += f'    "name": {json.dumps(data["name"])},\n'
+    text += f'    "walls": [\n        {items(data["walls"], "        ")}\n    ],\n'
+    text += f'    "waypoints": {json.dumps(data["waypoints"])},\n'
+    text += '    "spawn_grids": {\n'
+    text += f'        "race": [\n            {items(data["spawn_grids"]["race"], "            ")}\n        ],\n'
+    text += f'        "free_play": {json.dumps(data["spawn_grids"]["free_play"])}\n'
+    text += '    },\n'
+    text += f'    "ai_spawn_zones": {json.dumps(data["ai_spawn_zones"])},\n'
+    text += f'    "pickup_zones": {json.dumps(data["pickup_zones"])}\n'
+    text += "}\n"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+def parse_waypoints(text):
+    """
+    Parses command-line waypoints ("x,y x,y ...").
+    """
+    return [tuple(float(v) for v in point.split(",")) for point in text.split()]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import an AeroPizza track from a bitmap mask or a tile grid.")
+    parser.add_argument("source", help="A bitmap mask (.png, .bmp...: dark pixels are walls) or a tile grid text file ('#' are walls)")
+    parser.add_argument("-o", "--output", help="The track file to write (default: tracks/<source name>.json)")
+    parser.add_argument("--name", help="The name of the track (default: the source file name)")
+    parser.add_argument("--tile-size", type=float, default=TRACK_IMPORT_TILE_SIZE, help="Size of a tile in pixels (tile grids)")
+    parser.add_argument("--scale", type=float, default=TRACK_IMPORT_MASK_SCALE, help="Size of a mask pixel in pixels (bitmaps)")
+    parser.add_argument("--threshold", type=int, default=128, help="Luminance under which a mask pixel is a wall")
+    parser.add_argument("--invert", action="store_true", help="Light mask pixels are the walls")
+    parser.add_argument("--tolerance", type=float, default=TRACK_IMPORT_SIMPLIFY_TOLERANCE,
+                        help="Contour simplification tolerance in tiles/pixels (0: only merge collinear edges)")
+    parser.add_argument("--waypoints", type=parse_waypoints, help='Race waypoints in pixels, "x,y x,y ..." (overrides the grid markers)')
+    args = parser.parse_args()
+
+    base_name = os.path.splitext(os.path.basename(args.source))[0]
+    if args.source.lower().endswith((".png", ".bmp", ".gif", ".tga", ".jpg", ".jpeg")):
+        track_grid = read_mask(args.source, args.scale, args.threshold, args.invert)
+    else:
+        track_grid = read_tile_grid(args.source, args.tile_size)
+    output = args.output or os.path.join("tracks", base_name + ".json")
+    track_data, unit_edges = build_track_data(track_grid, args.name or base_name, args.waypoints, args.tolerance)
+    write_track_file(track_data, output)
+    compile_track(output)
+    print(f"{output}: {len(track_data['walls'])} walls (from {unit_edges} boundary edges), "
+          f"{len(track_data['waypoints'])} waypoints, {len(track_data['spawn_grids']['race'])} grid slots, "
+          f"{len(track_data['ai_spawn_zones'])} spawn zones")
@@ -1,11 +1,12 @@
 import pygame
 from constants import WALL_COLOR # Import WALL_COLOR from constants
+from collision_utils import get_axes # Import SAT axis computation
 
 class Wall(pygame.sprite.Sprite):
     """
     Represents a wall in the game.
     """
-    def __init__(self, p1, p2, normal_vector, thickness=10, color=WALL_COLOR):
+    def __init__(self, p1, p2, normal_vector, thickness=10, color=WALL_COLOR, polygon=None, axes=None):
         """
         Initializes a new Wall object.
 
@@ -15,6 +16,8 @@ class Wall(pygame.sprite.Sprite):
             normal_vector (pygame.math.Vector2): The normal vector of the wall.
             thickness (int, optional): The thickness of the wall. Defaults to 10.
             color (tuple, optional): The color of the wall. Defaults to WALL_COLOR.
+            polygon (list, optional): The precomputed SAT polygon of the wall (4 points). Defaults to None (computed).
+            axes (list, optional): The precomputed SAT axes of the wall polygon. Defaults to None (computed).
         """
         super().__init__()
         self.p1 = pygame.math.Vector2(p1)
@@ -30,6 +33,21 @@ class Wall(pygame.sprite.Sprite):
         max_y = max(self.p1.y, self.p2.y) + self.thickness
         self.rect = pygame.Rect(min_x, min_y, max_x - min_x, max_y - min_y)
 
+        # The wall is static: its "thick" SAT polygon and separating axes are computed once
+        if polygon is None:
+            wall_perp = pygame.math.Vector2(-self.normal.y, self.normal.x)
+            polygon = [
+                self.p1 + wall_perp * self.thickness / 2,
+                self.p2 + wall_perp * self.thickness / 2,
+                self.p2 - wall_perp * self.thickness / 2,
+                self.p1 - wall_perp * self.thickness / 2
+            ]
+        self.polygon = [pygame.math.Vector2(p) for p in polygon]
+        if axes is None:
+            # The polygon is a rectangle: opposite edges share their axis, keep the first two
+            axes = get_axes(self.polygon)[:2]
+        self.axes = [pygame.math.Vector2(a) for a in axes]
+
     def get_collision_line_segment(self):
         """
         Returns the line segment and its normal for collision detection.
@@ -39,12 +57,25 @@ class Wall(pygame.sprite.Sprite):
         """
         return self.p1, self.p2, self.normal
 
-    def draw(self, screen):
+    def get_collision_polygon(self):
+        """
+        Returns the "thick" polygon of the wall used for SAT collision detection.
+
+        Returns:
+            list: The 4 pygame.math.Vector2 vertices of the wall polygon.
+        """
+        return self.polygon
+
+    def draw(self, screen, scale=1.0):
         """
         Draws the wall on the screen.
 
         Args:
             screen (pygame.Surface): The screen to draw the wall on.
+            scale (float, optional): The size of a world pixel on the screen. Defaults to 1.0.
         """
-        pygame.draw.line(screen, self.color, self.p1, self.p2, self.thickness)
+        if scale == 1:
+            pygame.draw.line(screen, self.color, self.p1, self.p2, self.thickness)
+        else:
+            pygame.draw.line(screen, self.color, self.p1 * scale, self.p2 * scale, max(1, round(self.thickness * scale)))
 
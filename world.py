@@ -0,0 +1,653 @@
+import random
+from collections import namedtuple
+import pygame
+from constants import * # Import all constants
+from car import Car # Import Car class
+from flow_field import NavigationGrid, FlowFieldCache # Import the free-play pursuit navigation
+from raycast import RayCaster, RayHits # Import the batched ray-cast sensors and static wall index
+from ai_planner import PlannerService, make_world_snapshot, plan_ai_cars # Import the AI planner
+import snapshot # Import the flat world snapshots
+from asset_loader import assets # Import the shared fonts
+from entity_store import EntityStore, BULLET_MASK, CAR_COMPONENT_COLUMNS, CAR_MASK, PICKUP_COMPONENT_COLUMNS, PICKUP_MASK, pack_color # Import the entity storage
+from collision_utils import collide_polygons_sat, collide_car_wall_sat, resolve_collision, inflict_damage # Import collision functions
+from collision_events import CollisionEventQueue, EVENT_BULLET, IMPACT_ZONES # Import the collision event queue
+from render_queue import RenderQueue, LAYER_PICKUPS, LAYER_BULLETS, stamps # Import the batched sprite submission
+
+# AI planner modes
+PLANNER_OFF = "off"
+PLANNER_ASYNC = "async" # Plans computed in the worker processes, applied when they arrive
+PLANNER_INLINE = "inline" # Plans computed in the game loop on the planning frames (deterministic, used for replays)
+
+# A health pickup as the target of an AI car (the pickups themselves are rows of World.pickups)
+PickupTarget = namedtuple("PickupTarget", ["entity_id", "position", "hp_value"])
+
+class World:
+    """
+    The simulation of a game session: cars, bullets, health pickups and the AI helpers of the track.
+    Their state lives in entity stores (one row per car, bullet or pickup) that the rules iterate.
+
+    Everything that influences the simulation goes through step(): the frame duration, the
+    control flags of the human players and the seeded random generator of the session.
+    Two worlds built with the same arguments and stepped with the same inputs stay identical,
+    which is what replays rely on. Cars and pickups get a stable entity id (cars 0..n-1, then
+    pickups in spawn order), used instead of id() by the AI plans and the flow field cache.
+    """
+    def __init__(self, track, player_count, ai_count, game_mode, difficulty, seed=None, start_ticks=None, planner_mode=PLANNER_ASYNC,
+                 ai_planner_interval=AI_PLANNER_INTERVAL):
+        """
+        Initializes the session and places the cars.
+
+        Args:
+            track (Track): The loaded track.
+            player_count (int): The number of human players.
+            ai_count (int): The number of AI opponents.
+            game_mode (str): The selected game mode ("free_play" or "race").
+            difficulty (str): The selected AI difficulty.
+            seed (int, optional): The seed of the random generator of the session. Defaults to None (random seed).
+            start_ticks (int, optional): The game clock at the start of the session, in milliseconds. Defaults to None (pygame.time.get_ticks()).
+            planner_mode (str, optional): How the AI plans are computed (PLANNER_OFF, PLANNER_ASYNC or PLANNER_INLINE). Defaults to PLANNER_ASYNC.
+            ai_planner_interval (int, optional): The number of frames between two AI plans. Defaults to AI_PLANNER_INTERVAL.
+        """
+        self.track = track
+        self.game_mode = game_mode
+        self.difficulty = difficulty
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.rng = random.Random(self.seed)
+        # Game clock in milliseconds, advanced by the frame durations (the collision damage depends on it)
+        self.start_ticks = start_ticks if start_ticks is not None else max(1, pygame.time.get_ticks())
+        self.clock_ms = self.start_ticks
+        self.frame = 0
+        self.next_entity_id = 0
+
+        self.distance_field = track.distance_field
+        # Static wall index, used by the ray-cast sensors and the wall collision broad phase
+        self.wall_grid = track.wall_grid
+        self.ray_caster = RayCaster(track.wall_list, wall_grid=self.wall_grid)
+        # Racing line and speed profile, precomputed once per track
+        self.race_line = track.race_line if game_mode == GAME_MODE_RACE else None
+        # Free-play pursuit: one flow field per target, shared by every AI chasing it
+        self.flow_fields = FlowFieldCache(NavigationGrid(self.distance_field)) if game_mode == GAME_MODE_FREE_PLAY else None
+
+        self.player_cars = []
+        self.ai_cars = []
+        self.car_store = EntityStore(CAR_COMPONENT_COLUMNS) # Transform, kinematics, health, weapon and team of the cars, one row per car in car_list order
+        self.bullets = EntityStore() # Bullets: typed component arrays, iterated in firing order
+        self._bullet_rect = pygame.Rect(0, 0, 0, 0) # Reused for the bullet hit tests
+        self.collision_events = CollisionEventQueue() # Impacts of the step, applied in the "effects" phase
+        self.render_queue = RenderQueue() # Sprites of the frame being drawn (draw_scene)
+        self.collision_log_limit = COLLISION_LOG_LIMIT # Impact messages printed per step at most (performance profile)
+        self.phase_hook = None # Called with the name of each phase of step() as it starts (allocation diagnostics)
+        self.pickups = EntityStore(PICKUP_COMPONENT_COLUMNS) # Health pickups: position and HP restored, in spawn order
+        self.health_pickup_spawn_timer = 0.0
+        self._place_cars(player_count, ai_count)
+        self.car_list = self.player_cars + self.ai_cars
+        for car in self.car_list:
+            car.entity_id = self._new_entity_id()
+        self.cars_by_id = {car.entity_id: car for car in self.car_list}
+        # AI sensor readings, kept from frame to frame: the cars take turns to cast their whiskers
+        self.ai_whisker_interval = AI_WHISKER_INTERVAL
+        self.ray_caster.set_cars(self.car_list)
+        self.whisker_hits = self.ray_caster.cast_whiskers(self.ai_cars)
+        print(f"Total cars in game: {len(self.car_list)} (Players: {len(self.player_cars)}, AI: {len(self.ai_cars)})")
+
+        # High-level AI plans (target choice, lead targeting), off the frame budget in async mode
+        if game_mode != GAME_MODE_FREE_PLAY or not AI_PLANNER_ENABLED or not self.ai_cars:
+            planner_mode = PLANNER_OFF
+        self.planner_mode = planner_mode
+        self.ai_planner_interval = ai_planner_interval
+        self.planner = PlannerService() if planner_mode == PLANNER_ASYNC else None
+        if self.planner:
+            self.planner.start()
+
+    def _new_entity_id(self):
+        entity_id = self.next_entity_id
+        self.next_entity_id += 1
+        return entity_id
+
+    def _place_cars(self, player_count, ai_count):
+        """
+        Creates the cars at their starting positions (dynamic placement based on the game mode).
+        """
+        track = self.track
+        game_mode, difficulty = self.game_mode, self.difficulty
+        if game_mode == GAME_MODE_RACE:
+            # Starting grid placement
+            # Cars take the grid slots of the track in order (staggered lanes behind the start line, facing the driving direction)
+            if player_count + ai_count > len(track.race_grid):
+                print(f"Track {track.name} only has {len(track.race_grid)} grid slots")
+            grid_slots = iter(track.race_grid)
+
+            for i, (x_pos, y_pos, angle) in zip(range(player_count), grid_slots):
+                self.player_cars.append(Car(x_pos, y_pos, angle=angle, color=BLUE if i == 0 else GREEN, is_player=True, game_mode=game_mode, difficulty=difficulty, rng=self.rng, store=self.car_store))
+
+            for i, (x_pos, y_pos, angle) in zip(range(ai_count), grid_slots):
+                self.ai_cars.append(Car(x_pos, y_pos, angle=angle, color=YELLOW, is_player=False, game_mode=game_mode, difficulty=difficulty, rng=self.rng, store=self.car_store))
+
+        else: # GAME_MODE_FREE_PLAY
+            # Place player cars
+            for i, (x_pos, y_pos, angle) in zip(range(player_count), track.player_spawns):
+                self.player_cars.append(Car(x_pos, y_pos, angle=angle, color=BLUE if i == 0 else GREEN, is_player=True, game_mode=game_mode, difficulty=difficulty, rng=self.rng, store=self.car_store))
+
+            # Place AI cars randomly within the track boundaries, avoiding initial player positions
+            for i in range(ai_count):
+                for _ in range(AI_SPAWN_MAX_ATTEMPTS): # Bounded: the clear area of the track fills up with enough cars
+                    # Pick a point of an AI spawn zone of the track that is clear of walls
+                    zone = self.rng.choice(track.ai_spawn_zones) if track.ai_spawn_zones else None
+                    spawn_point = self.distance_field.random_clear_point(CAR_LENGTH / 2 + SPAWN_WALL_CLEARANCE, rng=self.rng, zone=zone)
+                    if spawn_point is None:
+                        print(f"No free spawn point found for AI Car {i+1}")
+                        break
+                    x, y = spawn_point
+                    new_pos = pygame.math.Vector2(x, y)
+                    too_close = False
+                    # Check distance to all existing cars (players and other AIs)
+                    for car in self.player_cars + self.ai_cars:
+                        if (car.position - new_pos).length() < CAR_LENGTH * 2.5: # Increased buffer
+                            too_close = True
+                            break
+                    if not too_close:
+                        self.ai_cars.append(Car(x, y, angle=self.rng.randint(0, 359), color=YELLOW, is_player=False, game_mode=game_mode, difficulty=difficulty, rng=self.rng, store=self.car_store))
+                        break
+                else:
+                    print(f"No free spawn point found for AI Car {i+1}")
+
+    def step(self, dt_ms, player_controls):
+        """
+        Advances the simulation by one frame.
+
+        Args:
+            dt_ms (int): The duration of the frame in milliseconds.
+            player_controls (sequence): The CONTROL_* flags of each human player for this frame.
+        """
+        dt = dt_ms / 1000.0
+        self.frame += 1
+        self.clock_ms += dt_ms
+        player_cars, ai_cars, cars, bullets, pickups = self.player_cars, self.ai_cars, self.car_list, self.bullets, self.pickups
+        car_store = self.car_store
+        car_rows = car_store.query(CAR_MASK) # One row per car, in car_list order
+        distance_field, ray_caster, flow_fields = self.distance_field, self.ray_caster, self.flow_fields
+        phase_hook = self.phase_hook
+
+        # Apply the inputs of all human players and collect bullets
+        if phase_hook:
+            phase_hook("inputs")
+        for player_car, controls in zip(player_cars, player_controls):
+            bullet_player = player_car.apply_controls(controls)
+            if bullet_player:
+                self._add_bullet(player_car, bullet_player)
+
+        # AI planner: apply the plans that came back, drop stale ones and plan again from time to time
+        if phase_hook:
+            phase_hook("ai")
+        plan_targets = {}
+        if self.planner_mode != PLANNER_OFF:
+            plans = self.planner.collect() if self.planner else {}
+            if self.frame % self.ai_planner_interval == 0:
+                snapshot = make_world_snapshot(self.frame, cars, pickups)
+                ai_tokens = tuple(ai_car.entity_id for ai_car in ai_cars)
+                if self.planner:
+                    self.planner.request_plans(snapshot, ai_tokens)
+                else:
+                    plans = plan_ai_cars(snapshot, ai_tokens)
+            for ai_car in ai_cars:
+                plan = plans.get(ai_car.entity_id, ai_car.ai_plan)
+                ai_car.ai_plan = plan if plan and self.frame - plan.frame <= AI_PLAN_MAX_AGE else None
+            # Cars a plan can target, by token (the pickups are looked up in their store)
+            plan_targets = {p_car.entity_id: p_car for p_car in player_cars if p_car.hp > 0}
+
+        # AI sensors: cast the whisker rays of the AI cars whose turn it is in one batch
+        ray_caster.set_cars(cars)
+        whisker_hits = ray_caster.cast_whiskers(ai_cars, hits=self.whisker_hits, frame=self.frame, interval=self.ai_whisker_interval)
+
+        # AI updates for all AI cars and collect bullets
+        for ai_index, ai_car in enumerate(ai_cars):
+            whiskers = whisker_hits.for_car(ai_index)
+            if self.game_mode == GAME_MODE_RACE:
+                bullet_ai = ai_car.update_ai(None, dt, track_waypoints=self.track.waypoints, distance_field=distance_field, race_line=self.race_line,
+                                             ray_caster=ray_caster, whiskers=whiskers) # No direct target, follow the racing line
+            else: # Free Play mode
+                target = None
+                # Follow the plan target if the planner chose one that still exists
+                plan = ai_car.ai_plan
+                if plan and plan.target_token is not None:
+                    target = self.pickup_target(plan.target_token) if plan.target_is_pickup else plan_targets.get(plan.target_token)
+                # Otherwise (no plan yet), prioritize targeting active human players
+                active_human_players = [p_car for p_car in player_cars if p_car.hp > 0]
+                if target is not None:
+                    pass
+                elif active_human_players:
+                    # AI targets the closest active human player
+                    target = min(active_human_players, key=lambda p: (ai_car.position - p.position).length())
+                elif len(pickups):
+                    # If no human players, target the closest health pickup
+                    ai_position = ai_car.position
+                    xs, ys = pickups.x, pickups.y
+                    closest = min(pickups.query(PICKUP_MASK), key=lambda row: ai_position.distance_to((xs[row], ys[row])))
+                    target = self.pickup_target(pickups.ids[closest])
+
+                flow_field = flow_fields.get(target, target.entity_id) if target else None
+                bullet_ai = ai_car.update_ai(target, dt, distance_field=distance_field, flow_field=flow_field,
+                                             ray_caster=ray_caster, whiskers=whiskers)
+
+            if bullet_ai:
+                self._add_bullet(ai_car, bullet_ai)
+
+        if flow_fields:
+            flow_fields.update() # Advance the flow fields of moving targets, release unused ones
+
+
+        # --- Game Update ---
+        if phase_hook:
+            phase_hook("physics")
+        # Timers and forces of each car, then the cars that drive move along their velocity
+        self.move_cars([row for row in car_rows if cars[row].update_physics(dt)], dt)
+
+        x, y, vx, vy = bullets.x, bullets.y, bullets.vx, bullets.vy
+        for row in bullets.query(BULLET_MASK):
+            x[row] += vx[row] * dt
+            y[row] += vy[row] * dt
+
+        # Check and resolve collisions between cars
+        if phase_hook:
+            phase_hook("collisions")
+        # Only consider cars that are alive or temporarily disabled for collision physics
+        car_hp = car_store.hp
+        live_or_disabled_cars = [cars[row] for row in car_rows if car_hp[row] > 0 or cars[row].is_disabled]
+        for i, car_a in enumerate(live_or_disabled_cars):
+            for j, car_b in enumerate(live_or_disabled_cars):
+                if i < j:
+                    # If either car is disabled, they don't actively participate in new collisions
+                    # (they can still be hit, but won't resolve movement against other disabled cars)
+                    if car_a.is_disabled and car_b.is_disabled:
+                        continue
+                    # The rects contain the polygons: cars whose rects are apart cannot collide
+                    if not car_a.rect.colliderect(car_b.rect):
+                        continue
+
+                    poly_a = car_a.get_collision_polygon()
+                    poly_b = car_b.get_collision_polygon()
+
+                    collided, normal, penetration = collide_polygons_sat(poly_a, poly_b)
+                    if collided:
+                        resolve_collision(car_a, car_b, normal, penetration, self.clock_ms, self.collision_events)
+
+        # Check and resolve collisions between cars and walls
+        for row in car_rows:
+            self._collide_walls(cars[row])
+
+        # Collisions balles-voitures
+        if phase_hook:
+            phase_hook("bullets")
+        bullets_to_remove = []
+        bullet_rect = self._bullet_rect
+        car_teams = car_store.team
+        radius_column, damage_column, team_column, ids = bullets.radius, bullets.damage, bullets.team, bullets.ids
+        collision_events = self.collision_events
+        for row in bullets.query(BULLET_MASK):
+            radius = radius_column[row]
+            bullet_rect.update(int(x[row]) - radius, int(y[row]) - radius, radius * 2, radius * 2)
+            bullet_pos = None
+            for car_row in car_rows:
+                # Prevent bullet from hitting its own car
+                if car_teams[car_row] == team_column[row]:
+                    continue
+                car = cars[car_row]
+
+                # Vérification plus précise de la collision
+                # D'abord un test rapide avec les rects
+                if bullet_rect.colliderect(car.rect):
+                    # Ensuite un test plus précis avec les polygones
+                    car_poly = car.get_collision_polygon()
+                    if bullet_pos is None:
+                        bullet_pos = pygame.math.Vector2(x[row], y[row])
+
+                    # Vérifier la distance entre la balle et chaque segment du polygone de la voiture
+                    for i in range(len(car_poly)):
+                        p1 = car_poly[i]
+                        p2 = car_poly[(i + 1) % len(car_poly)]
+
+                        # Distance point-segment
+                        segment = p2 - p1
+                        to_point = bullet_pos - p1
+                        segment_length = segment.length()
+                        segment = segment.normalize()
+
+                        projection = to_point.dot(segment)
+                        projection = max(0, min(projection, segment_length))
+                        closest_point = p1 + segment * projection
+
+                        distance = (bullet_pos - closest_point).length()
+
+                        if distance <= radius:
+                            inflict_damage(car, damage_column[row] * 100, bullet_pos, None, collision_events, EVENT_BULLET, ids[row])
+                            bullets_to_remove.append(ids[row])
+                            break
+
+        # Collisions balles-murs
+        for row in bullets.query(BULLET_MASK):
+            radius = radius_column[row]
+            bullet_rect.update(int(x[row]) - radius, int(y[row]) - radius, radius * 2, radius * 2)
+            for wall in self.wall_grid.walls_near(bullet_rect):
+                # Check for collision between bullet (circle) and wall (line segment)
+                # This is a simplified check, a more accurate one would use line-circle intersection
+                # For now, if bullet rect overlaps wall rect, consider it a hit
+                if bullet_rect.colliderect(wall.rect):
+                    bullets_to_remove.append(ids[row])
+                    break
+
+        bullets.remove(bullets_to_remove)
+
+        # Damage, scores, messages and sounds of the impacts of the step
+        if phase_hook:
+            phase_hook("effects")
+        self._apply_collision_events()
+
+        # --- Health Pickup Management ---
+        if phase_hook:
+            phase_hook("pickups")
+        # Health pickups only spawn in Free Play mode
+        if self.game_mode == GAME_MODE_FREE_PLAY:
+            self.health_pickup_spawn_timer += dt
+            if self.health_pickup_spawn_timer >= HEALTH_PICKUP_SPAWN_INTERVAL:
+                self.health_pickup_spawn_timer = 0.0
+                # Générer un point aléatoire dans une zone de bonus de la piste, loin des murs
+                zone = self.rng.choice(self.track.pickup_zones) if self.track.pickup_zones else None
+                spawn_point = distance_field.random_clear_point(HEALTH_PICKUP_RADIUS + SPAWN_WALL_CLEARANCE, rng=self.rng, zone=zone)
+                if spawn_point:
+                    x, y = spawn_point
+                    hp_value = self.rng.randint(HEALTH_PICKUP_MIN_HP, HEALTH_PICKUP_MAX_HP)
+                    pickups.create(PICKUP_MASK, entity_id=self._new_entity_id(), x=x, y=y, hp=hp_value)
+                    print(f"Bonus de vie apparu à ({x},{y}) avec {hp_value} PV.")
+
+            # Collisions entre voitures et bonus de vie
+            # The circle around the rect of the car against the circle of the pickup, both scaled by HEALTH_PICKUP_COLLISION_RATIO
+            pickup_x, pickup_y, pickup_hp, pickup_ids = pickups.x, pickups.y, pickups.hp, pickups.ids
+            pickup_radius = HEALTH_PICKUP_RADIUS * HEALTH_PICKUP_COLLISION_RATIO
+            picked = []
+            for car in self.alive_cars(): # Only active cars can pick up health
+                rect = car.rect
+                reach = (0.5 * ((rect.width ** 2 + rect.height ** 2) ** 0.5) * HEALTH_PICKUP_COLLISION_RATIO + pickup_radius) ** 2
+                for row in pickups.query(PICKUP_MASK):
+                    if pickup_ids[row] in picked:
+                        continue
+                    dx, dy = rect.centerx - int(pickup_x[row]), rect.centery - int(pickup_y[row])
+                    if dx ** 2 + dy ** 2 <= reach:
+                        picked.append(pickup_ids[row])
+                        car.heal(pickup_hp[row])
+                        print(f"Voiture {car.color} a ramassé un bonus de vie de {pickup_hp[row]} PV.")
+            pickups.remove(picked)
+
+    def pickup_target(self, entity_id):
+        """
+        Returns a health pickup as the target of an AI car.
+
+        Args:
+            entity_id (int): The entity id of the pickup.
+
+        Returns:
+            PickupTarget: The pickup, None if it is no longer on the track.
+        """
+        pickups = self.pickups
+        row = pickups.row(entity_id)
+        if row is None:
+            return None
+        return PickupTarget(entity_id, pygame.math.Vector2(pickups.x[row], pickups.y[row]), pickups.hp[row])
+
+    def move_cars(self, rows, dt):
+        """
+        Moves cars along their velocity and spin for one frame, in one pass over the car store columns,
+        then records their new pose (see Car.update_transform).
+
+        Args:
+            rows (list): The car store rows of the cars that drive this frame (see Car.update_physics).
+            dt (float): The time delta since the last frame.
+        """
+        store, cars = self.car_store, self.car_list
+        x, y, angle, vx, vy, spin = store.x, store.y, store.angle, store.vx, store.vy, store.spin
+        for row in rows:
+            x[row] += vx[row] * dt
+            y[row] += vy[row] * dt
+            angle[row] = (angle[row] + spin[row] * dt) % 360
+        for row in rows:
+            cars[row].update_transform()
+
+    def alive_cars(self, armed=False):
+        """
+        Returns the cars with HP left, from the health (and weapon) columns of the car store.
+
+        Args:
+            armed (bool, optional): Only the cars with bullets left in their cannon. Defaults to False.
+
+        Returns:
+            list: The cars, in car_list order.
+        """
+        store, cars = self.car_store, self.car_list # One row per car, in car_list order
+        hp = store.hp
+        if armed:
+            ammo = store.ammo
+            return [cars[row] for row in store.query(CAR_MASK) if hp[row] > 0 and ammo[row] > 0]
+        return [cars[row] for row in store.query(CAR_MASK) if hp[row] > 0]
+
+    def _add_bullet(self, car, shot):
+        """
+        Adds a bullet fired by a car to the entity store.
+
+        Args:
+            car (Car): The car that fired.
+            shot (tuple): The position and velocity of the bullet (x, y, vx, vy), as returned by Car.fire_cannon.
+        """
+        x, y, vx, vy = shot
+        self.bullets.create(BULLET_MASK, x=x, y=y, vx=vx, vy=vy, damage=BULLET_DAMAGE, radius=BULLET_RADIUS,
+                            owner=car.entity_id, team=pack_color(car.color))
+
+    def _collide_walls(self, car):
+        """
+        Resolves the collisions between a car and the walls of the track.
+        """
+        if car.hp <= 0 and not car.is_disabled: # Do not check collisions for destroyed cars
+            return
+        for wall in self.wall_grid.walls_near(car.rect): # Only the walls indexed around the car
+            # Use wall's rect for a quick initial check
+            if car.rect.colliderect(wall.rect):
+                collided, normal, penetration = collide_car_wall_sat(car, wall)
+                if collided:
+                    resolve_collision(car, wall, normal, penetration, self.clock_ms, self.collision_events)
+
+    def predict_car(self, car, dt_ms, controls):
+        """
+        Advances a single car by one frame: controls, physics and wall collisions, nothing else.
+        Used by the network client to predict its own car between two server snapshots.
+
+        Args:
+            car (Car): The car to move.
+            dt_ms (int): The duration of the frame in milliseconds.
+            controls (int): The CONTROL_* flags of the car for this frame.
+        """
+        car.apply_controls(controls) # Predicted bullets are not kept, the server's ones are displayed
+        if car.update_physics(dt_ms / 1000.0):
+            self.move_cars([car.store_row], dt_ms / 1000.0)
+        self._collide_walls(car)
+        self._apply_collision_events()
+
+    def _apply_collision_events(self):
+        """
+        Applies the impacts of the step, queued by the collision solver and the bullet hits: their
+        damage and scores, then their messages and the collision sound.
+
+        The events are applied in the order they happened, inside step(), so that a re-simulated step
+        (replays, rollback) ends with the same HP and scores. Only the impacts on a car that still has
+        HP count: the one that destroys it scores, the later ones of the step are dropped, as when the
+        solver applied the damage itself. A car destroyed by the step is disabled here, so that it does
+        not drive (nor fire) with 0 HP at the start of the next step.
+
+        A contact that goes on (a car scraping along a wall, two cars pushing against each other)
+        still deals its damage on every step, but only prints and plays the sound when it starts.
+        At most collision_log_limit messages and one collision sound per step, however many impacts.
+        """
+        events = self.collision_events
+        cars_by_id = self.cars_by_id
+        targets, sources, damages, zones = events.targets, events.sources, events.damages, events.zones
+        logged = skipped = 0
+        sound_car = None
+        for row in range(len(events)):
+            car = cars_by_id[targets[row]]
+            attacker = cars_by_id.get(sources[row]) # -1: no attacker
+            if not car.apply_damage(damages[row], attacker):
+                continue # Destroyed by an earlier impact of the step
+            new_contact = events.is_new_contact(row)
+            verbose = new_contact and logged < self.collision_log_limit
+            if verbose:
+                logged += 1
+            elif new_contact:
+                skipped += 1
+            car.report_damage(damages[row], IMPACT_ZONES[zones[row]], car.hp, attacker=attacker,
+                              verbose=verbose) # The destructions are always printed
+            if car.hp <= 0:
+                car.disable()
+            if new_contact and sound_car is None:
+                sound_car = car
+        if skipped:
+            print(f"... et {skipped} autres impacts")
+        if sound_car and sound_car.collision_sound and Car.sounds_enabled:
+            sound_car.collision_sound.play()
+        events.clear()
+
+    # --- State capture ---
+
+    def snapshot(self, out=None):
+        """
+        Returns the complete simulation state as a flat binary buffer (see snapshot.py).
+
+        Args:
+            out (bytearray, optional): A buffer to reuse. Defaults to None (new buffer).
+
+        Returns:
+            bytearray: The snapshot.
+        """
+        return snapshot.snapshot(self, out)
+
+    def restore(self, data):
+        """
+        Restores a buffer returned by snapshot() (the cars and entity stores are reused).
+
+        Args:
+            data (bytes-like): The snapshot.
+        """
+        snapshot.restore(self, data)
+
+    # --- Rendering ---
+
+    def draw(self, screen, font_score, font_coords, detail=RENDER_DETAIL_FULL):
+        """
+        Draws the track, the entities and the score board.
+
+        Args:
+            screen (pygame.Surface): The screen to draw on.
+            font_score (pygame.font.Font): The font of the score board.
+            font_coords (pygame.font.Font): The font of the coordinates.
+            detail (int, optional): The render detail (RENDER_DETAIL_*, lowered by the frame pacing under load). Defaults to RENDER_DETAIL_FULL.
+        """
+        self.draw_scene(screen, detail)
+        self.draw_hud(screen, font_score, font_coords, detail)
+
+    def draw_scene(self, screen, detail=RENDER_DETAIL_FULL, scale=1.0):
+        """
+        Draws the track and the entities (and the debug overlays at full detail).
+
+        Args:
+            screen (pygame.Surface): The surface to draw on.
+            detail (int, optional): The render detail (RENDER_DETAIL_*). Defaults to RENDER_DETAIL_FULL.
+            scale (float, optional): The size of a world pixel on the surface (internal render resolution). Defaults to 1.0.
+        """
+        screen.fill(DARK_GRAY) # Fond de la piste
+
+        for wall in self.track.walls:
+            wall.draw(screen, scale)
+            if detail >= RENDER_DETAIL_FULL:
+                # Dessiner la normale du mur pour le débogage (en rouge)
+                wall_center = (wall.p1 + wall.p2) / 2
+                pygame.draw.line(screen, RED, wall_center * scale, (wall_center + wall.normal * 30) * scale, max(1, round(2 * scale))) # Dessine la normale
+
+        # Draw the racing line and waypoints for debugging in Race Mode
+        if self.game_mode == GAME_MODE_RACE and detail >= RENDER_DETAIL_FULL:
+            if self.race_line:
+                points = self.race_line.points if scale == 1 else [(x * scale, y * scale) for x, y in self.race_line.points]
+                pygame.draw.lines(screen, MAGENTA, True, points, 1)
+            font_wp = assets.font(max(1, round(20 * scale)))
+            for i, wp in enumerate(self.track.waypoints):
+                pygame.draw.circle(screen, BLUE, (wp[0] * scale, wp[1] * scale), max(1, round(10 * scale)), max(1, round(2 * scale))) # Draw waypoint circle
+                wp_text = font_wp.render(str(i), True, BLUE)
+                screen.blit(wp_text, wp_text.get_rect(center=(wp[0] * scale, (wp[1] - 15) * scale)))
+
+
+        # The entities are gathered into the render queue, then drawn with one blits call per layer
+        queue = self.render_queue
+        pickups = self.pickups # Shared stamp per HP value: disc, outline and value
+        layer = queue.layers[LAYER_PICKUPS]
+        xs, ys, hps = pickups.x, pickups.y, pickups.hp
+        for row in pickups.query(PICKUP_MASK):
+            stamp, offset = stamps.pickup(hps[row], HEALTH_PICKUP_RADIUS, GREEN, scale)
+            layer.append((stamp, (int(xs[row] * scale) - offset, int(ys[row] * scale) - offset)))
+
+        cars = self.car_list
+        for row in self.car_store.query(CAR_MASK):
+            cars[row].submit(queue, scale)
+
+        bullets = self.bullets # Draw all active bullets
+        layer = queue.layers[LAYER_BULLETS]
+        xs, ys, radii = bullets.x, bullets.y, bullets.radius
+        stamp_radius = None
+        for row in bullets.query(BULLET_MASK):
+            if radii[row] != stamp_radius: # All bullets share BULLET_RADIUS so far
+                stamp_radius = radii[row]
+                stamp, offset = stamps.bullet(stamp_radius, scale)
+            layer.append((stamp, (int(xs[row] * scale) - offset, int(ys[row] * scale) - offset)))
+
+        queue.flush(screen)
+
+    def draw_hud(self, screen, font_score, font_coords, detail=RENDER_DETAIL_FULL, scale=1.0):
+        """
+        Draws the score board (and the coordinates at full detail).
+
+        Args:
+            screen (pygame.Surface): The surface to draw on.
+            font_score (pygame.font.Font): The font of the score board (sized for the scale).
+            font_coords (pygame.font.Font): The font of the coordinates (sized for the scale).
+            detail (int, optional): The render detail (RENDER_DETAIL_*). Defaults to RENDER_DETAIL_FULL.
+            scale (float, optional): The size of a screen pixel on the surface. Defaults to 1.0.
+        """
+        # Display scores and HP for all cars
+        score_y_offset = 10
+        for i, car in enumerate(self.player_cars):
+            status = " (Disabled)" if car.is_disabled else ""
+            score_text = font_score.render(
+                f"P{i+1} ({car.color}): Score: {car.score} HP: {car.hp:.0f} Bullets: {car.bullets_remaining}/{car.max_bullets}{status}",
+                True, car.color)
+            screen.blit(score_text, (10 * scale, (score_y_offset + i * 40) * scale))
+
+            if detail < RENDER_DETAIL_FULL:
+                continue
+            coord_text = font_coords.render(f"Coords: ({int(car.position.x)}, {int(car.position.y)})", True, car.color)
+            screen.blit(coord_text, (10 * scale, (score_y_offset + i * 40 + 25) * scale))
+
+        if detail < RENDER_DETAIL_REDUCED:
+            return
+        ai_score_y_offset = 10
+        right = (SCREEN_WIDTH - 10) * scale
+        for i, car in enumerate(self.ai_cars):
+            status = " (Disabled)" if car.is_disabled else ""
+            score_text = font_score.render(f"AI {i+1} ({car.color}): Score: {car.score} HP: {car.hp:.0f}{status}", True, YELLOW)
+            screen.blit(score_text, (right - score_text.get_width(), (ai_score_y_offset + i * 40) * scale)) # Augmenté le décalage Y
+            if detail < RENDER_DETAIL_FULL:
+                continue
+
+            # Affichage des coordonnées des IA dans le coin supérieur droit
+            coord_text = font_coords.render(f"Coords: ({int(car.position.x)}, {int(car.position.y)})", True, YELLOW)
+            screen.blit(coord_text, (right - coord_text.get_width(), (ai_score_y_offset + i * 40 + 25) * scale)) # Décalé sous le score
+
+    def shutdown(self):
+        """
+        Releases the resources of the session (AI planner worker processes).
+        """
+        if self.planner:
+            self.planner.shutdown()